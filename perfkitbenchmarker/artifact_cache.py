@@ -0,0 +1,310 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shares preprovisioned data between the VMs of a benchmark.
+
+Preprovisioned data files are identified by their sha256sum hashes. The first
+VM of a benchmark that needs a file fetches it the usual way, i.e. from the
+local data directory, the preprovisioned data bucket or the fallback URL.
+Every other VM copies the file from a VM that already has a verified copy. Each
+VM serves at most --artifact_peer_fan_out copies at a time, so copies spread
+through the VMs as a tree and the number of fetches from outside the benchmark
+does not grow with the number of VMs. Copies between VMs go to the internal IP
+address of the target when the source VM can reach it.
+
+DistributeFile uses the same copy tree to push a local file to many VMs.
+"""
+
+import collections
+import functools
+import hashlib
+import logging
+import os
+import posixpath
+import threading
+import time
+
+from absl import flags
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
+
+_ARTIFACT_PEER_FAN_OUT = flags.DEFINE_integer(
+    'artifact_peer_fan_out', 2,
+    'The number of VMs that one VM with a verified copy of a preprovisioned '
+    'data file copies it to at a time. 0 makes every VM fetch preprovisioned '
+    'data itself.', lower_bound=0)
+
+FLAGS = flags.FLAGS
+
+# Errors after which a VM fetches the file itself instead of copying it from a
+# peer.
+_PEER_COPY_ERRORS = (NotImplementedError,
+                     errors.VirtualMachine.RemoteCommandError,
+                     errors.Setup.BadPreprovisionedDataError)
+
+
+def _CanUseInternalIp(source_vm, target_vm):
+  """Returns whether the source VM can copy to the target's internal IP.
+
+  Copies over the internal network avoid the cost of external egress. The
+  external IP is only used when the VMs do not share a network.
+  """
+  if not target_vm.internal_ip:
+    return False
+  try:
+    return bool(source_vm.IsReachable(target_vm))
+  except _PEER_COPY_ERRORS as e:
+    logging.info('Could not check whether %s reaches %s internally: %s',
+                 source_vm, target_vm, e)
+    return False
+
+
+class ArtifactCache(object):
+  """Tracks which VMs of a benchmark have which preprovisioned data files.
+
+  Attributes:
+    fetches: The number of files fetched from outside the benchmark.
+    peer_copies: The number of files copied between VMs.
+  """
+
+  def __init__(self):
+    self._condition = threading.Condition()
+    # sha256sum to a list of (vm, path) tuples of verified copies.
+    self._copies = collections.defaultdict(list)
+    # sha256sums of files that some VM is fetching.
+    self._fetching = set()
+    # VM to the number of copies it is currently serving.
+    self._uploads = collections.Counter()
+    self.fetches = 0
+    self.peer_copies = 0
+
+  def Install(self, vm, module_name, sha256sum, filename, install_path,
+              fetch_function):
+    """Installs a file on the VM from a peer or with fetch_function.
+
+    Args:
+      vm: The BaseVirtualMachine to install the file on.
+      module_name: The name of the module defining the preprovisioned data.
+      sha256sum: The expected sha256sum hash of the file.
+      filename: The name of the file.
+      install_path: The directory on the VM to install the file in.
+      fetch_function: Function called without arguments that fetches the file
+          to install_path on the VM and verifies its hash.
+    """
+    source = self._TakeSource(vm, sha256sum)
+    if source and source[0] is vm:
+      self._CopyOnVm(vm, source[1], filename, install_path, fetch_function)
+    elif source:
+      source_vm, source_path = source
+      try:
+        source_vm.MoveFile(vm, posixpath.join(source_path, filename),
+                           install_path,
+                           use_internal_ip=_CanUseInternalIp(source_vm, vm))
+        if not FLAGS.preprovision_ignore_checksum:
+          vm.CheckPreprovisionedData(install_path, module_name, filename,
+                                     sha256sum)
+      except _PEER_COPY_ERRORS as e:
+        logging.warning('Copying %s from %s to %s failed, fetching it '
+                        'instead: %s', filename, source_vm, vm, e)
+        fetch_function()
+        with self._condition:
+          self.fetches += 1
+      else:
+        with self._condition:
+          self.peer_copies += 1
+      finally:
+        with self._condition:
+          self._uploads[source_vm] -= 1
+          self._condition.notify_all()
+    else:
+      try:
+        fetch_function()
+      finally:
+        with self._condition:
+          self._fetching.discard(sha256sum)
+          self._condition.notify_all()
+      with self._condition:
+        self.fetches += 1
+    with self._condition:
+      self._copies[sha256sum].append((vm, install_path))
+      self._condition.notify_all()
+
+  def _CopyOnVm(self, vm, source_path, filename, install_path,
+                fetch_function):
+    """Copies a file from another directory of the VM, or fetches it."""
+    if source_path == install_path:
+      return
+    try:
+      vm.RemoteCommand('cp %s %s' % (posixpath.join(source_path, filename),
+                                     install_path))
+    except _PEER_COPY_ERRORS as e:
+      logging.warning('Copying %s on %s failed, fetching it instead: %s',
+                      filename, vm, e)
+      fetch_function()
+      with self._condition:
+        self.fetches += 1
+
+  def _TakeSource(self, vm, sha256sum):
+    """Returns a (vm, path) copy to copy from, or None to fetch the file.
+
+    Returns the VM's own copy if it has one. Otherwise waits while another VM
+    is fetching the file or all VMs with copies are serving
+    --artifact_peer_fan_out copies.
+    """
+    with self._condition:
+      for source_vm, path in self._copies[sha256sum]:
+        if source_vm is vm:
+          return source_vm, path
+      while True:
+        sources = [(source_vm, path)
+                   for source_vm, path in self._copies[sha256sum]
+                   if source_vm is not vm and self._uploads[source_vm] <
+                   _ARTIFACT_PEER_FAN_OUT.value]
+        if sources:
+          source = min(sources, key=lambda source: self._uploads[source[0]])
+          self._uploads[source[0]] += 1
+          return source
+        if not self._copies[sha256sum] and sha256sum not in self._fetching:
+          self._fetching.add(sha256sum)
+          return None
+        self._condition.wait()
+
+  def GetSamples(self):
+    """Returns samples of how the preprovisioned data was installed."""
+    return [
+        sample.Sample('Preprovisioned Data Fetches', self.fetches, 'count',
+                      {'artifact_peer_fan_out': _ARTIFACT_PEER_FAN_OUT.value}),
+        sample.Sample('Preprovisioned Data Peer Copies', self.peer_copies,
+                      'count',
+                      {'artifact_peer_fan_out': _ARTIFACT_PEER_FAN_OUT.value}),
+    ]
+
+
+# BenchmarkSpec uuid to its ArtifactCache.
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def GetArtifactCache(benchmark_spec):
+  """Returns the ArtifactCache of the benchmark."""
+  with _caches_lock:
+    if benchmark_spec.uuid not in _caches:
+      _caches[benchmark_spec.uuid] = ArtifactCache()
+    return _caches[benchmark_spec.uuid]
+
+
+def Install(vm, module_name, sha256sum, filename, install_path,
+            fetch_function):
+  """Installs preprovisioned data on the VM, sharing it between VMs.
+
+  Shares the file between the VMs of the current thread's benchmark. Without a
+  benchmark, a sha256sum hash or with --artifact_peer_fan_out=0, calls
+  fetch_function.
+
+  Args:
+    vm: The BaseVirtualMachine to install the file on.
+    module_name: The name of the module defining the preprovisioned data.
+    sha256sum: The expected sha256sum hash of the file, or None if unknown.
+    filename: The name of the file.
+    install_path: The directory on the VM to install the file in.
+    fetch_function: Function called without arguments that fetches the file
+        to install_path on the VM and verifies its hash.
+  """
+  benchmark_spec = context.GetThreadBenchmarkSpec()
+  if not benchmark_spec or not sha256sum or not _ARTIFACT_PEER_FAN_OUT.value:
+    fetch_function()
+    return
+  GetArtifactCache(benchmark_spec).Install(vm, module_name, sha256sum,
+                                           filename, install_path,
+                                           fetch_function)
+
+
+def GetSamples(benchmark_spec):
+  """Returns samples of the benchmark's ArtifactCache, if it was used."""
+  with _caches_lock:
+    cache = _caches.get(benchmark_spec.uuid)
+  if not cache or not (cache.fetches or cache.peer_copies):
+    return []
+  return cache.GetSamples()
+
+
+def _GetLocalSha256sum(path):
+  """Returns the sha256sum hash of a local file."""
+  sha256 = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      sha256.update(chunk)
+  return sha256.hexdigest()
+
+
+def _PushAndVerify(vm, local_path, remote_path, sha256sum):
+  """Pushes a local file to the VM and checks its hash."""
+  vm.PushFile(local_path, remote_path)
+  vm.CheckPreprovisionedData(remote_path, os.path.dirname(local_path),
+                             os.path.basename(local_path), sha256sum)
+
+
+def DistributeFile(vms, local_path, remote_path=''):
+  """Copies a local file to many VMs through a peer copy tree.
+
+  Pushes the file from the runner to one VM. VMs with a verified copy then
+  copy it to the remaining VMs, each to at most --artifact_peer_fan_out VMs at
+  a time, so the runner's uplink carries the file once regardless of the
+  number of VMs. Every copy is checked against the local file's sha256sum
+  hash. With --artifact_peer_fan_out=0, pushes the file to every VM from the
+  runner.
+
+  Args:
+    vms: The list of BaseVirtualMachines to copy the file to.
+    local_path: The location of the file on the LOCAL machine.
+    remote_path: The directory on the VMs to copy the file into, default is
+        the home directory.
+
+  Returns:
+    A list of sample.Sample objects with the time taken and the aggregate
+    throughput of the distribution.
+  """
+  sha256sum = _GetLocalSha256sum(local_path)
+  filename = os.path.basename(local_path)
+  cache = ArtifactCache()
+
+  def _Install(vm):
+    fetch_function = functools.partial(_PushAndVerify, vm, local_path,
+                                       remote_path, sha256sum)
+    if _ARTIFACT_PEER_FAN_OUT.value:
+      cache.Install(vm, os.path.dirname(local_path), sha256sum, filename,
+                    remote_path, fetch_function)
+    else:
+      fetch_function()
+
+  start_time = time.time()
+  background_tasks.RunThreaded(_Install, vms)
+  elapsed = time.time() - start_time
+  file_size_mb = os.path.getsize(local_path) / (1 << 20)
+  metadata = {
+      'filename': filename,
+      'file_size_mb': file_size_mb,
+      'num_vms': len(vms),
+      'artifact_peer_fan_out': _ARTIFACT_PEER_FAN_OUT.value,
+      'runner_pushes': (cache.fetches if _ARTIFACT_PEER_FAN_OUT.value else
+                        len(vms)),
+      'peer_copies': cache.peer_copies,
+  }
+  return [
+      sample.Sample('File Distribution Time', elapsed, 'seconds', metadata),
+      sample.Sample('File Distribution Throughput',
+                    file_size_mb * len(vms) / elapsed if elapsed else 0,
+                    'MB/s', metadata),
+  ]
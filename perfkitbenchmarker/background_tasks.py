@@ -53,8 +53,10 @@ keeping the risk of deadlock low.
 
 
 import abc
+import asyncio
 import collections
 from concurrent import futures
+import contextlib
 import ctypes
 import functools
 import logging
@@ -67,6 +69,7 @@ import traceback
 from absl import flags
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import log_util
 import six
 from six.moves import queue
@@ -90,6 +93,11 @@ _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT = 1
 # The default value for max_concurrent_threads.
 MAX_CONCURRENT_THREADS = 200
 
+# The default maximum number of coroutines RunParallelCoroutines keeps in
+# flight. Coroutines are much cheaper than threads, so this can be far higher
+# than MAX_CONCURRENT_THREADS.
+MAX_CONCURRENT_COROUTINES = 1000
+
 # The default value is set in pkb.py. It is the greater of
 # MAX_CONCURRENT_THREADS or the value passed to --num_vms. This is particularly
 # important for the cluster_boot benchmark where we want to launch all of the
@@ -97,8 +105,16 @@ MAX_CONCURRENT_THREADS = 200
 flags.DEFINE_integer(
     'max_concurrent_threads', None, 'Maximum number of concurrent threads to '
     'use when running a benchmark.')
+flags.DEFINE_integer(
+    'adaptive_concurrency_initial', 10, 'Number of concurrent tasks an '
+    'AdaptiveConcurrencyLimiter starts with before adapting to rate limits.',
+    lower_bound=1)
 FLAGS = flags.FLAGS
 
+# Records the AdaptiveConcurrencyLimiter whose task the current thread is
+# running, so that a limiter only counts the rate limits its own tasks hit.
+_limiter_thread_local = threading.local()
+
 
 def _GetCallString(target_arg_tuple):
   """Returns the string representation of a function call."""
@@ -210,16 +226,21 @@ class _BackgroundTaskThreadContext(object):
   Attributes:
     benchmark_spec: BenchmarkSpec of the benchmark currently being executed.
     log_context: ThreadLogContext of the parent thread.
+    concurrency_limiter: AdaptiveConcurrencyLimiter whose tasks the parent
+        thread belongs to, or None.
   """
 
   def __init__(self):
     self.benchmark_spec = context.GetThreadBenchmarkSpec()
     self.log_context = log_util.GetThreadLogContext()
+    self.concurrency_limiter = getattr(
+        _limiter_thread_local, 'concurrency_limiter', None)
 
   def CopyToCurrentThread(self):
     """Sets the thread context of the current thread."""
     log_util.SetThreadLogContext(log_util.ThreadLogContext(self.log_context))
     context.SetThreadBenchmarkSpec(self.benchmark_spec)
+    _limiter_thread_local.concurrency_limiter = self.concurrency_limiter
 
 
 class _BackgroundTask(object):
@@ -486,8 +507,127 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     self._executor.shutdown(wait=True)
 
 
+class AdaptiveConcurrencyLimiter(object):
+  """Adapts the number of concurrent tasks to cloud API rate limits.
+
+  Uses additive-increase/multiplicative-decrease (AIMD): each task that
+  completes while no rate limit was reported raises the limit by one, and
+  each completion after events.rate_limited was sent halves it. Only events
+  sent from the limiter's own tasks, or from threads they start, are counted.
+  Pass an instance to RunThreaded to use it.
+
+  Attributes:
+    concurrency: int. The current limit on concurrent tasks.
+    max_concurrency: int. The upper bound for concurrency.
+    min_concurrency: int. The lower bound for concurrency.
+    timeline: list of (timestamp, concurrency) tuples recording each change.
+  """
+
+  def __init__(self, initial_concurrency=None, max_concurrency=None,
+               min_concurrency=1, decrease_factor=0.5):
+    self.max_concurrency = max_concurrency or MAX_CONCURRENT_THREADS
+    self.min_concurrency = min(min_concurrency, self.max_concurrency)
+    self.decrease_factor = decrease_factor
+    self.concurrency = max(self.min_concurrency, min(
+        initial_concurrency or FLAGS.adaptive_concurrency_initial,
+        self.max_concurrency))
+    self.timeline = [(time.time(), self.concurrency)]
+    self._rate_limited_count = 0
+    self._lock = threading.Lock()
+
+  def _OnRateLimited(self, sender, **kwargs):
+    del sender, kwargs
+    if getattr(_limiter_thread_local, 'concurrency_limiter', None) is not self:
+      return
+    with self._lock:
+      self._rate_limited_count += 1
+
+  def __enter__(self):
+    events.rate_limited.connect(self._OnRateLimited, weak=False)
+    return self
+
+  def __exit__(self, *unused_args):
+    events.rate_limited.disconnect(self._OnRateLimited)
+
+  def OnTaskComplete(self):
+    """Updates concurrency after a task completes."""
+    with self._lock:
+      rate_limited = self._rate_limited_count
+      self._rate_limited_count = 0
+    if rate_limited:
+      concurrency = max(self.min_concurrency,
+                        int(self.concurrency * self.decrease_factor))
+    else:
+      concurrency = min(self.max_concurrency, self.concurrency + 1)
+    if concurrency != self.concurrency:
+      logging.info('Adjusting concurrency from %d to %d.', self.concurrency,
+                   concurrency)
+      self.concurrency = concurrency
+      self.timeline.append((time.time(), concurrency))
+
+
+class ResourcePacker(object):
+  """Packs tasks with declared resource footprints into resource budgets.
+
+  Tasks start in order, except that a task whose footprint does not fit in
+  what is left of the budgets is passed over for the next task that fits
+  (first fit), so capacity freed by a finished task is reused immediately. A
+  task that exceeds a budget on its own starts once no other task is running.
+  Pass an instance to RunParallelProcesses to use it.
+
+  Attributes:
+    budgets: dict mapping resource name to the amount available to all running
+      tasks. Resources without a budget are unlimited.
+    footprints: list of dicts mapping resource name to the amount used by each
+      task, in task order.
+    queue_delays: list of the seconds from the creation of the packer until
+      each task started, or None for tasks that have not started.
+  """
+
+  def __init__(self, budgets, footprints):
+    self.budgets = dict(budgets)
+    self.footprints = footprints
+    self.queue_delays = [None] * len(footprints)
+    self._in_use = collections.Counter()
+    self._start_time = time.time()
+
+  def _Fits(self, index):
+    return all(self._in_use[resource] + amount <= self.budgets[resource]
+               for resource, amount in self.footprints[index].items()
+               if resource in self.budgets)
+
+  def NextTask(self, pending, any_active):
+    """Picks the next task to start.
+
+    Args:
+      pending: list of indices of the tasks not yet started, in task order.
+      any_active: bool. Whether any task is running.
+
+    Returns:
+      The index of the task to start, or None if no pending task fits until a
+      running task completes.
+    """
+    for index in pending:
+      if self._Fits(index):
+        return index
+    if any_active:
+      return None
+    logging.warning(
+        'Task %d needs %s, which exceeds the budgets %s. Running it alone.',
+        pending[0], self.footprints[pending[0]], self.budgets)
+    return pending[0]
+
+  def OnTaskStart(self, index):
+    self.queue_delays[index] = time.time() - self._start_time
+    self._in_use.update(self.footprints[index])
+
+  def OnTaskComplete(self, index):
+    self._in_use.subtract(self.footprints[index])
+
+
 def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
-                      parallel_exception_class, post_task_delay=0):
+                      parallel_exception_class, post_task_delay=0,
+                      concurrency_limiter=None, resource_packer=None):
   """Executes function calls concurrently in separate threads or processes.
 
   Args:
@@ -500,6 +640,11 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
     parallel_exception_class: Type of exception to raise upon an exception in
         one of the called functions.
     post_task_delay: Delay in seconds between parallel task invocations.
+    concurrency_limiter: Optional AdaptiveConcurrencyLimiter. If provided, the
+        number of concurrent tasks follows its concurrency, capped at
+        max_concurrency.
+    resource_packer: Optional ResourcePacker. If provided, it picks which task
+        to start next, so tasks may start out of order.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -510,19 +655,37 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
         functions.
   """
   thread_context = _BackgroundTaskThreadContext()
+  if concurrency_limiter:
+    thread_context.concurrency_limiter = concurrency_limiter
   max_concurrency = min(max_concurrency, len(target_arg_tuples))
   error_strings = []
-  started_task_count = 0
+  # Indices into target_arg_tuples of the tasks not yet started, and of the
+  # started tasks in the order they started (the task manager's task ids).
+  pending_indices = list(range(len(target_arg_tuples)))
+  started_indices = []
   active_task_count = 0
-  with get_task_manager(max_concurrency) as task_manager:
+  limiter_context = concurrency_limiter or contextlib.nullcontext()
+  with get_task_manager(max_concurrency) as task_manager, limiter_context:
     try:
-      while started_task_count < len(target_arg_tuples) or active_task_count:
-        if (started_task_count < len(target_arg_tuples) and
-            active_task_count < max_concurrency):
+      while pending_indices or active_task_count:
+        allowed_concurrency = max_concurrency
+        if concurrency_limiter:
+          allowed_concurrency = min(max_concurrency,
+                                    concurrency_limiter.concurrency)
+        index = None
+        if pending_indices and active_task_count < allowed_concurrency:
+          index = pending_indices[0]
+          if resource_packer:
+            index = resource_packer.NextTask(pending_indices,
+                                             bool(active_task_count))
+        if index is not None:
           # Start a new task.
-          target, args, kwargs = target_arg_tuples[started_task_count]
+          pending_indices.remove(index)
+          target, args, kwargs = target_arg_tuples[index]
           task_manager.StartTask(target, args, kwargs, thread_context)
-          started_task_count += 1
+          started_indices.append(index)
+          if resource_packer:
+            resource_packer.OnTaskStart(index)
           active_task_count += 1
           if post_task_delay:
             time.sleep(post_task_delay)
@@ -531,14 +694,18 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
         # Wait for a task to complete.
         task_id = task_manager.AwaitAnyTask()
         active_task_count -= 1
+        if concurrency_limiter:
+          concurrency_limiter.OnTaskComplete()
+        if resource_packer:
+          resource_packer.OnTaskComplete(started_indices[task_id])
         # If the task failed, it may still be a long time until all remaining
         # tasks complete. Log the failure immediately before continuing to wait
         # for other tasks.
         stacktrace = task_manager.tasks[task_id].traceback
         if stacktrace:
           msg = ('Exception occurred while calling {0}:{1}{2}'.format(
-              _GetCallString(target_arg_tuples[task_id]), os.linesep,
-              stacktrace))
+              _GetCallString(target_arg_tuples[started_indices[task_id]]),
+              os.linesep, stacktrace))
           logging.error(msg)
           error_strings.append(msg)
 
@@ -556,12 +723,16 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
     raise parallel_exception_class(
         'The following exceptions occurred during parallel execution:'
         '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
-  results = [task.return_value for task in task_manager.tasks]
-  assert len(target_arg_tuples) == len(results), (target_arg_tuples, results)
+  results = [None] * len(target_arg_tuples)
+  for index, task in zip(started_indices, task_manager.tasks):
+    results[index] = task.return_value
+  assert len(target_arg_tuples) == len(task_manager.tasks), (
+      target_arg_tuples, task_manager.tasks)
   return results
 
 
-def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
+def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0,
+                       concurrency_limiter=None):
   """Executes function calls concurrently in separate threads.
 
   Args:
@@ -570,6 +741,8 @@ def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
     max_concurrency: int or None. The maximum number of concurrent new
         threads.
     post_task_delay: Delay in seconds between parallel task invocations.
+    concurrency_limiter: Optional AdaptiveConcurrencyLimiter that adapts the
+        number of concurrent threads.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -581,13 +754,14 @@ def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
   """
   return _RunParallelTasks(
       target_arg_tuples, max_concurrency, _BackgroundThreadTaskManager,
-      errors.VmUtil.ThreadException, post_task_delay)
+      errors.VmUtil.ThreadException, post_task_delay, concurrency_limiter)
 
 
 def RunThreaded(target,
                 thread_params,
                 max_concurrent_threads=None,
-                post_task_delay=0):
+                post_task_delay=0,
+                concurrency_limiter=None):
   """Runs the target method in parallel threads.
 
   The method starts up threads with one arg from thread_params as the first arg.
@@ -599,6 +773,9 @@ def RunThreaded(target,
         Usually this is a list of VMs.
     max_concurrent_threads: The maximum number of concurrent threads to allow.
     post_task_delay: Delay in seconds between commands.
+    concurrency_limiter: Optional AdaptiveConcurrencyLimiter that grows the
+        number of concurrent threads while tasks succeed and backs off when
+        cloud APIs report rate limiting.
 
   Returns:
     List of the same length as thread_params. Contains the return value from
@@ -646,11 +823,151 @@ def RunThreaded(target,
 
   return RunParallelThreads(target_arg_tuples,
                             max_concurrency=max_concurrent_threads,
-                            post_task_delay=post_task_delay)
+                            post_task_delay=post_task_delay,
+                            concurrency_limiter=concurrency_limiter)
+
+
+def RunTaskGraph(tasks, max_concurrency=None):
+  """Runs tasks in threads, each as soon as the tasks it depends on complete.
+
+  Args:
+    tasks: list of (name, target, dependencies) tuples. Each target is called
+        without arguments once every task named in dependencies has completed.
+        Among tasks that are ready at the same time, earlier tasks start first.
+    max_concurrency: int or None. The maximum number of tasks running at once,
+        or None for no limit. With 1, tasks run one at a time in list order
+        whenever the list order satisfies the dependencies.
+
+  Returns:
+    dict mapping the name of each task to a (start_time, end_time) tuple of the
+    seconds since the epoch when it ran.
+
+  Raises:
+    ValueError: When a dependency names no task or the dependencies contain a
+        cycle.
+    Exception: The exception raised by the first task that failed. Tasks that
+        have not started when a task fails are not started, and running tasks
+        are allowed to finish first. Failures of other tasks are logged.
+  """
+  names = [name for name, _, _ in tasks]
+  dependencies = {name: set(deps) for name, _, deps in tasks}
+  unknown = set().union(*dependencies.values()) - set(names)
+  if unknown:
+    raise ValueError('Unknown task dependencies: {0}'.format(sorted(unknown)))
+  ordered = []
+  while len(ordered) < len(names):
+    ready = [name for name in names if name not in ordered and
+             dependencies[name].issubset(ordered)]
+    if not ready:
+      raise ValueError('Task dependencies contain a cycle: {0}'.format(
+          sorted(set(names) - set(ordered))))
+    ordered.extend(ready)
+
+  thread_context = _BackgroundTaskThreadContext()
+  targets = {name: target for name, target, _ in tasks}
+  timings = {}
+  running = set()
+  failures = []
+  condition = threading.Condition()
+
+  def _RunTask(name):
+    thread_context.CopyToCurrentThread()
+    start_time = time.time()
+    try:
+      targets[name]()
+    except BaseException as e:  # pylint: disable=broad-except
+      logging.error('Exception occurred while running task %s:%s%s', name,
+                    os.linesep, traceback.format_exc())
+      with condition:
+        failures.append(e)
+    finally:
+      with condition:
+        timings[name] = (start_time, time.time())
+        running.remove(name)
+        condition.notify()
+
+  pending = list(names)
+  with condition:
+    try:
+      while True:
+        while pending and not failures and (
+            max_concurrency is None or len(running) < max_concurrency):
+          ready = [name for name in pending
+                   if dependencies[name].issubset(timings)]
+          if not ready:
+            break
+          pending.remove(ready[0])
+          running.add(ready[0])
+          thread = threading.Thread(target=_RunTask, args=(ready[0],))
+          thread.daemon = True
+          thread.start()
+        if not running:
+          break
+        condition.wait(_LONG_TIMEOUT)
+    except KeyboardInterrupt:
+      logging.error(
+          'Received KeyboardInterrupt while running tasks %s.', sorted(running))
+      raise
+  if failures:
+    raise failures[0]
+  return timings
+
+
+def RunParallelCoroutines(coroutines, max_concurrency=None):
+  """Runs coroutines concurrently on an event loop in the calling thread.
+
+  This bridges synchronous benchmark code to coroutine APIs such as
+  vm_util.IssueCommandAsync and vm.RemoteCommandAsync, allowing thousands of
+  subprocesses to be awaited without a thread per task. Because the loop runs
+  in the calling thread, PKB thread context (e.g. the benchmark spec) is
+  visible to the coroutines.
+
+  Args:
+    coroutines: list of coroutine objects to run.
+    max_concurrency: int or None. The maximum number of coroutines running at
+        once. Defaults to MAX_CONCURRENT_COROUTINES.
+
+  Returns:
+    list of coroutine return values in the order corresponding to the order of
+    coroutines.
+
+  Raises:
+    errors.VmUtil.ThreadException: When an exception occurred in any of the
+        coroutines.
+  """
+  if not coroutines:
+    return []
+  semaphore_limit = max_concurrency or MAX_CONCURRENT_COROUTINES
+
+  async def _RunAll():
+    semaphore = asyncio.Semaphore(semaphore_limit)
+
+    async def _RunOne(coroutine):
+      async with semaphore:
+        return await coroutine
+
+    return await asyncio.gather(*[_RunOne(c) for c in coroutines],
+                                return_exceptions=True)
+
+  results = asyncio.run(_RunAll())
+  error_strings = []
+  for coroutine, result in zip(coroutines, results):
+    if isinstance(result, BaseException):
+      msg = 'Exception occurred while awaiting {0}:{1}{2}'.format(
+          coroutine.__qualname__, os.linesep, ''.join(
+              traceback.format_exception(type(result), result,
+                                         result.__traceback__)))
+      logging.error(msg)
+      error_strings.append(msg)
+  if error_strings:
+    raise errors.VmUtil.ThreadException(
+        'The following exceptions occurred during parallel execution:'
+        '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
+  return results
 
 
 def RunParallelProcesses(target_arg_tuples, max_concurrency,
-                         post_process_delay=0):
+                         post_process_delay=0, resource_packer=None):
   """Executes function calls concurrently in separate processes.
 
   Args:
@@ -660,6 +977,8 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency,
         processes. If None, it will default to the number of processors on the
         machine.
     post_process_delay: Delay in seconds between parallel process invocations.
+    resource_packer: Optional ResourcePacker that starts processes as their
+        resource footprints fit its budgets.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -680,7 +999,7 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency,
     ret_val = _RunParallelTasks(
         target_arg_tuples, max_concurrency, _BackgroundProcessTaskManager,
         errors.VmUtil.CalledProcessException,
-        post_task_delay=post_process_delay)
+        post_task_delay=post_process_delay, resource_packer=resource_packer)
   finally:
     if old_handler:
       signal.signal(signal.SIGINT, old_handler)
@@ -14,6 +14,7 @@
 """Container for all data required for a benchmark to run."""
 
 
+import collections
 import contextlib
 import copy
 import datetime
@@ -21,13 +22,17 @@ import importlib
 import logging
 import os
 import pickle
+import re
 import threading
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import benchmark_status
 from perfkitbenchmarker import capacity_reservation
 from perfkitbenchmarker import cloud_tpu
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import container_service
 from perfkitbenchmarker import context
 from perfkitbenchmarker import data_discovery_service
@@ -44,6 +49,8 @@ from perfkitbenchmarker import placement_group
 from perfkitbenchmarker import provider_info
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import relational_db
+from perfkitbenchmarker import resource
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import smb_service
 from perfkitbenchmarker import spark_service
 from perfkitbenchmarker import stages
@@ -93,6 +100,17 @@ flags.DEFINE_string('postrun_script', None,
                     'Script to run right after run stage.')
 flags.DEFINE_integer('create_and_boot_post_task_delay', None,
                      'Delay in seconds to delay in between boot tasks.')
+flags.DEFINE_boolean('adaptive_provisioning_concurrency', False,
+                     'Whether to adapt the number of VMs created in parallel '
+                     'to cloud API rate limits, starting from '
+                     '--adaptive_concurrency_initial and growing up to '
+                     '--max_concurrent_threads while creations succeed.')
+flags.DEFINE_boolean('parallel_provisioning', True,
+                     'Whether to provision independent resources, e.g. VMs, '
+                     'a container cluster and a managed database, '
+                     'concurrently as soon as the resources they depend on '
+                     'are ready. If false, resources are provisioned one '
+                     'kind at a time.')
 # pyformat: disable
 flags.DEFINE_enum('benchmark_compatibility_checking', SUPPORTED,
                   [SUPPORTED, NOT_EXCLUDED, SKIP_CHECK],
@@ -106,6 +124,80 @@ flags.DEFINE_enum('benchmark_compatibility_checking', SUPPORTED,
 # pyformat: enable
 
 
+# vCPUs of machine types whose names do not include a vCPU count.
+_MACHINE_TYPE_VCPUS = {
+    # GCP shared-core machine types.
+    'e2-micro': 2,
+    'e2-small': 2,
+    'e2-medium': 2,
+    'f1-micro': 1,
+    'g1-small': 1,
+    # AWS bare metal instance types.
+    'c5.metal': 96,
+    'c5d.metal': 96,
+    'c5n.metal': 72,
+    'c6g.metal': 64,
+    'c6gd.metal': 64,
+    'g4dn.metal': 96,
+    'i3.metal': 72,
+    'i3en.metal': 96,
+    'm5.metal': 96,
+    'm5d.metal': 96,
+    'm5zn.metal': 48,
+    'm6g.metal': 64,
+    'm6gd.metal': 64,
+    'm6i.metal': 128,
+    'm6id.metal': 128,
+    'r5.metal': 96,
+    'r5d.metal': 96,
+    'z1d.metal': 48,
+}
+
+
+def _EstimateVcpus(vm_spec):
+  """Estimates the number of vCPUs of a VM from its spec.
+
+  Uses the CPU count of the spec if it has one, e.g. for GCP custom machine
+  types given as {cpus: ..., memory: ...}. Otherwise the count is parsed from
+  custom machine type names (n2-custom-4-16384), looked up for machine types
+  whose names do not include it (e2-medium, m5.metal), or inferred from the
+  well known machine type naming schemes of AWS (m5.2xlarge), GCP
+  (n2-standard-8) and Azure (Standard_D8s_v3).
+
+  Args:
+    vm_spec: BaseVmSpec. The spec of the VM.
+
+  Returns:
+    int. The estimated number of vCPUs, 1 if it cannot be inferred.
+  """
+  cpus = getattr(vm_spec, 'cpus', None)
+  if cpus:
+    return int(cpus)
+  machine_type = getattr(vm_spec, 'machine_type', None)
+  if not isinstance(machine_type, str):
+    return 1
+  match = re.match(r'(?:[a-z0-9]+-)?custom-(\d+)-\d+', machine_type)
+  if match:
+    return int(match.group(1))
+  if machine_type in _MACHINE_TYPE_VCPUS:
+    return _MACHINE_TYPE_VCPUS[machine_type]
+  match = re.search(r'\.(\d*)xlarge$', machine_type)
+  if match:
+    return 4 * int(match.group(1) or 1)
+  if machine_type.endswith('.large'):
+    return 2
+  match = (re.match(r'[a-z0-9]+-[a-z]+-(\d+)$', machine_type) or
+           re.match(r'Standard_[A-Z]+(\d+)', machine_type))
+  if match:
+    return int(match.group(1))
+  return 1
+
+
+def _GetRegion(zone):
+  """Returns the region of a zone, e.g. us-central1 for us-central1-a."""
+  return re.sub(r'(-[a-z0-9]|(?<=\d)[a-z])$', '', zone) if zone else None
+
+
 class BenchmarkSpec(object):
   """Contains the various data required to make a benchmark run."""
 
@@ -175,6 +267,10 @@ class BenchmarkSpec(object):
 
     self.restore_spec = None
     self.freeze_path = None
+    self.provisioning_concurrency_limiter = None
+    self._response_cache_snapshot = coalescing_cache.SnapshotResponseCaches()
+    self.provisioning_dependencies = {}
+    self.provisioning_timings = {}
 
     # Modules can't be pickled, but functions can, so we store the functions
     # necessary to run the benchmark.
@@ -193,6 +289,32 @@ class BenchmarkSpec(object):
         'Benchmark name: {0}\nFlags: {1}'
         .format(self.name, self.config.flags))
 
+  def GetResourceFootprint(self):
+    """Returns the cloud resources the benchmark provisions.
+
+    Only VMs are counted, and static VMs are excluded since they do not use
+    any cloud quota. The vCPU counts are estimated from the machine types.
+
+    Returns:
+      dict mapping resource name to the amount used. The resources are 'vms'
+      and 'vcpus', and 'vms@<region>' and 'vcpus@<region>' for VMs with a
+      zone, e.g. 'vcpus@us-east1'.
+    """
+    footprint = collections.Counter()
+    for group_spec in self.vms_to_boot.values():
+      vm_count = max(group_spec.vm_count - len(group_spec.static_vms or []), 0)
+      if not vm_count:
+        continue
+      vm_spec = group_spec.vm_spec
+      vcpus = vm_count * _EstimateVcpus(vm_spec)
+      footprint['vms'] += vm_count
+      footprint['vcpus'] += vcpus
+      region = _GetRegion(getattr(vm_spec, 'zone', None))
+      if region:
+        footprint['vms@' + region] += vm_count
+        footprint['vcpus@' + region] += vcpus
+    return dict(footprint)
+
   @contextlib.contextmanager
   def RedirectGlobalFlags(self):
     """Redirects flag reads and writes to the benchmark-specific flags object.
@@ -649,42 +771,32 @@ class BenchmarkSpec(object):
     vm_util.RunParallelThreads(targets, len(targets))
 
   def Provision(self):
-    """Prepares the VMs and networks necessary for the benchmark to run."""
-    should_restore = hasattr(self, 'restore_spec') and self.restore_spec
-    # Create capacity reservations if the cloud supports it. Note that the
-    # capacity reservation class may update the VMs themselves. This is true
-    # on AWS, because the VM needs to be aware of the capacity reservation id
-    # before its Create() method is called. Furthermore, if the user does not
-    # specify an AWS zone, but a region instead, the AwsCapacityReservation
-    # class will make a reservation in a zone that has sufficient capacity.
-    # In this case the VM's zone attribute, and the VMs network instance
-    # need to be updated as well.
-    if self.capacity_reservations:
-      vm_util.RunThreaded(lambda res: res.Create(), self.capacity_reservations)
+    """Prepares the VMs and networks necessary for the benchmark to run.
 
+    Each kind of resource is a provisioning step that declares the steps it
+    depends on, and independent steps run concurrently unless
+    --parallel_provisioning is disabled.
+    """
+    should_restore = hasattr(self, 'restore_spec') and self.restore_spec
     # Sort networks into a guaranteed order of creation based on dict key.
-    # There is a finite limit on the number of threads that are created to
-    # provision networks. Until support is added to provision resources in an
-    # order based on dependencies, this key ordering can be used to avoid
-    # deadlock by placing dependent networks later and their dependencies
-    # earlier.
     networks = [
         self.networks[key] for key in sorted(six.iterkeys(self.networks))
     ]
 
-    vm_util.RunThreaded(lambda net: net.Create(), networks)
+    def _CreateNetworks():
+      vm_util.RunThreaded(lambda net: net.Create(), networks)
 
-    # VPC peering is currently only supported for connecting 2 VPC networks
-    if self.vpc_peering:
-      if len(networks) > 2:
-        raise errors.Error(
-            'Networks of size %d are not currently supported.' %
-            (len(networks)))
-      # Ignore Peering for one network
-      elif len(networks) == 2:
-        networks[0].Peer(networks[1])
+      # VPC peering is currently only supported for connecting 2 VPC networks
+      if self.vpc_peering:
+        if len(networks) > 2:
+          raise errors.Error(
+              'Networks of size %d are not currently supported.' %
+              (len(networks)))
+        # Ignore Peering for one network
+        elif len(networks) == 2:
+          networks[0].Peer(networks[1])
 
-    if self.container_registry:
+    def _CreateContainerRegistry():
       self.container_registry.Create()
       for container_spec in six.itervalues(self.container_specs):
         if container_spec.static_image:
@@ -692,27 +804,21 @@ class BenchmarkSpec(object):
         container_spec.image = self.container_registry.GetOrBuild(
             container_spec.image)
 
-    if self.container_cluster:
-      self.container_cluster.Create()
-
-    # do after network setup but before VM created
-    if self.nfs_service and self.nfs_service.CLOUD != nfs_service.UNMANAGED:
-      self.nfs_service.Create()
-    if self.smb_service:
-      self.smb_service.Create()
-
-    for placement_group_object in self.placement_groups.values():
-      placement_group_object.Create()
-
-    if self.vms:
-
-      # We separate out creating, booting, and preparing the VMs into two phases
-      # so that we don't slow down the creation of all the VMs by running
-      # commands on the VMs that booted.
+    def _CreateVms():
+      # We separate out creating, booting, and preparing the VMs into two
+      # phases so that we don't slow down the creation of all the VMs by
+      # running commands on the VMs that booted.
+      if FLAGS.adaptive_provisioning_concurrency:
+        self.provisioning_concurrency_limiter = (
+            background_tasks.AdaptiveConcurrencyLimiter(
+                max_concurrency=FLAGS.max_concurrent_threads))
       vm_util.RunThreaded(
           self.CreateAndBootVm,
           self.vms,
-          post_task_delay=FLAGS.create_and_boot_post_task_delay)
+          post_task_delay=FLAGS.create_and_boot_post_task_delay,
+          concurrency_limiter=self.provisioning_concurrency_limiter)
+
+    def _PrepareVms():
       if self.nfs_service and self.nfs_service.CLOUD == nfs_service.UNMANAGED:
         self.nfs_service.Create()
       vm_util.RunThreaded(self.PrepareVmAfterBoot, self.vms)
@@ -727,20 +833,12 @@ class BenchmarkSpec(object):
             if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES
         ]
       vm_util.GenerateSSHConfig(sshable_vms, sshable_vm_groups)
-    if self.spark_service:
-      self.spark_service.Create()
-    if self.dpb_service:
-      self.dpb_service.Create()
-    if hasattr(self, 'relational_db') and self.relational_db:
+
+    def _CreateRelationalDb():
       self.relational_db.SetVms(self.vm_groups)
       self.relational_db.Create(restore=should_restore)
-    if self.non_relational_db:
-      self.non_relational_db.Create(restore=should_restore)
-    if self.spanner:
-      self.spanner.Create(restore=should_restore)
-    if self.tpus:
-      vm_util.RunThreaded(lambda tpu: tpu.Create(), self.tpus)
-    if self.edw_service:
+
+    def _CreateEdwService():
       if (not self.edw_service.user_managed and
           self.edw_service.SERVICE_TYPE == 'redshift'):
         # The benchmark creates the Redshift cluster's subnet group in the
@@ -749,12 +847,96 @@ class BenchmarkSpec(object):
           if network.__class__.__name__ == 'AwsNetwork':
             self.edw_service.cluster_subnet_group.subnet_id = network.subnet.id
       self.edw_service.Create()
+
+    # Each step is (name, function, names of the steps it depends on), in the
+    # order the steps run without --parallel_provisioning.
+    steps = []
+    # Create capacity reservations if the cloud supports it. Note that the
+    # capacity reservation class may update the VMs themselves. This is true
+    # on AWS, because the VM needs to be aware of the capacity reservation id
+    # before its Create() method is called. Furthermore, if the user does not
+    # specify an AWS zone, but a region instead, the AwsCapacityReservation
+    # class will make a reservation in a zone that has sufficient capacity.
+    # In this case the VM's zone attribute, and the VMs network instance
+    # need to be updated as well.
+    if self.capacity_reservations:
+      steps.append((
+          'capacity_reservations',
+          lambda: vm_util.RunThreaded(lambda res: res.Create(),
+                                      self.capacity_reservations), []))
+    steps.append(('networks', _CreateNetworks, ['capacity_reservations']))
+    if self.container_registry:
+      steps.append(('container_registry', _CreateContainerRegistry, []))
+    if self.container_cluster:
+      steps.append(('container_cluster', self.container_cluster.Create,
+                    ['networks']))
+    # do after network setup but before VM created
+    if self.nfs_service and self.nfs_service.CLOUD != nfs_service.UNMANAGED:
+      steps.append(('nfs_service', self.nfs_service.Create, ['networks']))
+    if self.smb_service:
+      steps.append(('smb_service', self.smb_service.Create, ['networks']))
+    if self.placement_groups:
+      steps.append((
+          'placement_groups',
+          lambda: vm_util.RunThreaded(lambda group: group.Create(),
+                                      list(self.placement_groups.values())),
+          ['capacity_reservations']))
+    if self.vms:
+      # Kubernetes VMs are pods, which need the cluster and its kubeconfig.
+      steps.append(('vms', _CreateVms, ['networks', 'placement_groups',
+                                        'container_cluster', 'nfs_service',
+                                        'smb_service']))
+      steps.append(('vm_preparation', _PrepareVms, ['vms']))
+    # Services that PKB installs on its own VMs wait for the VMs; managed
+    # services only need the networks.
+    if self.spark_service:
+      steps.append(('spark_service', self.spark_service.Create,
+                    ['networks', 'vm_preparation']
+                    if self.config.spark_service.service_type ==
+                    spark_service.PKB_MANAGED else ['networks']))
+    if self.dpb_service:
+      steps.append(('dpb_service', self.dpb_service.Create,
+                    ['networks', 'vm_preparation']
+                    if self.config.dpb_service.service_type in
+                    dpb_service.UNMANAGED_SERVICES else ['networks']))
+    # A managed database is created while the VMs are provisioned; the client
+    # VM is authorized and gets the client tools once both are ready. An
+    # unmanaged database runs on the VMs, so it waits for them.
+    if hasattr(self, 'relational_db') and self.relational_db:
+      steps.append(('relational_db', _CreateRelationalDb,
+                    ['networks'] if self.relational_db.is_managed_db else
+                    ['networks', 'vm_preparation']))
+      steps.append(('relational_db_clients',
+                    self.relational_db.SetupClientVms,
+                    ['relational_db', 'vm_preparation']))
+    if self.non_relational_db:
+      steps.append(('non_relational_db',
+                    lambda: self.non_relational_db.Create(
+                        restore=should_restore), ['networks']))
+    if self.spanner:
+      steps.append(('spanner',
+                    lambda: self.spanner.Create(restore=should_restore), []))
+    if self.tpus:
+      steps.append(('tpus',
+                    lambda: vm_util.RunThreaded(lambda tpu: tpu.Create(),
+                                                self.tpus), ['networks']))
+    if self.edw_service:
+      steps.append(('edw_service', _CreateEdwService, ['networks']))
     if self.vpn_service:
-      self.vpn_service.Create()
+      steps.append(('vpn_service', self.vpn_service.Create, ['networks']))
     if hasattr(self, 'messaging_service') and self.messaging_service:
-      self.messaging_service.Create()
+      steps.append(('messaging_service', self.messaging_service.Create,
+                    ['vm_preparation']))
     if self.data_discovery_service:
-      self.data_discovery_service.Create()
+      steps.append(('data_discovery_service',
+                    self.data_discovery_service.Create, []))
+
+    step_names = {name for name, _, _ in steps}
+    steps = [(name, function, [dep for dep in deps if dep in step_names])
+             for name, function, deps in steps]
+    self.provisioning_dependencies = {name: deps for name, _, deps in steps}
+    self.provisioning_timings = background_tasks.RunTaskGraph(
+        steps, max_concurrency=None if FLAGS.parallel_provisioning else 1)
 
   def Delete(self):
     if self.deleted:
@@ -840,6 +1022,73 @@ class BenchmarkSpec(object):
       samples.extend(self.container_cluster.GetSamples())
     if self.container_registry:
       samples.extend(self.container_registry.GetSamples())
+    if self.provisioning_concurrency_limiter:
+      for timestamp, concurrency in (
+          self.provisioning_concurrency_limiter.timeline):
+        samples.append(sample.Sample(
+            'VM Provisioning Concurrency', concurrency, 'threads', {},
+            timestamp=timestamp))
+    if self.provisioning_timings:
+      samples.extend(self._GetProvisioningSamples())
+    samples.extend(resource.GetReadinessSamples(self._GetResources()))
+    samples.extend(coalescing_cache.GetResponseCacheSamples(
+        self._response_cache_snapshot))
+    samples.extend(artifact_cache.GetSamples(self))
+    return samples
+
+  def _GetResources(self):
+    """Returns the BaseResources of the benchmark, including VM disks."""
+    resources = (
+        list(self.networks.values()) + list(self.placement_groups.values()) +
+        self.capacity_reservations + self.tpus + self.vms + [
+            self.container_cluster, self.container_registry, self.nfs_service,
+            self.smb_service, self.spark_service, self.dpb_service,
+            getattr(self, 'relational_db', None), self.non_relational_db,
+            self.spanner, self.edw_service, self.vpn_service,
+            getattr(self, 'messaging_service', None),
+            self.data_discovery_service
+        ])
+    for vm in self.vms:
+      for scratch_disk in vm.scratch_disks:
+        resources.append(scratch_disk)
+        resources.extend(getattr(scratch_disk, 'disks', []))
+    return [r for r in resources if isinstance(r, resource.BaseResource)]
+
+  def _GetProvisioningSamples(self):
+    """Returns samples of the provisioning steps and their critical path.
+
+    The critical path is the chain of steps, each waiting on the one before it,
+    that ends with the last step to finish, so it determines how long
+    provisioning took.
+    """
+    timings = self.provisioning_timings
+    provisioning_start = min(start for start, _ in timings.values())
+    samples = []
+    for name, (start, end) in sorted(timings.items()):
+      samples.append(sample.Sample(
+          'Provisioning Step Time', end - start, 'seconds', {
+              'provisioning_step': name,
+              'provisioning_step_dependencies': ','.join(
+                  self.provisioning_dependencies.get(name, [])),
+              'provisioning_step_start_offset': start - provisioning_start,
+          }))
+    critical_path = [max(timings, key=lambda name: timings[name][1])]
+    while True:
+      dependencies = [
+          dep for dep in self.provisioning_dependencies.get(
+              critical_path[-1], []) if dep in timings
+      ]
+      if not dependencies:
+        break
+      critical_path.append(max(dependencies, key=lambda dep: timings[dep][1]))
+    critical_path.reverse()
+    samples.append(sample.Sample(
+        'Provisioning Critical Path Time',
+        timings[critical_path[-1]][1] - provisioning_start, 'seconds', {
+            'provisioning_critical_path': ','.join(critical_path),
+            'provisioning_step_time_sum': sum(
+                end - start for start, end in timings.values()),
+        }))
     return samples
 
   def StartBackgroundWorkload(self):
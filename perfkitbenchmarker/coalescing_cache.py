@@ -0,0 +1,284 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Coalesces lookups of many keys from many threads into batched calls.
+
+Provider code that polls the state of each resource from its own thread, e.g.
+one describe command per VM, can instead get the state from a CoalescingCache.
+Threads that ask for keys at about the same time share a single call of the
+batch function, so the number of API calls scales with the number of polling
+rounds rather than with the number of resources.
+
+Provider code that repeats read-only lookups of static data, e.g. listing
+zones or describing images, can share responses through a ResponseCache, which
+keeps them for --response_cache_ttl seconds.
+"""
+
+import logging
+import threading
+import time
+
+from absl import flags
+from perfkitbenchmarker import sample
+
+flags.DEFINE_boolean(
+    'batch_vm_describe', True,
+    'Whether VMs created concurrently share batched describe calls, e.g. one '
+    '"gcloud compute instances list" or "aws ec2 describe-instances" per zone '
+    'and polling round, instead of each VM describing itself.')
+
+flags.DEFINE_integer(
+    'response_cache_ttl', 600,
+    'Seconds that responses of cacheable read-only cloud CLI commands, e.g. '
+    'zone, region, machine type and image lookups, are reused. 0 disables '
+    'the cache.', lower_bound=0)
+
+FLAGS = flags.FLAGS
+
+# Seconds the first thread of a batch waits for other threads to join it.
+DEFAULT_BATCH_WINDOW = 0.5
+
+
+class CoalescingCache(object):
+  """Gets values of keys through a batch function shared between threads.
+
+  Get returns a value fetched after it was called, or within max_age seconds
+  before, so callers that poll for changing state never see a result older
+  than their request. The first caller without a fresh value waits
+  batch_window seconds for other callers, then calls the batch function once
+  with every requested key while the others wait for the result.
+
+  Attributes:
+    call_count: The number of times the batch function was called.
+  """
+
+  def __init__(self, batch_function, batch_window=DEFAULT_BATCH_WINDOW,
+               max_batch_size=None):
+    """Initializes the cache.
+
+    Args:
+      batch_function: Function called with a list of keys that returns a dict
+          mapping keys to values. Keys missing from the dict have the value
+          None.
+      batch_window: Seconds to wait for more keys before calling the batch
+          function.
+      max_batch_size: The maximum number of keys per call of the batch
+          function, or None for no limit.
+    """
+    self._batch_function = batch_function
+    self._batch_window = batch_window
+    self._max_batch_size = max_batch_size
+    self._condition = threading.Condition()
+    # Key to a (fetch_time, value, exception) tuple.
+    self._entries = {}
+    self._pending_keys = []
+    self._fetching = False
+    self.call_count = 0
+
+  def Get(self, key, max_age=0):
+    """Returns the value of the key.
+
+    Args:
+      key: A hashable key passed to the batch function.
+      max_age: Seconds before this call that a cached value may have been
+          fetched.
+
+    Returns:
+      The value of the key, or None if the batch function returned none.
+
+    Raises:
+      Exception: The exception raised by the batch function call that fetched
+          the key.
+    """
+    request_time = time.time()
+    with self._condition:
+      while True:
+        entry = self._entries.get(key)
+        if entry and entry[0] >= request_time - max_age:
+          _, value, exception = entry
+          if exception:
+            raise exception
+          return value
+        if key not in self._pending_keys:
+          self._pending_keys.append(key)
+        if not self._fetching:
+          self._fetching = True
+          break
+        self._condition.wait()
+    try:
+      time.sleep(self._batch_window)
+      with self._condition:
+        keys = self._pending_keys[:self._max_batch_size]
+        self._pending_keys = self._pending_keys[len(keys):]
+      self._Fetch(keys)
+    finally:
+      with self._condition:
+        self._fetching = False
+        self._condition.notify_all()
+    return self.Get(key, max_age=time.time() - request_time)
+
+  def _Fetch(self, keys):
+    """Calls the batch function and stores its results."""
+    fetch_time = time.time()
+    values, exception = {}, None
+    try:
+      self.call_count += 1
+      values = self._batch_function(keys)
+    except Exception as e:  # pylint: disable=broad-except
+      logging.info('Batched lookup of %d keys failed: %s', len(keys), e)
+      exception = e
+    with self._condition:
+      for key in keys:
+        self._entries[key] = (fetch_time, values.get(key), exception)
+
+  def Invalidate(self, key):
+    """Forgets the cached value of the key."""
+    with self._condition:
+      self._entries.pop(key, None)
+
+
+class ResponseCache(object):
+  """Caches responses of read-only commands for a time to live.
+
+  Threads that ask for a key while its response is being fetched wait for that
+  fetch instead of issuing the same command again.
+
+  Attributes:
+    name: The name of the cache used in sample metadata.
+    hits: The number of Gets answered from the cache.
+    misses: The number of Gets that called the fetch function.
+    coalesced: The number of Gets that waited for another thread's fetch.
+  """
+
+  def __init__(self, name):
+    self.name = name
+    self._lock = threading.Lock()
+    # Key to a (expiration_time, value) tuple.
+    self._entries = {}
+    # Key to a threading.Event set when its fetch completes.
+    self._in_flight = {}
+    self.hits = 0
+    self.misses = 0
+    self.coalesced = 0
+    _RESPONSE_CACHES.append(self)
+
+  def Get(self, key, fetch_function, ttl=None, should_cache=None):
+    """Returns the cached response for the key or fetches it.
+
+    Args:
+      key: A hashable key identifying the command, e.g. its arguments.
+      fetch_function: Function called without arguments that returns the
+          response.
+      ttl: Seconds to keep the response. Defaults to --response_cache_ttl.
+      should_cache: Optional function called with the response that returns
+          whether it may be cached, e.g. only successful responses.
+
+    Returns:
+      The response.
+    """
+    ttl = FLAGS.response_cache_ttl if ttl is None else ttl
+    if not ttl:
+      return fetch_function()
+    while True:
+      with self._lock:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.time():
+          self.hits += 1
+          return entry[1]
+        event = self._in_flight.get(key)
+        if not event:
+          self.misses += 1
+          event = self._in_flight[key] = threading.Event()
+          break
+        self.coalesced += 1
+      event.wait()
+    try:
+      value = fetch_function()
+      if should_cache is None or should_cache(value):
+        with self._lock:
+          self._entries[key] = (time.time() + ttl, value)
+      return value
+    finally:
+      with self._lock:
+        del self._in_flight[key]
+      event.set()
+
+  def Invalidate(self, predicate):
+    """Forgets the responses of keys for which predicate(key) is True."""
+    with self._lock:
+      for key in [key for key in self._entries if predicate(key)]:
+        del self._entries[key]
+
+  def Clear(self):
+    """Forgets all responses and resets the counters."""
+    with self._lock:
+      self._entries.clear()
+      self.hits = self.misses = self.coalesced = 0
+
+  def GetCounts(self):
+    """Returns a (hits, misses) tuple of the Gets so far."""
+    with self._lock:
+      return self.hits + self.coalesced, self.misses
+
+  def GetSamples(self, since=(0, 0)):
+    """Returns samples of the cache hit and miss counts.
+
+    Args:
+      since: A (hits, misses) tuple returned by GetCounts. Only Gets after it
+          are counted.
+    """
+    hits, misses = self.GetCounts()
+    metadata = {'response_cache': self.name,
+                'response_cache_ttl': FLAGS.response_cache_ttl}
+    return [
+        sample.Sample('Response Cache Hits', hits - since[0], 'count',
+                      metadata),
+        sample.Sample('Response Cache Misses', misses - since[1], 'count',
+                      metadata),
+    ]
+
+
+# Every ResponseCache, for reporting samples.
+_RESPONSE_CACHES = []
+
+
+def SnapshotResponseCaches():
+  """Returns the counts of every ResponseCache for GetResponseCacheSamples.
+
+  The caches outlive a benchmark run, so a BenchmarkSpec takes a snapshot when
+  it is created and only reports the Gets made during its own run. The
+  snapshot maps cache names to counts so that it can be pickled with the spec.
+  """
+  return {cache.name: cache.GetCounts() for cache in _RESPONSE_CACHES}
+
+
+def GetResponseCacheSamples(snapshot=None):
+  """Returns hit and miss samples of every ResponseCache that was used.
+
+  Args:
+    snapshot: Optional dict returned by SnapshotResponseCaches. Only Gets made
+        after it are counted.
+  """
+  snapshot = snapshot or {}
+  samples = []
+  for cache in _RESPONSE_CACHES:
+    since = snapshot.get(cache.name, (0, 0))
+    if cache.GetCounts() != since:
+      samples.extend(cache.GetSamples(since))
+  return samples
+
+
+def ClearResponseCaches():
+  """Forgets the responses of every ResponseCache."""
+  for cache in _RESPONSE_CACHES:
+    cache.Clear()
@@ -109,6 +109,14 @@ be added during this phase.
 Sender: the phase. Currently only stages.RUN.
 Payload: benchmark_spec (BenchmarkSpec), samples (list of sample.Sample).""")
 
+live_samples_created = _events.signal('live-samples-created', doc="""
+Signal sent by a trace collector running with --trace_live_interval when new
+points of its output were copied back from a VM during the run.
+
+Sender: the collector. Its live_telemetry attribute holds the rolling windows
+of all points streamed so far.
+Payload: vm (BaseVirtualMachine), samples (list of sample.Sample).""")
+
 record_event = _events.signal('record-event', doc="""
 Signal sent when an event is recorded.
 
@@ -120,6 +128,21 @@ Payload: event (string), start_timestamp (float), end_timestamp (float),
 metadata (dict).""")
 
 
+rate_limited = _events.signal('rate-limited', doc="""
+Signal sent when a cloud API call is rejected for exceeding a rate limit.
+
+Sender: the command or resource that was rate limited.
+Payload: none.""")
+
+
+command_issued = _events.signal('command-issued', doc="""
+Signal sent by vm_util.IssueCommand and IssueCommandAsync before running a
+command on the PKB host, e.g. a cloud CLI call.
+
+Sender: the command, as a list of strings.
+Payload: none.""")
+
+
 def RegisterTracingEvents():
   record_event.connect(AddEvent, weak=False)
 
@@ -0,0 +1,312 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Decodes and merges HdrHistogram interval logs.
+
+HdrHistogram (http://hdrhistogram.org) interval logs, as written by YCSB's
+hdrhistogram measurement type, hold one base64 encoded, compressed histogram
+per reporting interval:
+
+  #[StartTime: 1523565997.123 (seconds since epoch), Thu Apr 12 20:46:37 ...]
+  "StartTimestamp","Interval_Length","Interval_Max","Interval_Compressed_..."
+  0.127,1.007,2.769,HISTFAAAAEV42pNpmSzMwMCyAAJEcQAAAAAAAAAAAA...
+
+Histograms are decoded into numpy count arrays using the same bucket layout as
+the Java implementation, so histograms from many clients and intervals can be
+merged by addition and percentiles computed exactly over the merged
+distribution.
+"""
+
+import base64
+import math
+import re
+import struct
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+# Encoding cookies, ignoring the word size bits (0xf0) used by older encodings.
+_V2_ENCODING_COOKIE = 0x1c849303
+_V2_COMPRESSED_ENCODING_COOKIE = 0x1c849304
+_COOKIE_WORD_SIZE_MASK = 0xf0
+# cookie, payload length, normalizing index offset, significant value digits,
+# lowest trackable value, highest trackable value, integer to double ratio.
+_V2_HEADER = struct.Struct('>iiiiqqd')
+_COMPRESSED_HEADER = struct.Struct('>ii')
+# A ZigZag LEB128 count takes at most 9 bytes.
+_MAX_VARINT_BYTES = 9
+
+_START_TIME_RE = re.compile(r'#\[StartTime: ([\d.]+)')
+_BASE_TIME_RE = re.compile(r'#\[BaseTime: ([\d.]+)')
+# Interval timestamps below this are relative to the log's start time. Matches
+# HistogramLogReader in the Java implementation.
+_RELATIVE_TIMESTAMP_LIMIT = 365 * 24 * 3600
+
+
+class HdrHistogram(object):
+  """An array backed HdrHistogram.
+
+  Attributes:
+    significant_digits: int. Number of significant value digits recorded.
+    lowest_trackable_value: int. Smallest value distinguishable from 0.
+    counts: numpy array of int64. Count of recorded values by bucket index.
+    start_time: float. Start of the recording interval, in seconds since the
+      epoch, if known.
+    interval_length: float. Length of the recording interval in seconds, if
+      known.
+  """
+
+  def __init__(self,
+               significant_digits: int = 3,
+               lowest_trackable_value: int = 1,
+               counts: Optional[np.ndarray] = None,
+               start_time: Optional[float] = None,
+               interval_length: Optional[float] = None):
+    if not 0 <= significant_digits <= 5:
+      raise ValueError(
+          'Invalid number of significant digits %s' % significant_digits)
+    if lowest_trackable_value < 1:
+      raise ValueError(
+          'Invalid lowest trackable value %s' % lowest_trackable_value)
+    self.significant_digits = significant_digits
+    self.lowest_trackable_value = lowest_trackable_value
+    self.counts = (np.zeros(0, dtype=np.int64) if counts is None
+                   else np.asarray(counts, dtype=np.int64))
+    self.start_time = start_time
+    self.interval_length = interval_length
+    sub_bucket_count_magnitude = int(
+        math.ceil(math.log2(2 * 10**significant_digits)))
+    self._sub_bucket_half_count_magnitude = max(
+        sub_bucket_count_magnitude - 1, 0)
+    self._sub_bucket_half_count = 1 << self._sub_bucket_half_count_magnitude
+    self._unit_magnitude = int(math.floor(math.log2(lowest_trackable_value)))
+
+  @classmethod
+  def Decode(cls, encoded: str, **kwargs) -> 'HdrHistogram':
+    """Decodes a base64 encoded, compressed V2 histogram.
+
+    Args:
+      encoded: str. The histogram, e.g. the last column of an interval log.
+      **kwargs: Additional arguments for the HdrHistogram constructor.
+
+    Returns:
+      The decoded HdrHistogram.
+
+    Raises:
+      ValueError: If the histogram is not in the V2 encoding.
+    """
+    data = base64.b64decode(encoded)
+    cookie, length = _COMPRESSED_HEADER.unpack_from(data)
+    if cookie & ~_COOKIE_WORD_SIZE_MASK != _V2_COMPRESSED_ENCODING_COOKIE:
+      raise ValueError('Unsupported compressed histogram cookie %#x' % cookie)
+    payload = zlib.decompress(
+        data[_COMPRESSED_HEADER.size:_COMPRESSED_HEADER.size + length])
+    (cookie, payload_length, _, significant_digits, lowest_trackable_value, _,
+     _) = _V2_HEADER.unpack_from(payload)
+    if cookie & ~_COOKIE_WORD_SIZE_MASK != _V2_ENCODING_COOKIE:
+      raise ValueError('Unsupported histogram cookie %#x' % cookie)
+    counts = _DecodeCounts(
+        payload[_V2_HEADER.size:_V2_HEADER.size + payload_length])
+    return cls(significant_digits, lowest_trackable_value, counts, **kwargs)
+
+  @property
+  def total_count(self) -> int:
+    return int(self.counts.sum())
+
+  def _CheckCompatible(self, other: 'HdrHistogram'):
+    if (self.significant_digits != other.significant_digits or
+        self.lowest_trackable_value != other.lowest_trackable_value):
+      raise ValueError('Cannot merge histograms with different bucket layouts.')
+
+  def Add(self, other: 'HdrHistogram'):
+    """Adds the counts of another histogram to this one.
+
+    Args:
+      other: HdrHistogram with the same significant_digits and
+        lowest_trackable_value.
+
+    Raises:
+      ValueError: If the histograms have different bucket layouts.
+    """
+    self._CheckCompatible(other)
+    if other.counts.size > self.counts.size:
+      self.counts = np.pad(self.counts,
+                           (0, other.counts.size - self.counts.size))
+    self.counts[:other.counts.size] += other.counts
+
+  def _LowestEquivalentValues(self, indices: np.ndarray) -> np.ndarray:
+    """Returns the smallest value counted in each bucket index."""
+    indices = np.asarray(indices, dtype=np.int64)
+    bucket_indices = (indices >> self._sub_bucket_half_count_magnitude) - 1
+    sub_bucket_indices = ((indices & (self._sub_bucket_half_count - 1)) +
+                          self._sub_bucket_half_count)
+    first_bucket = bucket_indices < 0
+    sub_bucket_indices[first_bucket] -= self._sub_bucket_half_count
+    bucket_indices[first_bucket] = 0
+    return sub_bucket_indices << (bucket_indices + self._unit_magnitude)
+
+  def _HighestEquivalentValues(self, indices: np.ndarray) -> np.ndarray:
+    """Returns the largest value counted in each bucket index."""
+    indices = np.asarray(indices, dtype=np.int64)
+    bucket_indices = np.maximum(
+        (indices >> self._sub_bucket_half_count_magnitude) - 1, 0)
+    return (self._LowestEquivalentValues(indices) +
+            (1 << (bucket_indices + self._unit_magnitude)) - 1)
+
+  def GetBuckets(self):
+    """Returns the non-empty buckets.
+
+    Returns:
+      Tuple of numpy arrays (values, counts), where values is the highest
+      value counted in each non-empty bucket, in increasing order.
+    """
+    indices = np.flatnonzero(self.counts)
+    return self._HighestEquivalentValues(indices), self.counts[indices]
+
+  def GetValueAtPercentile(self, percentile: float) -> int:
+    """Returns the value at a percentile, as the Java implementation does.
+
+    Args:
+      percentile: float in [0, 100].
+
+    Returns:
+      The largest value equivalent to the recorded value at the percentile, or
+      the smallest equivalent value for the 0th percentile.
+
+    Raises:
+      ValueError: If the histogram is empty or percentile is not in [0, 100].
+    """
+    if percentile < 0 or percentile > 100:
+      raise ValueError('Invalid percentile %s' % percentile)
+    cumulative_counts = np.cumsum(self.counts)
+    if not cumulative_counts.size or not cumulative_counts[-1]:
+      raise ValueError("Can't compute percentiles of empty histogram.")
+    count_at_percentile = max(
+        int(percentile / 100.0 * cumulative_counts[-1] + 0.5), 1)
+    index = np.searchsorted(cumulative_counts, count_at_percentile)
+    if percentile == 0:
+      return int(self._LowestEquivalentValues([index])[0])
+    return int(self._HighestEquivalentValues([index])[0])
+
+  def GetMax(self) -> int:
+    """Returns the largest value equivalent to the largest recorded value."""
+    values, _ = self.GetBuckets()
+    return int(values[-1]) if values.size else 0
+
+  def GetMean(self) -> float:
+    """Returns the mean, using the middle of each bucket's value range."""
+    indices = np.flatnonzero(self.counts)
+    if not indices.size:
+      return 0.0
+    lowest = self._LowestEquivalentValues(indices)
+    highest = self._HighestEquivalentValues(indices)
+    counts = self.counts[indices]
+    return float(np.sum((lowest + (highest - lowest + 1) // 2) * counts) /
+                 np.sum(counts))
+
+
+def _DecodeCounts(data: bytes) -> np.ndarray:
+  """Decodes the ZigZag LEB128 run-length encoded counts of a V2 histogram.
+
+  Positive numbers are bucket counts; negative numbers are runs of empty
+  buckets.
+
+  Args:
+    data: bytes. The encoded counts.
+
+  Returns:
+    numpy array of int64 counts by bucket index.
+
+  Raises:
+    ValueError: If the counts are malformed.
+  """
+  encoded = np.frombuffer(data, dtype=np.uint8)
+  if not encoded.size:
+    return np.zeros(0, dtype=np.int64)
+  ends = np.flatnonzero(encoded < 0x80)
+  if not ends.size or ends[-1] != encoded.size - 1:
+    raise ValueError('Truncated histogram counts.')
+  starts = np.concatenate(([0], ends[:-1] + 1))
+  if np.any(ends - starts >= _MAX_VARINT_BYTES):
+    raise ValueError('Unsupported histogram count.')
+  byte_positions = np.arange(encoded.size) - np.repeat(starts,
+                                                       ends - starts + 1)
+  shifted = ((encoded & 0x7f).astype(np.uint64) <<
+             (7 * byte_positions).astype(np.uint64))
+  unsigned = np.add.reduceat(shifted, starts)
+  values = ((unsigned >> np.uint64(1)).astype(np.int64) ^
+            -(unsigned & np.uint64(1)).astype(np.int64))
+  return np.repeat(np.maximum(values, 0), np.where(values < 0, -values, 1))
+
+
+def ParseIntervalLog(log: str) -> List[HdrHistogram]:
+  """Parses an HdrHistogram interval log.
+
+  Args:
+    log: str. Contents of the interval log.
+
+  Returns:
+    List of HdrHistogram, one per interval, with start_time and
+    interval_length set.
+  """
+  start_time = None
+  base_time = None
+  histograms = []
+  for line in log.splitlines():
+    line = line.strip()
+    if not line or line.startswith('"'):
+      continue
+    if line.startswith('#'):
+      match = _START_TIME_RE.match(line)
+      if match:
+        start_time = float(match.group(1))
+      match = _BASE_TIME_RE.match(line)
+      if match:
+        base_time = float(match.group(1))
+      continue
+    fields = line.split(',')
+    if fields[0].startswith('Tag='):
+      fields = fields[1:]
+    timestamp = float(fields[0])
+    if timestamp < _RELATIVE_TIMESTAMP_LIMIT:
+      offset = base_time if base_time is not None else start_time
+      timestamp += offset or 0.0
+    histograms.append(
+        HdrHistogram.Decode(
+            fields[3], start_time=timestamp,
+            interval_length=float(fields[1])))
+  return histograms
+
+
+def Merge(histograms: List[HdrHistogram]) -> HdrHistogram:
+  """Merges histograms into a new histogram.
+
+  Args:
+    histograms: non-empty list of HdrHistogram with the same bucket layout.
+
+  Returns:
+    HdrHistogram with the summed counts. Its start_time is the earliest start
+    time and its interval_length spans all histograms, if known.
+  """
+  first = histograms[0]
+  merged = HdrHistogram(first.significant_digits, first.lowest_trackable_value)
+  for histogram in histograms:
+    merged.Add(histogram)
+  timed = [h for h in histograms
+           if h.start_time is not None and h.interval_length is not None]
+  if timed:
+    merged.start_time = min(h.start_time for h in timed)
+    merged.interval_length = max(
+        h.start_time + h.interval_length for h in timed) - merged.start_time
+  return merged
@@ -528,8 +528,3 @@ class IAASRelationalDb(relational_db.BaseRelationalDb):
       True if the resource was ready in time, False if the wait timed out.
     """
     return self._IsReadyUnmanaged()
-
-  def _PostCreate(self):
-    """Creates the PKB user and sets the password."""
-    super()._PostCreate()
-    self.client_vm_query_tools.InstallPackages()
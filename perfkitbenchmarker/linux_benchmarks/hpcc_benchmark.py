@@ -300,9 +300,7 @@ def CreateHpccinf(vm: linux_vm.BaseLinuxVirtualMachine,
 def PrepareHpcc(vm: linux_vm.BaseLinuxVirtualMachine) -> None:
   """Builds HPCC on a single vm."""
   logging.info('Building HPCC on %s', vm)
-  vm.Install('hpcc')
-  if FLAGS.hpcc_numa_binding:
-    vm.Install('numactl')
+  vm.InstallAll(['hpcc', 'numactl'] if FLAGS.hpcc_numa_binding else ['hpcc'])
 
 
 def PrepareBinaries(vms: List[linux_vm.BaseLinuxVirtualMachine]) -> None:
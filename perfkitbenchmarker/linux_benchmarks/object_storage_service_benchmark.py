@@ -31,6 +31,7 @@ category:
 import datetime
 import enum
 import glob
+import gzip
 import json
 import logging
 import os
@@ -74,7 +75,8 @@ flags.DEFINE_string('object_storage_storage_class', None,
 flags.DEFINE_enum(
     'object_storage_scenario', 'all', [
         'all', 'cli', 'api_data', 'api_namespace', 'api_multistream',
-        'api_multistream_writes', 'api_multistream_reads'
+        'api_multistream_writes', 'api_multistream_reads',
+        'api_parallel_transfer'
     ], 'select all, or one particular scenario to run: \n'
     'ALL: runs all scenarios. This is the default. \n'
     'cli: runs the command line only scenario. \n'
@@ -84,7 +86,10 @@ flags.DEFINE_enum(
     'api_multistream: runs API-based benchmarking with multiple '
     'upload/download streams.\n'
     'api_multistream_writes: runs API-based benchmarking with '
-    'multiple upload streams.')
+    'multiple upload streams.\n'
+    'api_parallel_transfer: runs API-based benchmarking of large objects '
+    'written with multipart uploads and read with parallel byte-range '
+    'reads. Not included in ALL.')
 
 flags.DEFINE_string('object_storage_bucket_name', None,
                     'If set, the bucket will be created with this name')
@@ -114,6 +119,28 @@ flags.DEFINE_integer(
     10, 'Number of independent streams per VM. Only applies to '
     'the api_multistream scenario.',
     lower_bound=1)
+flags.DEFINE_integer(
+    'object_storage_parallel_transfer_objects', 10,
+    'Number of objects that the api_parallel_transfer scenario writes and '
+    'reads.', lower_bound=1)
+flags.DEFINE_integer(
+    'object_storage_parallel_transfer_object_size_mb', 100,
+    'Size in MiB of the objects of the api_parallel_transfer scenario.',
+    lower_bound=1)
+flags.DEFINE_integer(
+    'object_storage_part_size_mb', 8,
+    'Size in MiB of the parts that the api_parallel_transfer scenario splits '
+    'objects into. S3 requires parts of at least 5 MiB.', lower_bound=1)
+flags.DEFINE_integer(
+    'object_storage_parallel_parts', 8,
+    'Number of parts of an object that the api_parallel_transfer scenario '
+    'transfers at once.', lower_bound=1)
+flags.DEFINE_integer(
+    'object_storage_threads_per_process', 1,
+    'Number of api_multistream streams that each worker process on a VM runs '
+    'concurrently in threads sharing one client and connection pool. 1 runs '
+    'every stream in its own process.',
+    lower_bound=1)
 
 flags.DEFINE_integer(
     'object_storage_list_consistency_iterations', 200,
@@ -134,6 +161,11 @@ flags.DEFINE_enum(
     'different name prefixes. '
     'approximately_sequential: object names from all '
     'streams will roughly increase together.')
+flags.DEFINE_float(
+    'object_storage_payload_compressibility', 0.0,
+    'The fraction of each block of objects written by the API scenarios that '
+    'is a repeated byte instead of random data. 0 writes incompressible '
+    'objects.', lower_bound=0.0, upper_bound=1.0)
 flags.DEFINE_string(
     'object_storage_objects_written_file_prefix', None,
     'If specified, the bucket and all of the objects will not '
@@ -192,6 +224,18 @@ _REDOWNLOAD = flags.DEFINE_boolean(
     'object_storage_redownload', False,
     'Download objects twice. Second download labeled "redownload" in metadata. '
     'Currently only used with api_multistream and api_multistream_reads.')
+_THROUGHPUT_TIME_SERIES_INTERVAL = flags.DEFINE_float(
+    'object_storage_throughput_time_series_interval', None,
+    'If set, a time series sample of the multistream throughput is created '
+    'with one value per interval of the specified length in seconds. Each '
+    'operation counts towards the interval in which it completed.',
+    lower_bound=0.001)
+_WORKER_BINARY_RESULTS = flags.DEFINE_boolean(
+    'object_storage_worker_binary_results', False,
+    'If true, the multistream workers write fixed-width binary records to a '
+    'file per stream instead of printing JSON results. The files are '
+    'compressed on the VMs, pulled and loaded with numpy, which is faster for '
+    'runs with many objects.')
 
 FLAGS = flags.FLAGS
 
@@ -262,6 +306,11 @@ CLI_TEST_ITERATION_COUNT_AZURE = 3
 
 SINGLE_STREAM_THROUGHPUT = 'single stream %s throughput Mbps'
 
+PARALLEL_TRANSFER_THROUGHPUT = 'parallel transfer %s throughput Mbps'
+PARALLEL_TRANSFER_PART_THROUGHPUT = 'parallel transfer %s part throughput Mbps'
+PARALLEL_TRANSFER_LATENCY = 'parallel transfer %s latency'
+PARALLEL_TRANSFER_PART_LATENCY = 'parallel transfer %s part latency'
+
 ONE_BYTE_LATENCY = 'one byte %s latency'
 
 LIST_CONSISTENCY_SCENARIOS = ['list-after-write', 'list-after-update']
@@ -302,6 +351,13 @@ MULTISTREAM_DELETE_OPS_PER_SEC = 3500
 # benchmark. This is the filename.
 OBJECTS_WRITTEN_FILE = 'pkb-objects-written'
 
+# With --object_storage_worker_binary_results, the workers write their results
+# to this directory in the VM's /tmp. The records match the API test script's
+# RESULT_RECORD_FORMAT.
+WORKER_RESULTS_DIR = 'pkb-worker-results'
+WORKER_RESULT_DTYPE = np.dtype([('start_time', '<f8'), ('latency', '<f8'),
+                                ('size', '<i8'), ('status', '<i8')])
+
 # If the gap between different stream starts and ends is above a
 # certain proportion of the total time, we log a warning because we
 # are throwing out a lot of information. We also put the warning in
@@ -453,21 +509,31 @@ def ProcessMultiStreamResults(start_times,
       FLAGS.object_storage_multistream_objects_per_stream)
   metadata['object_naming'] = FLAGS.object_storage_object_naming_scheme
 
-  min_num_records = min((len(start_time) for start_time in start_times))
-  num_records = sum((len(start_time) for start_time in start_times))
+  stream_lengths = np.array([len(start_time) for start_time in start_times])
+  min_num_records = stream_lengths.min()
+  num_records = stream_lengths.sum()
   logging.info('Processing %s total operation records', num_records)
 
-  stop_times = [
-      start_time + latency
-      for start_time, latency in zip(start_times, latencies)
-  ]
-
-  last_start_time = max((start_time[0] for start_time in start_times))
-  first_stop_time = min((stop_time[-1] for stop_time in stop_times))
+  # Flatten the streams into single arrays of records, keeping the stream of
+  # each record and its index within the stream, so that the rest of the
+  # processing is vectorized over all records instead of looping over them.
+  stream_offsets = np.cumsum(stream_lengths) - stream_lengths
+  record_streams = np.repeat(np.arange(num_streams), stream_lengths)
+  record_indexes = (np.arange(num_records) -
+                    np.repeat(stream_offsets, stream_lengths))
+  all_start_times = np.concatenate(start_times)
+  all_latencies = np.concatenate(latencies)
+  all_record_sizes = np.concatenate(sizes)
+  all_stop_times = all_start_times + all_latencies
+
+  first_start_times = all_start_times[stream_offsets]
+  last_stop_times = all_stop_times[stream_offsets + stream_lengths - 1]
+  last_start_time = first_start_times.max()
+  first_stop_time = last_stop_times.min()
 
   # Compute how well our synchronization worked
-  first_start_time = min((start_time[0] for start_time in start_times))
-  last_stop_time = max((stop_time[-1] for stop_time in stop_times))
+  first_start_time = first_start_times.min()
+  last_stop_time = last_stop_times.max()
   start_gap = last_start_time - first_start_time
   stop_gap = last_stop_time - first_stop_time
   if ((start_gap + stop_gap) /
@@ -485,30 +551,24 @@ def ProcessMultiStreamResults(start_times,
     metadata['stream_gap_above_threshold'] = True
 
   # Find the indexes in each stream where all streams are active,
-  # following Python's [inclusive, exclusive) index convention.
-  active_start_indexes = np.full(num_streams, 0)
-  for index, start_time in enumerate(start_times):
-    for i in range(len(start_time)):
-      if start_time[i] >= last_start_time:
-        active_start_indexes[index] = i
-        break
-  active_stop_indexes = np.full(num_streams, min_num_records)
-  for index, stop_time in enumerate(stop_times):
-    for i in range(len(stop_time) - 1, -1, -1):
-      if stop_time[i] <= first_stop_time:
-        active_stop_indexes[index] = i + 1
-        break
-  active_latencies = [
-      latencies[i][active_start_indexes[i]:active_stop_indexes[i]]
-      for i in range(num_streams)
-  ]
-  active_sizes = [
-      sizes[i][active_start_indexes[i]:active_stop_indexes[i]]
-      for i in range(num_streams)
-  ]
-
-  all_active_latencies = np.concatenate(active_latencies)
-  all_active_sizes = np.concatenate(active_sizes)
+  # following Python's [inclusive, exclusive) index convention. The
+  # records of each stream are in time order, so the first active index
+  # is the number of records that start before last_start_time and the
+  # stop index is the number of records that stop by first_stop_time.
+  active_start_indexes = np.bincount(
+      record_streams[all_start_times < last_start_time],
+      minlength=num_streams)
+  active_start_indexes[active_start_indexes == stream_lengths] = 0
+  active_stop_indexes = np.bincount(
+      record_streams[all_stop_times <= first_stop_time],
+      minlength=num_streams)
+  active_stop_indexes[active_stop_indexes == 0] = min_num_records
+  active = ((record_indexes >= active_start_indexes[record_streams]) &
+            (record_indexes < active_stop_indexes[record_streams]))
+
+  all_active_latencies = all_latencies[active]
+  all_active_sizes = all_record_sizes[active]
+  active_streams = record_streams[active]
 
   # Don't publish the full distribution in the metadata because doing
   # so might break regexp-based parsers that assume that all metadata
@@ -531,38 +591,39 @@ def ProcessMultiStreamResults(start_times,
 
   # Publish by-size and full-distribution stats even if there's only
   # one size in the distribution, because it simplifies postprocessing
-  # of results.
+  # of results. Sorting the active records by size once lets each size
+  # be sliced out with searchsorted. The sort is stable, so records of
+  # the same size stay in stream order.
+  size_order = np.argsort(all_active_sizes, kind='stable')
+  sorted_active_sizes = all_active_sizes[size_order]
+  sorted_active_latencies = all_active_latencies[size_order]
   for size in all_sizes:
     this_size_metadata = metadata.copy()
     this_size_metadata['object_size_B'] = size
     logging.info('Processing multi-stream %s results for object size %s',
                  operation, size)
-    _AppendPercentilesToResults(results,
-                                all_active_latencies[all_active_sizes == size],
-                                latency_prefix, LATENCY_UNIT,
-                                this_size_metadata)
+    size_latencies = sorted_active_latencies[
+        np.searchsorted(sorted_active_sizes, size, side='left'):
+        np.searchsorted(sorted_active_sizes, size, side='right')]
+    _AppendPercentilesToResults(results, size_latencies, latency_prefix,
+                                LATENCY_UNIT, this_size_metadata)
 
     # Record samples for individual downloads and uploads if requested.
     if FLAGS.record_individual_latency_samples:
-      for latency in all_active_latencies[all_active_sizes == size]:
+      for latency in size_latencies:
         results.append(
             sample.Sample('%s individual' % latency_prefix, latency,
                           LATENCY_UNIT, this_size_metadata))
 
     # Build the object latency histogram if user requested it
-    if FLAGS.object_storage_latency_histogram_interval and any(
-        size in x for x in sizes):
+    hist_latencies = (
+        all_latencies[all_record_sizes == size]
+        if FLAGS.object_storage_latency_histogram_interval else [])
+    if len(hist_latencies):
       histogram_interval = FLAGS.object_storage_latency_histogram_interval
-      hist_latencies = [[l for l, s in zip(*w_l_s) if s == size]
-                        for w_l_s in zip(latencies, sizes)]
-      max_latency = max([max(l) for l in hist_latencies])
-      # Note that int() floors for us
-      num_histogram_buckets = int(max_latency / histogram_interval) + 1
-      histogram_buckets = [0 for _ in range(num_histogram_buckets)]
-      for worker_latencies in hist_latencies:
-        for latency in worker_latencies:
-          # Note that int() floors for us
-          histogram_buckets[int(latency / histogram_interval)] += 1
+      # Note that astype() floors for us
+      histogram_buckets = np.bincount(
+          (hist_latencies / histogram_interval).astype(np.int64))
       histogram_str = ','.join([str(c) for c in histogram_buckets])
       histogram_metadata = this_size_metadata.copy()
       histogram_metadata['interval'] = histogram_interval
@@ -575,12 +636,13 @@ def ProcessMultiStreamResults(start_times,
               metadata=histogram_metadata))
 
   # Throughput metrics
-  total_active_times = [np.sum(latency) for latency in active_latencies]
-  active_durations = [
-      stop_times[i][active_stop_indexes[i] - 1] -
-      start_times[i][active_start_indexes[i]] for i in range(num_streams)
-  ]
-  total_active_sizes = [np.sum(size) for size in active_sizes]
+  total_active_times = np.bincount(
+      active_streams, weights=all_active_latencies, minlength=num_streams)
+  active_durations = (
+      all_stop_times[stream_offsets + active_stop_indexes - 1] -
+      all_start_times[stream_offsets + active_start_indexes])
+  total_active_sizes = np.bincount(
+      active_streams, weights=all_active_sizes, minlength=num_streams)
   # 'net throughput (with gap)' is computed by taking the throughput
   # for each stream (total # of bytes transmitted / (stop_time -
   # start_time)) and then adding the per-stream throughputs. 'net
@@ -590,22 +652,19 @@ def ProcessMultiStreamResults(start_times,
   results.append(
       sample.Sample(
           'Multi-stream ' + operation + ' net throughput',
-          np.sum((size / active_time * 8 for size, active_time in zip(
-              total_active_sizes, total_active_times))),
+          np.sum(total_active_sizes / total_active_times * 8),
           'bit / second',
           metadata=distribution_metadata))
   results.append(
       sample.Sample(
           'Multi-stream ' + operation + ' net throughput (with gap)',
-          np.sum((
-              size / duration * 8
-              for size, duration in zip(total_active_sizes, active_durations))),
+          np.sum(total_active_sizes / active_durations * 8),
           'bit / second',
           metadata=distribution_metadata))
   results.append(
       sample.Sample(
           'Multi-stream ' + operation + ' net throughput (simplified)',
-          sum([np.sum(size) for size in sizes]) /
+          np.sum(all_record_sizes) /
           (last_stop_time - first_start_time) * 8,
           'bit / second',
           metadata=distribution_metadata))
@@ -624,10 +683,24 @@ def ProcessMultiStreamResults(start_times,
           'operation / second',
           metadata=distribution_metadata))
 
+  if _THROUGHPUT_TIME_SERIES_INTERVAL.value:
+    interval = _THROUGHPUT_TIME_SERIES_INTERVAL.value
+    interval_bytes = np.bincount(
+        ((all_stop_times - first_start_time) / interval).astype(np.int64),
+        weights=all_record_sizes)
+    interval_start_times = first_start_time + np.arange(
+        len(interval_bytes)) * interval
+    results.append(
+        sample.CreateTimeSeriesSample(
+            (interval_bytes * 8 / interval).tolist(),
+            (interval_start_times * 1000).astype(np.int64).tolist(),
+            'Multi-stream %s throughput time series' % operation,
+            'bit / second',
+            interval,
+            additional_metadata=distribution_metadata))
+
   # Statistics about benchmarking overhead
-  gap_time = sum((active_duration - active_time
-                  for active_duration, active_time in zip(
-                      active_durations, total_active_times)))
+  gap_time = np.sum(active_durations - total_active_times)
   results.append(
       sample.Sample(
           'Multi-stream ' + operation + ' total gap time',
@@ -714,6 +787,9 @@ class APIScriptCommandBuilder(object):
       cmd_parts += [
           '--object_storage_class', FLAGS.object_storage_storage_class
       ]
+    if FLAGS.object_storage_payload_compressibility:
+      cmd_parts.append('--payload_compressibility=%s' %
+                       FLAGS.object_storage_payload_compressibility)
 
     return ' '.join(cmd_parts)
 
@@ -823,6 +899,77 @@ def SingleStreamThroughputBenchmark(results, metadata, vm, command_builder,
                         THROUGHPUT_UNIT, metadata))
 
 
+def ParallelTransferThroughputBenchmark(results, metadata, vm,
+                                       command_builder, service, bucket_name):
+  """A benchmark for large object throughput with parallel part transfers.
+
+  Args:
+    results: the results array to append to.
+    metadata: a dictionary of metadata to add to samples.
+    vm: the VM to run the benchmark on.
+    command_builder: an APIScriptCommandBuilder.
+    service: an ObjectStorageService.
+    bucket_name: the primary bucket to benchmark.
+
+  Raises:
+    ValueError if an unexpected test outcome is found from the API
+    test script.
+  """
+  del service
+  object_size = (
+      FLAGS.object_storage_parallel_transfer_object_size_mb * 1024 * 1024)
+  part_size = FLAGS.object_storage_part_size_mb * 1024 * 1024
+  parallel_transfer_cmd = command_builder.BuildCommand([
+      '--bucket=%s' % bucket_name,
+      '--scenario=ParallelTransferThroughput',
+      '--parallel_transfer_objects=%s' %
+      FLAGS.object_storage_parallel_transfer_objects,
+      '--parallel_transfer_object_size=%s' % object_size,
+      '--part_size=%s' % part_size,
+      '--parallel_parts=%s' % FLAGS.object_storage_parallel_parts
+  ])
+
+  _, raw_result = vm.RemoteCommand(parallel_transfer_cmd)
+  logging.info('ParallelTransferThroughput raw result is %s', raw_result)
+
+  parallel_transfer_metadata = metadata.copy()
+  parallel_transfer_metadata.update({
+      'object_size_B': object_size,
+      'part_size_B': part_size,
+      'parallel_parts': FLAGS.object_storage_parallel_parts,
+  })
+  for up_and_down in [
+      MultistreamOperationType.upload, MultistreamOperationType.download
+  ]:
+    for search_string, sample_name, unit in [
+        ('Parallel transfer %s throughput in Bps: (.*)',
+         PARALLEL_TRANSFER_THROUGHPUT, THROUGHPUT_UNIT),
+        ('Parallel transfer %s part throughput in Bps: (.*)',
+         PARALLEL_TRANSFER_PART_THROUGHPUT, THROUGHPUT_UNIT),
+        ('Parallel transfer %s latency in seconds: (.*)',
+         PARALLEL_TRANSFER_LATENCY, LATENCY_UNIT),
+        ('Parallel transfer %s part latency in seconds: (.*)',
+         PARALLEL_TRANSFER_PART_LATENCY, LATENCY_UNIT)
+    ]:
+      result_string = re.findall(search_string % up_and_down.name,
+                                 raw_result)
+      if not result_string:
+        raise ValueError('Unexpected test outcome from '
+                         'ParallelTransferThroughput api test: %s.' %
+                         raw_result)
+      result = json.loads(result_string[0])
+      for percentile in PERCENTILES_LIST:
+        value = float(result[percentile])
+        if unit == THROUGHPUT_UNIT:
+          # Convert Bytes per second to Mega bits per second, like
+          # SingleStreamThroughputBenchmark.
+          value = 8 * value / 1000 / 1000
+        results.append(
+            sample.Sample('%s %s' % (sample_name % up_and_down.name,
+                                     percentile),
+                          value, unit, parallel_transfer_metadata))
+
+
 def ListConsistencyBenchmark(results, metadata, vm, command_builder, service,
                              bucket_name):
   """A benchmark for bucket list consistency.
@@ -880,11 +1027,47 @@ def ListConsistencyBenchmark(results, metadata, vm, command_builder, service,
                                    LATENCY_UNIT, metadata)
 
 
-def LoadWorkerOutput(output):
+def LoadWorkerResultsFile(path, num_records):
+  """Loads a compressed file of binary worker results.
+
+  The file is decompressed straight into an array of num_records records, so
+  that neither the compressed nor the decompressed bytes are held besides it.
+
+  Args:
+    path: the local path of a gzipped file of WORKER_RESULT_DTYPE records.
+    num_records: int. The number of records in the file.
+
+  Returns:
+    A tuple of start_time, latency, size numpy arrays of the successful
+    operations in the file.
+
+  Raises:
+    AssertionError, if the file doesn't hold num_records records.
+  """
+  records = np.empty(num_records, dtype=WORKER_RESULT_DTYPE)
+  buf = memoryview(records).cast('B')
+  num_bytes = 0
+  with gzip.open(path, 'rb') as f:
+    while num_bytes < len(buf):
+      n = f.readinto(buf[num_bytes:])
+      if not n:
+        break
+      num_bytes += n
+    assert num_bytes == len(buf) and not f.read(1), (
+        '%s does not hold %d records' % (path, num_records))
+  succeeded = records['status'] == 0
+  return (records['start_time'][succeeded].astype(np.float64, copy=False),
+          records['latency'][succeeded].astype(np.float64, copy=False),
+          records['size'][succeeded].astype(np.int64, copy=False))
+
+
+def LoadWorkerOutput(output, results_dirs=None):
   """Load output from worker processes to our internal format.
 
   Args:
     output: list of strings. The stdouts of all worker processes.
+    results_dirs: list of local directories, one per worker process, holding
+      the pulled results files of streams that report a 'results_file'.
 
   Returns:
     A tuple of start_time, latency, size. Each of these is a list of
@@ -914,10 +1097,21 @@ def LoadWorkerOutput(output):
   latencies = []
   sizes = []
 
-  for worker_out in output:
+  for worker_idx, worker_out in enumerate(output):
     json_out = json.loads(worker_out)
 
     for stream in json_out:
+      if 'results_file' in stream:
+        stream_start_times, stream_latencies, stream_sizes = (
+            LoadWorkerResultsFile(os.path.join(
+                results_dirs[worker_idx], WORKER_RESULTS_DIR,
+                posixpath.basename(stream['results_file']) + '.gz'),
+            stream['num_records']))
+        start_times.append(stream_start_times)
+        latencies.append(stream_latencies)
+        sizes.append(stream_sizes)
+        continue
+
       assert len(stream['start_times']) == len(stream['latencies'])
       assert len(stream['latencies']) == len(stream['sizes'])
 
@@ -938,18 +1132,39 @@ def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm):
     command_builder: an APIScriptCommandBuilder.
     cmd_args: arguments for the command_builder.
     streams_per_vm: number of threads per vm.
+
+  Returns:
+    A tuple of the stdouts of the processes and, with
+    --object_storage_worker_binary_results, the local directories their
+    results files were pulled to, or None.
   """
 
   output = [None] * len(vms)
+  results_dirs = None
+  remote_results_dir = posixpath.join(vm_util.VM_TMP_DIR, WORKER_RESULTS_DIR)
+  if _WORKER_BINARY_RESULTS.value:
+    results_dirs = [
+        os.path.join(vm_util.GetTempDir(), 'worker_results_%s' % uuid.uuid4(),
+                     'vm%d' % vm_idx) for vm_idx in range(len(vms))
+    ]
 
   def RunOneProcess(vm_idx):
     logging.info('Running on VM %s.', vm_idx)
-    cmd = command_builder.BuildCommand(cmd_args + [
+    vm = vms[vm_idx]
+    process_args = [
         '--stream_num_start=%s' % (vm_idx * streams_per_vm),
         '--vm_id=%s' % vm_idx
-    ])
-    out, _ = vms[vm_idx].RobustRemoteCommand(cmd, should_log=False)
+    ]
+    if results_dirs:
+      vm.RemoteCommand('rm -rf {0} && mkdir -p {0}'.format(remote_results_dir))
+      process_args.append('--results_dir=%s' % remote_results_dir)
+    cmd = command_builder.BuildCommand(cmd_args + process_args)
+    out, _ = vm.RobustRemoteCommand(cmd, should_log=False)
     output[vm_idx] = out
+    if results_dirs:
+      vm.RemoteCommand('gzip -f %s/*.bin' % remote_results_dir)
+      os.makedirs(results_dirs[vm_idx])
+      vm.PullFile(results_dirs[vm_idx], remote_results_dir)
 
   # Each vm/process has a thread managing it.
   threads = [
@@ -963,7 +1178,7 @@ def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm):
   for thread in threads:
     thread.join()
   logging.info('All processes complete.')
-  return output
+  return output, results_dirs
 
 
 def _DatetimeNow():
@@ -1036,6 +1251,7 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder, service,
 
   streams_per_vm = FLAGS.object_storage_streams_per_vm
   num_vms = FLAGS.num_vms
+  threads_per_process = FLAGS.object_storage_threads_per_process
 
   start_time = (
       time.time() +
@@ -1054,6 +1270,8 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder, service,
       '--start_time=%s' % start_time,
       '--objects_written_file=%s' % objects_written_file
   ]
+  if threads_per_process > 1:
+    cmd_args.append('--threads_per_process=%s' % threads_per_process)
 
   if operation == MultistreamOperationType.upload:
     cmd_args += [
@@ -1079,9 +1297,9 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder, service,
     raise Exception('Value of operation must be \'upload\' or \'download\'.'
                     'Value is: \'' + operation.name + '\'')
 
-  output = _RunMultiStreamProcesses(vms, command_builder, cmd_args,
-                                    streams_per_vm)
-  start_times, latencies, sizes = LoadWorkerOutput(output)
+  output, results_dirs = _RunMultiStreamProcesses(vms, command_builder,
+                                                  cmd_args, streams_per_vm)
+  start_times, latencies, sizes = LoadWorkerOutput(output, results_dirs)
   if FLAGS.object_storage_worker_output:
     with open(FLAGS.object_storage_worker_output, 'w') as out_file:
       out_file.write(json.dumps(output))
@@ -1590,6 +1808,11 @@ def Run(benchmark_spec):
   bucket_name = benchmark_spec.bucket_name
 
   metadata = {'storage_provider': FLAGS.storage}
+  if FLAGS.object_storage_payload_compressibility:
+    metadata['payload_compressibility'] = (
+        FLAGS.object_storage_payload_compressibility)
+  if FLAGS.object_storage_threads_per_process > 1:
+    metadata['threads_per_process'] = FLAGS.object_storage_threads_per_process
 
   vms = benchmark_spec.vms
 
@@ -1629,6 +1852,10 @@ def Run(benchmark_spec):
     if FLAGS.object_storage_scenario in {name, 'all'}:
       benchmark(results, metadata, vms, command_builder, service, bucket_name)
 
+  if FLAGS.object_storage_scenario == 'api_parallel_transfer':
+    ParallelTransferThroughputBenchmark(results, metadata, vms[0],
+                                        command_builder, service, bucket_name)
+
   # MultiStreamRead has the additional 'read_objects' parameter
   if FLAGS.object_storage_scenario in {'api_multistream_reads', 'all'}:
     metadata['cold_objects_filename'] = benchmark_spec.read_objects_filename
@@ -26,6 +26,13 @@ uninstall function.  If the package manually places files in other locations
 (e.g. /usr/bin, /opt/pkb), then it also needs to define uninstall functions
 (e.g.  YumUninstall(vm)).
 
+Packages may instead, or in addition, declare the OS packages they need for
+each package manager in lists (e.g. APT_PACKAGES and YUM_PACKAGES), and the
+PerfKit packages they need in PACKAGE_DEPENDENCIES, a list or, when it depends
+on flags, a function that returns one. vm.InstallAll(packages)
+installs the declared OS packages of all requested packages with one package
+manager call, then runs their install functions concurrently.
+
 Package installation should persist across reboots.
 
 All functions in each package module should be prefixed with the type of package
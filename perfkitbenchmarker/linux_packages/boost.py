@@ -14,12 +14,5 @@
 
 """Module containing boost installation functions."""
 
-
-def AptInstall(vm):
-  """Installs boost on the VM."""
-  vm.InstallPackages('libboost-all-dev')
-
-
-def YumInstall(vm):
-  """Installs boost on the VM."""
-  vm.InstallPackages('boost-devel')
+APT_PACKAGES = ['libboost-all-dev']
+YUM_PACKAGES = ['boost-devel']
@@ -15,17 +15,5 @@
 
 """Module containing curl installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the curl package on the VM."""
-  vm.InstallPackages('curl')
-
-
-def YumInstall(vm):
-  """Installs the curl package on the VM."""
-  _Install(vm)
-
-
-def AptInstall(vm):
-  """Installs the curl package on the VM."""
-  _Install(vm)
+APT_PACKAGES = ['curl']
+YUM_PACKAGES = ['curl']
@@ -286,6 +286,25 @@ def _LimitBenchmarksToRun(vm, selected_hpcc_benchmarks):
   vm.PushFile(local_hpcc_path, remote_hpcc_path)
 
 
+def _GetPackageDependencies():
+  """Returns the PerfKit packages that HPCC needs with the current flags."""
+  if USE_INTEL_COMPILED_HPL.value:
+    return ['wget', 'intelmpi', 'mkl']
+  dependencies = ['wget', 'openmpi']
+  if FLAGS.hpcc_math_library in (HPCC_MATH_LIBRARY_OPEN_BLAS,
+                                 HPCC_MATH_LIBRARY_MKL):
+    # HPCC is compiled with OpenBLAS before it is recompiled with MKL.
+    dependencies.append('openblas')
+  if FLAGS.hpcc_math_library == HPCC_MATH_LIBRARY_MKL:
+    dependencies.append('mkl')
+  elif FLAGS.hpcc_math_library == HPCC_MATH_LIBRARY_AMD_BLIS:
+    dependencies.append('amdblis')
+  return dependencies
+
+
+PACKAGE_DEPENDENCIES = _GetPackageDependencies
+
+
 def Install(vm):
   """Installs the HPCC package on the VM."""
   vm.Install('wget')
@@ -156,21 +156,25 @@ def YumInstall(vm):
   vm.Install('build_tools')
   vm.InstallPackages(YUM_PACKAGES)
 
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
   pkg_config = 'PKG_CONFIG_PATH=/usr/local/lib/pkgconfig:${PKG_CONFIG_PATH}'
-  vm.RemoteCommand('cd {0} && autoreconf -ivf && {1} ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR, pkg_config))
+  vm.RemoteCommandBatch([
+      'git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR),
+      'cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG),
+      'cd {0} && autoreconf -ivf && {1} ./configure && '
+      'sudo make install'.format(MEMTIER_DIR, pkg_config),
+  ])
 
 
 def AptInstall(vm):
   """Installs the memtier package on the VM."""
   vm.Install('build_tools')
   vm.InstallPackages(APT_PACKAGES)
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
-  vm.RemoteCommand('cd {0} && autoreconf -ivf && ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR))
+  vm.RemoteCommandBatch([
+      'git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR),
+      'cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG),
+      'cd {0} && autoreconf -ivf && ./configure && '
+      'sudo make install'.format(MEMTIER_DIR),
+  ])
 
 
 def _Uninstall(vm):
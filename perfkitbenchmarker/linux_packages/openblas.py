@@ -22,6 +22,8 @@ OPENBLAS_DIR = '%s/OpenBLAS' % linux_packages.INSTALL_DIR
 GIT_REPO = 'https://github.com/xianyi/OpenBLAS'
 GIT_TAG = 'v0.3.3'
 
+PACKAGE_DEPENDENCIES = ['build_tools', 'fortran']
+
 
 def _Install(vm):
   """Installs the OpenBLAS package on the VM."""
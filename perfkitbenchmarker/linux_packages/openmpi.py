@@ -39,6 +39,8 @@ flags.DEFINE_string('openmpi_configs', None,
 MPI_URL_BASE = 'https://download.open-mpi.org/release/open-mpi'
 REMOVE_MPI_CMD = 'autoremove -y libopenmpi-dev openmpi-bin openmpi-common'
 
+PACKAGE_DEPENDENCIES = ['build_tools', 'wget']
+
 
 class MpirunParseOutputError(Exception):
   pass
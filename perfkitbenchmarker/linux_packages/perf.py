@@ -0,0 +1,29 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module containing Linux perf installation functions."""
+
+YUM_PACKAGES = ['perf']
+
+_UBUNTU_PACKAGES = [
+    'linux-tools-common', 'linux-tools-generic', 'linux-tools-`uname -r`'
+]
+
+
+def AptInstall(vm):
+  """Installs perf for the running kernel on the VM."""
+  if 'ubuntu' in vm.OS_TYPE:
+    vm.InstallPackages(' '.join(_UBUNTU_PACKAGES))
+  else:
+    vm.InstallPackages('linux-perf')
@@ -53,10 +53,12 @@ from absl import flags
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
+from perfkitbenchmarker import hdr_histogram
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import maven
+import numpy as np
 import six
 from six.moves import filter
 from six.moves import range
@@ -74,6 +76,8 @@ HDRHISTOGRAM_TAR_URL = ('https://github.com/HdrHistogram/HdrHistogram/archive/'
 HDRHISTOGRAM_GROUPS = ['READ', 'UPDATE']
 
 _DEFAULT_PERCENTILES = 50, 75, 90, 95, 99, 99.9
+# Latency percentiles reported per interval from hdrhistogram logs.
+_HDR_TIMESERIES_PERCENTILES = 50, 99
 
 HISTOGRAM = 'histogram'
 HDRHISTOGRAM = 'hdrhistogram'
@@ -110,6 +114,11 @@ flags.DEFINE_enum('ycsb_measurement_type', HISTOGRAM, YCSB_MEASUREMENT_TYPES,
                   'Measurement type to use for ycsb. Defaults to histogram.')
 flags.DEFINE_enum('ycsb_measurement_interval', 'op', ['op', 'intended', 'both'],
                   'Measurement interval to use for ycsb. Defaults to op.')
+flags.DEFINE_boolean(
+    'ycsb_hdrhistogram_remote_combine', False,
+    'If True, combine hdrhistogram logs on a client VM with HdrHistogram\'s '
+    'Java HistogramLogProcessor. Otherwise the raw interval logs are copied '
+    'from the client VMs, merged by PKB and also reported as time series.')
 flags.DEFINE_boolean(
     'ycsb_histogram', False, 'Include individual '
     'histogram results from YCSB (will increase sample '
@@ -359,7 +368,8 @@ def Install(vm):
       # TODO(user): Update minimum YCSB version and remove.
       "--exclude='**/log4j-core-2*.jar' ")
   vm.RemoteCommand(install_cmd.format(YCSB_DIR, ycsb_url))
-  if _GetVersion(FLAGS.ycsb_version) >= 11:
+  if (_GetVersion(FLAGS.ycsb_version) >= 11 and
+      FLAGS.ycsb_hdrhistogram_remote_combine):
     vm.Install('maven')
     vm.RemoteCommand(install_cmd.format(HDRHISTOGRAM_DIR, HDRHISTOGRAM_TAR_URL))
     # _JAVA_OPTIONS needed to work around this issue:
@@ -649,6 +659,123 @@ def ParseHdrLogs(hdrlogs):
   return parsed_hdr_histograms
 
 
+def ParseRawHdrLogs(hdrlogs):
+  """Decodes raw hdrhistogram interval logs from each client.
+
+  Args:
+    hdrlogs: Dict of group (read or update) to a list of raw interval logs for
+      that group, one per client.
+
+  Returns:
+    Dict of group to a list, per client with results, of lists of
+    hdr_histogram.HdrHistogram, one per interval.
+  """
+  parsed_hdr_histograms = {}
+  for group, logfiles in six.iteritems(hdrlogs):
+    client_intervals = []
+    for logfile in logfiles:
+      intervals = hdr_histogram.ParseIntervalLog(logfile)
+      if intervals:
+        client_intervals.append(intervals)
+    if client_intervals:
+      parsed_hdr_histograms[group] = client_intervals
+  return parsed_hdr_histograms
+
+
+def _HdrHistogramToTuples(histogram):
+  """Converts a histogram into (percentile, latency, count) tuples.
+
+  The tuples match the output of ParseHdrLogFile, but contain every non-empty
+  bucket of the histogram rather than only the buckets printed by
+  HistogramLogProcessor.
+
+  Args:
+    histogram: hdr_histogram.HdrHistogram of latencies in microseconds.
+
+  Returns:
+    List of (percent, value, count) tuples, with value in milliseconds.
+  """
+  values, counts = histogram.GetBuckets()
+  if not counts.size:
+    return []
+  counts_below = np.cumsum(counts) - counts
+  # Percentile reached before each bucket, rounded down to 3 decimal places.
+  percentiles = np.floor(counts_below * 100000.0 / counts.sum()) / 1000.0
+  return list(zip(percentiles.tolist(), (values / 1000.0).tolist(),
+                  counts.tolist()))
+
+
+def CombineRawHdrLogs(parsed_hdr_histograms):
+  """Merges each group's interval histograms from all clients.
+
+  Args:
+    parsed_hdr_histograms: Output of ParseRawHdrLogs.
+
+  Returns:
+    Dict of group to histogram tuples, as returned by ParseHdrLogs.
+  """
+  combined = {}
+  for group, client_intervals in six.iteritems(parsed_hdr_histograms):
+    histogram = hdr_histogram.Merge(list(itertools.chain(*client_intervals)))
+    combined[group] = _HdrHistogramToTuples(histogram)
+  return combined
+
+
+def _CreateHdrTimeSeriesSamples(parsed_hdr_histograms, **kwargs):
+  """Creates throughput and latency time series from interval histograms.
+
+  Intervals are aligned by their position in each client's log, as each client
+  starts logging when its run starts.
+
+  Args:
+    parsed_hdr_histograms: Output of ParseRawHdrLogs.
+    **kwargs: Base metadata for each sample.
+
+  Returns:
+    List of sample.Sample objects.
+  """
+  samples = []
+  for group, client_intervals in six.iteritems(parsed_hdr_histograms):
+    timestamps = []
+    throughputs = []
+    latencies = collections.defaultdict(list)
+    for i in range(max(len(intervals) for intervals in client_intervals)):
+      histograms = [
+          intervals[i] for intervals in client_intervals if i < len(intervals)
+      ]
+      merged = hdr_histogram.Merge(histograms)
+      timestamps.append(int(merged.start_time * 1000))
+      throughputs.append(
+          sum(h.total_count / h.interval_length for h in histograms))
+      for percentile in _HDR_TIMESERIES_PERCENTILES:
+        latencies[percentile].append(
+            merged.GetValueAtPercentile(percentile) /
+            1000.0 if merged.total_count else 0.0)
+    interval = client_intervals[0][0].interval_length
+    metadata = kwargs.copy()
+    metadata['operation'] = group
+    samples.append(
+        sample.CreateTimeSeriesSample(
+            throughputs,
+            timestamps,
+            sample.OPS_TIME_SERIES,
+            'ops',
+            interval,
+            additional_metadata=metadata))
+    for percentile in _HDR_TIMESERIES_PERCENTILES:
+      latency_metadata = metadata.copy()
+      latency_metadata['percentile'] = percentile
+      samples.append(
+          sample.CreateTimeSeriesSample(
+              latencies[percentile],
+              timestamps,
+              sample.LATENCY_TIME_SERIES,
+              'ms',
+              interval,
+              additional_metadata=latency_metadata))
+  return samples
+
+
 def _CumulativeSum(xs):
   total = 0
   for x in xs:
@@ -1342,12 +1469,22 @@ class YCSBExecutor(object):
                       include_histogram=FLAGS.ycsb_histogram,
                       **client_meta))
 
-          if self.measurement_type == HDRHISTOGRAM:
+          hdr_timeseries_samples = []
+          if (self.measurement_type == HDRHISTOGRAM and
+              FLAGS.ycsb_hdrhistogram_remote_combine):
             combined_log = self.CombineHdrHistogramLogFiles(
                 parameters['hdrhistogram.output.path'], vms)
             parsed_hdr = ParseHdrLogs(combined_log)
             combined = _CombineResults(results, self.measurement_type,
                                        parsed_hdr)
+          elif self.measurement_type == HDRHISTOGRAM:
+            raw_logs = self.CollectHdrHistogramLogFiles(
+                parameters['hdrhistogram.output.path'], vms)
+            parsed_hdr = ParseRawHdrLogs(raw_logs)
+            combined = _CombineResults(results, self.measurement_type,
+                                       CombineRawHdrLogs(parsed_hdr))
+            hdr_timeseries_samples = _CreateHdrTimeSeriesSamples(
+                parsed_hdr, result_type='combined', **client_meta)
           else:
             combined = _CombineResults(results, self.measurement_type, {})
           run_samples = list(
@@ -1356,6 +1493,7 @@ class YCSBExecutor(object):
                   result_type='combined',
                   include_histogram=FLAGS.ycsb_histogram,
                   **client_meta))
+          run_samples.extend(hdr_timeseries_samples)
 
           overall_throughput = 0
           for s in run_samples:
@@ -1386,6 +1524,35 @@ class YCSBExecutor(object):
 
     return all_results
 
+  def CollectHdrHistogramLogFiles(self, hdr_files_dir, vms):
+    """Copies the raw hdr histogram interval logs from each vm.
+
+    Args:
+      hdr_files_dir: directory on the remote vms where hdr files are stored.
+      vms: remote vms
+
+    Returns:
+      dict of group type to a list of hdr interval logs, one per vm with
+      results for that group type.
+    """
+
+    def _Collect(vm):
+      logs = {}
+      for grouptype in HDRHISTOGRAM_GROUPS:
+        logs[grouptype], _ = vm.RemoteCommand(
+            'touch {0}{1}.hdr && cat {0}{1}.hdr'.format(hdr_files_dir,
+                                                        grouptype))
+      return logs
+
+    hdrlogs = collections.defaultdict(list)
+    for logs in vm_util.RunThreaded(_Collect, vms):
+      for grouptype in HDRHISTOGRAM_GROUPS:
+        # It's possible that there is no result for certain group, e.g., read
+        # only, update only.
+        if logs[grouptype].strip():
+          hdrlogs[grouptype.lower()].append(logs[grouptype])
+    return dict(hdrlogs)
+
   def CombineHdrHistogramLogFiles(self, hdr_files_dir, vms):
     """Combine multiple hdr histograms by group type.
 
@@ -1398,6 +1565,9 @@ class YCSBExecutor(object):
        hdrhistogram package that is installed on the vms. Refer to https://
        github.com/HdrHistogram/HdrHistogram/blob/master/HistogramLogProcessor
 
+    Only used with --ycsb_hdrhistogram_remote_combine; by default the raw logs
+    are collected with CollectHdrHistogramLogFiles and merged locally.
+
     Args:
       hdr_files_dir: directory on the remote vms where hdr files are stored.
       vms: remote vms
@@ -27,8 +27,10 @@ for you.
 """
 
 import abc
+import asyncio
 import collections
 import copy
+import functools
 import json
 import logging
 import os
@@ -41,12 +43,14 @@ from typing import Optional, Dict, Set
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import regex_util
+from perfkitbenchmarker import stages
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 
@@ -137,6 +141,13 @@ flags.DEFINE_bool(
 flags.DEFINE_integer(
     'ssh_retries', 10, 'Default number of times to retry SSH.', lower_bound=0)
 
+flags.DEFINE_integer(
+    'ssh_max_sessions_per_vm', 10,
+    'Maximum number of concurrent SSH sessions issued to a single VM. When '
+    '--ssh_reuse_connections is set all sessions share one master connection '
+    'and sshd rejects sessions beyond its MaxSessions setting (10 by default).',
+    lower_bound=1)
+
 flags.DEFINE_integer(
     'scp_connect_timeout', 30, 'timeout for SCP connection.', lower_bound=0)
 
@@ -180,8 +191,29 @@ flags.DEFINE_boolean('disable_smt', False,
 _DISABLE_YUM_CRON = flags.DEFINE_boolean(
     'disable_yum_cron', True, 'Whether to disable the cron-run yum service.')
 
+_PERSIST_INSTALL_MANIFEST = flags.DEFINE_boolean(
+    'persist_install_manifest', True,
+    'Whether to record installed PerfKit packages in a manifest on the VM, so '
+    'that rerunning the prepare stage on the same VMs skips them.')
+
 RETRYABLE_SSH_RETCODE = 255
 
+# Lists the PerfKit packages installed on the VM, one per line.
+_INSTALL_MANIFEST = posixpath.join(linux_packages.INSTALL_DIR,
+                                   'installed_packages')
+
+# Seconds between attempts to take an SSH session slot from a coroutine.
+_SSH_SESSION_POLL_INTERVAL = 0.01
+
+
+def _GetPackageDependencies(package_name):
+  """Returns the PerfKit packages that the package declares it depends on."""
+  dependencies = getattr(linux_packages.PACKAGES[package_name],
+                         'PACKAGE_DEPENDENCIES', ())
+  if callable(dependencies):
+    dependencies = dependencies()
+  return list(dependencies)
+
 
 class CpuVulnerabilities:
   """The 3 different vulnerablity statuses from vm.cpu_vulernabilities.
@@ -312,6 +344,11 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   # can use the following command
   INIT_RAM_FS_CMD = 'sudo update-initramfs -u'
 
+  # Prefix of the install functions and declared OS packages of PerfKit
+  # packages for the OS's package manager, e.g. 'Apt' for AptInstall and
+  # APT_PACKAGES. See linux_packages/__init__.py.
+  PACKAGE_MANAGER = None
+
   # regex to get the network devices from "ip link show"
   _IP_LINK_RE_DEVICE_MTU = re.compile(
       r'^\d+: (?P<device_name>\S+):.*mtu (?P<mtu>\d+)')
@@ -329,6 +366,8 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     self.has_private_key = False
 
     self._remote_command_script_upload_lock = threading.Lock()
+    self._ssh_session_semaphore = threading.BoundedSemaphore(
+        FLAGS.ssh_max_sessions_per_vm)
     self._has_remote_command_script = False
     self._needs_reboot = False
     self._lscpu_cache = None
@@ -340,6 +379,14 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     self._cpu_arch: Optional[str] = None
     self._kernel_command_line: Optional[str] = None
     self._network_device_mtus = None
+    self._install_manifest_loaded = False
+    # Installed packages not yet written to the install manifest.
+    self._unrecorded_packages = []
+    self._installed_os_packages = set()
+    # Serializes package manager calls of packages installed concurrently.
+    self._package_manager_lock = threading.Lock()
+    self._package_locks = {}
+    self._package_locks_lock = threading.Lock()
 
   def _Suspend(self):
     """Suspends a VM."""
@@ -480,6 +527,58 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                         'Wrapper script log:\n%s', stdout)
       raise
 
+  def RemoteCommandBatch(self, commands, stop_on_failure=True,
+                         ignore_failure=False, should_log=False, timeout=None):
+    """Runs a sequence of commands on the VM in a single session.
+
+    Each command runs in its own subshell with stdin closed, so shell state
+    such as the working directory does not leak between commands, matching
+    separate RemoteCommand calls. Output of each command is delimited with
+    per-batch markers and split back apart on the runner.
+
+    See base class for the arguments and return value.
+    """
+    if not commands:
+      return []
+    marker = 'PKB_BATCH_%s' % uuid.uuid4().hex
+    script = []
+    for i, command in enumerate(commands):
+      script.append(
+          "printf '%(m)s:%(i)d:start\\n'; printf '%(m)s:%(i)d:start\\n' >&2\n"
+          '(\n%(command)s\n) </dev/null\n'
+          '_pkb_rc=$?\n'
+          "printf '\\n%(m)s:%(i)d:end:%%d\\n' $_pkb_rc; "
+          "printf '\\n%(m)s:%(i)d:end\\n' >&2" %
+          {'m': marker, 'i': i, 'command': command})
+      if stop_on_failure:
+        script.append('[ $_pkb_rc -eq 0 ] || exit 0')
+    stdout, stderr = self.RemoteCommand(
+        '\n'.join(script), should_log=should_log, ignore_failure=True,
+        timeout=timeout)
+
+    stdout_re = re.compile(
+        r'%s:(\d+):start\n(.*?)\n%s:\1:end:(\d+)\n' % (marker, marker),
+        re.DOTALL)
+    stderr_re = re.compile(
+        r'%s:(\d+):start\n(.*?)\n%s:\1:end\n' % (marker, marker), re.DOTALL)
+    stdouts = {int(m.group(1)): (m.group(2), int(m.group(3)))
+               for m in stdout_re.finditer(stdout)}
+    stderrs = {int(m.group(1)): m.group(2) for m in stderr_re.finditer(stderr)}
+    results = []
+    for i, command in enumerate(commands):
+      if i not in stdouts:
+        # Commands after a failure are skipped when stop_on_failure is set; any
+        # other gap means the batch was cut short, e.g. by a lost connection.
+        if not (stop_on_failure and results and results[-1].retcode):
+          results.append(virtual_machine.RemoteCommandResult(
+              command, '', stderr, RETRYABLE_SSH_RETCODE))
+        break
+      command_stdout, retcode = stdouts[i]
+      results.append(virtual_machine.RemoteCommandResult(
+          command, command_stdout, stderrs.get(i, ''), retcode))
+    self._RaiseOnBatchFailure(results, ignore_failure)
+    return results
+
   def SetupRemoteFirewall(self):
     """Sets up IP table configurations on the VM."""
     self.RemoteHostCommand('sudo iptables -A INPUT -j ACCEPT')
@@ -898,6 +997,173 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       stdout, _ = self.RemoteHostCommand(f'date "{date_fmt}" -d@$({date_cmd})')
     return stdout
 
+  def Install(self, package_name):
+    """Installs a PerfKit package on the VM.
+
+    Installs the OS packages the package declares for the OS's package manager
+    and then runs its install function, e.g. AptInstall or Install.
+
+    Args:
+      package_name: The name of the package in linux_packages.PACKAGES.
+
+    Raises:
+      KeyError: If the package has no install method for the OS.
+    """
+    if not self.install_packages:
+      return
+    self._LoadInstallManifest()
+    with self._GetPackageLock(package_name):
+      if package_name in self._installed_packages:
+        return
+      os_packages = self._GetOsPackages(package_name)
+      install_function = self._GetInstallFunction(package_name)
+      if not os_packages and not install_function:
+        raise KeyError('Package %s has no install method for %s.' %
+                       (package_name, self.BASE_OS_TYPE))
+      self._InstallOsPackages(os_packages)
+      if install_function:
+        install_function(self)
+      self._installed_packages.add(package_name)
+      if _PERSIST_INSTALL_MANIFEST.value:
+        with self._package_locks_lock:
+          self._unrecorded_packages.append(package_name)
+
+  def InstallAll(self, package_names):
+    """Installs PerfKit packages and their dependencies concurrently.
+
+    The OS packages that the packages and their PACKAGE_DEPENDENCIES declare
+    are installed with a single package manager call. Then the install
+    functions of the packages run concurrently, each one after those of the
+    packages it depends on.
+
+    Args:
+      package_names: list of names of packages in linux_packages.PACKAGES.
+    """
+    if not self.install_packages:
+      return
+    self._LoadInstallManifest()
+    pending = []
+    to_visit = list(package_names)
+    while to_visit:
+      package_name = to_visit.pop(0)
+      if package_name in pending or package_name in self._installed_packages:
+        continue
+      pending.append(package_name)
+      to_visit.extend(_GetPackageDependencies(package_name))
+    self._InstallOsPackages(sorted({
+        os_package for package_name in pending
+        for os_package in self._GetOsPackages(package_name)}))
+    background_tasks.RunTaskGraph([
+        (package_name, functools.partial(self.Install, package_name), [
+            dependency for dependency in _GetPackageDependencies(package_name)
+            if dependency in pending
+        ]) for package_name in pending
+    ])
+    self._WriteInstallManifest()
+
+  def Uninstall(self, package_name):
+    """Uninstalls a PerfKit package on the VM.
+
+    Runs the package's uninstall function for the OS, e.g. AptUninstall or
+    Uninstall, and removes the package from the install manifest.
+
+    Args:
+      package_name: The name of the package in linux_packages.PACKAGES.
+    """
+    package = linux_packages.PACKAGES[package_name]
+    if self.PACKAGE_MANAGER and hasattr(package,
+                                        self.PACKAGE_MANAGER + 'Uninstall'):
+      getattr(package, self.PACKAGE_MANAGER + 'Uninstall')(self)
+    elif hasattr(package, 'Uninstall'):
+      package.Uninstall(self)
+    self._installed_packages.discard(package_name)
+    with self._package_locks_lock:
+      if package_name in self._unrecorded_packages:
+        self._unrecorded_packages.remove(package_name)
+    if _PERSIST_INSTALL_MANIFEST.value:
+      self.RemoteCommand("sed -i '/^%s$/d' %s" % (package_name,
+                                                  _INSTALL_MANIFEST),
+                         ignore_failure=True)
+
+  def _GetOsPackages(self, package_name):
+    """Returns the OS packages the PerfKit package declares for the OS."""
+    if not self.PACKAGE_MANAGER:
+      return []
+    package = linux_packages.PACKAGES[package_name]
+    return list(getattr(package, self.PACKAGE_MANAGER.upper() + '_PACKAGES',
+                        ()))
+
+  def _GetInstallFunction(self, package_name):
+    """Returns the install function of the PerfKit package for the OS."""
+    package = linux_packages.PACKAGES[package_name]
+    if self.PACKAGE_MANAGER and hasattr(package,
+                                        self.PACKAGE_MANAGER + 'Install'):
+      return getattr(package, self.PACKAGE_MANAGER + 'Install')
+    return getattr(package, 'Install', None)
+
+  def _InstallOsPackages(self, os_packages):
+    """Installs the OS packages that this VM has not installed yet."""
+    os_packages = [os_package for os_package in os_packages
+                   if os_package not in self._installed_os_packages]
+    if os_packages:
+      self.InstallPackages(' '.join(os_packages))
+      self._installed_os_packages.update(os_packages)
+
+  def _TakeInstallManifestWrite(self):
+    """Returns a command prefix that writes the unrecorded packages.
+
+    Installed packages are added to the install manifest by the next package
+    manager command, or at the end of InstallAll, instead of by a command of
+    their own, which saves an SSH round trip per package. The write creates
+    the install directory, since packages are installed before
+    PrepareVMEnvironment creates it, and does not affect the exit status of
+    the command it prefixes.
+
+    Returns:
+      The prefix, or '' if there are no unrecorded packages.
+    """
+    with self._package_locks_lock:
+      package_names, self._unrecorded_packages = self._unrecorded_packages, []
+    if not package_names:
+      return ''
+    return ('(sudo mkdir -p {0} && sudo chmod a+rwxt {0} && '
+            "printf '%s\\n' {1} >> {2}); ").format(
+                linux_packages.INSTALL_DIR, ' '.join(package_names),
+                _INSTALL_MANIFEST)
+
+  def _WriteInstallManifest(self):
+    """Writes the unrecorded packages to the install manifest."""
+    manifest_write = self._TakeInstallManifestWrite()
+    if manifest_write:
+      self.RemoteCommand(manifest_write + 'true', ignore_failure=True)
+
+  def _GetPackageLock(self, package_name):
+    """Returns the lock held while installing the PerfKit package."""
+    with self._package_locks_lock:
+      return self._package_locks.setdefault(package_name, threading.Lock())
+
+  def _LoadInstallManifest(self):
+    """Adds the packages in the VM's install manifest to those installed.
+
+    The manifest is only read when the VM was provisioned by an earlier
+    invocation of PKB, e.g. when rerunning the prepare stage.
+    """
+    if not _PERSIST_INSTALL_MANIFEST.value:
+      return
+    with self._package_locks_lock:
+      if self._install_manifest_loaded:
+        return
+      self._install_manifest_loaded = True
+      if stages.PROVISION in FLAGS.run_stage:
+        return
+      stdout, _ = self.RemoteCommand(
+          'cat %s' % _INSTALL_MANIFEST, ignore_failure=True)
+      installed_packages = set(stdout.split()) & set(linux_packages.PACKAGES)
+      if installed_packages:
+        logging.info('Skipping packages already installed on %s: %s', self,
+                     ', '.join(sorted(installed_packages)))
+        self._installed_packages.update(installed_packages)
+
   def SnapshotPackages(self):
     """Grabs a snapshot of the currently installed packages."""
     pass
@@ -912,7 +1178,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     Deletes the temp directory, restores packages, and uninstalls all
     PerfKit packages.
     """
-    for package_name in self._installed_packages:
+    for package_name in list(self._installed_packages):
       self.Uninstall(package_name)
     self.RestorePackages()
     self.RemoteCommand('sudo rm -rf %s' % linux_packages.INSTALL_DIR)
@@ -1115,12 +1381,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       # Multi-line commands passed to ssh won't work on Windows unless the
       # newlines are escaped.
       command = command.replace('\n', '\\n')
-    ip_address = self.GetConnectionIp()
-    user_host = '%s@%s' % (self.user_name, ip_address)
-    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
-    ssh_private_key = (self.ssh_private_key if self.is_static else
-                       vm_util.GetPrivateKeyPath())
-    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    ssh_cmd = self._GetSshCommandPrefix()
     try:
       if login_shell:
         ssh_cmd.extend(['-t', '-t', 'bash -l -c "%s"' % command])
@@ -1129,13 +1390,18 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
         ssh_cmd.append(command)
 
       for _ in range(retries):
-        stdout, stderr, retcode = vm_util.IssueCommand(
-            ssh_cmd, force_info_log=should_log,
-            suppress_warning=suppress_warning,
-            timeout=timeout, raise_on_failure=False)
+        with self._ssh_session_semaphore:
+          stdout, stderr, retcode = vm_util.IssueCommand(
+              ssh_cmd, force_info_log=should_log,
+              suppress_warning=suppress_warning,
+              timeout=timeout, raise_on_failure=False)
         # Retry on 255 because this indicates an SSH failure
         if retcode != RETRYABLE_SSH_RETCODE:
           break
+        # A dead master connection fails every multiplexed session, so drop
+        # it and let the next attempt establish a fresh one.
+        if not self.CheckSshControlMaster():
+          self._RemoveSshControlSocket()
     finally:
       if login_shell:
         self._pseudo_tty_lock.release()
@@ -1150,6 +1416,150 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     return (stdout, stderr, retcode)
 
+  def _GetSshCommandPrefix(self):
+    """Returns the ssh command line, without the remote command, for the VM."""
+    user_host = '%s@%s' % (self.user_name, self.GetConnectionIp())
+    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
+    ssh_private_key = (self.ssh_private_key if self.is_static else
+                       vm_util.GetPrivateKeyPath())
+    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    return ssh_cmd
+
+  async def RemoteHostCommandWithReturnCodeAsync(self,
+                                                 command,
+                                                 should_log=False,
+                                                 retries=None,
+                                                 ignore_failure=False,
+                                                 suppress_warning=False,
+                                                 timeout=None):
+    """Coroutine version of RemoteHostCommandWithReturnCode.
+
+    Login shells are not supported since they require serializing ssh calls
+    that allocate a pseudo-tty.
+
+    Args:
+      command: A valid bash command.
+      should_log: A boolean indicating whether the command result should be
+          logged at the info level.
+      retries: The maximum number of times to retry SSHing when it receives a
+          255 return code. If None, it defaults to the value of the flag
+          ssh_retries.
+      ignore_failure: Ignore any failure if set to true.
+      suppress_warning: Suppress the result logging from IssueCommandAsync when
+          the return code is non-zero.
+      timeout: The timeout for IssueCommandAsync.
+
+    Returns:
+      A tuple of stdout, stderr, return_code from running the command.
+
+    Raises:
+      RemoteCommandError: If there was a problem establishing the connection.
+    """
+    if retries is None:
+      retries = FLAGS.ssh_retries
+    ssh_cmd = self._GetSshCommandPrefix() + [command]
+    for _ in range(retries):
+      # Polling keeps the event loop free while waiting on the session cap,
+      # which is shared with synchronous callers.
+      while not self._ssh_session_semaphore.acquire(blocking=False):
+        await asyncio.sleep(_SSH_SESSION_POLL_INTERVAL)
+      try:
+        stdout, stderr, retcode = await vm_util.IssueCommandAsync(
+            ssh_cmd, force_info_log=should_log,
+            suppress_warning=suppress_warning, timeout=timeout,
+            raise_on_failure=False)
+      finally:
+        self._ssh_session_semaphore.release()
+      # Retry on 255 because this indicates an SSH failure
+      if retcode != RETRYABLE_SSH_RETCODE:
+        break
+
+    if retcode:
+      error_text = ('Got non-zero return code (%s) executing %s\n'
+                    'Full command: %s\nSTDOUT: %sSTDERR: %s' %
+                    (retcode, command, ' '.join(ssh_cmd), stdout, stderr))
+      if not ignore_failure:
+        raise errors.VirtualMachine.RemoteCommandError(error_text)
+
+    return (stdout, stderr, retcode)
+
+  async def RemoteCommandAsync(self, command, **kwargs):
+    """Coroutine version of RemoteCommand.
+
+    Args:
+      command: A valid bash command.
+      **kwargs: Keyword arguments passed directly to
+          RemoteHostCommandWithReturnCodeAsync.
+
+    Returns:
+      A tuple of stdout, stderr from running the command.
+
+    Raises:
+      RemoteCommandError: If there was a problem establishing the connection.
+    """
+    return (await self.RemoteHostCommandWithReturnCodeAsync(
+        command, **kwargs))[:2]
+
+  def _GetSshControlSocket(self) -> Optional[str]:
+    """Returns the path of this VM's SSH master socket if it exists.
+
+    Only the %h token of --ssh_control_path is expanded; if other tokens are
+    used the socket cannot be located and None is returned.
+    """
+    if not FLAGS.ssh_reuse_connections:
+      return None
+    ip_address = self.GetConnectionIp()
+    if not ip_address:
+      return None
+    control_path = vm_util.GetSshControlPath().replace('%h', ip_address)
+    if '%' in control_path or not os.path.exists(control_path):
+      return None
+    return control_path
+
+  def _IssueSshControlCommand(self, control_command):
+    """Sends a control command (e.g. check, exit) to the SSH master.
+
+    Args:
+      control_command: The ssh -O command to send.
+
+    Returns:
+      The return code of the ssh control command.
+    """
+    ssh_private_key = (self.ssh_private_key if self.is_static else
+                       vm_util.GetPrivateKeyPath())
+    ssh_cmd = ['ssh', '-O', control_command, '-p', str(self.ssh_port),
+               '%s@%s' % (self.user_name, self.GetConnectionIp())]
+    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    _, _, retcode = vm_util.IssueCommand(
+        ssh_cmd, timeout=FLAGS.ssh_connect_timeout, raise_on_failure=False,
+        suppress_warning=True)
+    return retcode
+
+  def _RemoveSshControlSocket(self):
+    """Removes a stale SSH master socket so it is not reused."""
+    control_socket = self._GetSshControlSocket()
+    if not control_socket:
+      return
+    logging.info('Removing stale SSH control socket %s for %s.',
+                 control_socket, self)
+    try:
+      os.remove(control_socket)
+    except OSError:
+      pass
+
+  def CheckSshControlMaster(self) -> bool:
+    """Returns whether a healthy SSH master connection to the VM exists."""
+    if not self._GetSshControlSocket():
+      return False
+    return self._IssueSshControlCommand('check') == 0
+
+  def CloseRemoteConnections(self):
+    """Shuts down the SSH master connection shared by remote commands."""
+    if not self._GetSshControlSocket():
+      return
+    if self._IssueSshControlCommand('exit'):
+      self._RemoveSshControlSocket()
+
   def RemoteHostCommand(self, *args, **kwargs):
     """Runs a command on the VM.
 
@@ -1197,10 +1607,12 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     self._has_remote_command_script = False
     self._DisableCpus()
 
-  def MoveFile(self, target, source_path, remote_path=''):
-    self.MoveHostFile(target, source_path, remote_path)
+  def MoveFile(self, target, source_path, remote_path='',
+               use_internal_ip=False):
+    self.MoveHostFile(target, source_path, remote_path, use_internal_ip)
 
-  def MoveHostFile(self, target, source_path, remote_path=''):
+  def MoveHostFile(self, target, source_path, remote_path='',
+                   use_internal_ip=False):
     """Copies a file from one VM to a target VM.
 
     Args:
@@ -1208,6 +1620,8 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       source_path: The location of the file on the REMOTE machine.
       remote_path: The destination of the file on the TARGET machine, default
           is the home directory.
+      use_internal_ip: Whether to copy to the target's internal IP address
+          instead of its external one.
     """
     self.AuthenticateVm()
 
@@ -1217,7 +1631,9 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     #     ie: the key is added to know known_hosts which allows
     #     OpenMPI to operate correctly.
     remote_location = '%s@%s:%s' % (
-        target.user_name, target.ip_address, remote_path)
+        target.user_name,
+        target.internal_ip if use_internal_ip else target.ip_address,
+        remote_path)
     self.RemoteHostCommand('scp -P %s -o StrictHostKeyChecking=no -i %s %s %s' %
                            (target.ssh_port, REMOTE_KEY_PATH, source_path,
                             remote_location))
@@ -1558,6 +1974,7 @@ class ClearMixin(BaseLinuxMixin):
   OS_TYPE = os_types.CLEAR
   BASE_OS_TYPE = os_types.CLEAR
   PYTHON_2_PACKAGE = 'python-basic'
+  PACKAGE_MANAGER = 'Swupd'
 
   def OnStartup(self):
     """Eliminates the need to have a tty to run sudo commands."""
@@ -1598,31 +2015,9 @@ class ClearMixin(BaseLinuxMixin):
 
   def InstallPackages(self, packages: str) -> None:
     """Installs packages using the swupd bundle manager."""
-    self.RemoteCommand('sudo swupd bundle-add {0}'.format(packages))
-
-  def Install(self, package_name):
-    """Installs a PerfKit package on the VM."""
-    if not self.install_packages:
-      return
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      if hasattr(package, 'SwupdInstall'):
-        package.SwupdInstall(self)
-      elif hasattr(package, 'Install'):
-        package.Install(self)
-      else:
-        raise KeyError(
-            'Package {0} has no install method for Clear Linux.'.format(
-                package_name))
-      self._installed_packages.add(package_name)
-
-  def Uninstall(self, package_name):
-    """Uninstalls a PerfKit package on the VM."""
-    package = linux_packages.PACKAGES[package_name]
-    if hasattr(package, 'SwupdUninstall'):
-      package.SwupdUninstall(self)
-    elif hasattr(package, 'Uninstall'):
-      package.Uninstall(self)
+    with self._package_manager_lock:
+      self.RemoteCommand(self._TakeInstallManifestWrite() +
+                         'sudo swupd bundle-add {0}'.format(packages))
 
   def GetPathToConfig(self, package_name):
     """See base class."""
@@ -1718,6 +2113,7 @@ class BaseRhelMixin(BaseLinuxMixin):
 
   # OS_TYPE = os_types.RHEL
   BASE_OS_TYPE = os_types.RHEL
+  PACKAGE_MANAGER = 'Yum'
 
   def OnStartup(self):
     """Eliminates the need to have a tty to run sudo commands."""
@@ -1768,35 +2164,15 @@ class BaseRhelMixin(BaseLinuxMixin):
   @vm_util.Retry(max_retries=UPDATE_RETRIES)
   def InstallPackages(self, packages):
     """Installs packages using the yum package manager."""
-    self.RemoteCommand('sudo yum install -y %s' % packages)
+    with self._package_manager_lock:
+      self.RemoteCommand(self._TakeInstallManifestWrite() +
+                         'sudo yum install -y %s' % packages)
 
   @vm_util.Retry()
   def InstallPackageGroup(self, package_group):
     """Installs a 'package group' using the yum package manager."""
-    self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
-
-  def Install(self, package_name):
-    """Installs a PerfKit package on the VM."""
-    if not self.install_packages:
-      return
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      if hasattr(package, 'YumInstall'):
-        package.YumInstall(self)
-      elif hasattr(package, 'Install'):
-        package.Install(self)
-      else:
-        raise KeyError('Package %s has no install method for RHEL.' %
-                       package_name)
-      self._installed_packages.add(package_name)
-
-  def Uninstall(self, package_name):
-    """Uninstalls a PerfKit package on the VM."""
-    package = linux_packages.PACKAGES[package_name]
-    if hasattr(package, 'YumUninstall'):
-      package.YumUninstall(self)
-    elif hasattr(package, 'Uninstall'):
-      package.Uninstall(self)
+    with self._package_manager_lock:
+      self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
 
   def GetPathToConfig(self, package_name):
     """Returns the path to the config file for PerfKit packages.
@@ -1969,6 +2345,7 @@ class BaseDebianMixin(BaseLinuxMixin):
 
   OS_TYPE = 'base-only'
   BASE_OS_TYPE = os_types.DEBIAN
+  PACKAGE_MANAGER = 'Apt'
 
   def __init__(self, *args, **kwargs):
     super(BaseDebianMixin, self).__init__(*args, **kwargs)
@@ -2026,20 +2403,21 @@ class BaseDebianMixin(BaseLinuxMixin):
     if not self._apt_updated:
       self.AptUpdate()
       self._apt_updated = True
-    try:
-      install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
-                         '/usr/bin/apt-get -y install %s' % (packages))
-      self.RemoteCommand(install_command)
-    except errors.VirtualMachine.RemoteCommandError as e:
-      # TODO(user): Remove code below after Azure fix their package repository,
-      # or add code to recover the sources.list
-      self.RemoteCommand(
-          'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
-          '/etc/apt/sources.list')
-      logging.info('Installing "%s" failed on %s. This may be transient. '
-                   'Updating package list.', packages, self)
-      self.AptUpdate()
-      raise e
+    with self._package_manager_lock:
+      try:
+        install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
+                           '/usr/bin/apt-get -y install %s' % (packages))
+        self.RemoteCommand(self._TakeInstallManifestWrite() + install_command)
+      except errors.VirtualMachine.RemoteCommandError as e:
+        # TODO(user): Remove code below after Azure fix their package
+        # repository, or add code to recover the sources.list
+        self.RemoteCommand(
+            'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
+            '/etc/apt/sources.list')
+        logging.info('Installing "%s" failed on %s. This may be transient. '
+                     'Updating package list.', packages, self)
+        self.AptUpdate()
+        raise e
 
   def Install(self, package_name):
     """Installs a PerfKit package on the VM."""
@@ -2050,25 +2428,7 @@ class BaseDebianMixin(BaseLinuxMixin):
       self.AptUpdate()
       self._apt_updated = True
 
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      if hasattr(package, 'AptInstall'):
-        package.AptInstall(self)
-      elif hasattr(package, 'Install'):
-        package.Install(self)
-      else:
-        raise KeyError('Package %s has no install method for Debian.' %
-                       package_name)
-      self._installed_packages.add(package_name)
-
-  def Uninstall(self, package_name):
-    """Uninstalls a PerfKit package on the VM."""
-    package = linux_packages.PACKAGES[package_name]
-    if hasattr(package, 'AptUninstall'):
-      package.AptUninstall(self)
-    elif hasattr(package, 'Uninstall'):
-      package.Uninstall(self)
-    self._installed_packages.discard(package_name)
+    super(BaseDebianMixin, self).Install(package_name)
 
   def GetPathToConfig(self, package_name):
     """Returns the path to the config file for PerfKit packages.
@@ -2349,7 +2709,8 @@ class ContainerizedDebianMixin(BaseDebianMixin):
       self.ContainerCopy(file_name, remote_path, copy_to)
       self.RemoteHostCopy(file_path, tmp_path, copy_to)
 
-  def MoveFile(self, target, source_path, remote_path=''):
+  def MoveFile(self, target, source_path, remote_path='',
+               use_internal_ip=False):
     """Copies a file from one VM to a target VM.
 
     Copies a file from a container in the source VM to a container
@@ -2360,6 +2721,8 @@ class ContainerizedDebianMixin(BaseDebianMixin):
       source_path: The location of the file on the REMOTE machine.
       remote_path: The destination of the file on the TARGET machine, default
           is the root directory.
+      use_internal_ip: Whether to copy to the target's internal IP address
+          instead of its external one.
     """
     file_name = posixpath.basename(source_path)
 
@@ -2369,7 +2732,8 @@ class ContainerizedDebianMixin(BaseDebianMixin):
     # Moves the file to vm_util.VM_TMP_DIR in target
     source_host_path = posixpath.join(vm_util.VM_TMP_DIR, file_name)
     target_host_dir = vm_util.VM_TMP_DIR
-    self.MoveHostFile(target, source_host_path, target_host_dir)
+    self.MoveHostFile(target, source_host_path, target_host_dir,
+                      use_internal_ip)
 
     # Copies the file to its final destination in the container
     target.ContainerCopy(file_name, remote_path)
@@ -2731,15 +3095,7 @@ class JujuMixin(BaseDebianMixin):
     except AttributeError as e:
       logging.warning('Failed to install package %s, falling back to Apt (%s)',
                       package_name, e)
-      if package_name not in self._installed_packages:
-        if hasattr(package, 'AptInstall'):
-          package.AptInstall(self)
-        elif hasattr(package, 'Install'):
-          package.Install(self)
-        else:
-          raise KeyError('Package %s has no install method for Juju machines.' %
-                         package_name)
-        self._installed_packages.add(package_name)
+      super(JujuMixin, self).Install(package_name)
 
   def SetupPackageManager(self):
     if self.is_controller:
@@ -343,6 +343,15 @@ flags.DEFINE_float(
     'The delay in seconds between parallel processes\' invocation. '
     'Increasing this value may reduce provider throttling issues.',
     lower_bound=0)
+_RUN_PROCESSES_BUDGET = flags.DEFINE_list(
+    'run_processes_budget', [],
+    'Resource budgets shared by the benchmarks run with --run_processes, as '
+    'comma separated resource:amount pairs. The resources are vms and vcpus, '
+    'optionally qualified by region, e.g. '
+    '"vcpus:96,vcpus@us-east1:24,vms:16". Benchmarks start in order, except '
+    'that a benchmark whose VMs do not fit in what is left of the budgets '
+    'waits while later benchmarks that fit start. vCPUs are estimated from '
+    'machine type names.')
 flags.DEFINE_string(
     'completion_status_file', None,
     'If specified, this file will contain the completion status of each '
@@ -1296,7 +1305,7 @@ def RunBenchmarkTask(
     # Attempt to return the most recent results.
     if _TEARDOWN_EVENT.is_set():
       if result_specs and collector:
-        return result_specs, collector.samples
+        return result_specs, _GetUnpublishedSamples(collector)
       return [spec], []
 
     run_start_msg = ('\n' + '-' * 85 + '\n' +
@@ -1340,7 +1349,25 @@ def RunBenchmarkTask(
   # We need to return both the spec and samples so that we know
   # the status of the test and can publish any samples that
   # haven't yet been published.
-  return result_specs, collector.samples
+  return result_specs, _GetUnpublishedSamples(collector)
+
+
+def _GetUnpublishedSamples(
+    collector: publisher.SampleCollector) -> List[sample.SampleDict]:
+  """Returns the samples a benchmark task leaves for RunBenchmarks to publish.
+
+  A streaming collector publishes its remaining samples itself, since they are
+  also spooled in a file that would otherwise be republished by the next run.
+
+  Args:
+    collector: the SampleCollector of the task's last run.
+
+  Returns:
+    List of samples not yet published.
+  """
+  if collector.publish_batch_size and collector.samples:
+    collector.PublishSamples()
+  return collector.samples
 
 
 class ZoneRetryManager():
@@ -1549,6 +1576,39 @@ def RunBenchmarkTasksInSeries(tasks):
   return [func(*args, **kwargs) for func, args, kwargs in tasks]
 
 
+def _ParseResourceBudgets(budget_strings):
+  """Parses --run_processes_budget into a dict of resource to int amount."""
+  budgets = {}
+  for resource, amount in flag_util.ParseKeyValuePairs(budget_strings).items():
+    try:
+      budgets[resource] = int(amount)
+    except ValueError:
+      raise errors.Setup.InvalidFlagConfigurationError(
+          'Invalid --run_processes_budget amount for {0}: {1}'.format(
+              resource, amount))
+  return budgets
+
+
+def _AddQueueingDelaySamples(collector, resource_packer, benchmark_spec_lists):
+  """Adds a sample with the time each benchmark waited for its resources.
+
+  Args:
+    collector: SampleCollector to add the samples to.
+    resource_packer: background_tasks.ResourcePacker that scheduled the runs.
+    benchmark_spec_lists: list of lists of BenchmarkSpecs, one per task.
+  """
+  for delay, footprint, spec_list in zip(resource_packer.queue_delays,
+                                         resource_packer.footprints,
+                                         benchmark_spec_lists):
+    if delay is None:
+      continue
+    metadata = {'resource_' + resource.replace('@', '_'): amount
+                for resource, amount in footprint.items()}
+    collector.AddSamples(
+        [sample.Sample('Queueing Delay', delay, 'seconds', metadata)],
+        spec_list[-1].name, spec_list[-1])
+
+
 def RunBenchmarks():
   """Runs all benchmarks in PerfKitBenchmarker.
 
@@ -1566,18 +1626,33 @@ def RunBenchmarks():
     return 0
 
   benchmark_spec_lists = None
+  resource_packer = None
+  publisher.TruncateResultFiles()
   collector = publisher.SampleCollector()
+  if collector.publish_batch_size:
+    try:
+      collector.RepublishSpooledSamples()
+    except Exception:  # pylint: disable=broad-except
+      logging.exception('Failed to republish samples spooled by earlier runs.')
   try:
     tasks = [(RunBenchmarkTask, (spec,), {})
              for spec in benchmark_specs]
     if FLAGS.run_processes is None:
       spec_sample_tuples = RunBenchmarkTasksInSeries(tasks)
     else:
+      if _RUN_PROCESSES_BUDGET.value:
+        resource_packer = background_tasks.ResourcePacker(
+            _ParseResourceBudgets(_RUN_PROCESSES_BUDGET.value),
+            [spec.GetResourceFootprint() for spec in benchmark_specs])
       spec_sample_tuples = background_tasks.RunParallelProcesses(
-          tasks, FLAGS.run_processes, FLAGS.run_processes_delay)
+          tasks, FLAGS.run_processes, FLAGS.run_processes_delay,
+          resource_packer=resource_packer)
     benchmark_spec_lists, sample_lists = list(zip(*spec_sample_tuples))
     for sample_list in sample_lists:
       collector.samples.extend(sample_list)
+    if resource_packer:
+      _AddQueueingDelaySamples(collector, resource_packer,
+                               benchmark_spec_lists)
 
   finally:
     if collector.samples:
@@ -360,6 +360,16 @@ class AwsDynamoDBInstance(non_relational_db.BaseNonRelationalDb):
     result = json.loads(stdout)
     return result['Table']['TableStatus'] == 'ACTIVE'
 
+  def _WaitForReadyOperation(self, timeout: Optional[float]) -> None:
+    """Blocks on the AWS CLI waiter until the table is ACTIVE."""
+    cmd = util.AWS_PREFIX + [
+        'dynamodb',
+        'wait',
+        'table-exists',
+        '--region', self.region,
+        '--table-name', self.table_name]
+    vm_util.IssueCommand(cmd, timeout=timeout)
+
   def _Exists(self) -> bool:
     """Returns true if the dynamodb table exists."""
     logging.info('Checking if table %s exists', self.table_name)
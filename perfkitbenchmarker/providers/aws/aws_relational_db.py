@@ -579,8 +579,6 @@ class AwsRelationalDb(relational_db.BaseRelationalDb):
     else:
       self._GetPortsForWriterInstance(self.all_instance_ids[0])
 
-    self.client_vm_query_tools.InstallPackages()
-
   def _IsInstanceReady(self, instance_id, timeout=IS_READY_TIMEOUT):
     """Return true if the instance is ready.
 
@@ -30,8 +30,10 @@ import time
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import placement_group
 from perfkitbenchmarker import providers
@@ -176,7 +178,7 @@ def GetRootBlockDeviceSpecForImage(image_id, region):
       '--region=%s' % region,
       '--image-ids=%s' % image_id,
       '--query', 'Images[]']
-  stdout, _ = util.IssueRetryableCommand(command)
+  stdout, _ = util.IssueCachedRetryableCommand(command)
   images = json.loads(stdout)
   assert images
   assert len(images) == 1, (
@@ -423,6 +425,46 @@ def _GetKeyfileSetKey(region):
   return (region, FLAGS.run_uri)
 
 
+def _DescribeInstances(keys):
+  """Describes instances with one describe-instances command per region.
+
+  Args:
+    keys: list of (region, client_token) tuples.
+
+  Returns:
+    dict mapping each key whose instance exists to its instance dict.
+
+  Raises:
+    AssertionError: If more than one instance has the same client token.
+  """
+  tokens_by_region = collections.defaultdict(list)
+  for region, client_token in keys:
+    tokens_by_region[region].append(client_token)
+  instances = {}
+  for region, client_tokens in tokens_by_region.items():
+    describe_cmd = util.AWS_PREFIX + [
+        'ec2',
+        'describe-instances',
+        '--region=%s' % region,
+        '--filter=Name=client-token,Values=%s' % ','.join(client_tokens)]
+    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    response = json.loads(stdout)
+    for reservation in response['Reservations']:
+      for instance in reservation['Instances']:
+        if len(client_tokens) == 1:
+          key = (region, client_tokens[0])
+        else:
+          key = (region, instance['ClientToken'])
+        assert key not in instances, 'Wrong number of instances.'
+        instances[key] = instance
+  return instances
+
+
+# describe-instances accepts at most 200 values per filter.
+_DESCRIBE_CACHE = coalescing_cache.CoalescingCache(
+    _DescribeInstances, max_batch_size=200)
+
+
 class AwsKeyFileManager(object):
   """Object for managing AWS Keyfiles."""
   _lock = threading.Lock()
@@ -656,7 +698,7 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       describe_cmd.extend(['Name=description,Values=%s' %
                            cls.IMAGE_DESCRIPTION_FILTER])
     describe_cmd.extend(['--owners'] + cls.IMAGE_OWNER)
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    stdout, _ = util.IssueCachedRetryableCommand(describe_cmd)
 
     if not stdout:
       raise AwsImageNotFoundError('aws describe-images did not produce valid '
@@ -687,6 +729,17 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
 
     return max(images, key=lambda image: image['CreationDate'])['ImageId']
 
+  def _DescribeInstance(self):
+    """Returns the describe-instances dict of the VM or None if not found.
+
+    With --batch_vm_describe, VMs polled at the same time share one
+    describe-instances command per region.
+    """
+    key = (self.region, self.client_token)
+    if FLAGS.batch_vm_describe:
+      return _DESCRIBE_CACHE.Get(key)
+    return _DescribeInstances([key]).get(key)
+
   @vm_util.Retry(max_retries=2)
   def _PostCreate(self):
     """Get the instance's data and tag it."""
@@ -947,6 +1000,7 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
     if 'InstanceLimitExceeded' in stderr or 'VcpuLimitExceeded' in stderr:
       raise errors.Benchmarks.QuotaFailure(stderr)
     if 'RequestLimitExceeded' in stderr:
+      events.rate_limited.send(self)
       if FLAGS.retry_on_rate_limited:
         raise errors.Resource.RetryableCreationError(stderr)
       else:
@@ -1150,17 +1204,8 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       AwsUnknownStatusError: If an unknown status is returned from AWS.
       AwsTransitionalVmRetryableError: If the VM is pending. This is retried.
     """
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--filter=Name=client-token,Values=%s' % self.client_token]
-
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    reservations = response['Reservations']
-    assert len(reservations) < 2, 'Too many reservations.'
-    if not reservations:
+    instance = self._DescribeInstance()
+    if not instance:
       if not self.create_start_time:
         return False
       logging.info('No reservation returned by describe-instances. This '
@@ -1168,12 +1213,10 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
                    'run-instances command. Retrying describe-instances '
                    'command.')
       raise AwsTransitionalVmRetryableError()
-    instances = reservations[0]['Instances']
-    assert len(instances) == 1, 'Wrong number of instances.'
-    status = instances[0]['State']['Name']
-    self.id = instances[0]['InstanceId']
+    status = instance['State']['Name']
+    self.id = instance['InstanceId']
     if self.use_spot_instance:
-      self.spot_instance_request_id = instances[0]['SpotInstanceRequestId']
+      self.spot_instance_request_id = instance['SpotInstanceRequestId']
 
     if status not in INSTANCE_KNOWN_STATUSES:
       raise AwsUnknownStatusError('Unknown status %s' % status)
@@ -1184,16 +1227,16 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
     # In this path run-instances succeeded, a pending instance was created, but
     # not fulfilled so it moved to terminated.
     if (status == TERMINATED and
-        instances[0]['StateReason']['Code'] ==
+        instance['StateReason']['Code'] ==
         'Server.InsufficientInstanceCapacity'):
       raise errors.Benchmarks.InsufficientCapacityCloudFailure(
-          instances[0]['StateReason']['Message'])
+          instance['StateReason']['Message'])
     # In this path run-instances succeeded, a pending instance was created, but
     # instance is shutting down due to internal server error. This is a
     # retryable command for run-instance.
     # Client token needs to be refreshed for idempotency.
     if (status == SHUTTING_DOWN and
-        instances[0]['StateReason']['Code'] == 'Server.InternalError'):
+        instance['StateReason']['Code'] == 'Server.InternalError'):
       self.client_token = str(uuid.uuid4())
     return status in INSTANCE_EXISTS_STATUSES
 
@@ -16,13 +16,16 @@
 
 
 import collections
+import functools
 import json
 import re
 import string
 from typing import Dict, Set
 from absl import flags
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import vm_util
 import six
 
@@ -31,6 +34,10 @@ AWS_PREFIX = [AWS_PATH, '--output', 'json']
 FLAGS = flags.FLAGS
 STOCKOUT_MESSAGE = ('Creation failed due to insufficient capacity indicating a '
                     'potential stockout scenario.')
+# Error codes returned by AWS APIs when requests are throttled.
+_RATE_LIMITED_ERRORS = ('RequestLimitExceeded', 'Throttling')
+
+_RESPONSE_CACHE = coalescing_cache.ResponseCache('aws')
 
 
 def IsRegion(zone_or_region):
@@ -76,7 +83,7 @@ def GetZonesInRegion(region: str) -> Set[str]:
       'describe-availability-zones',
       '--region={0}'.format(region)
   ]
-  stdout, _, _ = vm_util.IssueCommand(get_zones_cmd)
+  stdout, _, _ = IssueCachedCommand(get_zones_cmd)
   response = json.loads(stdout)
   return {
       item['ZoneName']
@@ -93,7 +100,7 @@ def GetZonesFromMachineType(machine_type: str) -> Set[str]:
         'ec2', 'describe-instance-type-offerings',
         '--location-type=availability-zone', f'--region={region}'
     ] + AwsFilter({'instance-type': machine_type})
-    stdout, _, _ = vm_util.IssueCommand(get_zones_cmd)
+    stdout, _, _ = IssueCachedCommand(get_zones_cmd)
     response = json.loads(stdout)
     for item in response['InstanceTypeOfferings']:
       zones.add(item['Location'])
@@ -106,7 +113,7 @@ def GetAllRegions() -> Set[str]:
       'ec2',
       'describe-regions',
   ]
-  stdout, _, _ = vm_util.IssueCommand(get_regions_cmd)
+  stdout, _, _ = IssueCachedCommand(get_regions_cmd)
   response = json.loads(stdout)
   return {
       item['RegionName']
@@ -268,6 +275,8 @@ def IssueRetryableCommand(cmd, env=None, suppress_failure=None):
   """
   stdout, stderr, retcode = vm_util.IssueCommand(
       cmd, env=env, raise_on_failure=False, suppress_failure=suppress_failure)
+  if any(error in stderr for error in _RATE_LIMITED_ERRORS):
+    events.rate_limited.send(cmd)
   if retcode:
     raise errors.VmUtil.CalledProcessException(
         'Command returned a non-zero exit code.\n')
@@ -277,6 +286,42 @@ def IssueRetryableCommand(cmd, env=None, suppress_failure=None):
   return stdout, stderr
 
 
+def IssueCachedCommand(cmd):
+  """Runs a read-only command with vm_util.IssueCommand, sharing responses.
+
+  Only use this for commands that describe data that does not change during a
+  run, e.g. regions, zones and images. Responses are reused for
+  --response_cache_ttl seconds.
+
+  Args:
+    cmd: A list of strings such as is given to the subprocess.Popen()
+        constructor.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode from running the command.
+  """
+  return _RESPONSE_CACHE.Get(
+      ('IssueCommand',) + tuple(cmd), functools.partial(vm_util.IssueCommand,
+                                                        cmd))
+
+
+def IssueCachedRetryableCommand(cmd):
+  """Runs a read-only command with IssueRetryableCommand, sharing responses.
+
+  See IssueCachedCommand.
+
+  Args:
+    cmd: A list of strings such as is given to the subprocess.Popen()
+        constructor.
+
+  Returns:
+    A tuple of stdout and stderr from running the command.
+  """
+  return _RESPONSE_CACHE.Get(
+      ('IssueRetryableCommand',) + tuple(cmd),
+      functools.partial(IssueRetryableCommand, cmd))
+
+
 def AwsFilter(filter_keys_and_values):
   """Returns a list suitable for an AWS command line filter.
 
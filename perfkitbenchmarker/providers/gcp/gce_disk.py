@@ -17,6 +17,7 @@ Disks can be created, deleted, attached to VMs, and detached from VMs.
 Use 'gcloud compute disk-types list' to determine valid disk types.
 """
 
+import collections
 import json
 
 from absl import flags
@@ -221,6 +222,33 @@ class GceDisk(disk.BaseDisk):
       return False
     return result.get('status') == 'READY'
 
+  @classmethod
+  def _AreReady(cls, resources):
+    """Returns whether each disk is ready, with one list call per location."""
+    disks_by_location = collections.defaultdict(list)
+    for gce_disk in resources:
+      location = (gce_disk.project, gce_disk.region if gce_disk.replica_zones
+                  else gce_disk.zone, bool(gce_disk.replica_zones))
+      disks_by_location[location].append(gce_disk)
+    statuses = {}
+    for (_, location, regional), disks in disks_by_location.items():
+      cmd = util.GcloudCommand(disks[0], 'compute', 'disks', 'list')
+      cmd.flags.pop('zone', None)
+      cmd.flags['regions' if regional else 'zones'] = location
+      cmd.flags['filter'] = 'name=({0})'.format(
+          ' '.join(gce_disk.name for gce_disk in disks))
+      stdout, _, retcode = cmd.Issue(suppress_warning=True,
+                                     raise_on_failure=False)
+      if retcode:
+        continue
+      for result in json.loads(stdout):
+        statuses[(location, result['name'])] = result.get('status')
+    return [
+        statuses.get((gce_disk.region if gce_disk.replica_zones else
+                      gce_disk.zone, gce_disk.name)) == 'READY'
+        for gce_disk in resources
+    ]
+
   def _Exists(self):
     """Returns true if the disk exists."""
     result = self._Describe()
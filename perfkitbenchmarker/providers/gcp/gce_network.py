@@ -544,6 +544,7 @@ class GceFirewallRule(resource.BaseResource):
     """Returns True if the Firewall Rule exists."""
     cmd = util.GcloudCommand(self, 'compute', 'firewall-rules', 'describe',
                              self.name)
+    cmd.cacheable = True
     _, _, retcode = cmd.Issue(suppress_warning=True, raise_on_failure=False)
     return not retcode
 
@@ -692,6 +693,7 @@ class GceNetworkResource(resource.BaseResource):
   def _Exists(self) -> bool:
     """Returns True if the Network resource exists."""
     cmd = util.GcloudCommand(self, 'compute', 'networks', 'describe', self.name)
+    cmd.cacheable = True
     _, _, retcode = cmd.Issue(suppress_warning=True, raise_on_failure=False)
     return not retcode
 
@@ -36,6 +36,7 @@ import threading
 from typing import Dict, List, Optional, Tuple
 
 from absl import flags
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import custom_virtual_machine_spec
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
@@ -384,6 +385,52 @@ def GenerateAcceleratorSpecString(accelerator_type, accelerator_count):
       accelerator_count)
 
 
+def _DescribeInstances(keys):
+  """Describes instances with one command per project and zone.
+
+  Args:
+    keys: list of (project, zone, name) tuples of the instances.
+
+  Returns:
+    dict mapping the key of each instance that exists to its describe response.
+
+  Raises:
+    errors.VmUtil.IssueCommandError: If a command failed.
+  """
+  names_by_location = collections.defaultdict(list)
+  for project, zone, name in keys:
+    names_by_location[(project, zone)].append(name)
+  responses = {}
+  for (project, zone), names in names_by_location.items():
+    if len(names) == 1:
+      cmd = util.GcloudCommand(None, 'compute', 'instances', 'describe',
+                               names[0])
+    else:
+      cmd = util.GcloudCommand(None, 'compute', 'instances', 'list')
+      cmd.flags['filter'] = 'name=({0})'.format(' '.join(names))
+    if project:
+      cmd.flags['project'] = project
+    if zone:
+      cmd.flags['zone' if len(names) == 1 else 'zones'] = zone
+    stdout, stderr, retcode = cmd.Issue(suppress_warning=True,
+                                        raise_on_failure=False)
+    if retcode:
+      if len(names) == 1 and 'was not found' in stderr:
+        continue
+      raise errors.VmUtil.IssueCommandError(stderr)
+    if len(names) == 1:
+      responses[(project, zone, names[0])] = json.loads(stdout)
+      continue
+    for instance in json.loads(stdout):
+      responses[(project, zone, instance['name'])] = instance
+  return responses
+
+
+# Shared by the VMs created concurrently to describe themselves.
+_DESCRIBE_CACHE = coalescing_cache.CoalescingCache(
+    _DescribeInstances, max_batch_size=100)
+
+
 def GetArmArchitecture(machine_type):
   """Returns the specific ARM processor architecture of the VM."""
   # t2a-standard-1 -> t2a
@@ -820,14 +867,28 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
     """Returns whether the ID and IP addresses still need to be set."""
     return not self.id or not self.internal_ip or not self.ip_address
 
+  def _DescribeInstance(self):
+    """Returns the describe response of the VM, or None if it does not exist.
+
+    With --batch_vm_describe, concurrent calls from different VMs share a
+    single list command.
+
+    Raises:
+      errors.VmUtil.IssueCommandError: If the describe command failed.
+    """
+    key = (self.project, self.zone, self.name)
+    if FLAGS.batch_vm_describe:
+      return _DESCRIBE_CACHE.Get(key)
+    return _DescribeInstances([key]).get(key)
+
   @vm_util.Retry()
   def _PostCreate(self):
     """Get the instance's data."""
     if self._NeedsToParseDescribeResponse():
-      getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                           'describe', self.name)
-      stdout, _, _ = getinstance_cmd.Issue()
-      response = json.loads(stdout)
+      response = self._DescribeInstance()
+      if not response:
+        raise errors.Resource.RetryableCreationError(
+            'VM %s not found.' % self.name)
       self._ParseDescribeResponse(response)
     if not all((self.image, self.boot_disk_size, self.boot_disk_type)):
       getdisk_cmd = util.GcloudCommand(
@@ -866,13 +927,11 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True,
-                                         raise_on_failure=False)
     try:
-      response = json.loads(stdout)
-    except ValueError:
+      response = self._DescribeInstance()
+    except errors.VmUtil.IssueCommandError:
+      return False
+    if not response:
       return False
     try:
       # The VM may exist before we can fully parse the describe response for the
@@ -128,8 +128,6 @@ class GCPRelationalDb(relational_db.BaseRelationalDb):
     storage_size = self.spec.db_disk_spec.disk_size
     instance_zone = self.spec.db_spec.zone
 
-    authorized_network = self._GetAuthorizedNetworks([self.client_vm])
-
     database_version_string = self._GetEngineVersionString(
         self.spec.engine, self.spec.engine_version)
 
@@ -144,7 +142,6 @@ class GCPRelationalDb(relational_db.BaseRelationalDb):
         '--format=json',
         '--activation-policy=ALWAYS',
         '--assign-ip',
-        '--authorized-networks=%s' % authorized_network,
         '--zone=%s' % instance_zone,
         '--database-version=%s' % database_version_string,
         '--storage-size=%d' % storage_size,
@@ -384,7 +381,14 @@ class GCPRelationalDb(relational_db.BaseRelationalDb):
     super()._PostCreate()
     self.SetManagedDatabasePassword()
 
-    self.client_vm_query_tools.InstallPackages()
+  def _AuthorizeClientVms(self):
+    """Allows connections from the client VM, once it has an IP address."""
+    cmd = util.GcloudCommand(
+        self, 'sql', 'instances', 'patch', self.instance_id, '--quiet',
+        '--authorized-networks=%s' % self._GetAuthorizedNetworks(
+            [self.client_vm]))
+    _, stderr, retcode = cmd.Issue()
+    util.CheckGcloudResponseKnownFailures(stderr, retcode)
 
   def _ApplyDbFlags(self):
     cmd_string = [
@@ -20,8 +20,10 @@ import logging
 import re
 from typing import Set
 from absl import flags
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 import six
@@ -51,6 +53,13 @@ RATE_LIMITED_MAX_POLLING_INTERVAL = 200
 # This must be set. Otherwise, calling Issue() will fail in util_test.py.
 RATE_LIMITED_FUZZ = 0.5
 RATE_LIMITED_TIMEOUT = 1200
+
+# gcloud verbs that do not change resources. Any other command invalidates the
+# cached responses of its resource group.
+_READ_ONLY_VERBS = frozenset(['describe', 'list'])
+
+_RESPONSE_CACHE = coalescing_cache.ResponseCache('gcloud')
+
 STOCKOUT_MESSAGE = ('Creation failed due to insufficient capacity indicating a '
                     'potential stockout scenario.')
 
@@ -100,6 +109,7 @@ def GetAllZones() -> Set[str]:
   cmd.flags = {
       'format': 'value(name)',
   }
+  cmd.cacheable = True
   stdout, _, _ = cmd.Issue()
   return set(stdout.splitlines())
 
@@ -110,6 +120,7 @@ def GetAllRegions() -> Set[str]:
   cmd.flags = {
       'format': 'value(name)',
   }
+  cmd.cacheable = True
   stdout, _, _ = cmd.Issue()
   return set(stdout.splitlines())
 
@@ -121,6 +132,7 @@ def GetZonesInRegion(region) -> Set[str]:
       'filter': f"name~'{region}'",
       'format': 'value(name)',
   }
+  cmd.cacheable = True
   stdout, _, _ = cmd.Issue()
   return set(stdout.splitlines())
 
@@ -132,6 +144,7 @@ def GetZonesFromMachineType(machine_type: str) -> Set[str]:
       'filter': f"name~'{machine_type}'",
       'format': 'value(zone)'
   }
+  cmd.cacheable = True
   stdout, _, _ = cmd.Issue()
   return set(stdout.splitlines()) or GetAllZones()
 
@@ -231,6 +244,10 @@ class GcloudCommand(object):
         the end of the gcloud command (e.g. ['--metadata', 'color=red']).
     rate_limited: boolean. True if rate limited, False otherwise.
     use_alpha_gcloud: boolean. Defaults to False.
+    cacheable: boolean. True if Issue may return a cached response of a
+        read-only command issued within --response_cache_ttl seconds. Cached
+        responses are dropped when a command in the same resource group, e.g.
+        'compute firewall-rules', changes resources. Defaults to False.
   """
 
   def __init__(self, resource, *args):
@@ -248,6 +265,7 @@ class GcloudCommand(object):
     self._AddCommonFlags(resource)
     self.rate_limited = False
     self.use_alpha_gcloud = False
+    self.cacheable = False
 
   def GetCommand(self):
     """Generates the gcloud command.
@@ -313,6 +331,17 @@ class GcloudCommand(object):
       IssueCommandError: if command fails without Rate Limit Exceeded.
 
     """
+    self._InvalidateCachedResponses()
+    if self.cacheable and self._GetResourceGroup() is not None:
+      key = (self._GetResourceGroup(), tuple(self.GetCommand()),
+             tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+      return _RESPONSE_CACHE.Get(
+          key, functools.partial(self._IssueOnce, **kwargs),
+          should_cache=lambda response: not response[2])
+    return self._IssueOnce(**kwargs)
+
+  def _IssueOnce(self, **kwargs):
+    """Runs the gcloud command once. See Issue."""
     try:
       stdout, stderr, retcode = _issue_command_function(self, **kwargs)
     except errors.VmUtil.IssueCommandError as error:
@@ -339,6 +368,7 @@ class GcloudCommand(object):
       retry_on_rate_limited is set to false
     """
     self.rate_limited = True
+    events.rate_limited.send(self)
     if FLAGS.retry_on_rate_limited:
       raise errors.Benchmarks.QuotaFailure.RateLimitExceededError(error)
     raise errors.Benchmarks.QuotaFailure(error)
@@ -353,8 +383,23 @@ class GcloudCommand(object):
     Returns:
       (stdout, stderr) pair of strings from running the gcloud command.
     """
+    self._InvalidateCachedResponses()
     return _issue_retryable_command_function(self, **kwargs)
 
+  def _GetResourceGroup(self):
+    """Returns the args before the read-only verb, or None if it has none."""
+    for i, arg in enumerate(self.args):
+      if arg in _READ_ONLY_VERBS:
+        return tuple(self.args[:i])
+    return None
+
+  def _InvalidateCachedResponses(self):
+    """Drops cached responses that this command may make stale."""
+    if self._GetResourceGroup() is not None:
+      return
+    args = tuple(self.args)
+    _RESPONSE_CACHE.Invalidate(lambda key: args[:len(key[0])] == key[0])
+
   def _AddCommonFlags(self, resource):
     """Adds common flags to the command.
 
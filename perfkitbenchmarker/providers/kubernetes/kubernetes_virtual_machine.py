@@ -408,7 +408,8 @@ class DebianBasedKubernetesVirtualMachine(KubernetesVirtualMachine,
       raise errors.VirtualMachine.RemoteCommandError(error_text)
     return stdout, stderr, retcode
 
-  def MoveHostFile(self, target, source_path, remote_path=''):
+  def MoveHostFile(self, target, source_path, remote_path='',
+                   use_internal_ip=False):
     """Copies a file from one VM to a target VM.
 
     Args:
@@ -416,7 +417,9 @@ class DebianBasedKubernetesVirtualMachine(KubernetesVirtualMachine,
       source_path: The location of the file on the REMOTE machine.
       remote_path: The destination of the file on the TARGET machine, default is
         the home directory.
+      use_internal_ip: Unused. The file is copied through the runner.
     """
+    del use_internal_ip
     file_name = vm_util.PrependTempDir(posixpath.basename(source_path))
     self.RemoteHostCopy(file_name, source_path, copy_to=False)
     target.RemoteHostCopy(file_name, remote_path)
@@ -28,17 +28,22 @@ import json
 import logging
 import math
 import operator
+import os
 import pprint
+import shutil
 import sys
+import tempfile
 import time
 from typing import List
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import log_util
 from perfkitbenchmarker import sample as pkb_sample
+from perfkitbenchmarker import temp_dir
 from perfkitbenchmarker import version
 from perfkitbenchmarker import vm_util
 import pytz
@@ -46,6 +51,13 @@ import six
 from six.moves import urllib
 import six.moves.http_client as httplib
 
+try:
+  import pyarrow
+  from pyarrow import parquet
+except ImportError:
+  pyarrow = None
+  parquet = None
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_string(
@@ -83,7 +95,14 @@ flags.DEFINE_boolean(
 flags.DEFINE_string(
     'csv_path',
     None,
-    'A path to write CSV-format results')
+    'A path to write CSV-format results. The file has a single header row, '
+    'so it is rewritten whenever samples bring metadata keys it has no '
+    'column for yet.')
+flags.DEFINE_string(
+    'parquet_path',
+    None,
+    'A directory to write results to as Parquet files, one per publish, with '
+    'a typed column per sample metadata key. Requires pyarrow.')
 
 flags.DEFINE_string(
     'bigquery_table',
@@ -145,9 +164,33 @@ flags.DEFINE_boolean(
     'record_log_publisher', True,
     'Whether to use the log publisher or not.')
 
+PUBLISH_BATCH_SIZE = flags.DEFINE_integer(
+    'publish_batch_size', None,
+    'If set, samples are published in batches of at most this many samples as '
+    'they are collected, rather than held in memory until the end of the '
+    'benchmark. Unpublished samples are spooled to disk under --temp_dir and '
+    'republished by the next PKB run if this one exits before publishing '
+    'them.', lower_bound=1)
+
 DEFAULT_JSON_OUTPUT_NAME = 'perfkitbenchmarker_results.json'
 DEFAULT_CREDENTIALS_JSON = 'credentials.json'
 GCS_OBJECT_NAME_LENGTH = 20
+# Suffix of files holding samples spooled by a streaming SampleCollector.
+_SPOOL_SUFFIX = '.jsonl'
+_PARQUET_SUFFIX = '.parquet'
+# Prefix of the Parquet columns holding sample metadata.
+_PARQUET_METADATA_PREFIX = 'metadata.'
+# Parquet field metadata marking columns of JSON encoded values.
+_PARQUET_JSON_FIELD = b'pkb_json'
+# File holding the schema shared by the Parquet files of a directory.
+_PARQUET_COMMON_METADATA = '_common_metadata'
+# File locked while a Parquet file and the shared schema are written.
+_PARQUET_LOCK = '.lock'
+# Sample fields stored in typed Parquet columns.
+_PARQUET_FLOAT_FIELDS = frozenset(['value', 'timestamp'])
+_PARQUET_BOOL_FIELDS = frozenset(['official'])
+_PARQUET_STRING_FIELDS = frozenset(['metric', 'unit', 'test', 'owner',
+                                    'run_uri', 'sample_uri', 'product_name'])
 
 # A list of SamplePublishers that can be extended to add support for publishing
 # types beyond those in this module. The classes should not require any
@@ -298,7 +341,16 @@ class CSVPublisher(SamplePublisher):
   """Publisher which writes results in CSV format to a specified path.
 
   The default field names are written first, followed by all unique metadata
-  keys found in the data.
+  keys found in the data. Samples are appended to the file, which is locked
+  while writing so that collectors in several processes can share it.
+
+  The file has a single header row, so when samples bring metadata keys that
+  it has no column for, the rows written so far are rewritten under the
+  extended header. Each such rewrite costs a pass over the file, streamed
+  through a temporary file; publishing samples whose metadata keys already
+  have columns only appends. Benchmarks usually add their metadata keys in
+  their first batch, so the file is rewritten about once per benchmark rather
+  than once per batch.
   """
 
   _DEFAULT_FIELDS = ('timestamp', 'test', 'metric', 'value', 'unit',
@@ -312,20 +364,316 @@ class CSVPublisher(SamplePublisher):
   def PublishSamples(self, samples):
     samples = list(samples)
     # Union of all metadata keys.
-    meta_keys = sorted(
-        set(key for sample in samples for key in sample['metadata']))
+    meta_keys = set(key for sample in samples for key in sample['metadata'])
 
     logging.info('Writing CSV results to %s', self._path)
-    with open(self._path, 'w') as fp:
-      writer = csv.DictWriter(fp, list(self._DEFAULT_FIELDS) + meta_keys)
-      writer.writeheader()
-
+    with open(self._path, 'a+') as fp:
+      fcntl.flock(fp, fcntl.LOCK_EX)
+      fp.seek(0)
+      reader = csv.DictReader(fp)
+      written_fields = reader.fieldnames
+      written_meta_keys = set(
+          (written_fields or self._DEFAULT_FIELDS)[len(self._DEFAULT_FIELDS):])
+      fieldnames = list(self._DEFAULT_FIELDS) + sorted(written_meta_keys |
+                                                       meta_keys)
+      if not written_fields:
+        fp.truncate(0)
+        csv.DictWriter(fp, fieldnames).writeheader()
+      elif not meta_keys <= written_meta_keys:
+        self._RewriteWithHeader(fp, reader, fieldnames)
+      fp.seek(0, os.SEEK_END)
+
+      writer = csv.DictWriter(fp, fieldnames)
       for sample in samples:
         d = {}
         d.update(sample)
         d.update(d.pop('metadata'))
         writer.writerow(d)
 
+  def _RewriteWithHeader(self, fp, reader, fieldnames):
+    """Rewrites the rows of the locked file under a new header.
+
+    The rows are copied through a temporary file and back into the same file,
+    rather than renamed over it, so that the lock stays on the file other
+    processes open.
+
+    Args:
+      fp: The locked CSV file.
+      reader: csv.DictReader positioned after the header of fp.
+      fieldnames: list of the new field names, a superset of the old ones.
+    """
+    logging.info('Rewriting %s to add metadata columns', self._path)
+    with tempfile.TemporaryFile('w+', newline='') as tmp:
+      writer = csv.DictWriter(tmp, fieldnames)
+      writer.writeheader()
+      writer.writerows(reader)
+      tmp.seek(0)
+      fp.seek(0)
+      fp.truncate()
+      shutil.copyfileobj(tmp, fp)
+
+
+def _JsonArrowField(name):
+  """Returns the Arrow field of a column of JSON encoded values."""
+  return pyarrow.field(name, pyarrow.string(),
+                       metadata={_PARQUET_JSON_FIELD: b'1'})
+
+
+def _IsJsonArrowField(field):
+  return bool(field.metadata and field.metadata.get(_PARQUET_JSON_FIELD))
+
+
+def _PromoteArrowFields(field, other):
+  """Returns the Arrow field that can hold the values of both fields.
+
+  Nulls take the type of the other field, integers are promoted to floats, and
+  any other mix of types to JSON encoded strings.
+
+  Args:
+    field: pyarrow.Field or None.
+    other: pyarrow.Field with the same name.
+
+  Returns:
+    pyarrow.Field.
+  """
+  if field is None or pyarrow.types.is_null(field.type):
+    return other
+  if pyarrow.types.is_null(other.type) or field.equals(other,
+                                                       check_metadata=True):
+    return field
+  if not _IsJsonArrowField(field) and not _IsJsonArrowField(other):
+    types = {field.type, other.type}
+    if types == {pyarrow.int64(), pyarrow.float64()}:
+      return pyarrow.field(field.name, pyarrow.float64())
+  return _JsonArrowField(field.name)
+
+
+def _InferArrowField(name, values):
+  """Returns the Arrow field for the values of one sample field.
+
+  The known sample fields have fixed types. Other values are stored as bool,
+  int64, float64 or string when all of them have that type, and as JSON
+  encoded strings otherwise.
+
+  Args:
+    name: string. Name of the column.
+    values: list of the values for each sample.
+
+  Returns:
+    pyarrow.Field.
+  """
+  if name in _PARQUET_FLOAT_FIELDS:
+    arrow_type = pyarrow.float64()
+  elif name in _PARQUET_BOOL_FIELDS:
+    arrow_type = pyarrow.bool_()
+  elif name in _PARQUET_STRING_FIELDS:
+    arrow_type = pyarrow.string()
+  else:
+    field = pyarrow.field(name, pyarrow.null())
+    for value in values:
+      if value is None:
+        continue
+      if isinstance(value, bool):
+        arrow_type = pyarrow.bool_()
+      elif isinstance(value, int):
+        arrow_type = pyarrow.int64()
+      elif isinstance(value, float):
+        arrow_type = pyarrow.float64()
+      elif isinstance(value, str):
+        arrow_type = pyarrow.string()
+      else:
+        return _JsonArrowField(name)
+      field = _PromoteArrowFields(field, pyarrow.field(name, arrow_type))
+    return field
+  try:
+    pyarrow.array(values, arrow_type)
+  except (TypeError, pyarrow.ArrowException):
+    return _JsonArrowField(name)
+  return pyarrow.field(name, arrow_type)
+
+
+def _ToArrowArray(field, values):
+  """Converts the values of one sample field to an Arrow array of the field."""
+  if _IsJsonArrowField(field):
+    values = [None if value is None else json.dumps(value) for value in values]
+  return pyarrow.array(values, field.type)
+
+
+def _MergeArrowSchemas(schema, fields):
+  """Returns the schema with the fields added or promoted.
+
+  Sample fields come first, then metadata columns in sorted order.
+
+  Args:
+    schema: pyarrow.Schema.
+    fields: iterable of pyarrow.Field.
+
+  Returns:
+    pyarrow.Schema.
+  """
+  merged = {field.name: field for field in schema}
+  for field in fields:
+    merged[field.name] = _PromoteArrowFields(merged.get(field.name), field)
+  names = sorted(
+      merged, key=lambda name: (name.startswith(_PARQUET_METADATA_PREFIX),
+                                name))
+  return pyarrow.schema([merged[name] for name in names])
+
+
+class ParquetPublisher(SamplePublisher):
+  """Publishes samples to a directory of Parquet files.
+
+  Each call to PublishSamples adds one file, holding one row group, so samples
+  published per benchmark or per batch are appended without rewriting earlier
+  files. Sample fields and metadata keys, prefixed with 'metadata.', are
+  stored in typed columns. The directory's _common_metadata file holds the
+  schema of all its files, with a type per column that is promoted when later
+  samples need it, e.g. from int64 to float64, or to JSON encoded strings for
+  mixed or nested values. Each file is written with that schema, and files
+  written before a column was added or promoted are read with it, e.g.
+  pyarrow.parquet.read_table(path, schema=...). String columns are dictionary
+  encoded. The files can be read back with ReadParquetSamples.
+
+  Attributes:
+    path: string. Directory to write the Parquet files to.
+  """
+
+  def __init__(self, path):
+    super().__init__()
+    if pyarrow is None:
+      raise errors.Setup.PythonPackageRequirementUnfulfilled(
+          'Publishing to Parquet requires the pyarrow package.')
+    self.path = path
+    self._last_millis = 0
+    self._sequence = 0
+
+  def __repr__(self):
+    return '<{0} path="{1}">'.format(type(self).__name__, self.path)
+
+  def PublishSamples(self, samples):
+    if not samples:
+      return
+    columns = collections.defaultdict(lambda: [None] * len(samples))
+    for i, sample in enumerate(samples):
+      for key, value in sample.items():
+        if key != 'metadata':
+          columns[key][i] = value
+      for key, value in sample.get('metadata', {}).items():
+        columns[_PARQUET_METADATA_PREFIX + key][i] = value
+
+    os.makedirs(self.path, exist_ok=True)
+    # Publishers in other processes may share the directory, so the schema
+    # is re-read and extended under a lock.
+    with open(os.path.join(self.path, _PARQUET_LOCK), 'w') as lock_file:
+      fcntl.flock(lock_file, fcntl.LOCK_EX)
+      schema_path = os.path.join(self.path, _PARQUET_COMMON_METADATA)
+      schema = (parquet.read_schema(schema_path)
+                if os.path.exists(schema_path) else pyarrow.schema([]))
+      merged_schema = _MergeArrowSchemas(
+          schema, [_InferArrowField(name, values)
+                   for name, values in columns.items()])
+      if not merged_schema.equals(schema, check_metadata=True):
+        parquet.write_metadata(merged_schema, schema_path + '.tmp')
+        os.rename(schema_path + '.tmp', schema_path)
+      table = pyarrow.Table.from_arrays(
+          [_ToArrowArray(field, columns.get(field.name, [None] * len(samples)))
+           for field in merged_schema], schema=merged_schema)
+
+      # Names sort in publish order: the timestamp never goes back and the
+      # sequence number orders files written in the same millisecond. The
+      # random suffix keeps names of publishers in other processes unique.
+      # Write under a temporary name so readers never see a partial file.
+      self._last_millis = max(self._last_millis, int(time.time() * 1000))
+      self._sequence += 1
+      file_path = os.path.join(
+          self.path, '{0:015d}-{1:06d}-{2}{3}'.format(
+              self._last_millis, self._sequence, uuid.uuid4().hex[:8],
+              _PARQUET_SUFFIX))
+      logging.info('Publishing %d samples to %s', len(samples), file_path)
+      parquet.write_table(table, file_path + '.tmp')
+      os.rename(file_path + '.tmp', file_path)
+
+
+def _ArrowColumnToList(column):
+  """Converts an Arrow column to a list of Python values, None for nulls.
+
+  Faster than ChunkedArray.to_pylist for dictionary encoded and numeric
+  columns, which convert each element through a Python scalar object.
+
+  Args:
+    column: pyarrow.ChunkedArray.
+
+  Returns:
+    list of the column's values.
+  """
+  values = []
+  for chunk in column.chunks:
+    if pyarrow.types.is_dictionary(chunk.type):
+      dictionary = chunk.dictionary.to_pylist()
+      indices = chunk.indices.fill_null(-1).to_numpy().tolist()
+      values.extend(None if index < 0 else dictionary[index]
+                    for index in indices)
+    elif chunk.null_count or not (pyarrow.types.is_integer(chunk.type) or
+                                  pyarrow.types.is_floating(chunk.type) or
+                                  pyarrow.types.is_boolean(chunk.type)):
+      values.extend(chunk.to_pylist())
+    else:
+      values.extend(chunk.to_numpy(zero_copy_only=False).tolist())
+  return values
+
+
+def ReadParquetSamples(path):
+  """Reads samples written by ParquetPublisher.
+
+  Every file is read with the schema of all files, so columns added after a
+  file was written read as missing values. Columns keep the type they have in
+  the file, so that values written before a column was promoted are returned
+  unchanged.
+
+  Args:
+    path: string. A directory written by ParquetPublisher or one of its files.
+
+  Returns:
+    A list of sample dicts, in the order they were published.
+  """
+  if pyarrow is None:
+    raise errors.Setup.PythonPackageRequirementUnfulfilled(
+        'Reading Parquet samples requires the pyarrow package.')
+  if os.path.isdir(path):
+    paths = [os.path.join(path, filename)
+             for filename in sorted(os.listdir(path))
+             if filename.endswith(_PARQUET_SUFFIX)]
+  else:
+    paths = [path]
+  file_schemas = [parquet.read_schema(file_path) for file_path in paths]
+  schema = pyarrow.schema([])
+  for file_schema in file_schemas:
+    schema = _MergeArrowSchemas(schema, file_schema)
+  samples = []
+  for file_path, file_schema in zip(paths, file_schemas):
+    table = parquet.read_table(file_path, schema=pyarrow.schema([
+        file_schema.field(field.name)
+        if field.name in file_schema.names else field for field in schema]))
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+      values = _ArrowColumnToList(column)
+      if _IsJsonArrowField(field):
+        values = [None if value is None else json.loads(value)
+                  for value in values]
+      columns.append((field.name, values))
+    sample_columns = [(name, values) for name, values in columns
+                      if not name.startswith(_PARQUET_METADATA_PREFIX)]
+    metadata_columns = [(name[len(_PARQUET_METADATA_PREFIX):], values)
+                        for name, values in columns
+                        if name.startswith(_PARQUET_METADATA_PREFIX)]
+    for i in range(table.num_rows):
+      sample = {name: values[i] for name, values in sample_columns
+                if values[i] is not None}
+      sample['metadata'] = {name: values[i] for name, values in metadata_columns
+                            if values[i] is not None}
+      samples.append(sample)
+  return samples
+
 
 class PrettyPrintStreamPublisher(SamplePublisher):
   """Writes samples to an output stream, defaulting to stdout.
@@ -477,6 +825,22 @@ class LogPublisher(SamplePublisher):
 
 
 # TODO: Extract a function to write delimited JSON to a stream.
+def TruncateResultFiles():
+  """Truncates the result files that SampleCollectors append to.
+
+  SampleCollectors append to the CSV and JSON result files, because the
+  collectors of every benchmark and --run_processes process of a run share
+  them. PKB calls this once per invocation, before publishing any samples.
+  The JSON files are only truncated with --json_write_mode=w.
+  """
+  paths = [FLAGS.csv_path]
+  if FLAGS.json_write_mode == 'w':
+    paths += [vm_util.PrependTempDir(DEFAULT_JSON_OUTPUT_NAME), FLAGS.json_path]
+  for path in paths:
+    if path:
+      open(path, 'w').close()
+
+
 class NewlineDelimitedJSONPublisher(SamplePublisher):
   """Publishes samples to a file as newline delimited JSON.
 
@@ -488,7 +852,8 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
 
   Attributes:
     file_path: string. Destination path to write samples.
-    mode: Open mode for 'file_path'. Set to 'a' to append.
+    mode: Open mode for 'file_path'. Set to 'a' to append. Only applies to the
+      first call to PublishSamples; later calls always append.
     collapse_labels: boolean. If true, collapse sample metadata.
   """
 
@@ -512,6 +877,7 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
         if self.collapse_labels:
           sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
         fp.write(json.dumps(sample) + '\n')
+    self.mode = self.mode.replace('w', 'a')
 
 
 class BigQueryPublisher(SamplePublisher):
@@ -898,11 +1264,23 @@ class SampleCollector(object):
       PrettyPrintStreamPublisher, and NewlineDelimitedJSONPublisher targeting
       the run directory to the publishers list.
     run_uri: A unique tag for the run.
+    publish_batch_size: If set, samples are published in batches of at most
+      this many samples as they are added, and spooled to disk until they are
+      published. Defaults to --publish_batch_size.
+    spool_dir: Directory to spool unpublished samples to. Defaults to a
+      directory under --temp_dir shared by all runs.
   """
 
   def __init__(self, metadata_providers=None, publishers=None,
-               publishers_from_flags=True, add_default_publishers=True):
+               publishers_from_flags=True, add_default_publishers=True,
+               publish_batch_size=None, spool_dir=None):
     self.samples: List[pkb_sample.SampleDict] = []
+    self.publish_batch_size = (
+        publish_batch_size if publish_batch_size is not None else
+        PUBLISH_BATCH_SIZE.value)
+    self.spool_dir = spool_dir
+    self._spool_file = None
+    self._spool_path = None
 
     if metadata_providers is not None:
       self.metadata_providers = metadata_providers
@@ -928,11 +1306,12 @@ class SampleCollector(object):
     publishers.append(PrettyPrintStreamPublisher())
 
     # Publish to the default JSON path even if we will also publish to a
-    # different path due to flags.
+    # different path due to flags. Like the JSON file from flags, it is
+    # truncated by TruncateResultFiles, so collectors always append.
     default_json_path = vm_util.PrependTempDir(DEFAULT_JSON_OUTPUT_NAME)
     publishers.append(NewlineDelimitedJSONPublisher(
         default_json_path,
-        mode=FLAGS.json_write_mode,
+        mode='a',
         collapse_labels=FLAGS.collapse_labels))
 
     return publishers
@@ -944,7 +1323,7 @@ class SampleCollector(object):
     if FLAGS.json_path:
       publishers.append(NewlineDelimitedJSONPublisher(
           FLAGS.json_path,
-          mode=FLAGS.json_write_mode,
+          mode='a',
           collapse_labels=FLAGS.collapse_labels))
 
     if FLAGS.bigquery_table:
@@ -970,6 +1349,8 @@ class SampleCollector(object):
                                 gsutil_path=FLAGS.gsutil_path))
     if FLAGS.csv_path:
       publishers.append(CSVPublisher(FLAGS.csv_path))
+    if FLAGS.parquet_path:
+      publishers.append(ParquetPublisher(FLAGS.parquet_path))
 
     if FLAGS.es_uri:
       publishers.append(ElasticsearchPublisher(es_uri=FLAGS.es_uri,
@@ -1003,33 +1384,127 @@ class SampleCollector(object):
       sample['owner'] = FLAGS.owner
       sample['run_uri'] = benchmark_spec.uuid
       sample['sample_uri'] = str(uuid.uuid4())
+      if self.publish_batch_size:
+        self._SpoolSample(sample)
       self.samples.append(sample)
+      if (self.publish_batch_size and
+          len(self.samples) >= self.publish_batch_size):
+        self.PublishSamples()
+
+  def _PublishInBatches(self, samples):
+    """Publishes samples, at most publish_batch_size at a time."""
+    batch_size = self.publish_batch_size or len(samples)
+    for start in range(0, len(samples), batch_size):
+      batch = samples[start:start + batch_size]
+      for publisher in self.publishers:
+        publisher.PublishSamples(batch)
 
   def PublishSamples(self):
     """Publish samples via all registered publishers."""
     if not self.samples:
       logging.warning('No samples to publish.')
       return
-    for publisher in self.publishers:
-      publisher.PublishSamples(self.samples)
+    self._PublishInBatches(self.samples)
     self.samples = []
+    self._RemoveSpoolFile()
+
+  def _SpoolSample(self, sample):
+    """Writes a sample to this collector's spool file before it is published.
+
+    The spool file stays locked while this collector owns it, so that
+    RepublishSpooledSamples in another process only picks up spool files of
+    collectors that exited without publishing.
+
+    Args:
+      sample: SampleDict. The annotated sample.
+    """
+    if self._spool_file is None:
+      spool_dir = self._GetSpoolDir()
+      os.makedirs(spool_dir, exist_ok=True)
+      self._spool_path = os.path.join(spool_dir,
+                                      str(uuid.uuid4()) + _SPOOL_SUFFIX)
+      # Lock before giving the file the name other processes look for.
+      spool_file = open(self._spool_path + '.tmp', 'w')
+      fcntl.flock(spool_file, fcntl.LOCK_EX)
+      os.rename(spool_file.name, self._spool_path)
+      self._spool_file = spool_file
+    self._spool_file.write(json.dumps(sample) + '\n')
+    self._spool_file.flush()
+
+  def _RemoveSpoolFile(self):
+    """Removes the spool file once all its samples have been published."""
+    if self._spool_file is None:
+      return
+    os.remove(self._spool_path)
+    self._spool_file.close()
+    self._spool_file = None
+    self._spool_path = None
+
+  def _GetSpoolDir(self):
+    return self.spool_dir or temp_dir.GetSampleSpoolDirPath()
+
+  def RepublishSpooledSamples(self):
+    """Publishes samples spooled by collectors that exited before publishing.
+
+    Samples are published at least once: a collector that exited while
+    publishing a batch may have published part of it already.
+
+    Returns:
+      The number of samples republished.
+    """
+    spool_dir = self._GetSpoolDir()
+    if not os.path.isdir(spool_dir):
+      return 0
+    republished = 0
+    for filename in sorted(os.listdir(spool_dir)):
+      if not filename.endswith(_SPOOL_SUFFIX):
+        continue
+      path = os.path.join(spool_dir, filename)
+      try:
+        fp = open(path)
+      except FileNotFoundError:
+        continue  # Published and removed by its collector.
+      with fp:
+        try:
+          fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+          continue  # Still owned by a running collector.
+        if not os.fstat(fp.fileno()).st_nlink:
+          continue  # Removed by its collector while we were opening it.
+        samples = []
+        for line in fp:
+          try:
+            samples.append(json.loads(line))
+          except ValueError:
+            logging.warning('Skipping partially written sample in %s', path)
+        logging.info('Republishing %d spooled samples from %s', len(samples),
+                     path)
+        if samples:
+          self._PublishInBatches(samples)
+        os.remove(path)
+        republished += len(samples)
+    return republished
 
 
 def RepublishJSONSamples(path):
   """Read samples from a JSON file and re-export them.
 
   Args:
-    path: the path to the JSON file.
+    path: the path to the JSON file, or to Parquet samples written by
+      ParquetPublisher.
   """
 
-  with open(path, 'r') as file:
-    samples = [json.loads(s) for s in file if s]
-  for sample in samples:
-    # Chop '|' at the beginning and end of labels and split labels by '|,|'
-    fields = sample.pop('labels')[1:-1].split('|,|')
-    # Turn the fields into [[key, value], ...]
-    key_values = [field.split(':', 1) for field in fields]
-    sample['metadata'] = {k: v for k, v in key_values}
+  if os.path.isdir(path) or path.endswith(_PARQUET_SUFFIX):
+    samples = ReadParquetSamples(path)
+  else:
+    with open(path, 'r') as file:
+      samples = [json.loads(s) for s in file if s]
+    for sample in samples:
+      # Chop '|' at the beginning and end of labels and split labels by '|,|'
+      fields = sample.pop('labels')[1:-1].split('|,|')
+      # Turn the fields into [[key, value], ...]
+      key_values = [field.split(':', 1) for field in fields]
+      sample['metadata'] = {k: v for k, v in key_values}
 
   # We can't use a SampleCollector because SampleCollector.AddSamples depends on
   # having a benchmark and a benchmark_spec.
@@ -1045,12 +1520,13 @@ if __name__ == '__main__':
     argv = FLAGS(sys.argv)
   except flags.Error as e:
     logging.error(e)
-    logging.info('Flag error. Usage: publisher.py <flags> path-to-json-file')
+    logging.info('Flag error. Usage: publisher.py <flags> '
+                 'path-to-json-or-parquet-samples')
     sys.exit(1)
 
   if len(argv) != 2:
     logging.info('Argument number error. Usage: publisher.py <flags> '
-                 'path-to-json-file')
+                 'path-to-json-or-parquet-samples')
     sys.exit(1)
 
   json_path = argv[1]
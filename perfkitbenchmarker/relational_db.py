@@ -382,6 +382,22 @@ class BaseRelationalDb(resource.BaseResource):
     if self.spec.db_flags:
       self._ApplyDbFlags()
 
+  def SetupClientVms(self):
+    """Lets the client VM connect to the database and installs its tools.
+
+    Called once both the database and the client VM are ready, so that a
+    managed database can be created while the VMs are still provisioning.
+    """
+    self._AuthorizeClientVms()
+    self.client_vm_query_tools.InstallPackages()
+
+  def _AuthorizeClientVms(self):
+    """Allows the client VM to connect to the database.
+
+    Child classes whose databases only accept known clients should override
+    this.
+    """
+
   def _ApplyDbFlags(self):
     """Apply Flags on the database."""
     raise NotImplementedError('Managed Db flags is not supported for %s' %
@@ -19,18 +19,360 @@ and checks for resource existence so that resources can be created and deleted
 reliably.
 """
 import abc
+import collections
+import contextlib
 import logging
+import threading
 import time
 from typing import List
 
 from absl import flags
+from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
 FLAGS = flags.FLAGS
 
+AUTO = 'auto'
+POLL = 'poll'
+BACKOFF = 'backoff'
+
+flags.DEFINE_enum(
+    'resource_readiness_watcher', AUTO, [AUTO, POLL, BACKOFF],
+    'How to wait for resources to become ready. "poll" checks every '
+    'POLL_INTERVAL seconds of the resource. "backoff" checks with '
+    'exponentially growing intervals, then every second once the resource '
+    'is expected to be ready based on earlier resources of the same type. '
+    '"auto" waits on the cloud operation, or checks all resources of a type '
+    'waiting at the same time with one batched call, when the resource type '
+    'supports it, and polls otherwise.')
+flags.DEFINE_boolean(
+    'per_resource_readiness_samples', False,
+    'Whether to report the readiness samples of every resource, in addition '
+    'to the median and maximum per resource type.')
+
 _RESOURCE_REGISTRY = {}
 
+# Per-resource readiness metrics reported as a median and maximum per type.
+_READINESS_METRICS = ('Time to Ready', 'Resource CLI Calls',
+                      'Readiness Detection Latency')
+
+# Counts commands issued by the current thread while a resource is created.
+_command_counts = threading.local()
+
+
+def _OnCommandIssued(sender, **kwargs):
+  del sender, kwargs
+  counter = getattr(_command_counts, 'counter', None)
+  if counter is not None:
+    counter[0] += 1
+
+
+events.command_issued.connect(_OnCommandIssued, weak=False)
+
+
+@contextlib.contextmanager
+def _CountCommands():
+  """Counts the commands issued by this thread in the enclosed block.
+
+  Counts also add to the count of any enclosing block.
+
+  Yields:
+    A single element list holding the count.
+  """
+  outer_counter = getattr(_command_counts, 'counter', None)
+  counter = [0]
+  _command_counts.counter = counter
+  try:
+    yield counter
+  finally:
+    _command_counts.counter = outer_counter
+    if outer_counter is not None:
+      outer_counter[0] += counter[0]
+
+
+def _GetDeadline(timeout):
+  """Returns when a wait with the vm_util.Retry style timeout should end."""
+  if timeout is None:
+    timeout = FLAGS.default_timeout
+  return time.time() + timeout if timeout >= 0 else float('inf')
+
+
+class BaseReadinessWatcher(object):
+  """Waits for resources to become ready or be deleted.
+
+  Subclasses choose when to check the resource, and may check in other ways
+  than calling _IsReady on the resource.
+  """
+
+  NAME = None
+
+  def WaitUntilReady(self, resource, timeout):
+    """Blocks until the resource is ready.
+
+    Args:
+      resource: BaseResource that is being created.
+      timeout: The timeout in seconds in the style of vm_util.Retry.
+
+    Raises:
+      errors.Resource.RetryableCreationError: If the resource is not ready in
+          time.
+    """
+    # pylint: disable=protected-access
+    if not self._Poll(resource, resource._CheckReadiness, timeout):
+      raise errors.Resource.RetryableCreationError('Not yet ready')
+
+  def WaitUntilDeleted(self, resource, timeout):
+    """Blocks until the resource is no longer being deleted.
+
+    Args:
+      resource: BaseResource that is being deleted.
+      timeout: The timeout in seconds in the style of vm_util.Retry.
+
+    Raises:
+      errors.Resource.RetryableDeletionError: If the resource is still being
+          deleted when the timeout expires.
+    """
+    # pylint: disable=protected-access
+    if not self._Poll(resource, lambda: not resource._IsDeleting(), timeout):
+      raise errors.Resource.RetryableDeletionError('Not yet deleted')
+
+  def _GetSleepTime(self, resource, tries, elapsed):
+    """Returns how long to wait after the given number of failed checks."""
+    del tries, elapsed
+    return resource.POLL_INTERVAL
+
+  def _Poll(self, resource, check, timeout):
+    """Calls check until it returns True.
+
+    Returns:
+      True if check returned True, False if the timeout expired first.
+    """
+    deadline = _GetDeadline(timeout)
+    start_time = time.time()
+    tries = 0
+    while True:
+      tries += 1
+      if check():
+        return True
+      sleep_time = self._GetSleepTime(resource, tries, time.time() - start_time)
+      if time.time() + sleep_time >= deadline:
+        return False
+      time.sleep(sleep_time)
+
+
+class PollingReadinessWatcher(BaseReadinessWatcher):
+  """Checks the resource every POLL_INTERVAL seconds."""
+
+  NAME = POLL
+
+
+class BackoffReadinessWatcher(BaseReadinessWatcher):
+  """Checks with exponential backoff, then tightly near the expected time.
+
+  Checks after 1, 2, 4, ... seconds up to POLL_INTERVAL of the resource apart
+  until the resource has been waited on for tight_fraction of the time earlier
+  resources of the same type took to become ready, and every tight_interval
+  seconds from then on. With no earlier resources of the type, this is plain
+  exponential backoff.
+  """
+
+  NAME = BACKOFF
+
+  # Resource type name to the average seconds its resources took to be ready.
+  _expected_ready_seconds = {}
+  _lock = threading.Lock()
+
+  def __init__(self, initial_interval=1, tight_interval=1,
+               tight_fraction=0.8):
+    self.initial_interval = initial_interval
+    self.tight_interval = tight_interval
+    self.tight_fraction = tight_fraction
+
+  def _GetSleepTime(self, resource, tries, elapsed):
+    interval = min(self.initial_interval * 2**(tries - 1),
+                   max(resource.POLL_INTERVAL, self.initial_interval))
+    expected = self._expected_ready_seconds.get(type(resource).__name__)
+    if expected is None:
+      return interval
+    tight_start = expected * self.tight_fraction
+    if elapsed >= tight_start:
+      return self.tight_interval
+    return max(min(interval, tight_start - elapsed), self.tight_interval)
+
+  def WaitUntilReady(self, resource, timeout):
+    start_time = time.time()
+    # pylint: disable=protected-access
+    if self._Poll(resource, resource._CheckReadiness, timeout):
+      with self._lock:
+        name = type(resource).__name__
+        seconds = time.time() - start_time
+        previous = self._expected_ready_seconds.get(name)
+        self._expected_ready_seconds[name] = (
+            seconds if previous is None else (previous + seconds) / 2)
+      return
+    raise errors.Resource.RetryableCreationError('Not yet ready')
+
+
+class OperationReadinessWatcher(PollingReadinessWatcher):
+  """Blocks on the cloud operation that reports the resource ready.
+
+  Uses the resource's _WaitForReadyOperation, e.g. an AWS CLI waiter or
+  "gcloud ... operations wait", so readiness is detected when the cloud reports
+  it instead of at a poll boundary. The resource is then checked once, and
+  polled if it is still not ready.
+  """
+
+  NAME = 'operation'
+
+  def WaitUntilReady(self, resource, timeout):
+    deadline = _GetDeadline(timeout)
+    try:
+      # pylint: disable=protected-access
+      resource._WaitForReadyOperation(
+          None if deadline == float('inf') else deadline - time.time())
+    except (errors.VmUtil.IssueCommandError,
+            errors.VmUtil.IssueCommandTimeoutError) as e:
+      logging.info('Waiting for the operation creating %s failed, polling '
+                   'instead: %s', type(resource).__name__, e)
+    super(OperationReadinessWatcher, self).WaitUntilReady(
+        resource, max(deadline - time.time(), 0))
+
+
+class BatchedReadinessWatcher(PollingReadinessWatcher):
+  """Checks all waiting resources of a type with one batched call.
+
+  A thread per resource type calls the type's _AreReady with every resource
+  of the type that is waiting to be ready, every POLL_INTERVAL seconds, so N
+  resources created concurrently cost one CLI call per interval instead of N.
+  The commands of each batched call are split evenly between the resources it
+  checked.
+  """
+
+  NAME = 'batched'
+
+  # Resource type to a dict of id to (resource, threading.Event) for each
+  # resource waiting to be ready.
+  _waiting = {}
+  _lock = threading.Lock()
+
+  def WaitUntilReady(self, resource, timeout):
+    resource_type = type(resource)
+    ready_event = threading.Event()
+    with self._lock:
+      # The checking thread of a type removes its dict when it exits.
+      start_thread = resource_type not in self._waiting
+      waiting = self._waiting.setdefault(resource_type, {})
+      waiting[id(resource)] = (resource, ready_event)
+    if start_thread:
+      thread = threading.Thread(
+          target=self._CheckResources,
+          args=(resource_type, context.GetThreadBenchmarkSpec()))
+      thread.daemon = True
+      thread.start()
+    deadline = _GetDeadline(timeout)
+    if ready_event.wait(None if deadline == float('inf')
+                        else max(deadline - time.time(), 0)):
+      return
+    with self._lock:
+      self._waiting.get(resource_type, {}).pop(id(resource), None)
+    raise errors.Resource.RetryableCreationError('Not yet ready')
+
+  def _CheckResources(self, resource_type, benchmark_spec):
+    """Checks the waiting resources of a type until none are left."""
+    context.SetThreadBenchmarkSpec(benchmark_spec)
+    while True:
+      with self._lock:
+        resources = [
+            resource for resource, _ in self._waiting[resource_type].values()
+        ]
+        if not resources:
+          del self._waiting[resource_type]
+          return
+      check_time = time.time()
+      try:
+        with _CountCommands() as command_count:
+          # pylint: disable=protected-access
+          are_ready = resource_type._AreReady(resources)
+      except Exception:  # pylint: disable=broad-except
+        logging.exception('Batched readiness check of %s failed.',
+                          resource_type.__name__)
+        are_ready = [False] * len(resources)
+      with self._lock:
+        waiting = self._waiting[resource_type]
+        for resource, ready in zip(resources, are_ready):
+          # pylint: disable=protected-access
+          resource._RecordReadinessCheck(ready, check_time,
+                                         command_count[0] / len(resources))
+          if ready and id(resource) in waiting:
+            waiting.pop(id(resource))[1].set()
+        if not waiting:
+          continue
+      time.sleep(resource_type.POLL_INTERVAL)
+
+
+def GetReadinessSamples(resources):
+  """Returns readiness samples of the resources aggregated by resource type.
+
+  For each resource type and readiness metric there is a median and a maximum
+  sample, with the number of resources in the metadata. With
+  --per_resource_readiness_samples the samples of every resource are also
+  returned.
+
+  Args:
+    resources: list of BaseResources.
+
+  Returns:
+    list of samples.
+  """
+  samples = []
+  # Resource type to metric to (unit, values).
+  values = collections.defaultdict(dict)
+  watchers = collections.defaultdict(set)
+  for resource in resources:
+    resource_samples = resource.GetReadinessSamples()
+    if FLAGS.per_resource_readiness_samples:
+      samples.extend(resource_samples)
+    for resource_sample in resource_samples:
+      resource_type = resource_sample.metadata['resource_type']
+      _, metric_values = values[resource_type].setdefault(
+          resource_sample.metric, (resource_sample.unit, []))
+      metric_values.append(resource_sample.value)
+      watchers[resource_type].add(resource_sample.metadata['readiness_watcher'])
+  for resource_type in sorted(values):
+    for metric in _READINESS_METRICS:
+      if metric not in values[resource_type]:
+        continue
+      unit, metric_values = values[resource_type][metric]
+      percentiles = sample.PercentileCalculator(metric_values, [50, 100])
+      metadata = {
+          'resource_type': resource_type,
+          'resource_count': len(metric_values),
+          'readiness_watcher': ','.join(sorted(watchers[resource_type])),
+      }
+      samples.append(sample.Sample(metric + ' p50', percentiles['p50'], unit,
+                                   metadata))
+      samples.append(sample.Sample(metric + ' max', percentiles['p100'], unit,
+                                   metadata))
+  return samples
+
+
+def _GetReadinessWatcher(resource):
+  """Returns the readiness watcher chosen by the flag for the resource."""
+  if FLAGS.resource_readiness_watcher == BACKOFF:
+    return BackoffReadinessWatcher()
+  if FLAGS.resource_readiness_watcher == AUTO:
+    # pylint: disable=protected-access
+    resource_type = type(resource)
+    if (resource_type._WaitForReadyOperation is not
+        BaseResource._WaitForReadyOperation):
+      return OperationReadinessWatcher()
+    if resource_type._AreReady.__func__ is not BaseResource._AreReady.__func__:
+      return BatchedReadinessWatcher()
+  return PollingReadinessWatcher()
+
 
 def GetResourceClass(base_class, **kwargs):
   """Returns the subclass with the corresponding attributes.
@@ -96,6 +438,14 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
     create_end_time: The end time of the last create.
     delete_end_time: The end time of the last delete.
     resource_ready_time: The time when the resource last became ready.
+    readiness_watcher: The NAME of the readiness watcher that waited for the
+      resource to become ready.
+    readiness_checks: The number of times the resource was checked for
+      readiness.
+    last_not_ready_time: The time of the last check that found the resource
+      not ready.
+    cli_call_count: The number of commands issued to create the resource and
+      wait for it to be ready.
     metadata: Dictionary of resource metadata.
   """
 
@@ -134,6 +484,10 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
     self.create_end_time = None
     self.delete_end_time = None
     self.resource_ready_time = None
+    self.readiness_watcher = None
+    self.readiness_checks = 0
+    self.last_not_ready_time = None
+    self.cli_call_count = 0
     self.metadata = dict()
 
   def GetResourceMetadata(self):
@@ -201,6 +555,34 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
     """
     return True
 
+  def _WaitForReadyOperation(self, timeout):
+    """Blocks until the cloud reports the resource creation operation done.
+
+    Supplying this method is optional. Implement it with a blocking cloud call,
+    e.g. an AWS CLI waiter or "gcloud ... operations wait", so that readiness
+    is detected without polling. _IsReady is still checked afterwards.
+
+    Args:
+      timeout: The maximum seconds to wait, or None to wait indefinitely.
+    """
+    raise NotImplementedError()
+
+  @classmethod
+  def _AreReady(cls, resources):
+    """Returns whether each of the resources is ready.
+
+    Supplying this method is optional. Implement it with a single call that
+    describes many resources of this type at once, e.g. a list command with a
+    filter, so that resources created concurrently share readiness checks.
+
+    Args:
+      resources: list of instances of this class that are waiting to be ready.
+
+    Returns:
+      list of bools, one per resource, in the same order.
+    """
+    raise NotImplementedError()
+
   def _IsDeleting(self):
     """Return true if the underlying resource is getting deleted.
 
@@ -249,6 +631,57 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
     """
     pass
 
+  def _RecordReadinessCheck(self, ready, check_time, cli_calls=0):
+    """Records the result of checking whether the resource is ready.
+
+    Args:
+      ready: bool. Whether the resource was ready.
+      check_time: The time the check started.
+      cli_calls: The number of commands the check issued on another thread on
+        behalf of the resource.
+    """
+    self.readiness_checks += 1
+    self.cli_call_count += cli_calls
+    if not ready:
+      self.last_not_ready_time = check_time
+
+  def _CheckReadiness(self):
+    """Calls _IsReady and records the result."""
+    check_time = time.time()
+    ready = self._IsReady()
+    self._RecordReadinessCheck(ready, check_time)
+    return ready
+
+  def GetReadinessSamples(self):
+    """Returns samples of how long the resource took to be ready.
+
+    Only resources that wait for readiness report samples. The detection
+    latency is the time from the last check that found the resource not ready
+    to when it was found ready, an upper bound on how late readiness was
+    detected.
+    """
+    if (type(self)._IsReady is BaseResource._IsReady or
+        not self.resource_ready_time or not self.create_start_time):
+      return []
+    metadata = {
+        'resource_type': type(self).__name__,
+        'readiness_watcher': self.readiness_watcher,
+        'readiness_checks': self.readiness_checks,
+    }
+    samples = [
+        sample.Sample('Time to Ready',
+                      self.resource_ready_time - self.create_start_time,
+                      'seconds', metadata),
+        sample.Sample('Resource CLI Calls', self.cli_call_count, 'count',
+                      metadata),
+    ]
+    if self.last_not_ready_time:
+      samples.append(sample.Sample(
+          'Readiness Detection Latency',
+          self.resource_ready_time - self.last_not_ready_time, 'seconds',
+          metadata))
+    return samples
+
   @vm_util.Retry(retryable_exceptions=(errors.Resource.RetryableCreationError,))
   def _CreateResource(self):
     """Reliably creates the underlying resource."""
@@ -273,21 +706,12 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
                  timeout=3600)
   def _DeleteResource(self):
     """Reliably deletes the underlying resource."""
-
-    # Retryable method which allows waiting for deletion of the resource.
-    @vm_util.Retry(poll_interval=self.POLL_INTERVAL, fuzz=0, timeout=3600,
-                   retryable_exceptions=(
-                       errors.Resource.RetryableDeletionError,))
-    def WaitUntilDeleted():
-      if self._IsDeleting():
-        raise errors.Resource.RetryableDeletionError('Not yet deleted')
-
     if self.deleted or not self.created:
       return
     if not self.delete_start_time:
       self.delete_start_time = time.time()
     self._Delete()
-    WaitUntilDeleted()
+    _GetReadinessWatcher(self).WaitUntilDeleted(self, 3600)
     try:
       if self._Exists():
         raise errors.Resource.RetryableDeletionError(
@@ -329,14 +753,6 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
       RestoreError: If there is an error while restoring.
     """
 
-    @vm_util.Retry(poll_interval=self.POLL_INTERVAL, fuzz=0,
-                   timeout=self.READY_TIMEOUT,
-                   retryable_exceptions=(
-                       errors.Resource.RetryableCreationError,))
-    def WaitUntilReady():
-      if not self._IsReady():
-        raise errors.Resource.RetryableCreationError('Not yet ready')
-
     if self.user_managed:
       return
 
@@ -352,8 +768,14 @@ class BaseResource(metaclass=AutoRegisterResourceMeta):
           raise
 
     self._CreateDependencies()
-    self._CreateResource()
-    WaitUntilReady()
+    watcher = _GetReadinessWatcher(self)
+    self.readiness_watcher = watcher.NAME
+    with _CountCommands() as command_count:
+      self._CreateResource()
+      try:
+        watcher.WaitUntilReady(self, self.READY_TIMEOUT)
+      finally:
+        self.cli_call_count += command_count[0]
     if not self.resource_ready_time:
       self.resource_ready_time = time.time()
     self._PostCreate()
@@ -45,6 +45,10 @@ TIME_SERIES_METADATA = [
 def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   """Computes percentiles, stddev and mean on a set of numbers.
 
+  The percentile p is the element at index int(count * p / 100) of the sorted
+  numbers (clamped to the last element). Selection uses numpy.partition, so the
+  numbers are never fully sorted or copied into Python objects.
+
   Args:
     numbers: A sequence of numbers to compute percentiles for.
     percentiles: If given, a list of percentiles to compute. Can be floats, ints
@@ -63,31 +67,169 @@ def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   if not len(numbers):
     raise ValueError("Can't compute percentiles of empty list.")
 
-  numbers_sorted = sorted(numbers)
-  count = len(numbers_sorted)
-  total = sum(numbers_sorted)
-  result = {}
+  percentile_strings = []
   for percentile in percentiles:
     float(percentile)  # verify type
     if percentile < 0.0 or percentile > 100.0:
       raise ValueError('Invalid percentile %s' % percentile)
+    percentile_strings.append('p%s' % str(percentile))
+
+  values = np.asarray(numbers)
+  if values.dtype.kind not in 'iuf':
+    values = values.astype(float)
+  values = values.ravel()
+  count = values.size
+  # Correction to handle 100th percentile.
+  indices = [min(int(count * float(percentile) / 100.0), count - 1)
+             for percentile in percentiles]
+  result = {}
+  if indices:
+    unique_indices = np.unique(indices)
+    selected = np.partition(values, unique_indices)
+    for percentile_string, index in zip(percentile_strings, indices):
+      result[percentile_string] = selected[index].item()
 
-    percentile_string = 'p%s' % str(percentile)
-    index = int(count * float(percentile) / 100.0)
-    index = min(index, count - 1)  # Correction to handle 100th percentile.
-    result[percentile_string] = numbers_sorted[index]
-
-  average = total / float(count)
+  average = float(np.sum(values, dtype=float)) / count
   result['average'] = average
   if count > 1:
-    total_of_squares = sum([(i - average)**2 for i in numbers])
-    result['stddev'] = (total_of_squares / (count - 1))**0.5
+    result['stddev'] = float(np.std(values, dtype=float, ddof=1))
   else:
     result['stddev'] = 0
 
   return result
 
 
+class QuantileSketch(object):
+  """A mergeable, fixed-memory summary of a stream of non-negative numbers.
+
+  Values are counted in logarithmically sized buckets, where bucket i holds
+  the values in (gamma**(i - 1), gamma**i] and
+  gamma = (1 + relative_accuracy) / (1 - relative_accuracy). Every percentile
+  reported by the sketch is within relative_accuracy (relative error) of the
+  value PercentileCalculator would return for the same numbers, while memory
+  only grows with the logarithm of the range of the values. Sketches built on
+  different machines or threads can be combined with Merge. Count, average,
+  stddev, min and max are tracked exactly.
+
+  Attributes:
+    relative_accuracy: float. Guaranteed relative error of percentiles.
+    count: int. Number of values added.
+    min: float. Smallest value added.
+    max: float. Largest value added.
+  """
+
+  def __init__(self, relative_accuracy=0.01):
+    if not 0.0 < relative_accuracy < 1.0:
+      raise ValueError(
+          'Invalid relative accuracy %s' % relative_accuracy)
+    self.relative_accuracy = relative_accuracy
+    self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+    self._log_gamma = math.log(self._gamma)
+    self._buckets = collections.Counter()
+    self._zero_count = 0
+    self.count = 0
+    self.min = math.inf
+    self.max = -math.inf
+    self._mean = 0.0
+    self._m2 = 0.0  # Sum of squared differences from the mean.
+
+  def _UpdateMoments(self, count, mean, m2):
+    """Combines running moments (Chan et al. parallel algorithm)."""
+    total = self.count + count
+    delta = mean - self._mean
+    self._mean += delta * count / total
+    self._m2 += m2 + delta**2 * self.count * count / total
+    self.count = total
+
+  def Add(self, values):
+    """Adds a number or a sequence of numbers to the sketch.
+
+    Args:
+      values: A number or a sequence (e.g. list or numpy array) of numbers.
+
+    Raises:
+      ValueError, if a value is negative or NaN.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if not values.size:
+      return
+    if not np.all(values >= 0):
+      raise ValueError('QuantileSketch only supports non-negative values.')
+    mean = float(np.mean(values))
+    m2 = float(np.sum(np.square(values - mean)))
+    self._UpdateMoments(values.size, mean, m2)
+    self.min = min(self.min, float(np.min(values)))
+    self.max = max(self.max, float(np.max(values)))
+    positive = values[values > 0]
+    self._zero_count += values.size - positive.size
+    indices, counts = np.unique(
+        np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+        return_counts=True)
+    self._buckets.update(dict(zip(indices.tolist(), counts.tolist())))
+
+  def Merge(self, other):
+    """Adds all values summarized by another sketch to this one.
+
+    Args:
+      other: QuantileSketch created with the same relative_accuracy.
+
+    Raises:
+      ValueError, if the sketches have a different relative_accuracy.
+    """
+    if other.relative_accuracy != self.relative_accuracy:
+      raise ValueError(
+          'Cannot merge sketches with relative accuracy %s and %s' %
+          (self.relative_accuracy, other.relative_accuracy))
+    if not other.count:
+      return
+    self._UpdateMoments(other.count, other._mean, other._m2)  # pylint: disable=protected-access
+    self.min = min(self.min, other.min)
+    self.max = max(self.max, other.max)
+    self._zero_count += other._zero_count  # pylint: disable=protected-access
+    self._buckets.update(other._buckets)  # pylint: disable=protected-access
+
+  def Percentiles(self, percentiles=PERCENTILES_LIST):
+    """Computes percentiles, stddev and mean of the summarized numbers.
+
+    Args:
+      percentiles: If given, a list of percentiles to compute. Can be floats or
+        ints.
+
+    Returns:
+      A dictionary with the same keys as PercentileCalculator returns.
+
+    Raises:
+      ValueError, if the sketch is empty or if a percentile is outside of
+      [0, 100].
+    """
+    if not self.count:
+      raise ValueError("Can't compute percentiles of empty sketch.")
+    indices = np.array(sorted(self._buckets), dtype=np.int64)
+    cumulative_counts = np.cumsum(
+        [self._buckets[index] for index in indices.tolist()], dtype=np.int64)
+    result = {}
+    for percentile in percentiles:
+      float(percentile)  # verify type
+      if percentile < 0.0 or percentile > 100.0:
+        raise ValueError('Invalid percentile %s' % percentile)
+      # Same rank PercentileCalculator picks from the sorted numbers.
+      rank = min(int(self.count * float(percentile) / 100.0), self.count - 1)
+      if rank < self._zero_count:
+        value = 0.0
+      else:
+        bucket = indices[np.searchsorted(
+            cumulative_counts, rank - self._zero_count, side='right')]
+        value = 2.0 * self._gamma**float(bucket) / (self._gamma + 1.0)
+        value = min(max(value, self.min), self.max)
+      result['p%s' % str(percentile)] = value
+    result['average'] = self._mean
+    if self.count > 1:
+      result['stddev'] = (self._m2 / (self.count - 1))**0.5
+    else:
+      result['stddev'] = 0
+    return result
+
+
 def GeoMean(iterable):
   """Calculate the geometric mean of a collection of numbers.
 
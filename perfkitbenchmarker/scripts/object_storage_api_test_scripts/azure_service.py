@@ -85,3 +85,37 @@ class AzureService(object_storage_interface.ObjectStorageServiceBase):
     self.blob_service.get_blob_to_bytes(bucket, object)
     latency = time.time() - start_time
     return start_time, latency
+
+  def ReadObjectRange(self, bucket, object, offset, size):
+    start_time = time.time()
+    self.blob_service.get_blob(
+        bucket, object, x_ms_range='bytes=%d-%d' % (offset, offset + size - 1))
+    latency = time.time() - start_time
+    return start_time, latency
+
+  # Objects are written in parts as the blocks of a block blob.
+
+  def StartMultipartUpload(self, bucket, object):
+    return None
+
+  def WriteObjectPart(self, bucket, object, upload, part_number, stream, size):
+    # Block IDs of a blob must all have the same length.
+    block_id = '%06d' % part_number
+    # Unlike put_block_blob_from_file, put_block of this version of the
+    # library only takes the block as bytes rather than a stream and a count.
+    # PayloadReader.read copies the part into them once.
+    stream.seek(0)
+    start_time = time.time()
+    self.blob_service.put_block(bucket, object, stream.read(size), block_id)
+    latency = time.time() - start_time
+    return start_time, latency, block_id
+
+  def CompleteMultipartUpload(self, bucket, object, upload, parts):
+    start_time = time.time()
+    self.blob_service.put_block_list(bucket, object, parts)
+    latency = time.time() - start_time
+    return start_time, latency
+
+  def AbortMultipartUpload(self, bucket, object, upload):
+    # Uncommitted blocks are garbage collected by the service.
+    pass
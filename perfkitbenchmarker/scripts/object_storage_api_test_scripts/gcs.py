@@ -22,15 +22,25 @@ from absl import flags
 # This is the path that we SCP object_storage_interface to.
 from providers import object_storage_interface
 from google.cloud import storage
+from requests import adapters
 
 FLAGS = flags.FLAGS
 
+# The maximum number of objects that one compose request can combine.
+_MAX_COMPOSE_SOURCES = 32
+
 
 class GcsService(object_storage_interface.ObjectStorageServiceBase):
   """An interface to Google Cloud Storage, using the python library."""
 
   def __init__(self):
     self.client = storage.Client()
+    if FLAGS.threads_per_process > adapters.DEFAULT_POOLSIZE:
+      # Streams running in threads of one process share the client, so give
+      # each of them a pooled connection.
+      self.client._http.mount(  # pylint: disable=protected-access
+          'https://',
+          adapters.HTTPAdapter(pool_maxsize=FLAGS.threads_per_process))
 
   def ListObjects(self, bucket_name, prefix):
     bucket = storage.bucket.Bucket(self.client, bucket_name)
@@ -75,10 +85,9 @@ class GcsService(object_storage_interface.ObjectStorageServiceBase):
   def WriteObjectFromBuffer(self, bucket_name, object_name, stream, size):
     stream.seek(0)
     start_time = time.time()
-    data = str(stream.read(size))
     bucket = storage.bucket.Bucket(self.client, bucket_name)
     obj = storage.blob.Blob(object_name, bucket)
-    obj.upload_from_string(data, client=self.client)
+    obj.upload_from_file(stream, size=size, client=self.client)
     latency = time.time() - start_time
     return start_time, latency
 
@@ -89,3 +98,49 @@ class GcsService(object_storage_interface.ObjectStorageServiceBase):
     obj.download_as_string(client=self.client)
     latency = time.time() - start_time
     return start_time, latency
+
+  def ReadObjectRange(self, bucket_name, object_name, offset, size):
+    start_time = time.time()
+    bucket = storage.bucket.Bucket(self.client, bucket_name)
+    obj = storage.blob.Blob(object_name, bucket)
+    obj.download_as_string(client=self.client, start=offset,
+                           end=offset + size - 1)
+    latency = time.time() - start_time
+    return start_time, latency
+
+  # GCS has no multipart uploads in this library, so parts are written as
+  # temporary objects and composed into the object.
+
+  def StartMultipartUpload(self, bucket_name, object_name):
+    return '%s.part' % object_name
+
+  def WriteObjectPart(self, bucket_name, object_name, upload, part_number,
+                      stream, size):
+    part_name = '%s%05d' % (upload, part_number)
+    start_time, latency = self.WriteObjectFromBuffer(bucket_name, part_name,
+                                                     stream, size)
+    return start_time, latency, part_name
+
+  def CompleteMultipartUpload(self, bucket_name, object_name, upload, parts):
+    start_time = time.time()
+    bucket = storage.bucket.Bucket(self.client, bucket_name)
+    obj = storage.blob.Blob(object_name, bucket)
+    # Each compose request takes the object composed so far and as many
+    # parts as fit.
+    sources = []
+    remaining_parts = list(parts)
+    while remaining_parts:
+      num_parts = _MAX_COMPOSE_SOURCES - len(sources)
+      sources += [storage.blob.Blob(part_name, bucket)
+                  for part_name in remaining_parts[:num_parts]]
+      remaining_parts = remaining_parts[num_parts:]
+      obj.compose(sources, client=self.client)
+      sources = [obj]
+    bucket.delete_blobs(parts)
+    latency = time.time() - start_time
+    return start_time, latency
+
+  def AbortMultipartUpload(self, bucket_name, object_name, upload):
+    bucket = storage.bucket.Bucket(self.client, bucket_name)
+    bucket.delete_blobs(
+        list(bucket.list_blobs(prefix=upload, client=self.client)))
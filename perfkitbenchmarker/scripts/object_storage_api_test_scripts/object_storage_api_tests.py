@@ -23,12 +23,16 @@
 """
 
 
+from concurrent import futures
+import io
 import json
 import logging
+import mmap
 import multiprocessing as mp
 import os
 import random
 import string
+import struct
 import sys
 from threading import Thread
 import time
@@ -66,7 +70,7 @@ flags.DEFINE_enum(
     'scenario', 'OneByteRW', [
         'OneByteRW', 'ListConsistency', 'SingleStreamThroughput',
         'CleanupBucket', 'MultiStreamWrite', 'MultiStreamRead',
-        'MultiStreamDelete'
+        'MultiStreamDelete', 'ParallelTransferThroughput'
     ],
     'The various scenarios to run. OneByteRW: read and write of single byte. '
     'ListConsistency: List-after-write and list-after-update consistency. '
@@ -74,7 +78,10 @@ flags.DEFINE_enum(
     'CleanupBucket: Cleans up everything in a given bucket.'
     'MultiStreamWrite: Write objects with many streams at once.'
     'MultiStreamRead: Read objects with many streams at once.'
-    'MultiStreamDelete: Deletes all objects in a bucket with many streams.')
+    'MultiStreamDelete: Deletes all objects in a bucket with many streams.'
+    'ParallelTransferThroughput: Throughput of large objects written with '
+    'multipart uploads and read with byte-range reads, transferring '
+    'several parts at once.')
 
 flags.DEFINE_integer('iterations', 1, 'The number of iterations to run for the '
                      'particular test scenario. Currently only applicable to '
@@ -132,6 +139,48 @@ flags.DEFINE_boolean(
     'and records individual delete latency'
 )
 
+flags.DEFINE_float(
+    'payload_compressibility', 0.0,
+    'The fraction of each block of written objects filled with a repeated '
+    'byte instead of random data. Objects compress to roughly '
+    '(1 - payload_compressibility) of their size.',
+    lower_bound=0.0, upper_bound=1.0)
+
+flags.DEFINE_string(
+    'results_dir', None,
+    'If set, multistream workers append a fixed-width binary record per '
+    'operation to a file per stream in this directory, and the multistream '
+    'scenarios print the names of the files instead of all results. See '
+    'RESULT_RECORD_FORMAT.')
+
+flags.DEFINE_integer(
+    'parallel_transfer_objects', 10,
+    'The number of objects that the ParallelTransferThroughput scenario '
+    'writes and reads.', lower_bound=1)
+
+flags.DEFINE_integer(
+    'parallel_transfer_object_size', 100 * 1024 * 1024,
+    'The size in bytes of the objects of the ParallelTransferThroughput '
+    'scenario.', lower_bound=1)
+
+flags.DEFINE_integer(
+    'part_size', 8 * 1024 * 1024,
+    'The size in bytes of the parts that the ParallelTransferThroughput '
+    'scenario splits objects into. The last part of an object may be '
+    'smaller.', lower_bound=1)
+
+flags.DEFINE_integer(
+    'parallel_parts', 8,
+    'The number of parts of an object that the ParallelTransferThroughput '
+    'scenario transfers at once.', lower_bound=1)
+
+flags.DEFINE_integer(
+    'threads_per_process', 1,
+    'The number of multistream streams each worker process runs '
+    'concurrently in threads. The threads share the process\'s service '
+    'client and its connection pool, so many streams need far fewer '
+    'processes.', lower_bound=1)
+
 flags.DEFINE_integer('vm_id', 0, 'ID of VM.')
 flags.DEFINE_float('delete_delay', 0,
                    'Time to delay inbetween delete API call.')
@@ -185,6 +234,20 @@ LARGE_OBJECT_FAILURE_TOLERANCE = 0.1
 
 BYTES_PER_KILOBYTE = 1024
 
+# Written payloads are generated in blocks of this many bytes, each with the
+# same fraction of random data.
+PAYLOAD_BLOCK_SIZE = 64 * 1024
+
+# Maps random bytes to ASCII letters.
+_PAYLOAD_LETTERS = bytes(bytearray(
+    ord(string.ascii_letters[i % len(string.ascii_letters)])
+    for i in range(256)))
+
+# The struct format of the records written to --results_dir: the start time
+# and latency in seconds, the size in bytes and the status, which is 0 if the
+# operation succeeded and 1 if it failed.
+RESULT_RECORD_FORMAT = '<ddqq'
+
 # The multistream benchmarks log how many threads are still active
 # every THREAD_STATUS_LOG_INTERVAL seconds.
 THREAD_STATUS_LOG_INTERVAL = 10
@@ -200,6 +263,58 @@ class LowAvailabilityError(Exception):
 # ### Utilities for workload generation ###
 
 
+class StreamResults(object):
+  """The results of the operations of one multistream worker.
+
+  Keeps the results of successful operations in lists, or with --results_dir
+  writes the results of all operations to a file of RESULT_RECORD_FORMAT
+  records.
+
+  Args:
+    stream_num: the number of the stream.
+  """
+
+  def __init__(self, stream_num):
+    self.stream_num = stream_num
+    self.num_succeeded = 0
+    self.num_records = 0
+    self._start_times = []
+    self._latencies = []
+    self._sizes = []
+    self._path = None
+    self._file = None
+    if FLAGS.results_dir:
+      self._path = os.path.join(FLAGS.results_dir,
+                                'stream_%d.bin' % stream_num)
+      self._file = open(self._path, 'wb')
+
+  def Record(self, start_time, latency, size, succeeded=True):
+    """Records the result of an operation."""
+    if succeeded:
+      self.num_succeeded += 1
+    if self._file:
+      self.num_records += 1
+      self._file.write(struct.pack(RESULT_RECORD_FORMAT, start_time, latency,
+                                   size, 0 if succeeded else 1))
+    elif succeeded:
+      self._start_times.append(start_time)
+      self._latencies.append(latency)
+      self._sizes.append(size)
+
+  def Result(self):
+    """Returns the results as a dict to print as JSON for the controller."""
+    if self._file:
+      self._file.close()
+      return {'stream_num': self.stream_num,
+              'results_file': self._path,
+              'num_records': self.num_records,
+              'num_succeeded': self.num_succeeded}
+    return {'stream_num': self.stream_num,
+            'start_times': self._start_times,
+            'latencies': self._latencies,
+            'sizes': self._sizes}
+
+
 class SizeDistributionIterator(object):
   """Draw object sizes from a distribution.
 
@@ -364,24 +479,85 @@ def CleanupBucket(service):
     objects_to_cleanup = service.ListObjects(FLAGS.bucket, prefix=None)
 
 
-def GenerateWritePayload(size):
+def GenerateWritePayload(size, compressibility=0.0):
   """Generate random data for use with WriteObjectFromBuffer.
 
+  The payload is an anonymous shared memory map, so worker processes forked
+  after it is generated read the same pages instead of copies.
+
   Args:
     size: the amount of data needed, in bytes.
+    compressibility: the fraction of each PAYLOAD_BLOCK_SIZE block filled with
+        a repeated letter instead of random letters.
 
   Returns:
-    A byte array of the length requested, filled with random data.
+    An mmap.mmap of at least the length requested, filled with random ASCII
+    letters.
+  """
+
+  # Anonymous maps can not be empty.
+  payload = mmap.mmap(-1, max(size, 1))
+  random_size = PAYLOAD_BLOCK_SIZE - int(PAYLOAD_BLOCK_SIZE * compressibility)
+  filler = b'a' * (PAYLOAD_BLOCK_SIZE - random_size)
+  for offset in range(0, size, PAYLOAD_BLOCK_SIZE):
+    block = os.urandom(random_size).translate(_PAYLOAD_LETTERS) + filler
+    end = min(offset + PAYLOAD_BLOCK_SIZE, size)
+    payload[offset:end] = block[:end - offset]
+
+  return payload
+
+
+class PayloadReader(io.RawIOBase):
+  """A seekable stream over the start of a payload.
+
+  Reads from a memoryview of the payload, so creating a reader for each
+  object does not copy the payload.
+
+  Args:
+    payload: the payload to read, e.g. from GenerateWritePayload.
+    size: the number of bytes of the payload to read.
   """
 
-  payload_bytes = bytearray(size)
-  # don't use a for...range(100M), range(100M) will create a list of 100mm items
-  # with each item being the default object size of 30 bytes or so, it will lead
-  # to out of memory error.
-  for i in range(size):
-    payload_bytes[i] = ord(random.choice(string.ascii_letters))
+  def __init__(self, payload, size):
+    super(PayloadReader, self).__init__()
+    self._view = memoryview(payload)[:size]
+    self._position = 0
 
-  return payload_bytes
+  def readable(self):
+    return True
+
+  def seekable(self):
+    return True
+
+  def read(self, size=-1):
+    # Copies the bytes once, rather than into a bytearray and then into bytes
+    # like RawIOBase.read, for SDKs that only take a part's data as bytes.
+    end = len(self._view)
+    if size is not None and size >= 0:
+      end = min(end, self._position + size)
+    data = self._view[self._position:end].tobytes()
+    self._position = max(self._position, end)
+    return data
+
+  def readall(self):
+    return self.read()
+
+  def readinto(self, buffer):
+    count = max(0, min(len(buffer), len(self._view) - self._position))
+    buffer[:count] = self._view[self._position:self._position + count]
+    self._position += count
+    return count
+
+  def seek(self, offset, whence=io.SEEK_SET):
+    if whence == io.SEEK_CUR:
+      offset += self._position
+    elif whence == io.SEEK_END:
+      offset += len(self._view)
+    self._position = max(0, offset)
+    return self._position
+
+  def tell(self):
+    return self._position
 
 
 def WriteObjects(service, bucket, object_prefix, count,
@@ -406,15 +582,14 @@ def WriteObjects(service, bucket, object_prefix, count,
         successfully written.
   """
 
-  payload = GenerateWritePayload(size)
-  handle = six.BytesIO(payload)
+  payload = GenerateWritePayload(size, FLAGS.payload_compressibility)
 
   for i in range(count):
     object_name = '%s_%d' % (object_prefix, i)
 
     try:
       _, latency = service.WriteObjectFromBuffer(
-          bucket, object_name, handle, size)
+          bucket, object_name, PayloadReader(payload, size), size)
 
       objects_written.append(object_name)
       if latency_results is not None:
@@ -616,6 +791,184 @@ def SingleStreamThroughputBenchmark(service):
     service.DeleteObjects(FLAGS.bucket, objects_written)
 
 
+def _PartRanges(size, part_size):
+  """Returns a list of (offset, size) tuples splitting an object into parts."""
+  return [(offset, min(part_size, size - offset))
+          for offset in range(0, size, part_size)]
+
+
+def WriteObjectInParts(service, bucket, object_name, payload, size,
+                       part_latencies):
+  """Writes an object with a multipart upload of --parallel_parts at a time.
+
+  Args:
+    service: the ObjectStorageServiceBase object to use.
+    bucket: the name of the bucket to write to.
+    object_name: the name of the object.
+    payload: the buffer to take the data of each part from.
+    size: the size of the object in bytes.
+    part_latencies: a list to append the (latency, size) of each part to.
+
+  Returns:
+    The latency of writing the whole object, in seconds.
+  """
+  start_time = time.time()
+  upload = service.StartMultipartUpload(bucket, object_name)
+
+  def _WritePart(part_number, part_size):
+    return service.WriteObjectPart(bucket, object_name, upload, part_number,
+                                   PayloadReader(payload, part_size),
+                                   part_size)
+
+  part_sizes = [part_size for _, part_size in
+                _PartRanges(size, FLAGS.part_size)]
+  try:
+    with futures.ThreadPoolExecutor(FLAGS.parallel_parts) as executor:
+      part_results = list(executor.map(
+          _WritePart, range(1, len(part_sizes) + 1), part_sizes))
+    service.CompleteMultipartUpload(bucket, object_name, upload,
+                                    [part for _, _, part in part_results])
+  except Exception:
+    # Don't leave the written parts behind in the bucket.
+    try:
+      service.AbortMultipartUpload(bucket, object_name, upload)
+    except Exception:  # pylint: disable=broad-except
+      logging.exception('Failed aborting the upload of %s.', object_name)
+    raise
+  latency = time.time() - start_time
+  part_latencies.extend(
+      (part_latency, part_size)
+      for (_, part_latency, _), part_size in zip(part_results, part_sizes))
+  return latency
+
+
+def ReadObjectInParts(service, bucket, object_name, size, part_latencies):
+  """Reads an object with byte-range reads of --parallel_parts at a time.
+
+  Args:
+    service: the ObjectStorageServiceBase object to use.
+    bucket: the name of the bucket.
+    object_name: the name of the object.
+    size: the size of the object in bytes.
+    part_latencies: a list to append the (latency, size) of each part to.
+
+  Returns:
+    The latency of reading the whole object, in seconds.
+  """
+  start_time = time.time()
+  part_ranges = _PartRanges(size, FLAGS.part_size)
+  with futures.ThreadPoolExecutor(FLAGS.parallel_parts) as executor:
+    part_results = list(executor.map(
+        lambda part_range: service.ReadObjectRange(bucket, object_name,
+                                                   *part_range),
+        part_ranges))
+  latency = time.time() - start_time
+  part_latencies.extend(
+      (part_latency, part_size)
+      for (_, part_latency), (_, part_size) in zip(part_results, part_ranges))
+  return latency
+
+
+def _LogParallelTransferResults(operation, object_latencies, part_latencies):
+  """Logs the throughput and latency percentiles of one operation."""
+  size = FLAGS.parallel_transfer_object_size
+  object_bandwidth = [size / latency for latency in object_latencies
+                      if latency > 0.0]
+  part_bandwidth = [part_size / latency
+                    for latency, part_size in part_latencies
+                    if latency > 0.0]
+  part_latency = [latency for latency, _ in part_latencies]
+  logging.info('Parallel transfer %s throughput in Bps: %s', operation,
+               json.dumps(PercentileCalculator(object_bandwidth),
+                          sort_keys=True))
+  logging.info('Parallel transfer %s latency in seconds: %s', operation,
+               json.dumps(PercentileCalculator(object_latencies),
+                          sort_keys=True))
+  logging.info('Parallel transfer %s part throughput in Bps: %s', operation,
+               json.dumps(PercentileCalculator(part_bandwidth),
+                          sort_keys=True))
+  logging.info('Parallel transfer %s part latency in seconds: %s', operation,
+               json.dumps(PercentileCalculator(part_latency),
+                          sort_keys=True))
+
+
+def ParallelTransferThroughputBenchmark(service):
+  """A benchmark of large object throughput with parallel part transfers.
+
+  Writes --parallel_transfer_objects objects with multipart uploads and
+  reads them back with byte-range reads, transferring --parallel_parts
+  parts of --part_size bytes at once. Logs percentiles of the throughput
+  and latency of whole objects and of the individual parts.
+
+  Args:
+    service: the ObjectStorageServiceBase object to use.
+
+  Raises:
+    LowAvailabilityError: when the storage service has failed a high number of
+        our RW requests that exceeds a threshold (>5%), we raise this error
+        instead of collecting performance numbers from this run.
+  """
+  object_prefix = 'pkb_parallel_transfer_%f' % time.time()
+  size = FLAGS.parallel_transfer_object_size
+  payload = GenerateWritePayload(min(size, FLAGS.part_size),
+                                 FLAGS.payload_compressibility)
+  objects_written = []
+
+  try:
+    write_latencies = []
+    write_part_latencies = []
+    for i in range(FLAGS.parallel_transfer_objects):
+      object_name = '%s_%d' % (object_prefix, i)
+      try:
+        write_latencies.append(WriteObjectInParts(
+            service, FLAGS.bucket, object_name, payload, size,
+            write_part_latencies))
+        objects_written.append(object_name)
+      except Exception as e:
+        logging.info('Caught exception %s while writing object %s' %
+                     (e, object_name))
+    if len(objects_written) < FLAGS.parallel_transfer_objects * (
+        1 - LARGE_OBJECT_FAILURE_TOLERANCE):
+      raise LowAvailabilityError('Failed to write required number of large '
+                                 'objects, exiting.')
+    _LogParallelTransferResults('upload', write_latencies,
+                                write_part_latencies)
+
+    read_latencies = []
+    read_part_latencies = []
+    for object_name in objects_written:
+      try:
+        read_latencies.append(ReadObjectInParts(
+            service, FLAGS.bucket, object_name, size, read_part_latencies))
+      except Exception as e:
+        logging.info('Caught exception %s while reading object %s' %
+                     (e, object_name))
+    if len(read_latencies) < len(objects_written) * (
+        1 - LARGE_OBJECT_FAILURE_TOLERANCE):
+      raise LowAvailabilityError('Failed to read required number of objects, '
+                                 'exiting.')
+    _LogParallelTransferResults('download', read_latencies,
+                                read_part_latencies)
+
+  finally:
+    service.DeleteObjects(FLAGS.bucket, objects_written)
+
+
+def RunWorkerThreads(worker, stream_args):
+  """Runs the worker function for several streams in threads of one process.
+
+  Args:
+    worker: the worker function to call.
+    stream_args: a list of tuples. The arguments of the worker function for
+      each stream.
+  """
+  threads = [Thread(target=worker, args=args) for args in stream_args]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+
 def RunWorkerProcesses(worker, worker_args, per_process_args=None):
   """Run a worker function in many processes, then gather and return the results
 
@@ -624,10 +977,13 @@ def RunWorkerProcesses(worker, worker_args, per_process_args=None):
     worker_args: a tuple. The arguments to pass to the worker function. The
       result queue and stream number will be appended as the last two arguments.
     per_process_args: if given, an array with length equal to the
-      number of processes. Process number i will be passed
+      number of streams. Stream number i will be passed
       per_process_args[i] after its regular arguments and before the
       result queue and stream number.
 
+  Each stream runs in its own process, or with --threads_per_process in a
+  thread of a process shared with the following streams.
+
   Returns:
     A list of the results returned by the workers.
   """
@@ -635,17 +991,22 @@ def RunWorkerProcesses(worker, worker_args, per_process_args=None):
   result_queue = mp.Queue()
   num_streams = FLAGS.num_streams
 
-  logging.info('Creating %s processes', FLAGS.num_streams)
-  if per_process_args is None:
-    processes = [mp.Process(target=worker,
-                            args=worker_args + (result_queue, i))
-                 for i in range(num_streams)]
+  stream_args = [
+      worker_args + ((per_process_args[i],) if per_process_args else ()) +
+      (result_queue, i) for i in range(num_streams)
+  ]
+  threads_per_process = FLAGS.threads_per_process
+  logging.info('Creating %s processes with up to %s streams each',
+               -(-num_streams // threads_per_process), threads_per_process)
+  if threads_per_process == 1:
+    processes = [mp.Process(target=worker, args=args) for args in stream_args]
   else:
-    processes = [mp.Process(target=worker,
-                            args=worker_args +
-                            (per_process_args[i],) +
-                            (result_queue, i))
-                 for i in range(num_streams)]
+    processes = [
+        mp.Process(target=RunWorkerThreads,
+                   args=(worker,
+                         stream_args[i:i + threads_per_process]))
+        for i in range(0, num_streams, threads_per_process)
+    ]
   logging.info('Processes created. Starting processes.')
   for process in processes:
     process.start()
@@ -687,11 +1048,16 @@ def MultiStreamWrites(service):
   Both kinds of output are written as JSON, for easy serialization and
   deserialization.
 
+  With --results_dir, the timing information of each stream is written to a
+  file of RESULT_RECORD_FORMAT records instead, and sys.stdout only gets the
+  name of the file and the number of successful writes of each stream.
+
   """
 
   size_distribution = yaml.safe_load(FLAGS.object_sizes)
 
-  payload = GenerateWritePayload(MaxSizeInDistribution(size_distribution))
+  payload = GenerateWritePayload(
+      MaxSizeInDistribution(size_distribution), FLAGS.payload_compressibility)
 
   results = RunWorkerProcesses(
       WriteWorker,
@@ -709,7 +1075,8 @@ def MultiStreamWrites(service):
     try:
       object_records = []
       for result in results:
-        for name, size in zip(result['object_names'], result['sizes']):
+        for name, size in zip(result['object_names'],
+                              result['object_sizes']):
           object_records.append([name, size])
       if os.path.exists(FLAGS.objects_written_file):
         os.remove(FLAGS.objects_written_file)
@@ -724,12 +1091,9 @@ def MultiStreamWrites(service):
   logging.info('len(results) = %s', len(results))
 
   # streams is the data we send back to the controller.
-  streams = []
-  for result in results:
-    result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
-    streams.append({k: result[k] for k in result_keys})
+  streams = [result['result'] for result in results]
 
-  num_writes = sum([len(stream['start_times']) for stream in streams])
+  num_writes = sum([result['num_succeeded'] for result in results])
   num_writes_requested = FLAGS.objects_per_stream * FLAGS.num_streams
   min_writes_required = num_writes_requested * (1.0 - FAILURE_TOLERANCE)
   if num_writes < min_writes_required:
@@ -781,12 +1145,9 @@ def MultiStreamReads(service):
       per_process_args=objects_by_worker)
 
   # streams is the data we send back to the controller.
-  streams = []
-  for result in results:
-    result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
-    streams.append({k: result[k] for k in result_keys})
+  streams = [result['result'] for result in results]
 
-  num_reads = sum([len(stream['start_times']) for stream in streams])
+  num_reads = sum([result['num_succeeded'] for result in results])
   num_reads_requested = FLAGS.objects_per_stream * FLAGS.num_streams
   min_reads_required = num_reads_requested * (1.0 - FAILURE_TOLERANCE)
   if num_reads < min_reads_required:
@@ -838,10 +1199,7 @@ def MultiStreamDelete(service):
       per_process_args=objects_by_worker)
 
   # streams is the data we send back to the controller.
-  streams = []
-  for result in results:
-    result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
-    streams.append({k: result[k] for k in result_keys})
+  streams = [result['result'] for result in results]
 
   json.dump(streams, sys.stdout, indent=0)
 
@@ -870,7 +1228,8 @@ def WriteWorker(service, payload,
 
   Args:
     service: the ObjectStorageServiceBase object to use.
-    payload: a byte array. The bytes to upload.
+    payload: a bytes-like object, e.g. from GenerateWritePayload. The bytes to
+        upload. Each object is the start of the payload.
     size_distribution: the distribution of object sizes to use.
     num_objects: the number of objects to upload.
     start_time: a POSIX timestamp. When to start uploading.
@@ -880,9 +1239,8 @@ def WriteWorker(service, payload,
   """
 
   object_names = []
-  start_times = []
-  latencies = []
-  sizes = []
+  object_sizes = []
+  stream_results = StreamResults(worker_num + FLAGS.stream_num_start)
 
   if naming_scheme == 'prefix_by_vm_and_stream':
     # Unique prefix helps with backend sharding
@@ -899,8 +1257,6 @@ def WriteWorker(service, payload,
         '%s' % worker_num)
   size_iterator = SizeDistributionIterator(size_distribution)
 
-  payload_handle = six.BytesIO(payload)
-
   if start_time is not None:
     SleepUntilTime(start_time)
 
@@ -908,53 +1264,51 @@ def WriteWorker(service, payload,
     object_name = next(name_iterator)
     object_size = next(size_iterator)
 
+    attempt_time = time.time()
     try:
       start_time, latency = service.WriteObjectFromBuffer(
           FLAGS.bucket, object_name,
-          payload_handle, object_size)
+          PayloadReader(payload, object_size), object_size)
 
       object_names.append(object_name)
-      start_times.append(start_time)
-      latencies.append(latency)
-      sizes.append(object_size)
+      object_sizes.append(object_size)
+      stream_results.Record(start_time, latency, object_size)
     except Exception as e:
       logging.info('Worker %s caught exception %s while writing object %s' %
                    (worker_num, e, object_name))
+      stream_results.Record(attempt_time, time.time() - attempt_time,
+                            object_size, succeeded=False)
 
   logging.info('Worker %s finished writing its objects' % worker_num)
 
   result_queue.put({'object_names': object_names,
-                    'start_times': start_times,
-                    'latencies': latencies,
-                    'sizes': sizes,
-                    'stream_num': worker_num + FLAGS.stream_num_start})
+                    'object_sizes': object_sizes,
+                    'num_succeeded': stream_results.num_succeeded,
+                    'result': stream_results.Result()})
 
 
 def ReadWorker(service, start_time, object_records,
                result_queue, worker_num):
 
-  start_times = []
-  latencies = []
-  sizes = []
+  stream_results = StreamResults(worker_num + FLAGS.stream_num_start)
 
   if start_time is not None:
     SleepUntilTime(start_time)
 
   for name, size in object_records:
+    attempt_time = time.time()
     try:
       start_time, latency = service.ReadObject(FLAGS.bucket, name)
 
-      start_times.append(start_time)
-      latencies.append(latency)
-      sizes.append(size)
+      stream_results.Record(start_time, latency, size)
     except Exception as e:
       logging.info('Worker %s caught exception %s while reading object %s' %
                    (worker_num, e, name))
+      stream_results.Record(attempt_time, time.time() - attempt_time, size,
+                            succeeded=False)
 
-  result_queue.put({'start_times': start_times,
-                    'latencies': latencies,
-                    'sizes': sizes,
-                    'stream_num': worker_num + FLAGS.stream_num_start})
+  result_queue.put({'num_succeeded': stream_results.num_succeeded,
+                    'result': stream_results.Result()})
 
 
 def DeleteWorker(service, object_records, result_queue, worker_num):
@@ -988,12 +1342,11 @@ def DeleteWorker(service, object_records, result_queue, worker_num):
         delay_time=FLAGS.delete_delay,
         object_sizes=object_sizes)
 
-  result_queue.put({
-      'start_times': start_times,
-      'latencies': latencies,
-      'sizes': sizes,
-      'stream_num': worker_num + FLAGS.stream_num_start
-  })
+  stream_results = StreamResults(worker_num + FLAGS.stream_num_start)
+  for start_time, latency, size in zip(start_times, latencies, sizes):
+    stream_results.Record(start_time, latency, size)
+  result_queue.put({'num_succeeded': stream_results.num_succeeded,
+                    'result': stream_results.Result()})
 
 
 def OneByteRWBenchmark(service):
@@ -1296,6 +1649,8 @@ def Main(argv=sys.argv):
     return MultiStreamReads(service)
   elif FLAGS.scenario == 'MultiStreamDelete':
     return MultiStreamDelete(service)
+  elif FLAGS.scenario == 'ParallelTransferThroughput':
+    return ParallelTransferThroughputBenchmark(service)
 
 if __name__ == '__main__':
   sys.exit(Main())
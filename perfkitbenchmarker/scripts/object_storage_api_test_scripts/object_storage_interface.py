@@ -122,3 +122,85 @@ class ObjectStorageServiceBase(six.with_metaclass(abc.ABCMeta, object)):
     """
 
     pass
+
+  # The following methods transfer objects in parts for the parallel
+  # transfer scenario. They may be called concurrently from several
+  # threads. Services that don't support them raise NotImplementedError.
+
+  def ReadObjectRange(self, bucket, object, offset, size):
+    """Read a byte range of an object.
+
+    Args:
+      bucket: the name of the bucket.
+      object: the name of the object.
+      offset: the offset of the first byte to read.
+      size: the number of bytes to read.
+
+    Returns:
+      A tuple of (start_time, latency)
+    """
+
+    raise NotImplementedError()
+
+  def StartMultipartUpload(self, bucket, object):
+    """Start writing an object in parts.
+
+    Args:
+      bucket: the name of the bucket to write to.
+      object: the name of the object.
+
+    Returns:
+      A service-specific handle of the upload to pass to WriteObjectPart
+      and CompleteMultipartUpload.
+    """
+
+    raise NotImplementedError()
+
+  def WriteObjectPart(self, bucket, object, upload, part_number, stream, size):
+    """Write one part of an object.
+
+    This function will seek() to the beginning of stream before sending.
+
+    Args:
+      bucket: the name of the bucket to write to.
+      object: the name of the object.
+      upload: the handle returned by StartMultipartUpload.
+      part_number: the number of the part, starting at 1. Parts are
+        assembled in part number order.
+      stream: a read()-able and seek()-able stream to transfer.
+      size: the number of bytes to transfer.
+
+    Returns:
+      A tuple of (start_time, latency, part), where part is a
+      service-specific handle of the part to pass to
+      CompleteMultipartUpload.
+    """
+
+    raise NotImplementedError()
+
+  def CompleteMultipartUpload(self, bucket, object, upload, parts):
+    """Assemble the written parts into the object.
+
+    Args:
+      bucket: the name of the bucket to write to.
+      object: the name of the object.
+      upload: the handle returned by StartMultipartUpload.
+      parts: a list of the part handles returned by WriteObjectPart, in
+        part number order.
+
+    Returns:
+      A tuple of (start_time, latency)
+    """
+
+    raise NotImplementedError()
+
+  def AbortMultipartUpload(self, bucket, object, upload):
+    """Discard the parts written by an upload that will not be completed.
+
+    Args:
+      bucket: the name of the bucket to write to.
+      object: the name of the object.
+      upload: the handle returned by StartMultipartUpload.
+    """
+
+    raise NotImplementedError()
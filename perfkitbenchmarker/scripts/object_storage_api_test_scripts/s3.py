@@ -20,18 +20,26 @@ import time
 
 from absl import flags
 import boto3
+from botocore import config
 # This is the path that we SCP object_storage_interface to.
 from providers import object_storage_interface
-import six
 
 FLAGS = flags.FLAGS
 
+# botocore's default size of the connection pool of a client.
+_DEFAULT_MAX_POOL_CONNECTIONS = 10
+
 
 class S3Service(object_storage_interface.ObjectStorageServiceBase):
   """An interface to AWS S3, using the boto library."""
 
   def __init__(self):
-    self.client = boto3.client('s3', region_name=FLAGS.region)
+    # Streams running in threads of one process share the client, so give
+    # each of them a pooled connection.
+    self.client = boto3.client(
+        's3', region_name=FLAGS.region,
+        config=config.Config(max_pool_connections=max(
+            _DEFAULT_MAX_POOL_CONNECTIONS, FLAGS.threads_per_process)))
 
   def ListObjects(self, bucket, prefix):
     return self.client.list_objects_v2(Bucket=bucket, Prefix=prefix)
@@ -76,8 +84,9 @@ class S3Service(object_storage_interface.ObjectStorageServiceBase):
   def WriteObjectFromBuffer(self, bucket, object_name, stream, size):
     start_time = time.time()
     stream.seek(0)
-    obj = six.BytesIO(stream.read(size))
-    self.client.put_object(Body=obj, Bucket=bucket, Key=object_name)
+    # Passing the stream rather than its contents avoids copying the payload.
+    self.client.put_object(
+        Body=stream, ContentLength=size, Bucket=bucket, Key=object_name)
     latency = time.time() - start_time
     return start_time, latency
 
@@ -88,3 +97,39 @@ class S3Service(object_storage_interface.ObjectStorageServiceBase):
     s3_response_object['Body'].read()
     latency = time.time() - start_time
     return start_time, latency
+
+  def ReadObjectRange(self, bucket, object_name, offset, size):
+    start_time = time.time()
+    s3_response_object = self.client.get_object(
+        Bucket=bucket, Key=object_name,
+        Range='bytes=%d-%d' % (offset, offset + size - 1))
+    s3_response_object['Body'].read()
+    latency = time.time() - start_time
+    return start_time, latency
+
+  def StartMultipartUpload(self, bucket, object_name):
+    return self.client.create_multipart_upload(
+        Bucket=bucket, Key=object_name)['UploadId']
+
+  def WriteObjectPart(self, bucket, object_name, upload, part_number, stream,
+                      size):
+    start_time = time.time()
+    stream.seek(0)
+    response = self.client.upload_part(
+        Body=stream, ContentLength=size, Bucket=bucket, Key=object_name,
+        PartNumber=part_number, UploadId=upload)
+    latency = time.time() - start_time
+    return start_time, latency, {'ETag': response['ETag'],
+                                 'PartNumber': part_number}
+
+  def CompleteMultipartUpload(self, bucket, object_name, upload, parts):
+    start_time = time.time()
+    self.client.complete_multipart_upload(
+        Bucket=bucket, Key=object_name, UploadId=upload,
+        MultipartUpload={'Parts': parts})
+    latency = time.time() - start_time
+    return start_time, latency
+
+  def AbortMultipartUpload(self, bucket, object_name, upload):
+    self.client.abort_multipart_upload(
+        Bucket=bucket, Key=object_name, UploadId=upload)
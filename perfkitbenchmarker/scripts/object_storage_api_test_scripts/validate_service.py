@@ -20,7 +20,6 @@ import sys
 
 from absl import flags
 import object_storage_api_tests
-import six
 from six.moves import range
 
 FLAGS = flags.FLAGS
@@ -30,13 +29,14 @@ def ValidateService(service):
   """Sanity test for the a storage service."""
   object_names = ['object_' + str(i) for i in range(10)]
   payload = object_storage_api_tests.GenerateWritePayload(100)
-  handle = six.StringIO(payload)
 
   logging.info('Starting test.')
 
   # Write objects
   for name in object_names:
-    service.WriteObjectFromBuffer(FLAGS.bucket, name, handle, 100)
+    service.WriteObjectFromBuffer(
+        FLAGS.bucket, name,
+        object_storage_api_tests.PayloadReader(payload, 100), 100)
 
   logging.info('Wrote 10 100B objects to %s.', FLAGS.bucket)
 
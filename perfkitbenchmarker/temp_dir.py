@@ -27,6 +27,7 @@ from perfkitbenchmarker import version
 
 _PERFKITBENCHMARKER = 'perfkitbenchmarker'
 _RUNS = 'runs'
+_SPOOL = 'spool'
 _VERSIONS = 'versions'
 
 _TEMP_DIR = os.path.join(tempfile.gettempdir(), _PERFKITBENCHMARKER)
@@ -54,6 +55,11 @@ def GetSshConnectionsDir():
   return os.path.join(GetRunDirPath(), 'ssh')
 
 
+def GetSampleSpoolDirPath():
+  """Gets path to the directory of samples not yet published by any run."""
+  return os.path.join(FLAGS.temp_dir, _SPOOL)
+
+
 def GetVersionDirPath(version=version.VERSION):
   """Gets path to the directory containing files specific to a PKB version."""
   return os.path.join(FLAGS.temp_dir, _VERSIONS, version)
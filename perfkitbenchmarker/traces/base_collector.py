@@ -17,6 +17,7 @@
 
 import abc
 import functools
+import gzip
 import logging
 import os
 import posixpath
@@ -26,7 +27,9 @@ import uuid
 from absl import flags
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.traces import live_telemetry
 import six
 
 FLAGS = flags.FLAGS
@@ -36,6 +39,19 @@ _TRACE_VM_GROUPS = flags.DEFINE_list(
     'By default traces runs on all VMs, for client and server achitecture,'
     'specify trace vm groups to servers to only collect metrics on server vms.')
 
+_TRACE_COMPRESS_OUTPUT = flags.DEFINE_boolean(
+    'trace_compress_output', True,
+    'Whether to gzip collector output files on the VMs before copying them '
+    'back. Compressed files are analyzed without decompressing them to disk.')
+
+_TRACE_LIVE_INTERVAL = flags.DEFINE_integer(
+    'trace_live_interval', None,
+    'If set, copies new output of collectors that support it back from the '
+    'VMs every this many seconds during the run and sends it as '
+    'live_samples_created events. The most recent points of each metric are '
+    'also published as time series samples with the collector\'s samples.',
+    lower_bound=1)
+
 
 def Register(parsed_flags):
   """Registers the collector if FLAGS.<collector> is set.
@@ -54,8 +70,17 @@ class BaseCollector(object):
   A Collector is a utility that is ran alongside benchmarks to record stats
   at various points when running a benchmark. A Base collector is an abstract
   class with common routines that derived collectors use.
+
+  Collectors that set LIVE_TELEMETRY and implement _ParseLiveLine also stream
+  their output to the runner during the run with --trace_live_interval.
+
+  Attributes:
+    live_telemetry: LiveTelemetryAggregator of the points streamed during the
+        run, or None if the collector is not streaming.
   """
 
+  LIVE_TELEMETRY = False
+
   def __init__(self, interval=None, output_directory=None):
     """Runs collector on 'vms'.
 
@@ -74,6 +99,9 @@ class BaseCollector(object):
     self._role_mapping = {}  # mapping vm role to output file
     self._start_time = 0
     self.vm_groups = {}
+    self.live_telemetry = None
+    self._live_stop = threading.Event()
+    self._live_threads = []
 
     if not os.path.isdir(self.output_directory):
       raise IOError('collector output directory does not exist: {0}'.format(
@@ -95,6 +123,86 @@ class BaseCollector(object):
     """Command to kill off the collector."""
     return 'kill {0}'.format(pid)
 
+  def _CompressCommand(self, collector_file):
+    """Command to gzip the collector file in place."""
+    return 'gzip -f {0}'.format(collector_file)
+
+  def _ParseLiveLine(self, line):
+    """Parses a line of collector output streamed during the run.
+
+    Args:
+      line: string. A complete line of the collector file.
+
+    Returns:
+      A list of (metric, value, unit) tuples.
+    """
+    raise NotImplementedError()
+
+  def _StreamFromVm(self, vm, collector_file):
+    """Copies new collector output from the VM until the collector stops."""
+    offset = 0
+    partial_line = ''
+    while not self._live_stop.wait(_TRACE_LIVE_INTERVAL.value):
+      try:
+        stdout, _ = vm.RemoteCommand(
+            'tail -c +{0} {1}'.format(offset + 1, collector_file))
+      except errors.VirtualMachine.RemoteCommandError:
+        logging.warning('Failed streaming collector output from %s.', vm.name)
+        continue
+      offset += len(stdout.encode())
+      lines = (partial_line + stdout).split('\n')
+      partial_line = lines.pop()
+      timestamp = time.time()
+      samples = []
+      for line in lines:
+        try:
+          points = self._ParseLiveLine(line)
+        except ValueError:
+          logging.debug('Skipping unparsable %s line from %s: %r',
+                        self._CollectorName(), vm.name, line)
+          continue
+        for metric, value, unit in points:
+          self.live_telemetry.Add(vm.name, metric, timestamp, value, unit)
+          samples.append(
+              sample.Sample(metric, value, unit, {
+                  'vm_name': vm.name,
+                  'event': self._CollectorName(),
+              }, timestamp))
+      if samples:
+        events.live_samples_created.send(self, vm=vm, samples=samples)
+
+  def _StartStreaming(self, vms):
+    """Starts streaming collector output from the VMs."""
+    self.live_telemetry = live_telemetry.LiveTelemetryAggregator()
+    self._live_stop.clear()
+    for vm in vms:
+      with self._lock:
+        _, collector_file = self._pid_files[vm.name]
+      thread = threading.Thread(
+          target=self._StreamFromVm, args=(vm, collector_file))
+      thread.daemon = True
+      thread.start()
+      self._live_threads.append(thread)
+
+  def _StopStreaming(self):
+    """Stops streaming collector output, waiting for in-flight copies."""
+    self._live_stop.set()
+    for thread in self._live_threads:
+      thread.join()
+    self._live_threads = []
+
+  def _AddLiveTelemetrySamples(self, samples):
+    """Adds time series samples of the points streamed during the run.
+
+    Collectors that set LIVE_TELEMETRY call this from Analyze.
+
+    Args:
+      samples: The list of samples to extend.
+    """
+    if self.live_telemetry:
+      samples.extend(self.live_telemetry.GetSamples(
+          _TRACE_LIVE_INTERVAL.value, {'event': self._CollectorName()}))
+
   def _StartOnVm(self, vm, suffix=''):
     """Start collector, having it write to an output file."""
     self._InstallCollector(vm)
@@ -117,13 +225,32 @@ class BaseCollector(object):
       with self._lock:
         pid, file_name = self._pid_files.pop(vm.name)
     vm.RemoteCommand(self._KillCommand(pid), ignore_failure=True)
+    self._role_mapping[vm_role] = self._PullOutput(vm, file_name)
+
+  def _PullOutput(self, vm, file_name):
+    """Copies a collector file back from 'vm', compressing it first.
+
+    Args:
+      vm: The VM the file is on.
+      file_name: The path of the file on the VM.
+
+    Returns:
+      The path on the VM of the file that was copied back, which is the path
+      of the compressed file if the file was compressed.
+    """
+    if _TRACE_COMPRESS_OUTPUT.value:
+      if not vm.TryRemoteCommand(self._CompressCommand(file_name)):
+        logging.warning('Failed compressing collector result on %s, copying '
+                        'it uncompressed.', vm.name)
+      else:
+        file_name += '.gz'
 
     try:
       vm.PullFile(self.output_directory, file_name)
-      self._role_mapping[vm_role] = file_name
     except errors.VirtualMachine.RemoteCommandError as ex:
       logging.exception('Failed fetching collector result from %s.', vm.name)
       raise ex
+    return file_name
 
   def Start(self, sender, benchmark_spec):
     """Install and start collector on VMs specified in trace vm groups'."""
@@ -151,6 +278,8 @@ class BaseCollector(object):
     func = functools.partial(self._StartOnVm, suffix=id_suffix)
     vm_util.RunThreaded(func, vms)
     self._start_time = time.time()
+    if _TRACE_LIVE_INTERVAL.value and self.LIVE_TELEMETRY:
+      self._StartStreaming(vms)
     return
 
   def Stop(self, sender, benchmark_spec, name=''):  # pylint: disable=unused-argument
@@ -164,6 +293,7 @@ class BaseCollector(object):
       sender: sender of the event to stop the collector.
       name: name of event to be stopped.
     """
+    self._StopStreaming()
     events.record_event.send(sender, event=name,
                              start_timestamp=self._start_time,
                              end_timestamp=time.time(),
@@ -175,6 +305,21 @@ class BaseCollector(object):
     vm_util.RunThreaded(self._StopOnVm, args)
     return
 
+  def _OpenOutput(self, collector_file):
+    """Opens a collector file copied back from a VM for reading.
+
+    Args:
+      collector_file: The path of the collector file on the VM.
+
+    Returns:
+      A file object reading the local copy of the file as text, decompressing
+      it while reading if it was compressed on the VM.
+    """
+    path = os.path.join(self.output_directory, os.path.basename(collector_file))
+    if path.endswith('.gz'):
+      return gzip.open(path, 'rt')
+    return open(path, 'r')
+
   @abc.abstractmethod
   def Analyze(self, sender, benchmark_spec, samples):
     """Analyze collector file and record samples."""
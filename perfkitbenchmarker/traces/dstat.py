@@ -119,8 +119,7 @@ class _DStatCollector(base_collector.BaseCollector):
                   sample.Sample(label, value, '', individual_sample_metadata))
 
     def _Analyze(role, file):
-      with open(os.path.join(self.output_directory,
-                             os.path.basename(file)), 'r') as f:
+      with self._OpenOutput(file) as f:
         fp = iter(f)
         labels, out = dstat.ParseCsvFile(fp)
         vm_util.RunThreaded(
@@ -0,0 +1,102 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Rolling windows of collector metrics streamed from VMs during a run."""
+
+import array
+import threading
+
+from absl import flags
+from perfkitbenchmarker import sample
+
+_TRACE_LIVE_WINDOW = flags.DEFINE_integer(
+    'trace_live_window', 720,
+    'The number of most recent points of each collector metric kept on the '
+    'runner when running with --trace_live_interval.', lower_bound=1)
+
+
+class _RingBuffer(object):
+  """Fixed size buffer of (timestamp, value) points, overwriting the oldest."""
+
+  def __init__(self, size):
+    self._timestamps = array.array('d', [0.0] * size)
+    self._values = array.array('d', [0.0] * size)
+    self._next = 0
+    self._count = 0
+
+  def Append(self, timestamp, value):
+    self._timestamps[self._next] = timestamp
+    self._values[self._next] = value
+    self._next = (self._next + 1) % len(self._values)
+    self._count = min(self._count + 1, len(self._values))
+
+  def Points(self):
+    """Returns the points in the buffer from oldest to newest."""
+    start = (self._next - self._count) % len(self._values)
+    indices = [(start + i) % len(self._values) for i in range(self._count)]
+    return [(self._timestamps[i], self._values[i]) for i in indices]
+
+
+class LiveTelemetryAggregator(object):
+  """Keeps rolling windows of metric points streamed from VMs.
+
+  Points are kept per (vm name, metric) series in fixed size ring buffers of
+  --trace_live_window points, so memory does not grow with the run length.
+  """
+
+  def __init__(self, window=None):
+    self._window = window or _TRACE_LIVE_WINDOW.value
+    self._lock = threading.Lock()
+    self._series = {}
+    self._units = {}
+
+  def Add(self, vm_name, metric, timestamp, value, unit):
+    """Adds a point to the series of the metric on the VM."""
+    key = (vm_name, metric)
+    with self._lock:
+      if key not in self._series:
+        self._series[key] = _RingBuffer(self._window)
+        self._units[key] = unit
+      self._series[key].Append(timestamp, value)
+
+  def GetWindow(self, vm_name, metric):
+    """Returns the (timestamp, value) points kept for the series."""
+    with self._lock:
+      if (vm_name, metric) not in self._series:
+        return []
+      return self._series[(vm_name, metric)].Points()
+
+  def GetSamples(self, interval, metadata=None):
+    """Returns a time series sample of the window kept for each series.
+
+    Args:
+      interval: The interval between points in seconds.
+      metadata: Optional dict of metadata added to each sample.
+
+    Returns:
+      A list of sample.Sample objects.
+    """
+    with self._lock:
+      series = [(key, buf.Points(), self._units[key])
+                for key, buf in sorted(self._series.items())]
+    samples = []
+    for (vm_name, metric), points, unit in series:
+      sample_metadata = {'vm_name': vm_name}
+      sample_metadata.update(metadata or {})
+      samples.append(
+          sample.CreateTimeSeriesSample(
+              [value for _, value in points],
+              [int(timestamp * 1000) for timestamp, _ in points],
+              metric + '_time_series',
+              unit, interval, additional_metadata=sample_metadata))
+    return samples
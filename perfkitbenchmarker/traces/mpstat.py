@@ -48,7 +48,6 @@ For more details, see https://linux.die.net/man/1/mpstat.
 import datetime
 import json
 import logging
-import os
 from typing import Any, Dict, List, Optional
 
 from absl import flags
@@ -406,10 +405,8 @@ class MpstatCollector(base_collector.BaseCollector):
 
     def _Analyze(role, output):
       """Parse file and record samples."""
-      with open(
-          os.path.join(self.output_directory, os.path.basename(output)),
-          'r') as fp:
-        output = json.loads(fp.read())
+      with self._OpenOutput(output) as fp:
+        output = json.load(fp)
         metadata = {
             'event': 'mpstat',
             'role': role,
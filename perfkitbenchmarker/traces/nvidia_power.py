@@ -14,8 +14,7 @@
 """Runs nvidia-smi power.draw on VMs."""
 
 import csv
-import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from absl import flags
 from perfkitbenchmarker import events
@@ -57,10 +56,22 @@ class _NvidiaPowerCollector(base_collector.BaseCollector):
   Runs Nvidia on the VMs.
   """
 
+  LIVE_TELEMETRY = True
+
   def _CollectorName(self) -> str:
     """See base class."""
     return 'nvidia_power'
 
+  def _ParseLiveLine(self, line: str) -> List[Tuple[str, float, str]]:
+    """See base class.
+
+    Parses lines of the form "0, 71.32 W", skipping the csv header.
+    """
+    index, _, power = line.partition(',')
+    if not index.strip().isdigit():
+      return []
+    return [(f'gpu{index.strip()}_power', float(power.split()[0]), 'watts')]
+
   def _CollectorRunCommand(self, vm: virtual_machine.BaseVirtualMachine,
                            collector_file: str) -> str:
     """See base class."""
@@ -71,9 +82,7 @@ class _NvidiaPowerCollector(base_collector.BaseCollector):
     """Analyze Nvidia power and record samples."""
 
     def _Analyze(role: str, collector_file: str) -> None:
-      with open(
-          os.path.join(self.output_directory, os.path.basename(collector_file)),
-          'r') as fp:
+      with self._OpenOutput(collector_file) as fp:
         metadata = {
             'event': 'nvidia_power',
             'nvidia_interval': self.interval,
@@ -83,6 +92,7 @@ class _NvidiaPowerCollector(base_collector.BaseCollector):
 
     vm_util.RunThreaded(
         _Analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
+    self._AddLiveTelemetrySamples(samples)
 
 
 def Register(parsed_flags: flags) -> None:
@@ -16,7 +16,6 @@
 import collections
 import json
 import logging
-import os
 
 from absl import flags
 from perfkitbenchmarker import data
@@ -100,9 +99,7 @@ class _OTELCollector(base_collector.BaseCollector):
       parsed_metrics = collections.defaultdict(
           lambda: collections.defaultdict(list))
 
-      with open(
-          os.path.join(self.output_directory, os.path.basename(file)),
-          'r') as file_contents:
+      with self._OpenOutput(file) as file_contents:
 
         for data_element in file_contents:
           data_element = json.loads(data_element)
@@ -0,0 +1,244 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiles VMs with Linux perf during the run.
+
+Counts hardware and software events with perf stat and samples on-CPU call
+stacks with perf record. The stacks are folded on the VMs, so only the folded
+stacks are copied back. Publishes the event counts, IPC, the cache miss rate
+and the functions with the most samples.
+"""
+
+import collections
+import copy
+
+from absl import flags
+from perfkitbenchmarker import events
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import stages
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.traces import base_collector
+import six
+
+_PERF_PROFILE = flags.DEFINE_boolean(
+    'perf_profile', False,
+    'Run perf stat and perf record on each VM to profile each benchmark run.')
+_EVENTS = flags.DEFINE_list(
+    'perf_profile_events', [
+        'cycles', 'instructions', 'cache-references', 'cache-misses',
+        'context-switches'
+    ], 'The perf events counted on each VM during the run.')
+_FREQUENCY = flags.DEFINE_integer(
+    'perf_profile_frequency', 99,
+    'The frequency in Hz at which perf record samples call stacks.',
+    lower_bound=1)
+_COMMS = flags.DEFINE_list(
+    'perf_profile_comms', None,
+    'Only fold the call stacks of processes with these command names, e.g. '
+    'the benchmark\'s server process. Default: all processes.')
+_TOP_FUNCTIONS = flags.DEFINE_integer(
+    'perf_profile_top_functions', 10,
+    'The number of functions with the most samples to publish.',
+    lower_bound=0)
+_PUBLISH = flags.DEFINE_boolean(
+    'perf_profile_publish', True, 'Whether to publish perf profile samples.')
+
+FLAGS = flags.FLAGS
+
+# Folds "perf script -F comm,ip,sym" output into one "comm;root;...;leaf count"
+# line per distinct stack.
+_FOLD_AWK = (
+    '/^\\t/ {sym = $2; sub(/\\+0x[0-9a-f]+$/, "", sym); '
+    'stack = (stack == "" ? sym : sym ";" stack); next} '
+    '/^$/ {if (stack != "") folded[comm ";" stack]++; stack = ""; next} '
+    '{comm = $1} '
+    'END {if (stack != "") folded[comm ";" stack]++; '
+    'for (s in folded) print s, folded[s]}')
+
+
+def _ParsePerfStat(fp):
+  """Parses perf stat output in csv format.
+
+  Sample output e.g.
+  # started on Mon Jun 12 17:02:17 2023
+
+  1201932711,,cycles,10004321543,100.00,,
+  1802443516,,instructions,10004321543,100.00,1.50,insn per cycle
+  <not supported>,,cache-misses,0,100.00,,
+
+  Args:
+    fp: the perf stat output, as an iterable of lines.
+
+  Returns:
+    A dict mapping each counted event to its count.
+  """
+  counts = {}
+  for line in fp:
+    fields = line.strip().split(',')
+    if len(fields) < 3 or line.startswith('#'):
+      continue
+    try:
+      counts[fields[2]] = float(fields[0])
+    except ValueError:
+      continue  # <not counted> or <not supported>
+  return counts
+
+
+def _ParseFoldedStacks(fp):
+  """Returns the number of samples of each leaf function in folded stacks."""
+  function_samples = collections.Counter()
+  for line in fp:
+    stack, _, count = line.strip().rpartition(' ')
+    if not stack:
+      continue
+    function_samples[stack.split(';')[-1]] += int(count)
+  return function_samples
+
+
+def _PerfProfileResults(metadata, counts, function_samples, top_functions):
+  """Returns samples of perf event counts and hot functions.
+
+  Args:
+    metadata: metadata of the samples.
+    counts: dict mapping perf events to their counts.
+    function_samples: collections.Counter of samples of each function.
+    top_functions: the number of functions with the most samples to return.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  samples = [
+      sample.Sample(event, count, 'count', metadata)
+      for event, count in sorted(counts.items())
+  ]
+  if counts.get('cycles') and 'instructions' in counts:
+    samples.append(
+        sample.Sample('ipc', counts['instructions'] / counts['cycles'], '',
+                      metadata))
+  if counts.get('cache-references') and 'cache-misses' in counts:
+    samples.append(
+        sample.Sample(
+            'cache_miss_rate',
+            100.0 * counts['cache-misses'] / counts['cache-references'], '%',
+            metadata))
+  total = sum(function_samples.values())
+  for rank, (function, count) in enumerate(
+      function_samples.most_common(top_functions)):
+    function_metadata = copy.deepcopy(metadata)
+    function_metadata.update({
+        'function': function,
+        'rank': rank + 1,
+        'samples': count
+    })
+    samples.append(
+        sample.Sample('hot_function', 100.0 * count / total, '%',
+                      function_metadata))
+  return samples
+
+
+class _PerfProfileCollector(base_collector.BaseCollector):
+  """Profiles VMs with perf stat and perf record."""
+
+  def __init__(self, interval=None, output_directory=None):
+    super(_PerfProfileCollector, self).__init__(interval, output_directory)
+    self._folded_mapping = {}  # mapping vm role to folded stacks file
+
+  def _CollectorName(self):
+    return 'perf_profile'
+
+  def _InstallCollector(self, vm):
+    vm.Install('perf')
+
+  def _CollectorRunCommand(self, vm, collector_file):
+    """See base class.
+
+    perf stat counts events system wide for as long as the perf record it
+    runs is sampling. Echoes the pid of perf stat.
+    """
+    return ("sudo sh -c 'perf stat -a -x, -e {events} -o {output} -- "
+            "perf record -a -g -F {frequency} -o {output}.data "
+            "> /dev/null 2>&1 & echo $!'").format(
+                events=','.join(_EVENTS.value),
+                output=collector_file,
+                frequency=_FREQUENCY.value)
+
+  def _KillCommand(self, pid):
+    """See base class.
+
+    Interrupts the perf record run by perf stat, so that both flush their
+    output, and waits for them to exit.
+    """
+    return ('sudo pkill -INT -P {0}; '
+            'while sudo kill -0 {0} 2> /dev/null; do sleep 1; done').format(pid)
+
+  def _CompressCommand(self, collector_file):
+    """See base class.
+
+    Runs as sudo as the perf stat output is owned by root.
+    """
+    return 'sudo gzip -f {}'.format(collector_file)
+
+  def _FoldCommand(self, collector_file):
+    """Command folding the stacks sampled by perf record."""
+    comms = '--comms {} '.format(','.join(_COMMS.value)) if _COMMS.value else ''
+    return ('sudo perf script -F comm,ip,sym -i {output}.data {comms}'
+            "2> /dev/null | awk '{awk}' > {output}.folded").format(
+                output=collector_file, comms=comms, awk=_FOLD_AWK)
+
+  def _StopOnVm(self, vm, vm_role):
+    """See base class. Also folds the sampled stacks and copies them back."""
+    with self._lock:
+      _, collector_file = self._pid_files.get(vm.name, (None, None))
+    super(_PerfProfileCollector, self)._StopOnVm(vm, vm_role)
+    if not collector_file:
+      return
+    vm.RemoteCommand(self._FoldCommand(collector_file))
+    self._folded_mapping[vm_role] = self._PullOutput(
+        vm, collector_file + '.folded')
+    vm.RemoteCommand('sudo rm -f {}.data'.format(collector_file),
+                     ignore_failure=True)
+
+  def Analyze(self, unused_sender, benchmark_spec, samples):
+    """Analyze perf output and record samples."""
+
+    def _Analyze(role, stat_file):
+      """Parse files and record samples."""
+      with self._OpenOutput(stat_file) as fp:
+        counts = _ParsePerfStat(fp)
+      function_samples = collections.Counter()
+      if role in self._folded_mapping:
+        with self._OpenOutput(self._folded_mapping[role]) as fp:
+          function_samples = _ParseFoldedStacks(fp)
+      metadata = {
+          'event': 'perf_profile',
+          'role': role,
+          'perf_profile_frequency': _FREQUENCY.value,
+      }
+      samples.extend(
+          _PerfProfileResults(metadata, counts, function_samples,
+                              _TOP_FUNCTIONS.value))
+
+    vm_util.RunThreaded(
+        _Analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
+
+
+def Register(parsed_flags):
+  """Registers the perf profile collector if FLAGS.perf_profile is set."""
+  if not parsed_flags.perf_profile:
+    return
+  collector = _PerfProfileCollector(output_directory=vm_util.GetTempDir())
+  events.before_phase.connect(collector.Start, stages.RUN, weak=False)
+  events.after_phase.connect(collector.Stop, stages.RUN, weak=False)
+  if parsed_flags.perf_profile_publish:
+    events.benchmark_samples_created.connect(collector.Analyze, weak=False)
@@ -45,6 +45,30 @@ flags.DEFINE_boolean('sar_publish', True,
 FLAGS = flags.FLAGS
 
 
+def _ParseStealLine(line):
+  """Parses a line of sar output.
+
+  Args:
+    line: a line of sar output.
+
+  Returns:
+    A (metric, steal percent, user percent) tuple, or None if the line does
+    not contain steal time.
+  """
+  line_split = line.split()
+  if not line_split:
+    return None
+  if line_split[0] == 'Linux':
+    return None
+  if line_split[-2] == '%steal':
+    return None
+  if line_split[0] == 'Average:':
+    metric = 'average_steal'
+  else:
+    metric = 'steal'
+  return metric, float(line_split[-2]), float(line_split[3])
+
+
 def _AddStealResults(metadata, output, samples):
   """Appends average Steal Time %'s to the samples list.
 
@@ -60,26 +84,19 @@ def _AddStealResults(metadata, output, samples):
 
   Args:
     metadata: metadata of the sample.
-    output: the output of the stress-ng benchmark.
+    output: the output of sar, as a string or an iterable of lines.
     samples: list of samples to return.
   """
-  output_lines = output.splitlines()
+  if isinstance(output, str):
+    output = output.splitlines()
 
-  for line in output_lines:
-    line_split = line.split()
-    if not line_split:
-      continue
-    if line_split[0] == 'Linux':
-      continue
-    if line_split[-2] == '%steal':
+  for line in output:
+    result = _ParseStealLine(line)
+    if not result:
       continue
-    if line_split[0] == 'Average:':
-      metric = 'average_steal'
-    else:
-      metric = 'steal'
-    value = float(line_split[-2])  # parse %steal time
+    metric, value, user_percent = result
 
-    my_metadata = {'user_percent': float(line_split[3])}
+    my_metadata = {'user_percent': user_percent}
     my_metadata.update(metadata)
 
     samples.append(
@@ -93,9 +110,18 @@ class _SarCollector(base_collector.BaseCollector):
   Installs sysstat and runs sar on a collection of VMs.
   """
 
+  LIVE_TELEMETRY = True
+
   def _CollectorName(self):
     return 'sar'
 
+  def _ParseLiveLine(self, line):
+    """See base class."""
+    result = _ParseStealLine(line)
+    if not result or result[0] != 'steal':
+      return []
+    return [('steal', result[1], '%'), ('user', result[2], '%')]
+
   def _InstallCollector(self, vm):
     vm.InstallPackages('sysstat')
 
@@ -112,18 +138,17 @@ class _SarCollector(base_collector.BaseCollector):
 
     def _Analyze(role, f):
       """Parse file and record samples."""
-      with open(os.path.join(self.output_directory, os.path.basename(f)),
-                'r') as fp:
-        output = fp.read()
+      with self._OpenOutput(f) as fp:
         metadata = {
             'event': 'sar',
             'sar_interval': self.interval,
             'role': role,
         }
-        _AddStealResults(metadata, output, samples)
+        _AddStealResults(metadata, fp, samples)
 
     vm_util.RunThreaded(
         _Analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
+    self._AddLiveTelemetrySamples(samples)
 
 
 def Register(parsed_flags):
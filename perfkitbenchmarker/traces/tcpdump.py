@@ -96,6 +96,13 @@ class _TcpdumpCollector(base_collector.BaseCollector):
     """
     return 'sudo kill -s INT {}; sleep 3'.format(pid)
 
+  def _CompressCommand(self, collector_file):
+    """See base class.
+
+    Runs as sudo as the capture file is owned by root.
+    """
+    return 'sudo gzip -f {}'.format(collector_file)
+
   def _InstallCollector(self, vm):
     """See base class."""
     vm.InstallPackages('tcpdump')
@@ -21,6 +21,8 @@ operate on the VM: boot, shutdown, etc.
 
 import abc
 import contextlib
+import dataclasses
+import functools
 import logging
 import os.path
 import socket
@@ -31,6 +33,7 @@ from typing import Any, Dict, List, Optional, Union
 
 from absl import flags
 import jinja2
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import background_workload
 from perfkitbenchmarker import benchmark_lookup
 from perfkitbenchmarker import context as pkb_context
@@ -51,6 +54,15 @@ DEFAULT_USERNAME = 'perfkit'
 QUOTA_EXCEEDED_MESSAGE = 'Creation failed due to quota exceeded: '
 
 
+@dataclasses.dataclass
+class RemoteCommandResult():
+  """Output of a single command issued through RemoteCommandBatch."""
+  command: str
+  stdout: str
+  stderr: str
+  retcode: int
+
+
 def ValidateVmMetadataFlag(options_list):
   """Verifies correct usage of the vm metadata flag.
 
@@ -411,6 +423,58 @@ class BaseOsMixin(six.with_metaclass(abc.ABCMeta, object)):
     """
     raise NotImplementedError()
 
+  def RemoteCommandBatch(
+      self,
+      commands: List[str],
+      stop_on_failure: bool = True,
+      ignore_failure: bool = False,
+      should_log: bool = False,
+      timeout: Optional[int] = None) -> List[RemoteCommandResult]:
+    """Runs a sequence of commands on the VM.
+
+    Each command runs as if issued through its own RemoteCommand call. This
+    implementation issues one RemoteCommand per command; subclasses may ship
+    the whole batch in a single session.
+
+    Args:
+      commands: The commands to run, in order.
+      stop_on_failure: Whether to skip the remaining commands once one fails.
+      ignore_failure: Ignore any failure if set to true.
+      should_log: Whether to log the command output at the info level.
+      timeout: The time to wait in seconds for the whole batch.
+
+    Returns:
+      A RemoteCommandResult for each command that was run.
+
+    Raises:
+      RemoteCommandError: If a command failed and ignore_failure is false.
+    """
+    results = []
+    for command in commands:
+      try:
+        stdout, stderr = self.RemoteCommand(
+            command, should_log=should_log, timeout=timeout)
+        retcode = 0
+      except errors.VirtualMachine.RemoteCommandError as e:
+        stdout, stderr, retcode = '', str(e), 1
+      results.append(RemoteCommandResult(command, stdout, stderr, retcode))
+      if retcode and stop_on_failure:
+        break
+    self._RaiseOnBatchFailure(results, ignore_failure)
+    return results
+
+  def _RaiseOnBatchFailure(self, results: List[RemoteCommandResult],
+                           ignore_failure: bool) -> None:
+    """Raises a RemoteCommandError for the first failed batch command."""
+    if ignore_failure:
+      return
+    for result in results:
+      if result.retcode:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Got non-zero return code (%s) executing %s\n'
+            'STDOUT: %sSTDERR: %s' %
+            (result.retcode, result.command, result.stdout, result.stderr))
+
   def TryRemoteCommand(self, command, **kwargs):
     """Runs a remote command and returns True iff it succeeded."""
     try:
@@ -637,6 +701,18 @@ class BaseOsMixin(six.with_metaclass(abc.ABCMeta, object)):
     """Installs a PerfKit package on the VM."""
     raise NotImplementedError()
 
+  def InstallAll(self, package_names):
+    """Installs PerfKit packages on the VM.
+
+    OSes may install the packages concurrently and share package manager calls
+    between them.
+
+    Args:
+      package_names: list of names of PerfKit packages.
+    """
+    for package_name in package_names:
+      self.Install(package_name)
+
   @abc.abstractmethod
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -655,6 +731,10 @@ class BaseOsMixin(six.with_metaclass(abc.ABCMeta, object)):
     """Perform OS specific setup on any local disks that exist."""
     pass
 
+  def CloseRemoteConnections(self):
+    """Closes any persistent connections held open to the VM."""
+    pass
+
   def LogVmDebugInfo(self):
     """Logs OS-specific debug info. Must be overridden on an OS mixin."""
     pass
@@ -1276,47 +1356,71 @@ class BaseVirtualMachine(BaseOsMixin, resource.BaseResource):
           code does not match the sha256 of the file.
     """
     for filename in filenames:
-      if data.ResourceExists(filename):
-        local_tar_file_path = data.ResourcePath(filename)
-        self.PushFile(local_tar_file_path, install_path)
-        continue
-      url = fallback_url.get(filename)
       sha256sum = preprovisioned_data.get(filename)
-      try:
-        preprovisioned = self.ShouldDownloadPreprovisionedData(
-            module_name, filename)
-      except NotImplementedError:
-        logging.info('The provider does not implement '
-                     'ShouldDownloadPreprovisionedData. Attempting to '
-                     'download the data via URL')
-        preprovisioned = False
       if not FLAGS.preprovision_ignore_checksum and not sha256sum:
+        if data.ResourceExists(filename):
+          self.PushFile(data.ResourcePath(filename), install_path)
+          continue
         raise errors.Setup.BadPreprovisionedDataError(
             'Cannot find sha256sum hash for file %s in module %s. Might want '
             'to run using --preprovision_ignore_checksum (not recommended). '
             'See README.md for information about preprovisioned data. '
             'Cannot find file in /data directory either, fail to upload from '
             'local directory.' % (filename, module_name))
+      artifact_cache.Install(
+          self, module_name, sha256sum, filename, install_path,
+          functools.partial(self._FetchData, module_name, filename,
+                            install_path, fallback_url.get(filename),
+                            sha256sum))
 
-      if preprovisioned:
-        self.DownloadPreprovisionedData(install_path, module_name, filename)
-      elif url:
-        self.Install('wget')
-        file_name = os.path.basename(url)
-        self.RemoteCommand(
-            'wget -O {0} {1}'.format(
-                os.path.join(install_path, file_name), url))
-      else:
-        raise errors.Setup.BadPreprovisionedDataError(
-            'Cannot find preprovisioned file %s inside preprovisioned bucket '
-            'in module %s. See README.md for information about '
-            'preprovisioned data. '
-            'Cannot find fallback url of the file to download from web. '
-            'Cannot find file in /data directory either, fail to upload from '
-            'local directory.' % (filename, module_name))
-      if not FLAGS.preprovision_ignore_checksum:
-        self.CheckPreprovisionedData(
-            install_path, module_name, filename, sha256sum)
+  def _FetchData(self, module_name, filename, install_path, url, sha256sum):
+    """Fetches a preprovisioned data file to this VM.
+
+    Pushes the file from the local data directory if it is there. Otherwise
+    downloads it from the preprovisioned data bucket or from url.
+
+    Args:
+      module_name: The name of the module defining the preprovisioned data.
+      filename: The name of the preprovisioned data file.
+      install_path: The path to download the data file.
+      url: The fallback url to download the file from, or None.
+      sha256sum: The expected sha256sum hash of the file.
+
+    Raises:
+      errors.Setup.BadPreprovisionedDataError: If the file cannot be found, or
+          if its sha256sum hash does not match sha256sum.
+    """
+    if data.ResourceExists(filename):
+      self.PushFile(data.ResourcePath(filename), install_path)
+      return
+    try:
+      preprovisioned = self.ShouldDownloadPreprovisionedData(
+          module_name, filename)
+    except NotImplementedError:
+      logging.info('The provider does not implement '
+                   'ShouldDownloadPreprovisionedData. Attempting to '
+                   'download the data via URL')
+      preprovisioned = False
+
+    if preprovisioned:
+      self.DownloadPreprovisionedData(install_path, module_name, filename)
+    elif url:
+      self.Install('wget')
+      file_name = os.path.basename(url)
+      self.RemoteCommand(
+          'wget -O {0} {1}'.format(
+              os.path.join(install_path, file_name), url))
+    else:
+      raise errors.Setup.BadPreprovisionedDataError(
+          'Cannot find preprovisioned file %s inside preprovisioned bucket '
+          'in module %s. See README.md for information about '
+          'preprovisioned data. '
+          'Cannot find fallback url of the file to download from web. '
+          'Cannot find file in /data directory either, fail to upload from '
+          'local directory.' % (filename, module_name))
+    if not FLAGS.preprovision_ignore_checksum:
+      self.CheckPreprovisionedData(
+          install_path, module_name, filename, sha256sum)
 
   def InstallPreprovisionedBenchmarkData(self, benchmark_name, filenames,
                                          install_path):
@@ -1518,6 +1622,7 @@ class BaseVirtualMachine(BaseOsMixin, resource.BaseResource):
   def _PreDelete(self):
     """See base class."""
     self.LogVmDebugInfo()
+    self.CloseRemoteConnections()
 
 
 VirtualMachine = typing.TypeVar('VirtualMachine', bound=BaseVirtualMachine)
@@ -15,6 +15,7 @@
 """Set of utility functions for working with virtual machines."""
 
 
+import asyncio
 import contextlib
 import logging
 import os
@@ -22,10 +23,10 @@ import platform
 import posixpath
 import random
 import re
+import selectors
 import string
 import subprocess
 import tempfile
-import threading
 import time
 from typing import Callable, Dict, Iterable, Optional, Tuple
 
@@ -34,6 +35,7 @@ import jinja2
 from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import temp_dir
 from six.moves import range
 
@@ -64,6 +66,11 @@ OUTPUT_STDOUT = 0
 OUTPUT_STDERR = 1
 OUTPUT_EXIT_CODE = 2
 
+# Bytes read from a command's output pipe at a time.
+_PIPE_READ_SIZE = 65536
+# Seconds between checks for process exit where a pidfd is not available.
+_PIPE_POLL_INTERVAL = 0.05
+
 flags.DEFINE_integer('default_timeout', TIMEOUT, 'The default timeout for '
                      'retryable commands in seconds.')
 flags.DEFINE_integer('burn_cpu_seconds', 0,
@@ -175,6 +182,12 @@ def GetPublicKeyPath():
   return PrependTempDir(PUBLIC_KEYFILE)
 
 
+def GetSshControlPath():
+  """Returns the ControlPath used for SSH connection reuse."""
+  return (FLAGS.ssh_control_path or
+          os.path.join(temp_dir.GetSshConnectionsDir(), '%h'))
+
+
 def GetSshOptions(ssh_key_filename, connect_timeout=None):
   """Return common set of SSH and SCP options."""
   options = [
@@ -194,10 +207,8 @@ def GetSshOptions(ssh_key_filename, connect_timeout=None):
   if FLAGS.use_ipv6:
     options.append('-6')
   if FLAGS.ssh_reuse_connections:
-    control_path = (FLAGS.ssh_control_path or
-                    os.path.join(temp_dir.GetSshConnectionsDir(), '%h'))
     options.extend([
-        '-o', 'ControlPath="%s"' % control_path,
+        '-o', 'ControlPath="%s"' % GetSshControlPath(),
         '-o', 'ControlMaster=auto',
         '-o', 'ControlPersist=%s' % FLAGS.ssh_control_persist
     ])
@@ -273,24 +284,104 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
   return Wrap
 
 
-class _BoxedObject(object):
-  """Box a value in a reference so it is modifiable inside an inner function.
+def _ReadIssueCommandOutput(
+    process: subprocess.Popen,
+    timeout: Optional[float],
+    line_callback: Optional[Callable[[int, str], None]] = None,
+    max_output_bytes: Optional[int] = None) -> Tuple[str, str, bool]:
+  """Reads IssueCommand output from the process pipes until it exits.
 
-  In python3 the nonlocal keyword could be used instead - but for python2
-  there is no support for modifying an external scoped variable value.
-  """
+  Output is read in the calling thread by multiplexing the stdout and stderr
+  pipes with a selector, so no temporary files or timer threads are needed.
+  On Linux the process is also watched through a pidfd so that exit is
+  noticed immediately even if a daemonized grandchild (e.g. an ssh
+  ControlPersist master) keeps the pipes open.
 
-  def __init__(self, initial_value):
-    self.value = initial_value
+  Args:
+    process: The process started by IssueCommand.
+    timeout: Seconds to wait for the process before killing it, or None.
+    line_callback: Called with (OUTPUT_STDOUT or OUTPUT_STDERR, line) for each
+        complete line of output as it is read.
+    max_output_bytes: If set, only the last max_output_bytes of each stream are
+        kept.
 
+  Returns:
+    A tuple of stdout, stderr, and whether the timeout was reached.
+  """
+  deadline = None if timeout is None else time.time() + timeout
+  buffers = {OUTPUT_STDOUT: bytearray(), OUTPUT_STDERR: bytearray()}
+  partial_lines = {OUTPUT_STDOUT: b'', OUTPUT_STDERR: b''}
+
+  def _HandleChunk(stream, chunk):
+    buf = buffers[stream]
+    buf += chunk
+    if max_output_bytes is not None and len(buf) > max_output_bytes:
+      del buf[:len(buf) - max_output_bytes]
+    if line_callback:
+      lines = (partial_lines[stream] + chunk).split(b'\n')
+      partial_lines[stream] = lines.pop()
+      for line in lines:
+        line_callback(stream, line.decode('ascii', 'ignore'))
+
+  did_timeout = False
+  with selectors.DefaultSelector() as selector:
+    selector.register(process.stdout, selectors.EVENT_READ, OUTPUT_STDOUT)
+    selector.register(process.stderr, selectors.EVENT_READ, OUTPUT_STDERR)
+    pidfd = None
+    if hasattr(os, 'pidfd_open'):
+      try:
+        pidfd = os.pidfd_open(process.pid)
+        selector.register(pidfd, selectors.EVENT_READ, OUTPUT_EXIT_CODE)
+      except OSError:
+        pidfd = None
+    try:
+      while True:
+        exited = process.poll() is not None
+        open_pipes = len(selector.get_map()) - (pidfd is not None)
+        if exited and not open_pipes:
+          break
+        if deadline is None:
+          wait = None
+        else:
+          wait = deadline - time.time()
+          if wait <= 0 and not exited:
+            did_timeout = True
+            process.kill()
+            process.wait()
+            continue
+        if exited:
+          # Drain what is already buffered without waiting on pipes that a
+          # lingering grandchild may hold open.
+          wait = 0
+        elif pidfd is None:
+          wait = _PIPE_POLL_INTERVAL if wait is None else min(
+              wait, _PIPE_POLL_INTERVAL)
+        events = selector.select(wait)
+        if exited and not events:
+          break
+        for key, _ in events:
+          if key.data == OUTPUT_EXIT_CODE:
+            selector.unregister(pidfd)
+            os.close(pidfd)
+            pidfd = None
+            continue
+          chunk = os.read(key.fd, _PIPE_READ_SIZE)
+          if chunk:
+            _HandleChunk(key.data, chunk)
+          else:
+            selector.unregister(key.fileobj)
+    finally:
+      if pidfd is not None:
+        os.close(pidfd)
+      process.stdout.close()
+      process.stderr.close()
 
-def _ReadIssueCommandOutput(tf_out, tf_err):
-  """Reads IssueCommand Output from stdout and stderr."""
-  tf_out.seek(0)
-  stdout = tf_out.read().decode('ascii', 'ignore')
-  tf_err.seek(0)
-  stderr = tf_err.read().decode('ascii', 'ignore')
-  return stdout, stderr
+  if line_callback:
+    for stream, line in partial_lines.items():
+      if line:
+        line_callback(stream, line.decode('ascii', 'ignore'))
+  return (buffers[OUTPUT_STDOUT].decode('ascii', 'ignore'),
+          buffers[OUTPUT_STDERR].decode('ascii', 'ignore'), did_timeout)
 
 
 def IssueCommand(
@@ -302,7 +393,9 @@ def IssueCommand(
     cwd: Optional[str] = None,
     raise_on_failure: bool = True,
     suppress_failure: Optional[Callable[[str, str, int], bool]] = None,
-    raise_on_timeout: bool = True) -> Tuple[str, str, int]:
+    raise_on_timeout: bool = True,
+    line_callback: Optional[Callable[[int, str], None]] = None,
+    max_output_bytes: Optional[int] = None) -> Tuple[str, str, int]:
   """Tries running the provided command once.
 
   Args:
@@ -332,6 +425,11 @@ def IssueCommand(
         exist.
     raise_on_timeout: A boolean indicating if killing the process due to the
         timeout being hit should raise a IssueCommandTimeoutError
+    line_callback: A function passed (OUTPUT_STDOUT or OUTPUT_STDERR, line)
+        for each line of output as the command produces it, e.g. to follow
+        the progress of a long running command.
+    max_output_bytes: If set, only the last max_output_bytes of stdout and of
+        stderr are kept, bounding memory for very chatty commands.
 
   Returns:
     A tuple of stdout, stderr, and retcode from running the provided command.
@@ -348,6 +446,7 @@ def IssueCommand(
   # type error or NPE.
   full_cmd = ' '.join(str(w) for w in cmd)
   logging.info('Running: %s', full_cmd)
+  events.command_issued.send(cmd)
 
   time_file_path = '/usr/bin/time'
 
@@ -356,9 +455,7 @@ def IssueCommand(
   should_time = (not (running_on_windows or running_on_darwin) and
                  os.path.isfile(time_file_path) and FLAGS.time_commands)
   shell_value = running_on_windows
-  with tempfile.TemporaryFile() as tf_out, \
-      tempfile.TemporaryFile() as tf_err, \
-      tempfile.NamedTemporaryFile(mode='r') as tf_timing:
+  with tempfile.NamedTemporaryFile(mode='r') as tf_timing:
 
     cmd_to_use = cmd
     if should_time:
@@ -369,8 +466,8 @@ def IssueCommand(
 
     try:
       process = subprocess.Popen(cmd_to_use, env=env, shell=shell_value,
-                                 stdin=subprocess.PIPE, stdout=tf_out,
-                                 stderr=tf_err, cwd=cwd)
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE, cwd=cwd)
     except TypeError as e:
       # Only perform this validation after a type error, in case we are being
       # too strict.
@@ -380,34 +477,60 @@ def IssueCommand(
             f'Command {cmd} contains non-string elements {non_strings}.') from e
       raise
 
-    did_timeout = _BoxedObject(False)
-    was_killed = _BoxedObject(False)
-
-    def _KillProcess():
-      did_timeout.value = True
-      if not raise_on_timeout:
-        logging.warning('IssueCommand timed out after %d seconds. '
-                        'Killing command "%s".', timeout, full_cmd)
-      process.kill()
-      was_killed.value = True
-
-    timer = threading.Timer(timeout, _KillProcess)
-    timer.start()
-
     try:
+      if running_on_windows:
+        # Selectors do not support pipes on Windows.
+        try:
+          stdout, stderr = process.communicate(timeout=timeout)
+          did_timeout = False
+        except subprocess.TimeoutExpired:
+          process.kill()
+          stdout, stderr = process.communicate()
+          did_timeout = True
+        stdout = stdout.decode('ascii', 'ignore')
+        stderr = stderr.decode('ascii', 'ignore')
+      else:
+        stdout, stderr, did_timeout = _ReadIssueCommandOutput(
+            process, timeout, line_callback, max_output_bytes)
+    except BaseException:
+      process.kill()
       process.wait()
-    finally:
-      timer.cancel()
-
-    stdout, stderr = _ReadIssueCommandOutput(tf_out, tf_err)
+      raise
+    if did_timeout and not raise_on_timeout:
+      logging.warning('IssueCommand timed out after %d seconds. '
+                      'Killing command "%s".', timeout, full_cmd)
 
     timing_output = ''
     if should_time:
       timing_output = tf_timing.read().rstrip('\n')
 
+  return _HandleIssueCommandResult(
+      full_cmd, stdout, stderr, process.returncode, timing_output, did_timeout,
+      timeout, force_info_log, suppress_warning, raise_on_failure,
+      suppress_failure, raise_on_timeout)
+
+
+def _HandleIssueCommandResult(
+    full_cmd: str, stdout: str, stderr: str, retcode: int, timing_output: str,
+    did_timeout: bool, timeout: Optional[float], force_info_log: bool,
+    suppress_warning: bool, raise_on_failure: bool,
+    suppress_failure: Optional[Callable[[str, str, int], bool]],
+    raise_on_timeout: bool) -> Tuple[str, str, int]:
+  """Logs the result of an issued command and applies its failure handling.
+
+  See IssueCommand for a description of the arguments.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode to return to the caller.
+
+  Raises:
+    IssueCommandError: When raise_on_failure=True and retcode is non-zero.
+    IssueCommandTimeoutError:  When raise_on_timeout=True and
+                               command duration exceeds timeout
+  """
   debug_text = ('Ran: {%s}\nReturnCode:%s%s\nSTDOUT: %s\nSTDERR: %s' %
-                (full_cmd, process.returncode, timing_output, stdout, stderr))
-  if force_info_log or (process.returncode and not suppress_warning):
+                (full_cmd, retcode, timing_output, stdout, stderr))
+  if force_info_log or (retcode and not suppress_warning):
     logging.info(debug_text)
   else:
     logging.debug(debug_text)
@@ -415,24 +538,109 @@ def IssueCommand(
   # Raise timeout error regardless of raise_on_failure - as the intended
   # semantics is to ignore expected errors caused by invoking the command
   # not errors from PKB infrastructure.
-  if did_timeout.value and raise_on_timeout:
+  if did_timeout and raise_on_timeout:
     debug_text = (
         '{0}\nIssueCommand timed out after {1} seconds.  '
-        '{2} by perfkitbenchmarker.'.format(
-            debug_text, timeout,
-            'Process was killed' if was_killed.value else
-            'Process may have been killed'))
+        'Process was killed by perfkitbenchmarker.'.format(debug_text, timeout))
     raise errors.VmUtil.IssueCommandTimeoutError(debug_text)
-  elif process.returncode and (raise_on_failure or suppress_failure):
+  elif retcode and (raise_on_failure or suppress_failure):
     if (suppress_failure and
-        suppress_failure(stdout, stderr, process.returncode)):
+        suppress_failure(stdout, stderr, retcode)):
       # failure is suppressible, rewrite the stderr and return code as passing
       # since some callers assume either is a failure e.g.
       # perfkitbenchmarker.providers.aws.util.IssueRetryableCommand()
       return stdout, '', 0
     raise errors.VmUtil.IssueCommandError(debug_text)
 
-  return stdout, stderr, process.returncode
+  return stdout, stderr, retcode
+
+
+async def _ReadPipeAsync(stream: asyncio.StreamReader,
+                         buffer: bytearray) -> None:
+  """Appends the output of an IssueCommandAsync pipe to buffer until EOF."""
+  while True:
+    chunk = await stream.read(_PIPE_READ_SIZE)
+    if not chunk:
+      return
+    buffer += chunk
+
+
+async def _CommunicateAsync(process: asyncio.subprocess.Process,
+                            stdout: bytearray, stderr: bytearray) -> None:
+  """Reads an IssueCommandAsync process's output until EOF and its exit."""
+  await asyncio.gather(_ReadPipeAsync(process.stdout, stdout),
+                       _ReadPipeAsync(process.stderr, stderr), process.wait())
+
+
+async def IssueCommandAsync(
+    cmd: Iterable[str],
+    force_info_log: bool = False,
+    suppress_warning: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[int] = DEFAULT_TIMEOUT,
+    cwd: Optional[str] = None,
+    raise_on_failure: bool = True,
+    suppress_failure: Optional[Callable[[str, str, int], bool]] = None,
+    raise_on_timeout: bool = True) -> Tuple[str, str, int]:
+  """Coroutine version of IssueCommand.
+
+  Runs the command with asyncio.create_subprocess_exec so that thousands of
+  commands can be in flight from a single event loop without a thread per
+  command. Use background_tasks.RunParallelCoroutines to call this from
+  synchronous code. The command is not wrapped in /usr/bin/time. The output is
+  read until EOF, so a command that leaves a background process holding its
+  stdout or stderr open runs until the timeout.
+
+  See IssueCommand for a description of the arguments.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode from running the provided command.
+
+  Raises:
+    IssueCommandError: When raise_on_failure=True and retcode is non-zero.
+    IssueCommandTimeoutError:  When raise_on_timeout=True and
+                               command duration exceeds timeout
+  """
+  if env:
+    logging.debug('Environment variables: %s', env)
+  full_cmd = ' '.join(str(w) for w in cmd)
+  logging.info('Running: %s', full_cmd)
+  events.command_issued.send(cmd)
+
+  process = await asyncio.create_subprocess_exec(
+      *cmd, env=env, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE)
+  process.stdin.close()
+  # The output is read into the buffers as it arrives, so what was read before
+  # a timeout is kept.
+  stdout, stderr = bytearray(), bytearray()
+  did_timeout = False
+  try:
+    try:
+      await asyncio.wait_for(_CommunicateAsync(process, stdout, stderr),
+                             timeout)
+    except asyncio.TimeoutError:
+      did_timeout = True
+      if not raise_on_timeout:
+        logging.warning('IssueCommand timed out after %d seconds. '
+                        'Killing command "%s".', timeout, full_cmd)
+      process.kill()
+      try:
+        await asyncio.wait_for(_CommunicateAsync(process, stdout, stderr),
+                               timeout)
+      except asyncio.TimeoutError:
+        logging.warning('A process started by the killed command "%s" still '
+                        'holds its output open.', full_cmd)
+  except BaseException:
+    if process.returncode is None:
+      process.kill()
+    raise
+
+  return _HandleIssueCommandResult(
+      full_cmd, stdout.decode('ascii', 'ignore'),
+      stderr.decode('ascii', 'ignore'), process.returncode, '', did_timeout,
+      timeout, force_info_log, suppress_warning, raise_on_failure,
+      suppress_failure, raise_on_timeout)
 
 
 def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
@@ -0,0 +1,196 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.artifact_cache."""
+
+import hashlib
+import os
+import threading
+import unittest
+
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import errors
+from tests import pkb_common_test_case
+
+_SHA256 = 'abc123'
+
+
+class ArtifactCacheTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(ArtifactCacheTestCase, self).setUp()
+    self.cache = artifact_cache.ArtifactCache()
+    self.lock = threading.Lock()
+    self.copies = []  # (source, target) pairs.
+    self.max_uploads = 0
+    self.uploads = {}
+
+  def _CreateVm(self, name):
+    vm = mock.Mock()
+    vm.name = name
+
+    def _MoveFile(target, source_path, remote_path, use_internal_ip):
+      del source_path, remote_path, use_internal_ip
+      with self.lock:
+        self.uploads[vm.name] = self.uploads.get(vm.name, 0) + 1
+        self.max_uploads = max(self.max_uploads, self.uploads[vm.name])
+        self.copies.append((vm.name, target.name))
+      with self.lock:
+        self.uploads[vm.name] -= 1
+
+    vm.MoveFile.side_effect = _MoveFile
+    return vm
+
+  def _InstallOnAll(self, vms, fetch_function):
+    threads = [
+        threading.Thread(
+            target=self.cache.Install,
+            args=(vm, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                  fetch_function)) for vm in vms
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  def testFetchesOnceAndCopiesToPeers(self):
+    vms = [self._CreateVm('vm%d' % i) for i in range(8)]
+    fetch = mock.Mock()
+    self._InstallOnAll(vms, fetch)
+    fetch.assert_called_once_with()
+    self.assertEqual(self.cache.fetches, 1)
+    self.assertEqual(self.cache.peer_copies, 7)
+    targets = [target for _, target in self.copies]
+    seeds = [vm for vm in vms if vm.name not in targets]
+    self.assertLen(seeds, 1)
+    self.assertCountEqual(targets, [vm.name for vm in vms if vm not in seeds])
+    seeds[0].CheckPreprovisionedData.assert_not_called()
+
+  def testCopiedFilesAreVerified(self):
+    seed, peer = self._CreateVm('seed'), self._CreateVm('peer')
+    self.cache.Install(seed, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    self.cache.Install(peer, 'module', _SHA256, 'data.tgz', '/tmp',
+                       mock.Mock())
+    seed.MoveFile.assert_called_once_with(peer, '/opt/pkb/data.tgz', '/tmp',
+                                          use_internal_ip=True)
+    peer.CheckPreprovisionedData.assert_called_once_with(
+        '/tmp', 'module', 'data.tgz', _SHA256)
+
+  def testCopiesToInternalIpWhenReachable(self):
+    seed, peer = self._CreateVm('seed'), self._CreateVm('peer')
+    peer.internal_ip = '10.0.0.2'
+    seed.IsReachable.return_value = True
+    self.cache.Install(seed, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    self.cache.Install(peer, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    seed.IsReachable.assert_called_once_with(peer)
+    self.assertTrue(seed.MoveFile.call_args[1]['use_internal_ip'])
+
+  def testCopiesToExternalIpWhenUnreachable(self):
+    seed, peer = self._CreateVm('seed'), self._CreateVm('peer')
+    peer.internal_ip = '10.0.0.2'
+    seed.IsReachable.return_value = False
+    self.cache.Install(seed, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    self.cache.Install(peer, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    self.assertFalse(seed.MoveFile.call_args[1]['use_internal_ip'])
+
+  def testFailedPeerCopyFetches(self):
+    seed, peer = self._CreateVm('seed'), self._CreateVm('peer')
+    seed.MoveFile.side_effect = errors.VirtualMachine.RemoteCommandError()
+    self.cache.Install(seed, 'module', _SHA256, 'data.tgz', '/opt/pkb',
+                       mock.Mock())
+    fetch = mock.Mock()
+    self.cache.Install(peer, 'module', _SHA256, 'data.tgz', '/opt/pkb', fetch)
+    fetch.assert_called_once_with()
+    self.assertEqual((self.cache.fetches, self.cache.peer_copies), (2, 0))
+
+  def testFailedFetchLetsAnotherVmFetch(self):
+    fetch = mock.Mock(side_effect=[ValueError(), None])
+    with self.assertRaises(ValueError):
+      self.cache.Install(self._CreateVm('vm0'), 'module', _SHA256, 'data.tgz',
+                         '/opt/pkb', fetch)
+    self.cache.Install(self._CreateVm('vm1'), 'module', _SHA256, 'data.tgz',
+                       '/opt/pkb', fetch)
+    self.assertEqual(fetch.call_count, 2)
+
+  def testSecondPathOnSameVmCopiesLocally(self):
+    vm = self._CreateVm('vm')
+    fetch = mock.Mock()
+    self.cache.Install(vm, 'module', _SHA256, 'data.tgz', '/opt/pkb', fetch)
+    self.cache.Install(vm, 'module', _SHA256, 'data.tgz', '/tmp', fetch)
+    fetch.assert_called_once_with()
+    vm.MoveFile.assert_not_called()
+    vm.RemoteCommand.assert_called_once_with('cp /opt/pkb/data.tgz /tmp')
+
+  @flagsaver.flagsaver(artifact_peer_fan_out=1)
+  def testFanOutLimitsConcurrentCopies(self):
+    vms = [self._CreateVm('vm%d' % i) for i in range(6)]
+    self._InstallOnAll(vms, mock.Mock())
+    self.assertEqual(self.max_uploads, 1)
+    self.assertEqual(self.cache.peer_copies, 5)
+
+  @flagsaver.flagsaver(artifact_peer_fan_out=0)
+  def testDisabled(self):
+    fetch = mock.Mock()
+    spec = mock.Mock(uuid='disabled')
+    with mock.patch.object(artifact_cache.context, 'GetThreadBenchmarkSpec',
+                           return_value=spec):
+      for i in range(3):
+        artifact_cache.Install(self._CreateVm('vm%d' % i), 'module', _SHA256,
+                               'data.tgz', '/opt/pkb', fetch)
+    self.assertEqual(fetch.call_count, 3)
+    self.assertEqual(artifact_cache.GetSamples(spec), [])
+
+
+class DistributeFileTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(DistributeFileTestCase, self).setUp()
+    self.local_path = self.create_tempfile(
+        'data.bin', content=b'x' * 1024, mode='wb').full_path
+    self.sha256sum = hashlib.sha256(b'x' * 1024).hexdigest()
+    self.vms = [mock.Mock(name='vm%d' % i) for i in range(5)]
+
+  def testPushesOnceAndCopiesBetweenVms(self):
+    samples = artifact_cache.DistributeFile(self.vms, self.local_path, '/tmp')
+    pushed = [vm for vm in self.vms if vm.PushFile.called]
+    self.assertLen(pushed, 1)
+    pushed[0].PushFile.assert_called_once_with(self.local_path, '/tmp')
+    self.assertEqual(
+        sum(vm.MoveFile.call_count for vm in self.vms), len(self.vms) - 1)
+    for vm in self.vms:
+      vm.CheckPreprovisionedData.assert_called_once_with(
+          '/tmp', os.path.dirname(self.local_path), 'data.bin', self.sha256sum)
+    metrics = {s.metric: s for s in samples}
+    self.assertCountEqual(
+        metrics, ['File Distribution Time', 'File Distribution Throughput'])
+    self.assertEqual(metrics['File Distribution Time'].metadata['peer_copies'],
+                     len(self.vms) - 1)
+
+  @flagsaver.flagsaver(artifact_peer_fan_out=0)
+  def testDisabledPushesToEveryVm(self):
+    samples = artifact_cache.DistributeFile(self.vms, self.local_path)
+    for vm in self.vms:
+      vm.PushFile.assert_called_once_with(self.local_path, '')
+      vm.MoveFile.assert_not_called()
+    self.assertEqual(samples[0].metadata['runner_pushes'], len(self.vms))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -15,6 +15,7 @@
 """Tests for perfkitbenchmarker.background_tasks."""
 
 
+import asyncio
 import functools
 import os
 import signal
@@ -23,6 +24,7 @@ import unittest
 
 from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from tests import pkb_common_test_case
 from six.moves import range
 
@@ -49,6 +51,22 @@ def _WaitAndAppendInt(int_list, int_to_append, event=None, timeout=None):
   int_list.append(int_to_append)
 
 
+async def _ReturnArgsAsync(a, b=None):
+  await asyncio.sleep(0)
+  return b, a
+
+
+async def _RaiseValueErrorAsync():
+  raise ValueError('ValueError')
+
+
+async def _TrackConcurrency(counter, peak):
+  counter.value += 1
+  peak.value = max(peak.value, counter.value)
+  await asyncio.sleep(0.01)
+  counter.value -= 1
+
+
 class Counter():
 
   def __init__(self):
@@ -156,6 +174,186 @@ class RunThreadedTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(result, [(None, 'red'), ('blue', 'green')])
 
 
+class AdaptiveConcurrencyLimiterTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testAdditiveIncrease(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=2, max_concurrency=4)
+    with limiter:
+      for _ in range(5):
+        limiter.OnTaskComplete()
+    self.assertEqual(limiter.concurrency, 4)
+    self.assertEqual([c for _, c in limiter.timeline], [2, 3, 4])
+
+  def testMultiplicativeDecrease(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=8, max_concurrency=16)
+
+    def _RateLimitedTwice(_):
+      events.rate_limited.send(None)
+      events.rate_limited.send(None)
+
+    background_tasks.RunThreaded(_RateLimitedTwice, [0],
+                                 concurrency_limiter=limiter)
+    self.assertEqual(limiter.concurrency, 4)
+    background_tasks.RunThreaded(lambda _: None, [0],
+                                 concurrency_limiter=limiter)
+    self.assertEqual(limiter.concurrency, 5)
+
+  def testIgnoresEventsFromOtherThreads(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=8, max_concurrency=16)
+
+    def _UnrelatedRateLimit(_):
+      thread = threading.Thread(target=events.rate_limited.send, args=(None,))
+      thread.start()
+      thread.join()
+
+    background_tasks.RunThreaded(_UnrelatedRateLimit, [0],
+                                 concurrency_limiter=limiter)
+    self.assertEqual(limiter.concurrency, 9)
+
+  def testCountsEventsFromNestedTasks(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=8, max_concurrency=16)
+
+    def _NestedRateLimit(_):
+      background_tasks.RunThreaded(events.rate_limited.send, [None])
+
+    background_tasks.RunThreaded(_NestedRateLimit, [0],
+                                 concurrency_limiter=limiter)
+    self.assertEqual(limiter.concurrency, 4)
+
+  def testIgnoresEventsOutsideContext(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=8, max_concurrency=16)
+    events.rate_limited.send(None)
+    limiter.OnTaskComplete()
+    self.assertEqual(limiter.concurrency, 9)
+
+  def testRunThreadedBacksOff(self):
+    limiter = background_tasks.AdaptiveConcurrencyLimiter(
+        initial_concurrency=4, max_concurrency=8)
+
+    def _RateLimitedTask(i):
+      if i == 0:
+        events.rate_limited.send(None)
+      return i
+
+    result = background_tasks.RunThreaded(
+        _RateLimitedTask, list(range(10)), max_concurrent_threads=8,
+        concurrency_limiter=limiter)
+    self.assertEqual(result, list(range(10)))
+    concurrencies = [c for _, c in limiter.timeline]
+    self.assertTrue(any(later < earlier for earlier, later
+                        in zip(concurrencies, concurrencies[1:])))
+
+
+class RunTaskGraphTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testDependenciesCompleteFirst(self):
+    done = []
+    tasks = [('c', functools.partial(done.append, 'c'), ['a', 'b']),
+             ('a', functools.partial(done.append, 'a'), []),
+             ('b', functools.partial(done.append, 'b'), ['a'])]
+    timings = background_tasks.RunTaskGraph(tasks)
+    self.assertEqual(done, ['a', 'b', 'c'])
+    self.assertEqual(set(timings), {'a', 'b', 'c'})
+    self.assertLessEqual(timings['b'][1], timings['c'][0])
+
+  def testIndependentTasksRunConcurrently(self):
+    barrier = threading.Barrier(2, timeout=10)
+    tasks = [('a', barrier.wait, []), ('b', barrier.wait, [])]
+    background_tasks.RunTaskGraph(tasks)
+
+  def testSerialRunsInListOrder(self):
+    done = []
+    tasks = [(name, functools.partial(done.append, name), deps)
+             for name, deps in [('a', []), ('b', ['a']), ('c', []),
+                                ('d', ['b'])]]
+    background_tasks.RunTaskGraph(tasks, max_concurrency=1)
+    self.assertEqual(done, ['a', 'b', 'c', 'd'])
+
+  def testFailureStopsDependentTasks(self):
+    done = []
+    tasks = [('a', _RaiseValueError, []),
+             ('b', functools.partial(done.append, 'b'), ['a'])]
+    with self.assertRaises(ValueError):
+      background_tasks.RunTaskGraph(tasks)
+    self.assertEqual(done, [])
+
+  def testInvalidDependencies(self):
+    with self.assertRaisesRegex(ValueError, 'Unknown'):
+      background_tasks.RunTaskGraph([('a', _RaiseValueError, ['b'])])
+    with self.assertRaisesRegex(ValueError, 'cycle'):
+      background_tasks.RunTaskGraph([('a', _RaiseValueError, ['b']),
+                                     ('b', _RaiseValueError, ['a'])])
+
+
+class RunParallelCoroutinesTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testNoCoroutines(self):
+    self.assertEqual(background_tasks.RunParallelCoroutines([]), [])
+
+  def testResultsInOrder(self):
+    result = background_tasks.RunParallelCoroutines(
+        [_ReturnArgsAsync('a', b=i) for i in range(10)])
+    self.assertEqual(result, [(i, 'a') for i in range(10)])
+
+  def testConcurrencyLimit(self):
+    counter = Counter()
+    peak = Counter()
+    background_tasks.RunParallelCoroutines(
+        [_TrackConcurrency(counter, peak) for _ in range(10)],
+        max_concurrency=3)
+    self.assertEqual(peak.value, 3)
+
+  def testException(self):
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      background_tasks.RunParallelCoroutines(
+          [_ReturnArgsAsync('a'), _RaiseValueErrorAsync()])
+
+
+class ResourcePackerTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testFirstFit(self):
+    packer = background_tasks.ResourcePacker(
+        {'vcpus': 8}, [{'vcpus': 6}, {'vcpus': 4}, {'vcpus': 2}])
+    self.assertEqual(packer.NextTask([0, 1, 2], False), 0)
+    packer.OnTaskStart(0)
+    self.assertEqual(packer.NextTask([1, 2], True), 2)
+    packer.OnTaskStart(2)
+    self.assertIsNone(packer.NextTask([1], True))
+    packer.OnTaskComplete(0)
+    self.assertEqual(packer.NextTask([1], True), 1)
+    packer.OnTaskStart(1)
+    self.assertNotIn(None, packer.queue_delays)
+
+  def testUnbudgetedResourcesAreUnlimited(self):
+    packer = background_tasks.ResourcePacker(
+        {'vcpus@us-east1': 4}, [{'vcpus': 64, 'vcpus@us-west1': 64}] * 2)
+    packer.OnTaskStart(0)
+    self.assertEqual(packer.NextTask([1], True), 1)
+
+  def testOversizedTaskRunsAlone(self):
+    packer = background_tasks.ResourcePacker({'vms': 2},
+                                             [{'vms': 1}, {'vms': 3}])
+    packer.OnTaskStart(0)
+    self.assertIsNone(packer.NextTask([1], True))
+    packer.OnTaskComplete(0)
+    self.assertEqual(packer.NextTask([1], False), 1)
+
+  def testRunParallelProcessesResultsInOrder(self):
+    calls = [(_ReturnArgs, ('a',), {'b': i}) for i in range(6)]
+    packer = background_tasks.ResourcePacker(
+        {'vms': 3}, [{'vms': 3}, {'vms': 2}, {'vms': 1}] * 2)
+    result = background_tasks.RunParallelProcesses(
+        calls, max_concurrency=4, resource_packer=packer)
+    self.assertEqual(result, [(i, 'a') for i in range(6)])
+    self.assertNotIn(None, packer.queue_delays)
+    self.assertEqual(packer._in_use['vms'], 0)
+
+
 class RunParallelProcessesTestCase(pkb_common_test_case.PkbCommonTestCase):
 
   def testFewerThreadsThanConcurrencyLimit(self):
@@ -14,6 +14,7 @@
 """Tests for perfkitbenchmarker.benchmark_spec."""
 
 import inspect
+import threading
 import unittest
 
 from absl import flags
@@ -249,6 +250,123 @@ class ConstructVmsTestCase(_BenchmarkSpecTestCase):
     self.assertEqual(spec.vm_groups['group2'][0].zone, 'us-west-2b')
 
 
+class GetResourceFootprintTestCase(_BenchmarkSpecTestCase):
+
+  def testMultiCloud(self):
+    spec = pkb_common_test_case.CreateBenchmarkSpecFromYaml(MULTI_CLOUD_CONFIG)
+    self.assertEqual(spec.GetResourceFootprint(), {
+        'vms': 2,
+        'vcpus': 12,
+        'vms@us-east-1': 1,
+        'vcpus@us-east-1': 8,
+    })
+
+  def testStaticVmsExcluded(self):
+    spec = pkb_common_test_case.CreateBenchmarkSpecFromYaml(
+        VALID_CONFIG_WITH_DISK_SPEC)
+    self.assertEqual(spec.GetResourceFootprint(), {'vms': 2, 'vcpus': 8})
+    spec = pkb_common_test_case.CreateBenchmarkSpecFromYaml(STATIC_VM_CONFIG)
+    self.assertEqual(spec.GetResourceFootprint()['vms'], 2)
+
+
+class EstimateVcpusTestCase(unittest.TestCase):
+
+  def _Estimate(self, machine_type=None, cpus=None):
+    return benchmark_spec._EstimateVcpus(
+        mock.Mock(machine_type=machine_type, cpus=cpus))
+
+  def testNamedMachineTypes(self):
+    self.assertEqual(self._Estimate('m5.2xlarge'), 8)
+    self.assertEqual(self._Estimate('m5.large'), 2)
+    self.assertEqual(self._Estimate('n2-standard-8'), 8)
+    self.assertEqual(self._Estimate('Standard_D8s_v3'), 8)
+
+  def testCustomMachineTypes(self):
+    self.assertEqual(self._Estimate('n1-custom-4-16384'), 4)
+    self.assertEqual(self._Estimate('custom-2-4096'), 2)
+    self.assertEqual(self._Estimate('n2-custom-8-32768-ext'), 8)
+    self.assertEqual(self._Estimate(cpus=6), 6)
+
+  def testMachineTypesWithoutCount(self):
+    self.assertEqual(self._Estimate('e2-medium'), 2)
+    self.assertEqual(self._Estimate('m5.metal'), 96)
+    self.assertEqual(self._Estimate('unknown'), 1)
+    self.assertEqual(self._Estimate(), 1)
+
+
+class ProvisionTestCase(_BenchmarkSpecTestCase):
+
+  def setUp(self):
+    super(ProvisionTestCase, self).setUp()
+    self.spec = pkb_common_test_case.CreateBenchmarkSpecFromYaml(SIMPLE_CONFIG)
+    self.spec.ConstructVirtualMachines()
+    self.spec.networks = {}
+    self.enter_context(mock.patch.object(self.spec, 'PrepareVmAfterBoot'))
+    self.enter_context(
+        mock.patch.object(benchmark_spec.vm_util, 'GenerateSSHConfig'))
+
+  def testIndependentResourcesProvisionedConcurrently(self):
+    # The VMs only finish booting once the Spanner instance is being created.
+    barrier = threading.Barrier(2, timeout=10)
+    self.enter_context(mock.patch.object(
+        self.spec, 'CreateAndBootVm', side_effect=lambda vm: barrier.wait()))
+    self.spec.spanner = mock.Mock(Create=lambda restore: barrier.wait())
+
+    self.spec.Provision()
+
+    self.assertEqual(set(self.spec.provisioning_timings),
+                     {'networks', 'vms', 'vm_preparation', 'spanner'})
+    samples = {s.metric: s for s in self.spec.GetSamples()}
+    self.assertEqual(
+        samples['Provisioning Critical Path Time'].metadata[
+            'provisioning_critical_path'], 'networks,vms,vm_preparation')
+
+  def testManagedDatabaseCreatedWhileVmsBoot(self):
+    barrier = threading.Barrier(2, timeout=10)
+    calls = []
+    self.enter_context(mock.patch.object(
+        self.spec, 'CreateAndBootVm', side_effect=lambda vm: barrier.wait()))
+    self.spec.relational_db = mock.Mock(
+        is_managed_db=True, Create=lambda restore: barrier.wait(),
+        SetupClientVms=lambda: calls.append('clients'))
+
+    self.spec.Provision()
+
+    self.assertEqual(calls, ['clients'])
+    self.assertEqual(self.spec.provisioning_dependencies['relational_db'],
+                     ['networks'])
+    self.assertEqual(
+        self.spec.provisioning_dependencies['relational_db_clients'],
+        ['relational_db', 'vm_preparation'])
+
+  def testVmsCreatedAfterContainerCluster(self):
+    calls = []
+    self.enter_context(mock.patch.object(
+        self.spec, 'CreateAndBootVm', side_effect=lambda vm: calls.append(
+            'vms')))
+    self.spec.container_cluster = mock.Mock(
+        Create=lambda: calls.append('container_cluster'))
+
+    self.spec.Provision()
+
+    self.assertEqual(calls, ['container_cluster', 'vms'])
+    self.assertEqual(self.spec.provisioning_dependencies['vms'],
+                     ['networks', 'container_cluster'])
+
+  @flagsaver.flagsaver(parallel_provisioning=False)
+  def testSerialProvisioning(self):
+    calls = []
+    self.enter_context(mock.patch.object(
+        self.spec, 'CreateAndBootVm', side_effect=lambda vm: calls.append(
+            'vms')))
+    self.spec.spanner = mock.Mock(
+        Create=lambda restore: calls.append('spanner'))
+
+    self.spec.Provision()
+
+    self.assertEqual(calls, ['vms', 'spanner'])
+
+
 class BenchmarkSupportTestCase(_BenchmarkSpecTestCase):
 
   def createBenchmarkSpec(self, config, benchmark):
@@ -0,0 +1,194 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.coalescing_cache."""
+
+import threading
+import time
+import unittest
+
+import mock
+from perfkitbenchmarker import coalescing_cache
+from tests import pkb_common_test_case
+
+
+class CoalescingCacheTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(CoalescingCacheTestCase, self).setUp()
+    self.batches = []
+
+  def _Square(self, keys):
+    self.batches.append(sorted(keys))
+    return {key: key * key for key in keys if key >= 0}
+
+  def _GetConcurrently(self, cache, keys):
+    results = {}
+
+    def _Get(key):
+      results[key] = cache.Get(key)
+
+    threads = [threading.Thread(target=_Get, args=(key,)) for key in keys]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return results
+
+  def testConcurrentGetsShareOneCall(self):
+    cache = coalescing_cache.CoalescingCache(self._Square, batch_window=0.2)
+    results = self._GetConcurrently(cache, range(5))
+    self.assertEqual(results, {0: 0, 1: 1, 2: 4, 3: 9, 4: 16})
+    self.assertEqual(cache.call_count, 1)
+    self.assertEqual(self.batches, [[0, 1, 2, 3, 4]])
+
+  def testMissingKeyReturnsNone(self):
+    cache = coalescing_cache.CoalescingCache(self._Square, batch_window=0)
+    self.assertIsNone(cache.Get(-1))
+
+  def testMaxBatchSize(self):
+    cache = coalescing_cache.CoalescingCache(
+        self._Square, batch_window=0.2, max_batch_size=2)
+    results = self._GetConcurrently(cache, range(5))
+    self.assertEqual(results, {0: 0, 1: 1, 2: 4, 3: 9, 4: 16})
+    self.assertEqual(sorted(len(batch) for batch in self.batches), [1, 2, 2])
+
+  def testGetRefetchesStaleValue(self):
+    cache = coalescing_cache.CoalescingCache(self._Square, batch_window=0)
+    cache.Get(2)
+    cache.Get(2)
+    self.assertEqual(cache.call_count, 2)
+
+  def testGetReturnsValueWithinMaxAge(self):
+    cache = coalescing_cache.CoalescingCache(self._Square, batch_window=0)
+    cache.Get(2)
+    self.assertEqual(cache.Get(2, max_age=60), 4)
+    self.assertEqual(cache.call_count, 1)
+
+  def testInvalidate(self):
+    cache = coalescing_cache.CoalescingCache(self._Square, batch_window=0)
+    cache.Get(2)
+    cache.Invalidate(2)
+    cache.Get(2, max_age=60)
+    self.assertEqual(cache.call_count, 2)
+
+  def testExceptionRaisedForEveryKeyInBatch(self):
+
+    def _Raise(keys):
+      raise ValueError(keys)
+
+    cache = coalescing_cache.CoalescingCache(_Raise, batch_window=0.2)
+    errors = []
+
+    def _Get(key):
+      try:
+        cache.Get(key)
+      except ValueError as e:
+        errors.append(e)
+
+    threads = [threading.Thread(target=_Get, args=(key,)) for key in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertLen(errors, 3)
+    self.assertEqual(cache.call_count, 1)
+
+
+class ResponseCacheTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(ResponseCacheTestCase, self).setUp()
+    self.cache = coalescing_cache.ResponseCache('test')
+    self.addCleanup(coalescing_cache._RESPONSE_CACHES.remove, self.cache)
+    self.fetch = mock.Mock(return_value='response')
+
+  def testGetCachesResponse(self):
+    self.assertEqual(self.cache.Get('key', self.fetch), 'response')
+    self.assertEqual(self.cache.Get('key', self.fetch), 'response')
+    self.fetch.assert_called_once_with()
+    self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+  def testZeroTtlDisablesCache(self):
+    self.cache.Get('key', self.fetch, ttl=0)
+    self.cache.Get('key', self.fetch, ttl=0)
+    self.assertEqual(self.fetch.call_count, 2)
+
+  def testExpiredResponseIsFetchedAgain(self):
+    with mock.patch.object(coalescing_cache.time, 'time', return_value=100):
+      self.cache.Get('key', self.fetch, ttl=10)
+    with mock.patch.object(coalescing_cache.time, 'time', return_value=111):
+      self.cache.Get('key', self.fetch, ttl=10)
+    self.assertEqual(self.fetch.call_count, 2)
+
+  def testShouldCache(self):
+    self.cache.Get('key', self.fetch, should_cache=lambda response: False)
+    self.cache.Get('key', self.fetch)
+    self.assertEqual(self.fetch.call_count, 2)
+
+  def testInvalidate(self):
+    self.cache.Get('a', self.fetch)
+    self.cache.Get('b', self.fetch)
+    self.cache.Invalidate(lambda key: key == 'a')
+    self.cache.Get('a', self.fetch)
+    self.cache.Get('b', self.fetch)
+    self.assertEqual(self.fetch.call_count, 3)
+
+  def testConcurrentGetsShareOneFetch(self):
+    started = threading.Event()
+    release = threading.Event()
+
+    def _Fetch():
+      started.set()
+      release.wait()
+      return 'response'
+
+    results = []
+    fetcher = threading.Thread(
+        target=lambda: results.append(self.cache.Get('key', _Fetch)))
+    fetcher.start()
+    started.wait()
+    waiter = threading.Thread(
+        target=lambda: results.append(self.cache.Get('key', self.fetch)))
+    waiter.start()
+    while not self.cache.coalesced:
+      time.sleep(0.01)
+    release.set()
+    fetcher.join()
+    waiter.join()
+    self.assertEqual(results, ['response', 'response'])
+    self.fetch.assert_not_called()
+
+  def testGetResponseCacheSamples(self):
+    self.cache.Get('key', self.fetch)
+    self.cache.Get('key', self.fetch)
+    samples = {s.metric: s for s in coalescing_cache.GetResponseCacheSamples()
+               if s.metadata['response_cache'] == 'test'}
+    self.assertEqual(samples['Response Cache Hits'].value, 1)
+    self.assertEqual(samples['Response Cache Misses'].value, 1)
+
+  def testGetResponseCacheSamplesSinceSnapshot(self):
+    self.cache.Get('key', self.fetch)
+    snapshot = coalescing_cache.SnapshotResponseCaches()
+    self.assertEmpty([s for s in coalescing_cache.GetResponseCacheSamples(
+        snapshot) if s.metadata['response_cache'] == 'test'])
+    self.cache.Get('key', self.fetch)
+    self.cache.Get('other', self.fetch)
+    samples = {s.metric: s for s in coalescing_cache.GetResponseCacheSamples(
+        snapshot) if s.metadata['response_cache'] == 'test'}
+    self.assertEqual(samples['Response Cache Hits'].value, 1)
+    self.assertEqual(samples['Response Cache Misses'].value, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
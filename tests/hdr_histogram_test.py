@@ -0,0 +1,89 @@
+# Copyright 2022 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.hdr_histogram."""
+
+import os
+import unittest
+
+from perfkitbenchmarker import hdr_histogram
+
+
+def _ReadDataFile(filename):
+  path = os.path.join(os.path.dirname(__file__), 'data', filename)
+  with open(path) as fp:
+    return fp.read()
+
+
+class HdrHistogramTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(HdrHistogramTestCase, self).setUp()
+    # Each log holds 3 one second intervals. Expected values were computed
+    # with the reference HdrHistogram implementation.
+    self.client_logs = [
+        hdr_histogram.ParseIntervalLog(_ReadDataFile(filename))
+        for filename in ('ycsb-hdr-client-0.hdr', 'ycsb-hdr-client-1.hdr')
+    ]
+
+  def testParseIntervalLog(self):
+    intervals = self.client_logs[1]
+    self.assertEqual(3, len(intervals))
+    self.assertEqual([1000] * 3, [h.total_count for h in intervals])
+    self.assertAlmostEqual(1523565997.35, intervals[0].start_time)
+    self.assertAlmostEqual(1523565999.35, intervals[2].start_time)
+    self.assertEqual(1.0, intervals[0].interval_length)
+
+  def testMergePercentiles(self):
+    merged = hdr_histogram.Merge(self.client_logs[0] + self.client_logs[1])
+    self.assertEqual(4500, merged.total_count)
+    self.assertEqual(75, merged.GetValueAtPercentile(0))
+    self.assertEqual(1113, merged.GetValueAtPercentile(50))
+    self.assertEqual(7227, merged.GetValueAtPercentile(99))
+    self.assertEqual(13695, merged.GetValueAtPercentile(100))
+    self.assertEqual(13695, merged.GetMax())
+    self.assertAlmostEqual(1523565997.1, merged.start_time)
+    self.assertAlmostEqual(3.25, merged.interval_length)
+
+  def testMergeIntervals(self):
+    merged = [
+        hdr_histogram.Merge([first, second])
+        for first, second in zip(*self.client_logs)
+    ]
+    self.assertEqual(
+        [(1500, 394, 1184), (1500, 1119, 3509), (1500, 2967, 9143)],
+        [(h.total_count, h.GetValueAtPercentile(50),
+          h.GetValueAtPercentile(99)) for h in merged])
+
+  def testGetBuckets(self):
+    histogram = self.client_logs[0][0]
+    values, counts = histogram.GetBuckets()
+    self.assertEqual(histogram.total_count, counts.sum())
+    self.assertTrue((values[1:] > values[:-1]).all())
+    self.assertEqual(histogram.GetMax(), values[-1])
+
+  def testMergeDifferentLayouts(self):
+    with self.assertRaises(ValueError):
+      hdr_histogram.HdrHistogram(3).Add(hdr_histogram.HdrHistogram(2))
+
+  def testEmptyHistogramPercentile(self):
+    with self.assertRaises(ValueError):
+      hdr_histogram.HdrHistogram().GetValueAtPercentile(50)
+
+  def testInvalidEncoding(self):
+    with self.assertRaises(ValueError):
+      hdr_histogram.HdrHistogram.Decode('AAAAAAAAAAA=')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -15,10 +15,15 @@
 """Tests for object storage service benchmark."""
 
 import datetime
+import gzip
+import json
+import os
 import time
 import unittest
 from absl import flags
+from absl.testing import flagsaver
 import mock
+import numpy as np
 
 from perfkitbenchmarker.linux_benchmarks import object_storage_service_benchmark
 from tests import pkb_common_test_case
@@ -135,5 +140,143 @@ class TestColdObjectsWrittenFiles(pkb_common_test_case.PkbCommonTestCase):
       self.assertLessEqual(age, 73)
 
 
+class TestProcessMultiStreamResults(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(TestProcessMultiStreamResults, self).setUp()
+    FLAGS.object_storage_streams_per_vm = 2
+    FLAGS.num_vms = 1
+    # Stream 0 stops at 0.5, 1.5, 2.5, 3.5 and stream 1 at 1, 2, 3, so all
+    # streams are active from 0.5 to 3.
+    self.start_times = [np.array([0.0, 1.0, 2.0, 3.0]),
+                        np.array([0.5, 1.5, 2.5])]
+    self.latencies = [np.full(4, 0.5), np.full(3, 0.5)]
+    self.sizes = [np.array([100, 200, 100, 200]), np.array([100, 100, 200])]
+
+  def _Process(self):
+    results = []
+    object_storage_service_benchmark.ProcessMultiStreamResults(
+        self.start_times, self.latencies, self.sizes, 'upload', [100, 200],
+        results)
+    return results
+
+  def testActiveWindow(self):
+    samples = {s.metric: s for s in self._Process()}
+    self.assertEqual(
+        samples['Multi-stream upload QPS (all streams active)'].value, 2.0)
+    self.assertEqual(
+        samples['Multi-stream upload QPS (any stream active)'].value, 2.0)
+    # Stream 0 moves 300 bytes in 1 second of operations and stream 1 moves
+    # 400 bytes in 1.5 seconds.
+    self.assertAlmostEqual(
+        samples['Multi-stream upload net throughput'].value,
+        300 * 8 + 400 / 1.5 * 8)
+    self.assertAlmostEqual(
+        samples['Multi-stream upload total gap time'].value, 1.5)
+
+  def testPercentilesBySize(self):
+    results = self._Process()
+    p50 = {s.metadata['object_size_B']: s.metadata for s in results
+           if s.metric == 'Multi-stream upload latency p50'}
+    self.assertCountEqual(p50, ['distribution', 100, 200])
+
+  @flagsaver.flagsaver(object_storage_latency_histogram_interval=0.2)
+  def testLatencyHistogram(self):
+    histograms = [s for s in self._Process() if s.metric ==
+                  'Multi-stream upload latency histogram']
+    self.assertEqual([s.metadata['histogram'] for s in histograms],
+                     ['0,0,4', '0,0,3'])
+
+  @flagsaver.flagsaver(object_storage_throughput_time_series_interval=1)
+  def testThroughputTimeSeries(self):
+    time_series, = [s for s in self._Process() if s.metric ==
+                    'Multi-stream upload throughput time series']
+    self.assertEqual(time_series.metadata['values'],
+                     [800.0, 2400.0, 1600.0, 3200.0])
+    self.assertEqual(time_series.metadata['timestamps'], [0, 1000, 2000, 3000])
+
+
+class TestParallelTransferThroughputBenchmark(
+    pkb_common_test_case.PkbCommonTestCase):
+
+  def testSamples(self):
+    percentiles = {
+        p: 1.0 for p in object_storage_service_benchmark.PERCENTILES_LIST}
+    raw_result = '\n'.join(
+        'INFO:root:Parallel transfer %s %s: %s' %
+        (operation, name, json.dumps(percentiles))
+        for operation in ('upload', 'download')
+        for name in ('throughput in Bps', 'latency in seconds',
+                     'part throughput in Bps', 'part latency in seconds'))
+    vm = mock.Mock()
+    vm.RemoteCommand.return_value = ('', raw_result)
+    command_builder = mock.Mock()
+    results = []
+    object_storage_service_benchmark.ParallelTransferThroughputBenchmark(
+        results, {}, vm, command_builder, mock.Mock(), 'bucket')
+    self.assertIn('--part_size=8388608',
+                  command_builder.BuildCommand.call_args[0][0])
+    samples = {s.metric: s for s in results}
+    self.assertLen(
+        samples, 8 * len(object_storage_service_benchmark.PERCENTILES_LIST))
+    self.assertEqual(
+        samples['parallel transfer upload throughput Mbps p50'].value, 8e-6)
+    self.assertEqual(
+        samples['parallel transfer download part latency p99'].value, 1.0)
+    self.assertEqual(
+        samples['parallel transfer download part latency p99'].metadata[
+            'parallel_parts'], 8)
+
+  def testMissingResults(self):
+    vm = mock.Mock()
+    vm.RemoteCommand.return_value = ('', '')
+    with self.assertRaises(ValueError):
+      object_storage_service_benchmark.ParallelTransferThroughputBenchmark(
+          [], {}, vm, mock.Mock(), mock.Mock(), 'bucket')
+
+
+class TestLoadWorkerOutput(pkb_common_test_case.PkbCommonTestCase):
+
+  def testJsonOutput(self):
+    output = [json.dumps([{'stream_num': 0, 'start_times': [1.0, 2.0],
+                           'latencies': [0.5, 0.7], 'sizes': [100, 200]}])]
+    start_times, latencies, sizes = (
+        object_storage_service_benchmark.LoadWorkerOutput(output))
+    np.testing.assert_array_equal(start_times[0], [1.0, 2.0])
+    np.testing.assert_array_equal(latencies[0], [0.5, 0.7])
+    np.testing.assert_array_equal(sizes[0], [100, 200])
+
+  def testBinaryResultsFiles(self):
+    local_dir = self.create_tempdir().full_path
+    results_dir = os.path.join(
+        local_dir, object_storage_service_benchmark.WORKER_RESULTS_DIR)
+    os.makedirs(results_dir)
+    records = np.array(
+        [(1.0, 0.5, 100, 0), (2.0, 0.7, 200, 1), (3.0, 0.2, 300, 0)],
+        dtype=object_storage_service_benchmark.WORKER_RESULT_DTYPE)
+    with gzip.open(os.path.join(results_dir, 'stream_4.bin.gz'), 'wb') as f:
+      f.write(records.tobytes())
+    output = [json.dumps([{'stream_num': 4, 'num_records': 3,
+                           'num_succeeded': 2,
+                           'results_file': '/tmp/pkb/results/stream_4.bin'}])]
+    start_times, latencies, sizes = (
+        object_storage_service_benchmark.LoadWorkerOutput(output, [local_dir]))
+    np.testing.assert_array_equal(start_times[0], [1.0, 3.0])
+    np.testing.assert_array_equal(latencies[0], [0.5, 0.2])
+    np.testing.assert_array_equal(sizes[0], [100, 300])
+
+  def testBinaryResultsFileRecordCountMismatch(self):
+    path = os.path.join(self.create_tempdir().full_path, 'stream_0.bin.gz')
+    records = np.array(
+        [(1.0, 0.5, 100, 0), (2.0, 0.7, 200, 0)],
+        dtype=object_storage_service_benchmark.WORKER_RESULT_DTYPE)
+    with gzip.open(path, 'wb') as f:
+      f.write(records.tobytes())
+    for num_records in (1, 3):
+      with self.assertRaises(AssertionError):
+        object_storage_service_benchmark.LoadWorkerResultsFile(
+            path, num_records)
+
+
 if __name__ == '__main__':
   unittest.main()
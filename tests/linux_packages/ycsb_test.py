@@ -275,6 +275,47 @@ class HdrLogsParserTestCase(unittest.TestCase):
                 (20.0, 0.949, 50396), (30.0, 1.033, 49759)]
     self.assertEqual(actual, expected)
 
+  def testCombineRawHdrLogs(self):
+    rawlogs = {
+        'read': [
+            open_data_file('ycsb-hdr-client-0.hdr'),
+            open_data_file('ycsb-hdr-client-1.hdr')
+        ]
+    }
+    combined = ycsb.CombineRawHdrLogs(ycsb.ParseRawHdrLogs(rawlogs))
+    histogram = combined['read']
+    self.assertEqual(4500, sum(count for _, _, count in histogram))
+    self.assertEqual((0.0, 0.075), histogram[0][:2])
+    self.assertEqual(13.695, histogram[-1][1])
+    percentiles = ycsb._PercentilesFromHistogram(
+        [value_count[-2:] for value_count in histogram], [50, 99])
+    self.assertEqual({'p50': 1.113, 'p99': 7.227}, dict(percentiles))
+
+  def testParseRawHdrLogsSkipsEmptyLogs(self):
+    rawlogs = {'read': [open_data_file('ycsb-hdr-client-0.hdr'), '\n']}
+    self.assertEqual(1, len(ycsb.ParseRawHdrLogs(rawlogs)['read']))
+
+  def testCreateHdrTimeSeriesSamples(self):
+    rawlogs = {
+        'read': [
+            open_data_file('ycsb-hdr-client-0.hdr'),
+            open_data_file('ycsb-hdr-client-1.hdr')
+        ]
+    }
+    samples = ycsb._CreateHdrTimeSeriesSamples(
+        ycsb.ParseRawHdrLogs(rawlogs), stage='run')
+    self.assertEqual(['OPS_time_series', 'Latency_time_series',
+                      'Latency_time_series'], [s.metric for s in samples])
+    ops, p50, p99 = samples
+    self.assertEqual([1500.0] * 3, ops.metadata['values'])
+    self.assertEqual([1523565997100, 1523565998100, 1523565999100],
+                     ops.metadata['timestamps'])
+    self.assertEqual('read', ops.metadata['operation'])
+    self.assertEqual('run', ops.metadata['stage'])
+    self.assertEqual(50, p50.metadata['percentile'])
+    self.assertEqual([0.394, 1.119, 2.967], p50.metadata['values'])
+    self.assertEqual([1.184, 3.509, 9.143], p99.metadata['values'])
+
 
 class PrerequisitesTestCase(pkb_common_test_case.PkbCommonTestCase):
 
@@ -14,6 +14,12 @@
 
 """Tests for linux_virtual_machine.py."""
 
+import asyncio
+import os
+import subprocess
+import threading
+import time
+import types
 from typing import Dict, Union
 import unittest
 
@@ -216,6 +222,139 @@ class LogDmesgTestCase(pkb_common_test_case.PkbCommonTestCase):
     remote_command.assert_called_once_with('hostname && dmesg', should_log=True)
 
 
+class SshControlMasterTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super().setUp()
+    FLAGS.ssh_reuse_connections = True
+    FLAGS.ssh_control_path = os.path.join(self.create_tempdir().full_path,
+                                          '%h')
+    self.vm = CreateTestLinuxVm()
+    self.vm.ip_address = '1.2.3.4'
+    self.control_socket = FLAGS.ssh_control_path.replace('%h', '1.2.3.4')
+
+  def testCloseWithoutSocketIsNoop(self):
+    with mock.patch.object(linux_virtual_machine.vm_util,
+                           'IssueCommand') as issue_command:
+      self.vm.CloseRemoteConnections()
+    issue_command.assert_not_called()
+
+  def testCloseSendsExit(self):
+    self.create_tempfile(self.control_socket)
+    with mock.patch.object(linux_virtual_machine.vm_util, 'IssueCommand',
+                           return_value=('', '', 0)) as issue_command:
+      self.vm.CloseRemoteConnections()
+    ssh_cmd = issue_command.call_args[0][0]
+    self.assertEqual(ssh_cmd[:3], ['ssh', '-O', 'exit'])
+    self.assertIn('perfkit@1.2.3.4', ssh_cmd)
+
+  def testStaleSocketRemovedAfterSshFailure(self):
+    self.create_tempfile(self.control_socket)
+    FLAGS.ssh_retries = 2
+    with mock.patch.object(
+        linux_virtual_machine.vm_util, 'IssueCommand',
+        side_effect=[('', '', 255), ('', '', 255), ('out', '', 0)]):
+      stdout, _ = self.vm.RemoteHostCommand('hostname')
+    self.assertEqual('out', stdout)
+    self.assertFalse(os.path.exists(self.control_socket))
+
+  def testSessionsLimitedPerVm(self):
+    FLAGS.ssh_max_sessions_per_vm = 2
+    vm = CreateTestLinuxVm()
+    lock = threading.Lock()
+    active = [0]
+    max_active = [0]
+
+    def FakeIssueCommand(*args, **kwargs):
+      del args, kwargs
+      with lock:
+        active[0] += 1
+        max_active[0] = max(max_active[0], active[0])
+      time.sleep(0.05)
+      with lock:
+        active[0] -= 1
+      return '', '', 0
+
+    with mock.patch.object(linux_virtual_machine.vm_util, 'IssueCommand',
+                           side_effect=FakeIssueCommand):
+      threads = [threading.Thread(target=vm.RemoteCommand, args=('true',))
+                 for _ in range(6)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    self.assertEqual(2, max_active[0])
+
+
+class RemoteCommandAsyncTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.vm = CreateTestLinuxVm()
+    self.vm.ip_address = '1.2.3.4'
+
+  def testRetriesSshFailure(self):
+    FLAGS.ssh_retries = 3
+    issue_command = mock.AsyncMock(
+        side_effect=[('', '', 255), ('out', '', 0)])
+    with mock.patch.object(linux_virtual_machine.vm_util, 'IssueCommandAsync',
+                           issue_command):
+      stdout, _ = asyncio.run(self.vm.RemoteCommandAsync('hostname'))
+    self.assertEqual('out', stdout)
+    self.assertEqual(2, issue_command.call_count)
+    self.assertEqual('hostname', issue_command.call_args[0][0][-1])
+
+  def testFailureRaises(self):
+    with mock.patch.object(linux_virtual_machine.vm_util, 'IssueCommandAsync',
+                           mock.AsyncMock(return_value=('', 'err', 1))):
+      with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+        asyncio.run(self.vm.RemoteCommandAsync('false'))
+
+
+def _RunLocally(command, **_):
+  process = subprocess.run(['bash', '-c', command], capture_output=True,
+                           text=True, check=False)
+  return process.stdout, process.stderr
+
+
+class RemoteCommandBatchTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.vm = CreateTestLinuxVm()
+    self.enter_context(mock.patch.object(
+        self.vm, 'RemoteCommand', side_effect=_RunLocally))
+
+  def testSingleSession(self):
+    results = self.vm.RemoteCommandBatch(
+        ['echo one', 'printf two; echo err >&2', 'cd /; pwd'])
+    self.vm.RemoteCommand.assert_called_once()
+    self.assertEqual([('one\n', '', 0), ('two', 'err\n', 0), ('/\n', '', 0)],
+                     [(r.stdout, r.stderr, r.retcode) for r in results])
+
+  def testStopOnFailure(self):
+    results = self.vm.RemoteCommandBatch(
+        ['true', 'exit 3', 'echo skipped'], ignore_failure=True)
+    self.assertEqual([0, 3], [r.retcode for r in results])
+
+  def testContinueOnFailure(self):
+    results = self.vm.RemoteCommandBatch(
+        ['exit 3', 'echo ran'], stop_on_failure=False, ignore_failure=True)
+    self.assertEqual([3, 0], [r.retcode for r in results])
+    self.assertEqual('ran\n', results[1].stdout)
+
+  def testFailureRaises(self):
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RemoteCommandBatch(['false'])
+
+  def testTruncatedBatch(self):
+    self.vm.RemoteCommand.side_effect = lambda *_, **__: ('', 'lost')
+    results = self.vm.RemoteCommandBatch(['true', 'true'], ignore_failure=True)
+    self.assertEqual(
+        [linux_virtual_machine.RETRYABLE_SSH_RETCODE],
+        [r.retcode for r in results])
+
+
 class TestLsCpu(unittest.TestCase, test_util.SamplesTestMixin):
 
   LSCPU_DATA = {
@@ -601,5 +740,113 @@ class LinuxVirtualMachineTestCase(pkb_common_test_case.PkbCommonTestCase):
       mock_remote.assert_called_with('sudo reboot', ignore_failure=True)
 
 
+class MoveHostFileTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(MoveHostFileTestCase, self).setUp()
+    self.vm = CreateTestLinuxVm()
+    self.vm.has_private_key = True
+    self.target = CreateTestLinuxVm()
+    self.target.ip_address = '203.0.113.2'
+    self.target.internal_ip = '10.0.0.2'
+    self.mock_cmd = self.enter_context(
+        mock.patch.object(self.vm, 'RemoteHostCommand'))
+
+  def testExternalIp(self):
+    self.vm.MoveHostFile(self.target, '/tmp/data.tgz', '/opt/pkb')
+    self.assertIn('@203.0.113.2:/opt/pkb', self.mock_cmd.call_args[0][0])
+
+  def testInternalIp(self):
+    self.vm.MoveFile(self.target, '/tmp/data.tgz', '/opt/pkb',
+                     use_internal_ip=True)
+    self.assertIn('@10.0.0.2:/opt/pkb', self.mock_cmd.call_args[0][0])
+
+
+class InstallTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(InstallTestCase, self).setUp()
+    self.installed = []
+    packages = {
+        'curl': types.SimpleNamespace(YUM_PACKAGES=['curl']),
+        'boost': types.SimpleNamespace(YUM_PACKAGES=['boost-devel']),
+        'tool': types.SimpleNamespace(
+            YUM_PACKAGES=['make'], PACKAGE_DEPENDENCIES=['curl'],
+            YumInstall=lambda vm: self.installed.append('tool'),
+            YumUninstall=lambda vm: self.installed.remove('tool')),
+        'app': types.SimpleNamespace(
+            PACKAGE_DEPENDENCIES=lambda: ['tool'],
+            Install=lambda vm: self.installed.append('app')),
+        'empty': types.SimpleNamespace(),
+    }
+    self.enter_context(
+        mock.patch.dict(linux_virtual_machine.linux_packages.PACKAGES,
+                        packages, clear=True))
+    self.vm = CreateCentos7Vm()
+    self.manifest = ''
+    self.mock_cmd = self.enter_context(
+        mock.patch.object(self.vm, 'RemoteCommand',
+                          side_effect=lambda cmd, **_: (self.manifest, '')))
+
+  def _Commands(self):
+    return [call[0][0] for call in self.mock_cmd.call_args_list]
+
+  def testInstallDeclaredPackages(self):
+    self.vm.Install('tool')
+    self.assertEqual(self._Commands(), ['sudo yum install -y make'])
+    self.assertEqual(self.installed, ['tool'])
+
+  def testNextInstallWritesManifest(self):
+    self.vm.Install('tool')
+    self.vm.Install('boost')
+    self.assertEqual(self._Commands()[-1], (
+        '(sudo mkdir -p /opt/pkb && sudo chmod a+rwxt /opt/pkb && '
+        "printf '%s\\n' tool >> /opt/pkb/installed_packages); "
+        'sudo yum install -y boost-devel'))
+
+  def testInstallAllWritesManifest(self):
+    self.vm.InstallAll(['tool'])
+    self.assertEqual(self._Commands()[-1], (
+        '(sudo mkdir -p /opt/pkb && sudo chmod a+rwxt /opt/pkb && '
+        "printf '%s\\n' curl tool >> /opt/pkb/installed_packages); true"))
+
+  def testInstallWithoutInstallMethod(self):
+    with self.assertRaises(KeyError):
+      self.vm.Install('empty')
+
+  def testInstallAllCollapsesOsPackages(self):
+    self.vm.InstallAll(['boost', 'tool'])
+    yum_commands = [cmd for cmd in self._Commands() if 'yum install' in cmd]
+    self.assertEqual(yum_commands,
+                     ['sudo yum install -y boost-devel curl make'])
+    self.assertEqual(self.installed, ['tool'])
+    self.assertEqual(self.vm._installed_packages, {'boost', 'curl', 'tool'})
+
+  def testInstallAllCallsDependencyFunction(self):
+    self.vm.InstallAll(['app'])
+    self.assertEqual(self.installed, ['tool', 'app'])
+    self.assertEqual(self.vm._installed_packages, {'app', 'curl', 'tool'})
+
+  def testUninstallRemovesFromManifest(self):
+    self.vm.Install('tool')
+    self.vm.Uninstall('tool')
+    self.assertEqual(self.installed, [])
+    self.assertNotIn('tool', self.vm._installed_packages)
+    self.assertEqual(self._Commands()[-1],
+                     "sed -i '/^tool$/d' /opt/pkb/installed_packages")
+
+  @flagsaver.flagsaver(run_stage=['prepare'])
+  def testInstallSkipsPackagesInManifest(self):
+    self.manifest = 'tool\ncurl\n'
+    self.vm.InstallAll(['tool'])
+    self.assertEqual(self.installed, [])
+    self.assertEqual(self._Commands(), ['cat /opt/pkb/installed_packages'])
+
+  @flagsaver.flagsaver(persist_install_manifest=False)
+  def testInstallWithoutManifest(self):
+    self.vm.Install('curl')
+    self.assertEqual(self._Commands(), ['sudo yum install -y curl'])
+
+
 if __name__ == '__main__':
   unittest.main()
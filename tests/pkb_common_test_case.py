@@ -23,6 +23,7 @@ from absl.testing import flagsaver
 from absl.testing import parameterized
 import mock
 from perfkitbenchmarker import benchmark_spec
+from perfkitbenchmarker import coalescing_cache
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
 from perfkitbenchmarker import linux_benchmarks
@@ -147,6 +148,9 @@ class TestLinuxVirtualMachine(linux_virtual_machine.BaseLinuxVirtualMachine,
   def InstallPackages(self, packages):
     pass
 
+  def Install(self, package_name):
+    pass
+
 
 class TestGceVirtualMachine(TestOsMixin, gce_virtual_machine.GceVirtualMachine):
   pass
@@ -204,6 +208,8 @@ class PkbCommonTestCase(parameterized.TestCase, absltest.TestCase):
     # benchmark spec to the running thread in __init__(). If this isn't
     # cleaned up, it creates problems for tests run using unittest.
     self.addCleanup(context.SetThreadBenchmarkSpec, None)
+    # Cached cloud CLI responses would leak mocked output between tests.
+    coalescing_cache.ClearResponseCaches()
 
     p = mock.patch(
         util.__name__ + '.GetDefaultProject',
@@ -233,4 +239,4 @@ class PkbCommonTestCase(parameterized.TestCase, absltest.TestCase):
     self.addCleanup(cmd_output.stop)
 
     p.start().return_value.returncode = retcode
-    cmd_output.start().side_effect = [(stdout, stderr)]
+    cmd_output.start().side_effect = [(stdout, stderr, False)]
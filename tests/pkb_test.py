@@ -275,6 +275,13 @@ class TestMiscFunctions(pkb_common_test_case.PkbCommonTestCase,
     self.assertEqual(expected_parsed, parsed)
     self.assertEqual(expected_unparsed, unparsed)
 
+  def testParseResourceBudgets(self):
+    self.assertEqual(
+        pkb._ParseResourceBudgets(['vcpus:96,vcpus@us-east1:24', 'vms:16']),
+        {'vcpus': 96, 'vcpus@us-east1': 24, 'vms': 16})
+    with self.assertRaises(errors.Setup.InvalidFlagConfigurationError):
+      pkb._ParseResourceBudgets(['vcpus:many'])
+
   def testCollectMeminfoHandlerDefault(self):
     # must set --collect_meminfo to collect samples
     vm = mock.Mock()
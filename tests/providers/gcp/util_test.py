@@ -132,6 +132,27 @@ class GcloudCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
                                      '--format', 'json', '--quiet'])
     self.assertEqual(return_value, mock_issue_return_value)
 
+  def testIssueCacheable(self):
+    gce_resource = GceResource(project='test-project')
+    with _MockIssueCommand('[]') as mock_issue:
+      for _ in range(2):
+        cmd = util.GcloudCommand(gce_resource, 'compute', 'networks',
+                                 'describe', 'net')
+        cmd.cacheable = True
+        cmd.Issue()
+    self.assertEqual(mock_issue.call_count, 1)
+
+  def testIssueMutatingCommandInvalidatesCache(self):
+    gce_resource = GceResource(project='test-project')
+    with _MockIssueCommand('[]') as mock_issue:
+      for args in (('networks', 'describe', 'net'),
+                   ('networks', 'delete', 'net'),
+                   ('networks', 'describe', 'net')):
+        cmd = util.GcloudCommand(gce_resource, 'compute', *args)
+        cmd.cacheable = True
+        cmd.Issue()
+    self.assertEqual(mock_issue.call_count, 3)
+
   def testGetRegionFromZone(self):
     zone = 'us-central1-xyz'
     self.assertEqual(util.GetRegionFromZone(zone), 'us-central1')
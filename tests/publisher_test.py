@@ -16,11 +16,14 @@
 import collections
 import csv
 import json
+import os
 import re
+import shutil
 import tempfile
 import unittest
 import uuid
 from absl import flags
+from absl.testing import flagsaver
 import mock
 
 from perfkitbenchmarker import pkb  # pylint: disable=unused-import
@@ -108,6 +111,12 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
                           {u'test': u'testb', u'labels': u'|key2:val2|'}],
                          result)
 
+  def testLaterCallsAppend(self):
+    self.instance.PublishSamples([{'test': 'testa', 'metadata': {}}])
+    self.instance.PublishSamples([{'test': 'testb', 'metadata': {}}])
+    result = [json.loads(i)['test'] for i in self.fp]
+    self.assertListEqual(['testa', 'testb'], result)
+
 
 class BigQueryPublisherTestCase(unittest.TestCase):
 
@@ -256,6 +265,104 @@ class SampleCollectorTestCase(unittest.TestCase):
         self.instance.samples[0])
 
 
+class StreamingSampleCollectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(StreamingSampleCollectorTestCase, self).setUp()
+    self.spool_dir = tempfile.mkdtemp(prefix='perfkit-spool-')
+    self.addCleanup(shutil.rmtree, self.spool_dir)
+    self.publisher = mock.Mock()
+    self.benchmark_spec = mock.MagicMock(uuid='run-uri')
+
+  def _CreateCollector(self):
+    return publisher.SampleCollector(
+        metadata_providers=[], publishers=[self.publisher],
+        publishers_from_flags=False, add_default_publishers=False,
+        publish_batch_size=2, spool_dir=self.spool_dir)
+
+  def _AddSamples(self, collector, count):
+    samples = [sample.Sample('widgets', i, 'oz') for i in range(count)]
+    collector.AddSamples(samples, 'test', self.benchmark_spec)
+
+  def _PublishedValues(self):
+    return [[s['value'] for s in call_args[0][0]]
+            for call_args in self.publisher.PublishSamples.call_args_list]
+
+  def testPublishesFullBatches(self):
+    collector = self._CreateCollector()
+    self._AddSamples(collector, 5)
+    self.assertEqual([[0, 1], [2, 3]], self._PublishedValues())
+    self.assertEqual(1, len(collector.samples))
+    collector.PublishSamples()
+    self.assertEqual([[0, 1], [2, 3], [4]], self._PublishedValues())
+    self.assertEqual([], os.listdir(self.spool_dir))
+
+  def testRepublishesSamplesOfExitedCollector(self):
+    crashed = self._CreateCollector()
+    self._AddSamples(crashed, 3)
+    # Simulate the process exiting, which releases the spool file lock.
+    crashed._spool_file.close()
+    self.publisher.reset_mock()
+
+    self.assertEqual(1, self._CreateCollector().RepublishSpooledSamples())
+    self.assertEqual([[2]], self._PublishedValues())
+    self.assertEqual([], os.listdir(self.spool_dir))
+
+  def testSkipsSpoolOfRunningCollector(self):
+    running = self._CreateCollector()
+    self._AddSamples(running, 1)
+
+    self.assertEqual(0, self._CreateCollector().RepublishSpooledSamples())
+    self.assertEqual([], self._PublishedValues())
+    running.PublishSamples()
+    self.assertEqual([[0]], self._PublishedValues())
+
+  def testSkipsPartiallyWrittenSample(self):
+    with open(os.path.join(self.spool_dir, 'crashed.jsonl'), 'w') as fp:
+      fp.write(json.dumps({'value': 1.0}) + '\n{"value": ')
+
+    self.assertEqual(1, self._CreateCollector().RepublishSpooledSamples())
+    self.assertEqual([[1.0]], self._PublishedValues())
+
+
+class SharedResultFilesTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(SharedResultFilesTestCase, self).setUp()
+    self.tmp_dir = tempfile.mkdtemp(prefix='perfkit-shared-')
+    self.addCleanup(shutil.rmtree, self.tmp_dir)
+    self.json_path = os.path.join(self.tmp_dir, 'results.json')
+    saver = flagsaver.flagsaver(
+        json_path=self.json_path, csv_path=None, parquet_path=None,
+        json_write_mode='w')
+    saver.__enter__()
+    self.addCleanup(saver.__exit__, None, None, None)
+    p = mock.patch.object(
+        vm_util, 'PrependTempDir',
+        side_effect=lambda name: os.path.join(self.tmp_dir, name))
+    p.start()
+    self.addCleanup(p.stop)
+    self.benchmark_spec = mock.MagicMock(uuid='run-uri')
+
+  def _CreateCollector(self):
+    return publisher.SampleCollector(
+        metadata_providers=[], publish_batch_size=1,
+        spool_dir=os.path.join(self.tmp_dir, 'spool'))
+
+  def _PublishedValues(self):
+    with open(self.json_path) as fp:
+      return [json.loads(line)['value'] for line in fp]
+
+  def testCollectorsAppendToTruncatedFile(self):
+    with open(self.json_path, 'w') as fp:
+      fp.write(json.dumps({'value': -1.0}) + '\n')
+    publisher.TruncateResultFiles()
+    for value in range(2):
+      self._CreateCollector().AddSamples(
+          [sample.Sample('widgets', value, 'oz')], 'test', self.benchmark_spec)
+    self.assertEqual([0, 1], self._PublishedValues())
+
+
 class DefaultMetadataProviderTestCase(unittest.TestCase):
 
   def setUp(self):
@@ -405,6 +512,167 @@ class CSVPublisherTestCase(unittest.TestCase):
     self.assertEqual(['key1', 'key3'], reader.fieldnames[-2:])
     self.assertEqual(3, len(rows))
 
+  def testLaterCallsAppend(self):
+    instance = publisher.CSVPublisher(self.tf.name)
+    instance.PublishSamples([{'test': 'testa', 'metric': '1', 'value': 1.0,
+                              'unit': 'MB', 'metadata': {}}])
+    instance.PublishSamples([{'test': 'testa', 'metric': '2', 'value': 2.0,
+                              'unit': 'MB', 'metadata': {}}])
+    self.tf.seek(0)
+    rows = list(csv.DictReader(self.tf))
+    self.assertEqual(['1', '2'], [i['metric'] for i in rows])
+
+  def testNewMetaKeysRewriteSingleHeader(self):
+    # Separate instances, like the collectors of different benchmarks.
+    publisher.CSVPublisher(self.tf.name).PublishSamples(
+        [{'test': 'testa', 'metric': '1', 'value': 1.0, 'unit': 'MB',
+          'metadata': {'key2': 'a'}}])
+    publisher.CSVPublisher(self.tf.name).PublishSamples(
+        [{'test': 'testa', 'metric': '2', 'value': 2.0, 'unit': 'MB',
+          'metadata': {'key1': 'b'}}])
+    publisher.CSVPublisher(self.tf.name).PublishSamples(
+        [{'test': 'testa', 'metric': '3', 'value': 3.0, 'unit': 'MB',
+          'metadata': {'key2': 'c'}}])
+    self.tf.seek(0)
+    reader = csv.DictReader(self.tf)
+    rows = list(reader)
+    self.assertEqual(['key1', 'key2'], reader.fieldnames[-2:])
+    self.assertEqual([('1', '', 'a'), ('2', 'b', ''), ('3', '', 'c')],
+                     [(i['metric'], i['key1'], i['key2']) for i in rows])
+
+  def testRewritesOnlyForNewMetaKeys(self):
+    instance = publisher.CSVPublisher(self.tf.name)
+    with mock.patch.object(
+        instance, '_RewriteWithHeader',
+        wraps=instance._RewriteWithHeader) as rewrite:
+      for metric, metadata in (('1', {'key1': 'a'}), ('2', {'key1': 'b'}),
+                               ('3', {'key2': 'c'}), ('4', {'key1': 'd'}),
+                               ('5', {})):
+        instance.PublishSamples([{'test': 'testa', 'metric': metric,
+                                  'value': 1.0, 'unit': 'MB',
+                                  'metadata': metadata}])
+    self.assertEqual(1, rewrite.call_count)
+    self.tf.seek(0)
+    rows = list(csv.DictReader(self.tf))
+    self.assertEqual(
+        [('1', 'a', ''), ('2', 'b', ''), ('3', '', 'c'), ('4', 'd', ''),
+         ('5', '', '')],
+        [(i['metric'], i['key1'], i['key2']) for i in rows])
+
+
+class ParquetPublisherTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(ParquetPublisherTestCase, self).setUp()
+    self.path = tempfile.mkdtemp(prefix='perfkit-parquet-publisher')
+    self.addCleanup(shutil.rmtree, self.path)
+    self.instance = publisher.ParquetPublisher(self.path)
+
+  def testRoundTrip(self):
+    samples = [{'metric': 'm1', 'value': 1.0, 'official': False,
+                'metadata': {'threads': 4, 'zone': 'us-a', 'ok': True,
+                             'sizes': [1, 2]}},
+               {'metric': 'm2', 'value': 2.5, 'official': False,
+                'metadata': {'threads': 8, 'ratio': 0.5,
+                             'mixed': 'a'}},
+               {'metric': 'm3', 'value': 3.0, 'official': True,
+                'metadata': {'mixed': 1}}]
+    self.instance.PublishSamples(samples)
+    self.assertEqual(samples, publisher.ReadParquetSamples(self.path))
+
+  def _ParquetFiles(self):
+    return sorted(filename for filename in os.listdir(self.path)
+                  if filename.endswith('.parquet'))
+
+  def _ReadDirectory(self):
+    schema = publisher.parquet.read_schema(
+        os.path.join(self.path, '_common_metadata'))
+    return publisher.parquet.read_table(self.path, schema=schema)
+
+  def testColumnTypes(self):
+    self.instance.PublishSamples([{'metric': 'm', 'value': 1.0,
+                                   'metadata': {'threads': 4, 'zone': 'us-a',
+                                                'ratio': 0.5, 'ok': True,
+                                                'sizes': [1]}}])
+    parquet_file, = self._ParquetFiles()
+    table = publisher.parquet.read_table(os.path.join(self.path, parquet_file))
+    types = {field.name: str(field.type) for field in table.schema}
+    self.assertEqual({
+        'metric': 'string',
+        'value': 'double',
+        'metadata.ok': 'bool',
+        'metadata.ratio': 'double',
+        'metadata.sizes': 'string',
+        'metadata.threads': 'int64',
+        'metadata.zone': 'string',
+    }, types)
+    self.assertEqual(['metric', 'value', 'metadata.ok', 'metadata.ratio',
+                      'metadata.sizes', 'metadata.threads', 'metadata.zone'],
+                     table.column_names)
+
+  def testAppendsFilePerPublish(self):
+    self.instance.PublishSamples([{'metric': 'm1', 'metadata': {'a': 1}}])
+    self.instance.PublishSamples([{'metric': 'm2', 'metadata': {'b': 'x'}}])
+    self.assertEqual(2, len(self._ParquetFiles()))
+    self.assertEqual([{'metric': 'm1', 'metadata': {'a': 1}},
+                      {'metric': 'm2', 'metadata': {'b': 'x'}}],
+                     publisher.ReadParquetSamples(self.path))
+
+  @mock.patch.object(publisher.time, 'time', return_value=100)
+  def testFilesSortInPublishOrder(self, _):
+    for i in range(20):
+      self.instance.PublishSamples([{'metric': 'm%d' % i, 'metadata': {}}])
+    self.assertEqual(['m%d' % i for i in range(20)],
+                     [sample['metric'] for sample in
+                      publisher.ReadParquetSamples(self.path)])
+
+  def testTypesPromotedAcrossFiles(self):
+    self.instance.PublishSamples([{'metric': 'm1', 'value': 1,
+                                   'metadata': {'threads': 4, 'ratio': 1}}])
+    self.instance.PublishSamples([{'metric': 'm2', 'value': 2.5,
+                                   'metadata': {'threads': 'max',
+                                                'ratio': 0.5}}])
+    table = self._ReadDirectory()
+    self.assertEqual('double', str(table.schema.field('metadata.ratio').type))
+    self.assertEqual([1.0, 0.5], table.column('metadata.ratio').to_pylist())
+    self.assertEqual([{'metric': 'm1', 'value': 1.0,
+                       'metadata': {'threads': 4, 'ratio': 1}},
+                      {'metric': 'm2', 'value': 2.5,
+                       'metadata': {'threads': 'max', 'ratio': 0.5}}],
+                     publisher.ReadParquetSamples(self.path))
+
+  def testLaterFileAddsMetadataKey(self):
+    self.instance.PublishSamples([{'metric': 'm1', 'metadata': {'a': 1}}])
+    self.instance.PublishSamples([{'metric': 'm2',
+                                   'metadata': {'a': 2, 'b': 'x'}}])
+    table = self._ReadDirectory()
+    self.assertEqual([None, 'x'], table.column('metadata.b').to_pylist())
+    self.assertEqual([{'metric': 'm1', 'metadata': {'a': 1}},
+                      {'metric': 'm2', 'metadata': {'a': 2, 'b': 'x'}}],
+                     publisher.ReadParquetSamples(self.path))
+
+  def testPublishersShareSchema(self):
+    self.instance.PublishSamples([{'metric': 'm1', 'metadata': {'a': 1}}])
+    first_files = self._ParquetFiles()
+    publisher.ParquetPublisher(self.path).PublishSamples(
+        [{'metric': 'm2', 'metadata': {'b': 'x'}}])
+    # Files of different publishers in the same millisecond may sort either
+    # way, so find the new one by name.
+    new_file, = set(self._ParquetFiles()) - set(first_files)
+    self.assertEqual(
+        ['metric', 'metadata.a', 'metadata.b'],
+        publisher.parquet.read_schema(os.path.join(self.path,
+                                                   new_file)).names)
+
+  @mock.patch.object(publisher.SampleCollector, '_PublishersFromFlags')
+  def testRepublishParquetSamples(self, mock_publishers_from_flags):
+    mock_publisher = mock.Mock()
+    mock_publishers_from_flags.return_value = [mock_publisher]
+    samples = [{'metric': 'm1', 'value': 1.0, 'metadata': {'a': 1}}]
+    self.instance.PublishSamples(samples)
+    publisher.RepublishJSONSamples(self.path)
+    mock_publisher.PublishSamples.assert_called_once_with(samples)
+
 
 class InfluxDBPublisherTestCase(unittest.TestCase):
 
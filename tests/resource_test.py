@@ -1,10 +1,13 @@
 """Tests for perfkitbenchmarker.resource."""
 
+import threading
 import unittest
 
 from absl import flags
+from absl.testing import flagsaver
 import mock
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import resource
 from tests import pkb_common_test_case
 
@@ -45,6 +48,45 @@ class CompleteFreezeRestoreResource(IncompleteFreezeRestoreResource):
     pass
 
 
+class ReadyAfterChecksResource(NonFreezeRestoreResource):
+  """Dummy class that is ready on the ready_after_checks-th check."""
+
+  POLL_INTERVAL = 0
+
+  def __init__(self, ready_after_checks=1):
+    super(ReadyAfterChecksResource, self).__init__()
+    self.ready_after_checks = ready_after_checks
+    self.is_ready_calls = 0
+
+  def _Create(self):
+    events.command_issued.send(['create'])
+
+  def _IsReady(self):
+    events.command_issued.send(['describe'])
+    self.is_ready_calls += 1
+    return self.is_ready_calls >= self.ready_after_checks
+
+
+class OperationResource(ReadyAfterChecksResource):
+  """Dummy class whose creation operation can be waited on."""
+
+  def _WaitForReadyOperation(self, timeout):
+    events.command_issued.send(['wait'])
+
+
+class BatchedResource(ReadyAfterChecksResource):
+  """Dummy class that is checked with batched calls."""
+
+  batch_sizes = []
+
+  @classmethod
+  def _AreReady(cls, resources):
+    events.command_issued.send(['list'])
+    cls.batch_sizes.append(len(resources))
+    # Only ready once all three resources of the test wait together.
+    return [len(resources) == 3] * len(resources)
+
+
 def _CreateFreezeRestoreResource():
   return CompleteFreezeRestoreResource(enable_freeze_restore=True)
 
@@ -206,5 +248,121 @@ class FreezeRestoreTest(pkb_common_test_case.PkbCommonTestCase):
     mock_freeze.assert_not_called()
 
 
+class ReadinessWatcherTest(pkb_common_test_case.PkbCommonTestCase):
+
+  def testPollsUntilReady(self):
+    test_resource = ReadyAfterChecksResource(ready_after_checks=3)
+
+    test_resource.Create()
+
+    self.assertEqual(test_resource.readiness_watcher, resource.POLL)
+    self.assertEqual(test_resource.readiness_checks, 3)
+    self.assertEqual(test_resource.cli_call_count, 4)
+    self.assertEqual(
+        {s.metric: s.value for s in test_resource.GetReadinessSamples()}.keys(),
+        {'Time to Ready', 'Resource CLI Calls', 'Readiness Detection Latency'})
+
+  def testNotReadyInTime(self):
+    test_resource = ReadyAfterChecksResource(ready_after_checks=3)
+    test_resource.POLL_INTERVAL = 1
+    test_resource.READY_TIMEOUT = 0
+
+    with self.assertRaises(errors.Resource.RetryableCreationError):
+      test_resource.Create()
+
+  def testReadinessSamplesAggregatedByType(self):
+    test_resources = [ReadyAfterChecksResource(ready_after_checks=2)
+                      for _ in range(3)]
+    for test_resource in test_resources:
+      test_resource.Create()
+
+    samples = resource.GetReadinessSamples(test_resources)
+
+    self.assertEqual(
+        [s.metric for s in samples],
+        ['Time to Ready p50', 'Time to Ready max', 'Resource CLI Calls p50',
+         'Resource CLI Calls max', 'Readiness Detection Latency p50',
+         'Readiness Detection Latency max'])
+    self.assertEqual(samples[2].value, 3)
+    self.assertEqual(samples[0].metadata, {
+        'resource_type': 'ReadyAfterChecksResource',
+        'resource_count': 3,
+        'readiness_watcher': resource.POLL,
+    })
+
+  @flagsaver.flagsaver(per_resource_readiness_samples=True)
+  def testPerResourceReadinessSamples(self):
+    test_resources = [ReadyAfterChecksResource(ready_after_checks=2)
+                      for _ in range(3)]
+    for test_resource in test_resources:
+      test_resource.Create()
+
+    samples = resource.GetReadinessSamples(test_resources)
+
+    self.assertLen([s for s in samples if s.metric == 'Time to Ready'], 3)
+    self.assertLen([s for s in samples if s.metric == 'Time to Ready p50'], 1)
+
+  def testNoSamplesWithoutReadinessCheck(self):
+    test_resource = NonFreezeRestoreResource()
+    test_resource.Create()
+    self.assertEqual(test_resource.GetReadinessSamples(), [])
+
+  def testOperationWatcher(self):
+    test_resource = OperationResource()
+
+    test_resource.Create()
+
+    self.assertEqual(test_resource.readiness_watcher, 'operation')
+    self.assertEqual(test_resource.readiness_checks, 1)
+    self.assertEqual(test_resource.cli_call_count, 3)
+
+  @flagsaver.flagsaver(resource_readiness_watcher=resource.POLL)
+  def testFlagOverridesAuto(self):
+    test_resource = OperationResource()
+    test_resource.Create()
+    self.assertEqual(test_resource.readiness_watcher, resource.POLL)
+
+  def testBatchedWatcher(self):
+    BatchedResource.batch_sizes = []
+    test_resources = [BatchedResource() for _ in range(3)]
+
+    threads = [threading.Thread(target=r.Create) for r in test_resources]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(
+        [r.readiness_watcher for r in test_resources], ['batched'] * 3)
+    self.assertNotIn(None, [r.resource_ready_time for r in test_resources])
+    self.assertEqual(BatchedResource.batch_sizes[-1], 3)
+    self.assertEqual([r.is_ready_calls for r in test_resources], [0, 0, 0])
+    # One create command each, and a share of the batched list commands.
+    self.assertAlmostEqual(
+        sum(r.cli_call_count for r in test_resources),
+        3 + len(BatchedResource.batch_sizes))
+
+  def testBackoffSleepTimes(self):
+    watcher = resource.BackoffReadinessWatcher()
+    test_resource = ReadyAfterChecksResource()
+    test_resource.POLL_INTERVAL = 10
+    self.assertEqual(
+        [watcher._GetSleepTime(test_resource, tries, 0)
+         for tries in range(1, 7)], [1, 2, 4, 8, 10, 10])
+    watcher._expected_ready_seconds['ReadyAfterChecksResource'] = 100
+    self.addCleanup(watcher._expected_ready_seconds.clear)
+    self.assertEqual(watcher._GetSleepTime(test_resource, 7, 75), 5)
+    self.assertEqual(watcher._GetSleepTime(test_resource, 7, 85), 1)
+
+  @flagsaver.flagsaver(resource_readiness_watcher=resource.BACKOFF)
+  def testBackoffLearnsReadyTime(self):
+    self.addCleanup(resource.BackoffReadinessWatcher._expected_ready_seconds
+                    .clear)
+    test_resource = ReadyAfterChecksResource()
+    test_resource.Create()
+    self.assertIn('ReadyAfterChecksResource',
+                  resource.BackoffReadinessWatcher._expected_ready_seconds)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -15,6 +15,7 @@
 
 import unittest
 
+import numpy as np
 from perfkitbenchmarker import sample
 from six.moves import range
 
@@ -83,5 +84,71 @@ class TestPercentileCalculator(unittest.TestCase):
       sample.PercentileCalculator([3], percentiles=['a'])
 
 
+  def testNumpyArray(self):
+    numbers = np.arange(1001)
+    percentiles = sample.PercentileCalculator(numbers, percentiles=[50, 100])
+
+    self.assertEqual(percentiles['p50'], 500)
+    self.assertIsInstance(percentiles['p50'], int)
+    self.assertEqual(percentiles['p100'], 1000)
+    self.assertAlmostEqual(percentiles['stddev'], np.std(numbers, ddof=1))
+
+
+class QuantileSketchTestCase(unittest.TestCase):
+
+  def testWithinRelativeAccuracyOfPercentileCalculator(self):
+    numbers = np.random.RandomState(0).lognormal(3, 1, 100000)
+    sketch = sample.QuantileSketch(relative_accuracy=0.01)
+    sketch.Add(numbers)
+
+    exact = sample.PercentileCalculator(numbers)
+    estimate = sketch.Percentiles()
+
+    self.assertEqual(exact.keys(), estimate.keys())
+    for key in exact:
+      self.assertLessEqual(
+          abs(estimate[key] - exact[key]), 0.01 * exact[key], key)
+
+  def testMerge(self):
+    numbers = np.random.RandomState(0).exponential(10, 10000)
+    whole = sample.QuantileSketch()
+    whole.Add(numbers)
+    merged = sample.QuantileSketch()
+    for chunk in np.array_split(numbers, 7):
+      part = sample.QuantileSketch()
+      part.Add(chunk)
+      merged.Merge(part)
+
+    self.assertEqual(whole.count, merged.count)
+    whole_percentiles = whole.Percentiles()
+    merged_percentiles = merged.Percentiles()
+    for key in whole_percentiles:
+      self.assertAlmostEqual(whole_percentiles[key], merged_percentiles[key])
+
+  def testZerosAndScalars(self):
+    sketch = sample.QuantileSketch()
+    sketch.Add([0, 0, 0])
+    sketch.Add(5)
+
+    percentiles = sketch.Percentiles(percentiles=[0, 50, 100])
+
+    self.assertEqual(percentiles['p0'], 0)
+    self.assertEqual(percentiles['p50'], 0)
+    self.assertEqual(percentiles['p100'], 5)
+    self.assertEqual(percentiles['average'], 1.25)
+
+  def testEmptySketch(self):
+    with self.assertRaises(ValueError):
+      sample.QuantileSketch().Percentiles()
+
+  def testNegativeValue(self):
+    with self.assertRaises(ValueError):
+      sample.QuantileSketch().Add([1, -1])
+
+  def testMergeDifferentAccuracy(self):
+    with self.assertRaises(ValueError):
+      sample.QuantileSketch(0.01).Merge(sample.QuantileSketch(0.02))
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,8 +14,13 @@
 
 """Tests for the object_storage_service benchmark worker process."""
 
+import io
 import itertools
+import os
 import random
+import string
+import struct
+import tempfile
 import time
 import unittest
 
@@ -92,5 +97,183 @@ class TestPrefixTimestampSuffixIterator(unittest.TestCase):
                               'foo_2.000000_bar'])
 
 
+class TestGenerateWritePayload(unittest.TestCase):
+
+  def testRandomLetters(self):
+    payload = object_storage_api_tests.GenerateWritePayload(100000)
+    self.assertGreaterEqual(len(payload), 100000)
+    self.assertTrue(
+        set(payload[:100000]) <= set(string.ascii_letters.encode()))
+    self.assertGreater(len(set(payload[:100000])), 40)
+
+  def testCompressibility(self):
+    block_size = object_storage_api_tests.PAYLOAD_BLOCK_SIZE
+    payload = object_storage_api_tests.GenerateWritePayload(
+        2 * block_size, compressibility=0.75)
+    filler = b'a' * (block_size // 4 * 3)
+    self.assertEqual(payload[block_size // 4:block_size], filler)
+    self.assertEqual(payload[block_size + block_size // 4:2 * block_size],
+                     filler)
+
+  def testEmptyPayload(self):
+    payload = object_storage_api_tests.GenerateWritePayload(0)
+    self.assertEqual(
+        object_storage_api_tests.PayloadReader(payload, 0).read(), b'')
+
+
+class TestPayloadReader(unittest.TestCase):
+
+  def testReadsStartOfPayload(self):
+    reader = object_storage_api_tests.PayloadReader(b'abcdefgh', 5)
+    self.assertEqual(reader.read(2), b'ab')
+    self.assertEqual(reader.read(), b'cde')
+    self.assertEqual(reader.read(), b'')
+
+  def testSeek(self):
+    reader = object_storage_api_tests.PayloadReader(b'abcdefgh', 5)
+    reader.read()
+    self.assertEqual(reader.seek(0), 0)
+    self.assertEqual(reader.read(5), b'abcde')
+    self.assertEqual(reader.seek(-2, io.SEEK_END), 3)
+    self.assertEqual(reader.read(), b'de')
+    self.assertEqual(reader.tell(), 5)
+
+  def testReadReturnsBytesOfRequestedSize(self):
+    reader = object_storage_api_tests.PayloadReader(bytearray(b'abcdefgh'), 5)
+    data = reader.read(3)
+    self.assertIsInstance(data, bytes)
+    self.assertEqual(data, b'abc')
+    self.assertEqual(reader.readall(), b'de')
+    reader.seek(7)
+    self.assertEqual(reader.read(2), b'')
+    self.assertEqual(reader.tell(), 7)
+
+
+class TestStreamResults(unittest.TestCase):
+
+  def testKeepsSuccessfulResults(self):
+    with mock.patch.object(object_storage_api_tests, 'FLAGS',
+                           mock.Mock(results_dir=None)):
+      results = object_storage_api_tests.StreamResults(3)
+    results.Record(1.0, 0.5, 100)
+    results.Record(2.0, 0.7, 200, succeeded=False)
+    self.assertEqual(results.Result(),
+                     {'stream_num': 3, 'start_times': [1.0],
+                      'latencies': [0.5], 'sizes': [100]})
+    self.assertEqual(results.num_succeeded, 1)
+
+  def testWritesBinaryRecords(self):
+    results_dir = tempfile.mkdtemp()
+    with mock.patch.object(object_storage_api_tests, 'FLAGS',
+                           mock.Mock(results_dir=results_dir)):
+      results = object_storage_api_tests.StreamResults(3)
+    results.Record(1.0, 0.5, 100)
+    results.Record(2.0, 0.7, 200, succeeded=False)
+    path = os.path.join(results_dir, 'stream_3.bin')
+    self.assertEqual(results.Result(),
+                     {'stream_num': 3, 'results_file': path,
+                      'num_records': 2, 'num_succeeded': 1})
+    with open(path, 'rb') as f:
+      records = list(struct.iter_unpack(
+          object_storage_api_tests.RESULT_RECORD_FORMAT, f.read()))
+    self.assertEqual(records, [(1.0, 0.5, 100, 0), (2.0, 0.7, 200, 1)])
+
+
+class _SleepingService(object):
+
+  def ReadObject(self, bucket, object_name):
+    del bucket, object_name
+    start_time = time.time()
+    time.sleep(0.01)
+    return start_time, time.time() - start_time
+
+
+class TestRunWorkerProcesses(unittest.TestCase):
+
+  def _ReadAll(self, threads_per_process):
+    flag_values = mock.Mock(
+        num_streams=6, threads_per_process=threads_per_process,
+        stream_num_start=0, bucket='bucket', results_dir=None)
+    records = [[('object_%d_%d' % (stream, i), 100) for i in range(3)]
+               for stream in range(6)]
+    with mock.patch.object(object_storage_api_tests, 'FLAGS', flag_values), \
+        mock.patch.object(object_storage_api_tests.mp, 'Process',
+                          wraps=object_storage_api_tests.mp.Process) as process:
+      results = object_storage_api_tests.RunWorkerProcesses(
+          object_storage_api_tests.ReadWorker, (_SleepingService(), None),
+          records)
+    return process.call_count, results
+
+  def testProcessPerStream(self):
+    num_processes, results = self._ReadAll(1)
+    self.assertEqual(num_processes, 6)
+    self.assertCountEqual([r['result']['stream_num'] for r in results],
+                          range(6))
+
+  def testThreadsPerProcess(self):
+    num_processes, results = self._ReadAll(4)
+    self.assertEqual(num_processes, 2)
+    self.assertCountEqual([r['result']['stream_num'] for r in results],
+                          range(6))
+    self.assertEqual([r['num_succeeded'] for r in results], [3] * 6)
+
+
+class TestParallelTransfer(unittest.TestCase):
+
+  def setUp(self):
+    super(TestParallelTransfer, self).setUp()
+    flag_values = mock.Mock(part_size=4, parallel_parts=2)
+    patcher = mock.patch.object(object_storage_api_tests, 'FLAGS', flag_values)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.service = mock.Mock()
+
+  def testPartRanges(self):
+    self.assertEqual(object_storage_api_tests._PartRanges(10, 4),
+                     [(0, 4), (4, 4), (8, 2)])
+
+  def testWriteObjectInParts(self):
+    written = {}
+
+    def _WriteObjectPart(bucket, object_name, upload, part_number, stream,
+                         size):
+      del bucket, object_name, upload
+      written[part_number] = stream.read()
+      self.assertEqual(len(written[part_number]), size)
+      return 0.0, 0.5, 'part%d' % part_number
+
+    self.service.StartMultipartUpload.return_value = 'upload'
+    self.service.WriteObjectPart.side_effect = _WriteObjectPart
+    part_latencies = []
+    object_storage_api_tests.WriteObjectInParts(
+        self.service, 'bucket', 'object', b'abcd', 10, part_latencies)
+    self.assertEqual(written, {1: b'abcd', 2: b'abcd', 3: b'ab'})
+    self.service.CompleteMultipartUpload.assert_called_once_with(
+        'bucket', 'object', 'upload', ['part1', 'part2', 'part3'])
+    self.assertEqual(part_latencies, [(0.5, 4), (0.5, 4), (0.5, 2)])
+
+  def testFailedPartAbortsUpload(self):
+    self.service.StartMultipartUpload.return_value = 'upload'
+    self.service.WriteObjectPart.side_effect = IOError()
+    with self.assertRaises(IOError):
+      object_storage_api_tests.WriteObjectInParts(
+          self.service, 'bucket', 'object', b'abcd', 10, [])
+    self.service.CompleteMultipartUpload.assert_not_called()
+    self.service.AbortMultipartUpload.assert_called_once_with(
+        'bucket', 'object', 'upload')
+
+  def testReadObjectInParts(self):
+    self.service.ReadObjectRange.return_value = (0.0, 0.5)
+    part_latencies = []
+    object_storage_api_tests.ReadObjectInParts(
+        self.service, 'bucket', 'object', 10, part_latencies)
+    self.assertCountEqual(self.service.ReadObjectRange.call_args_list, [
+        mock.call('bucket', 'object', 0, 4),
+        mock.call('bucket', 'object', 4, 4),
+        mock.call('bucket', 'object', 8, 2)
+    ])
+    self.assertEqual(part_latencies, [(0.5, 4), (0.5, 4), (0.5, 2)])
+
+
 if __name__ == '__main__':
   unittest.main()
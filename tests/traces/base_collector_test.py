@@ -0,0 +1,172 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.base_collector."""
+
+import gzip
+import os
+import unittest
+
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker import events
+from perfkitbenchmarker.traces import base_collector
+from perfkitbenchmarker.traces import live_telemetry
+from tests import pkb_common_test_case
+
+
+class _TestCollector(base_collector.BaseCollector):
+
+  def _CollectorName(self):
+    return 'test'
+
+  def _InstallCollector(self, vm):
+    pass
+
+  def _CollectorRunCommand(self, vm, collector_file):
+    return 'collect > {0} & echo $!'.format(collector_file)
+
+  def Analyze(self, sender, benchmark_spec, samples):
+    pass
+
+
+class _LiveTestCollector(_TestCollector):
+
+  LIVE_TELEMETRY = True
+
+  def _ParseLiveLine(self, line):
+    return [('value', float(line), 'count')]
+
+
+class BaseCollectorTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(BaseCollectorTestCase, self).setUp()
+    self.collector = _TestCollector(
+        output_directory=self.create_tempdir().full_path)
+    self.vm = mock.Mock()
+    self.vm.name = 'vm0'
+    self.vm.RemoteCommand.return_value = ('1234', '')
+    self.collector._StartOnVm(self.vm)
+    self.collector_file = self.collector._pid_files['vm0'][1]
+
+  def testStopCompressesOutput(self):
+    self.vm.TryRemoteCommand.return_value = True
+    self.collector._StopOnVm(self.vm, 'role_0')
+    self.vm.TryRemoteCommand.assert_called_once_with(
+        'gzip -f ' + self.collector_file)
+    self.vm.PullFile.assert_called_once_with(self.collector.output_directory,
+                                             self.collector_file + '.gz')
+    self.assertEqual(self.collector._role_mapping,
+                     {'role_0': self.collector_file + '.gz'})
+
+  def testStopPullsUncompressedOutputIfCompressionFails(self):
+    self.vm.TryRemoteCommand.return_value = False
+    self.collector._StopOnVm(self.vm, 'role_0')
+    self.vm.PullFile.assert_called_once_with(self.collector.output_directory,
+                                             self.collector_file)
+
+  @flagsaver.flagsaver(trace_compress_output=False)
+  def testStopWithoutCompression(self):
+    self.collector._StopOnVm(self.vm, 'role_0')
+    self.vm.TryRemoteCommand.assert_not_called()
+    self.assertEqual(self.collector._role_mapping,
+                     {'role_0': self.collector_file})
+
+  def testOpenCompressedOutput(self):
+    path = os.path.join(self.collector.output_directory, 'out.stdout.gz')
+    with gzip.open(path, 'wt') as f:
+      f.write('line1\nline2\n')
+    with self.collector._OpenOutput('/tmp/pkb/out.stdout.gz') as f:
+      self.assertEqual(list(f), ['line1\n', 'line2\n'])
+
+  def testOpenUncompressedOutput(self):
+    path = os.path.join(self.collector.output_directory, 'out.stdout')
+    with open(path, 'w') as f:
+      f.write('line1\n')
+    with self.collector._OpenOutput('/tmp/pkb/out.stdout') as f:
+      self.assertEqual(f.read(), 'line1\n')
+
+
+class LiveTelemetryTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(LiveTelemetryTestCase, self).setUp()
+    self.collector = _LiveTestCollector(
+        output_directory=self.create_tempdir().full_path)
+    self.collector.live_telemetry = live_telemetry.LiveTelemetryAggregator()
+    self.vm = mock.Mock()
+    self.vm.name = 'vm0'
+
+  @flagsaver.flagsaver(trace_live_interval=1)
+  def testStreamFromVm(self):
+    self.vm.RemoteCommand.side_effect = [('1\n2', ''), ('0\n', '')]
+    received = []
+    self.enter_context(mock.patch.object(
+        self.collector._live_stop, 'wait', side_effect=[False, False, True]))
+
+    def _Receive(sender, vm, samples):
+      received.append((sender, vm, [s.value for s in samples]))
+
+    events.live_samples_created.connect(_Receive)
+    try:
+      self.collector._StreamFromVm(self.vm, '/tmp/pkb/out')
+    finally:
+      events.live_samples_created.disconnect(_Receive)
+    self.assertEqual(self.vm.RemoteCommand.call_args_list, [
+        mock.call('tail -c +1 /tmp/pkb/out'),
+        mock.call('tail -c +4 /tmp/pkb/out')
+    ])
+    self.assertEqual(received, [(self.collector, self.vm, [1.0]),
+                                (self.collector, self.vm, [20.0])])
+    self.assertEqual(
+        [value for _, value in
+         self.collector.live_telemetry.GetWindow('vm0', 'value')], [1.0, 20.0])
+
+  @flagsaver.flagsaver(trace_live_interval=1)
+  def testStreamSkipsUnparsableLines(self):
+    self.vm.RemoteCommand.return_value = ('1\n[N/A]\n2\n', '')
+    self.enter_context(mock.patch.object(
+        self.collector._live_stop, 'wait', side_effect=[False, True]))
+    self.collector._StreamFromVm(self.vm, '/tmp/pkb/out')
+    self.assertEqual(
+        [value for _, value in
+         self.collector.live_telemetry.GetWindow('vm0', 'value')], [1.0, 2.0])
+
+  @flagsaver.flagsaver(trace_live_interval=5)
+  def testAddLiveTelemetrySamples(self):
+    self.collector.live_telemetry.Add('vm0', 'value', 1.0, 3.0, 'count')
+    samples = []
+    self.collector._AddLiveTelemetrySamples(samples)
+    self.assertLen(samples, 1)
+    self.assertEqual(samples[0].metric, 'value_time_series')
+    self.assertEqual(samples[0].metadata['event'], 'test')
+    self.assertEqual(samples[0].metadata['vm_name'], 'vm0')
+    self.assertEqual(samples[0].metadata['interval'], 5)
+
+  @flagsaver.flagsaver(trace_live_interval=1)
+  def testStartAndStopStreaming(self):
+    self.vm.RemoteCommand.return_value = ('1234', '')
+    self.collector.StartOnVms(None, [self.vm], '')
+    self.assertLen(self.collector._live_threads, 1)
+    self.collector.StopOnVms(None, 'run')
+    self.assertEmpty(self.collector._live_threads)
+
+  def testNotStreamingByDefault(self):
+    self.vm.RemoteCommand.return_value = ('1234', '')
+    self.collector.StartOnVms(None, [self.vm], '')
+    self.assertEmpty(self.collector._live_threads)
+
+
+if __name__ == '__main__':
+  unittest.main()
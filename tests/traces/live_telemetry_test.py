@@ -0,0 +1,51 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.live_telemetry."""
+
+import unittest
+
+from perfkitbenchmarker.traces import live_telemetry
+from tests import pkb_common_test_case
+
+
+class LiveTelemetryAggregatorTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testWindowKeepsMostRecentPoints(self):
+    aggregator = live_telemetry.LiveTelemetryAggregator(window=3)
+    for i in range(5):
+      aggregator.Add('vm0', 'steal', float(i), i * 10.0, '%')
+    self.assertEqual(
+        aggregator.GetWindow('vm0', 'steal'), [(2.0, 20.0), (3.0, 30.0),
+                                               (4.0, 40.0)])
+
+  def testUnknownSeries(self):
+    aggregator = live_telemetry.LiveTelemetryAggregator(window=3)
+    self.assertEqual(aggregator.GetWindow('vm0', 'steal'), [])
+
+  def testGetSamples(self):
+    aggregator = live_telemetry.LiveTelemetryAggregator(window=3)
+    aggregator.Add('vm0', 'steal', 1.5, 10.0, '%')
+    aggregator.Add('vm0', 'steal', 2.5, 20.0, '%')
+    samples = aggregator.GetSamples(1, {'event': 'sar'})
+    self.assertLen(samples, 1)
+    self.assertEqual(samples[0].metric, 'steal_time_series')
+    self.assertEqual(samples[0].unit, '%')
+    self.assertEqual(samples[0].metadata['values'], [10.0, 20.0])
+    self.assertEqual(samples[0].metadata['timestamps'], [1500, 2500])
+    self.assertEqual(samples[0].metadata['vm_name'], 'vm0')
+    self.assertEqual(samples[0].metadata['event'], 'sar')
+
+
+if __name__ == '__main__':
+  unittest.main()
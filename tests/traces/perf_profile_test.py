@@ -0,0 +1,116 @@
+# Copyright 2023 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.perf_profile."""
+
+import gzip
+import os
+import unittest
+
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker.traces import perf_profile
+from tests import pkb_common_test_case
+
+_PERF_STAT_OUTPUT = """# started on Mon Jun 12 17:02:17 2023
+
+2000000000,,cycles,10004321543,100.00,,
+3000000000,,instructions,10004321543,100.00,1.50,insn per cycle
+1000000,,cache-references,10004321543,100.00,,
+250000,,cache-misses,10004321543,100.00,25.00,of all cache refs
+<not supported>,,context-switches,0,100.00,,
+"""
+
+_FOLDED_STACKS = """redis-server;main;malloc;_int_malloc 6
+redis-server;main;processCommand 3
+swapper;cpu_startup_entry;intel_idle 1
+"""
+
+
+class PerfProfileTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(PerfProfileTestCase, self).setUp()
+    self.collector = perf_profile._PerfProfileCollector(
+        output_directory=self.create_tempdir().full_path)
+
+  def testParsePerfStat(self):
+    self.assertEqual(
+        perf_profile._ParsePerfStat(_PERF_STAT_OUTPUT.splitlines()), {
+            'cycles': 2e9,
+            'instructions': 3e9,
+            'cache-references': 1e6,
+            'cache-misses': 2.5e5
+        })
+
+  def testParseFoldedStacks(self):
+    self.assertEqual(
+        perf_profile._ParseFoldedStacks(_FOLDED_STACKS.splitlines()), {
+            '_int_malloc': 6,
+            'processCommand': 3,
+            'intel_idle': 1
+        })
+
+  def testRunCommand(self):
+    self.assertEqual(
+        self.collector._CollectorRunCommand(None, '/tmp/pkb/out'),
+        "sudo sh -c 'perf stat -a -x, -e cycles,instructions,cache-references,"
+        'cache-misses,context-switches -o /tmp/pkb/out -- perf record -a -g '
+        "-F 99 -o /tmp/pkb/out.data > /dev/null 2>&1 & echo $!'")
+
+  @flagsaver.flagsaver(perf_profile_comms=['redis-server'])
+  def testFoldCommandFiltersComms(self):
+    self.assertIn('-i /tmp/pkb/out.data --comms redis-server ',
+                  self.collector._FoldCommand('/tmp/pkb/out'))
+
+  def testStopFoldsAndPullsStacks(self):
+    vm = mock.Mock()
+    vm.name = 'vm0'
+    vm.RemoteCommand.return_value = ('1234', '')
+    self.collector._StartOnVm(vm)
+    collector_file = self.collector._pid_files['vm0'][1]
+    self.collector._StopOnVm(vm, 'role_0')
+    vm.PullFile.assert_has_calls([
+        mock.call(self.collector.output_directory, collector_file + '.gz'),
+        mock.call(self.collector.output_directory,
+                  collector_file + '.folded.gz')
+    ])
+    self.assertEqual(self.collector._folded_mapping,
+                     {'role_0': collector_file + '.folded.gz'})
+
+  @flagsaver.flagsaver(perf_profile_top_functions=2)
+  def testAnalyze(self):
+    for name, contents in (('out.gz', _PERF_STAT_OUTPUT),
+                           ('out.folded.gz', _FOLDED_STACKS)):
+      with gzip.open(
+          os.path.join(self.collector.output_directory, name), 'wt') as f:
+        f.write(contents)
+    self.collector._role_mapping['role_0'] = '/tmp/pkb/out.gz'
+    self.collector._folded_mapping['role_0'] = '/tmp/pkb/out.folded.gz'
+    samples = []
+    self.collector.Analyze(None, None, samples)
+    by_metric = {}
+    for s in samples:
+      by_metric.setdefault(s.metric, []).append(s)
+    self.assertEqual(by_metric['ipc'][0].value, 1.5)
+    self.assertEqual(by_metric['cache_miss_rate'][0].value, 25.0)
+    self.assertEqual(by_metric['cycles'][0].value, 2e9)
+    self.assertNotIn('context-switches', by_metric)
+    self.assertEqual(
+        [(s.metadata['function'], s.value) for s in by_metric['hot_function']],
+        [('_int_malloc', 60.0), ('processCommand', 30.0)])
+    self.assertEqual(by_metric['hot_function'][0].metadata['role'], 'role_0')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -56,5 +56,18 @@ class SarTestCase(unittest.TestCase):
     last_sample = samples[-1]
     self.assertEqual('average_steal', last_sample.metric)
 
+  def testParseLiveLine(self):
+    collector = sar._SarCollector(output_directory='/tmp')
+    self.assertEqual(
+        collector._ParseLiveLine(
+            '12:17:17 AM     all     18.09      0.00      0.00      0.00     '
+            '81.91     0.00'), [('steal', 81.91, '%'), ('user', 18.09, '%')])
+    self.assertEqual(
+        collector._ParseLiveLine(
+            'Average:        all     33.73      0.00      0.00      0.00     '
+            '66.27     0.00'), [])
+    self.assertEqual(collector._ParseLiveLine(''), [])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,9 +14,8 @@
 
 """Tests for perfkitbenchmarker.vm_util."""
 
+import asyncio
 import os
-import subprocess
-import threading
 import time
 import unittest
 from absl import flags
@@ -81,46 +80,6 @@ def HaveSleepSubprocess():
   return False
 
 
-class WaitUntilSleepTimer(threading.Thread):
-  """Timer that waits for a sleep subprocess to appear.
-
-  This is intended for specific tests that want to trigger timer
-  expiry as soon as it detects that a subprocess is executing a
-  "sleep" command.
-
-  It assumes that the test driver is not parallelizing the tests using
-  this method since that may lead to inconsistent results.
-  TODO(user): If that's an issue, could add a unique fractional part
-  to the sleep command args to distinguish them.
-  """
-
-  def __init__(self, interval, function):
-    threading.Thread.__init__(self)
-    self.end_time = time.time() + interval
-    self.function = function
-    self.finished = threading.Event()
-    self.have_sleep = threading.Event()
-
-    def WaitForSleep():
-      while not self.finished.is_set():
-        if HaveSleepSubprocess():
-          self.have_sleep.set()
-          break
-        time.sleep(0)  # yield to other Python threads
-
-    threading.Thread(target=WaitForSleep).run()
-
-  def cancel(self):
-    self.finished.set()
-
-  def run(self):
-    while time.time() < self.end_time and not self.have_sleep.is_set():
-      time.sleep(0)  # yield to other Python threads
-    if not self.finished.is_set():
-      self.function()
-    self.finished.set()
-
-
 class IssueCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
 
   def setUp(self):
@@ -131,14 +90,12 @@ class IssueCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
     _, _, retcode = vm_util.IssueCommand(['sleep', '0s'])
     self.assertEqual(retcode, 0)
 
-  @mock.patch('threading.Timer', new=WaitUntilSleepTimer)
   def testTimeoutReachedThrows(self):
     with self.assertRaises(errors.VmUtil.IssueCommandTimeoutError):
       _, _, _ = vm_util.IssueCommand(['sleep', '2s'], timeout=1,
                                      raise_on_failure=False)
     self.assertFalse(HaveSleepSubprocess())
 
-  @mock.patch('threading.Timer', new=WaitUntilSleepTimer)
   def testTimeoutReached(self):
     _, _, retcode = vm_util.IssueCommand(['sleep', '2s'], timeout=1,
                                          raise_on_failure=False,
@@ -151,12 +108,40 @@ class IssueCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(retcode, 0)
 
   def testNoTimeout_ExceptionRaised(self):
-    with mock.patch('subprocess.Popen', spec=subprocess.Popen) as mock_popen:
-      mock_popen.return_value.wait.side_effect = KeyboardInterrupt()
+    with mock.patch.object(vm_util, '_ReadIssueCommandOutput',
+                           side_effect=KeyboardInterrupt()):
       with self.assertRaises(KeyboardInterrupt):
         vm_util.IssueCommand(['sleep', '2s'], timeout=None)
     self.assertFalse(HaveSleepSubprocess())
 
+  def testLargeOutput(self):
+    stdout, stderr, retcode = vm_util.IssueCommand(
+        ['bash', '-c', 'head -c 1000000 /dev/zero | tr "\\0" a; echo err >&2'])
+    self.assertEqual(0, retcode)
+    self.assertEqual('a' * 1000000, stdout)
+    self.assertEqual('err\n', stderr)
+
+  def testLineCallback(self):
+    lines = []
+    stdout, _, _ = vm_util.IssueCommand(
+        ['bash', '-c', 'echo one; echo two >&2; printf three'],
+        line_callback=lambda stream, line: lines.append((stream, line)))
+    self.assertEqual('one\nthree', stdout)
+    self.assertCountEqual([(vm_util.OUTPUT_STDOUT, 'one'),
+                           (vm_util.OUTPUT_STDERR, 'two'),
+                           (vm_util.OUTPUT_STDOUT, 'three')], lines)
+
+  def testMaxOutputBytes(self):
+    stdout, _, _ = vm_util.IssueCommand(['seq', '1000'], max_output_bytes=9)
+    self.assertEqual('998\n999\n1000\n'[-9:], stdout)
+
+  def testBackgroundedGrandchildDoesNotBlock(self):
+    start = time.time()
+    _, _, retcode = vm_util.IssueCommand(
+        ['bash', '-c', '(sleep 2 &) ; echo done'])
+    self.assertEqual(0, retcode)
+    self.assertLess(time.time() - start, 1.5)
+
   def testRaiseOnFailureSuppressed_NoException(self):
     def _SuppressFailure(stdout, stderr, retcode):
       del stdout  # unused
@@ -208,6 +193,47 @@ class IssueCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
                   str(cm.exception))
 
 
+class IssueCommandAsyncTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testOutput(self):
+    stdout, stderr, retcode = asyncio.run(vm_util.IssueCommandAsync(
+        ['bash', '-c', 'echo out; echo err >&2']))
+    self.assertEqual(('out\n', 'err\n', 0), (stdout, stderr, retcode))
+
+  def testFailureRaises(self):
+    with self.assertRaises(errors.VmUtil.IssueCommandError):
+      asyncio.run(vm_util.IssueCommandAsync(['cat', 'non_existent_file']))
+
+  def testTimeoutReachedThrows(self):
+    with self.assertRaises(errors.VmUtil.IssueCommandTimeoutError):
+      asyncio.run(vm_util.IssueCommandAsync(['sleep', '2s'], timeout=0.5))
+    self.assertFalse(HaveSleepSubprocess())
+
+  def testTimeoutReached(self):
+    _, _, retcode = asyncio.run(vm_util.IssueCommandAsync(
+        ['sleep', '2s'], timeout=0.5, raise_on_failure=False,
+        raise_on_timeout=False))
+    self.assertEqual(retcode, -9)
+
+  def testReadsAllOutput(self):
+    stdout, _, _ = asyncio.run(vm_util.IssueCommandAsync(
+        ['bash', '-c', 'head -c 5000000 /dev/zero | tr "\\0" x']))
+    self.assertEqual('x' * 5000000, stdout)
+
+  def testDetachedGrandchildDoesNotBlock(self):
+    start = time.time()
+    stdout, _, retcode = asyncio.run(vm_util.IssueCommandAsync(
+        ['bash', '-c', '(sleep 4 >/dev/null 2>&1 &) ; echo done'], timeout=2))
+    self.assertEqual(('done\n', 0), (stdout, retcode))
+    self.assertLess(time.time() - start, 1.5)
+
+  def testGrandchildHoldingOutputTimesOut(self):
+    stdout, _, _ = asyncio.run(vm_util.IssueCommandAsync(
+        ['bash', '-c', '(sleep 4 &) ; echo done'], timeout=0.5,
+        raise_on_failure=False, raise_on_timeout=False))
+    self.assertEqual('done\n', stdout)
+
+
 class VmUtilTest(pkb_common_test_case.PkbCommonTestCase):
 
   def setUp(self):